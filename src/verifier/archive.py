@@ -0,0 +1,200 @@
+import posixpath
+import tarfile
+import threading
+import zipfile
+from .record_source import RecordSource, RecordEntry, normalize_name
+
+"""
+This module reads an election record directly from a zip or tar archive, so that a published record can be
+verified without unpacking it to disk first.
+
+The record may be at the root of the archive or inside a single top-level folder, which is detected from the
+location of context.json and stripped from the file names. A zip archive is read with random access through its
+central directory. A compressed tar archive cannot be read at random offsets without decompressing from its start
+again, so the small documents of the record (constants, context, description, coefficients, tally) are kept in
+memory while indexing, and the ballot folders are streamed in a single pass whenever they are walked, in archive
+order, which is stable but not sorted.
+
+Class:
+    ZipRecordSource
+    TarRecordSource
+
+Function:
+    is_record_archive(str)
+    open_record_archive(str)
+"""
+
+ARCHIVE_SUFFIXES = ('.zip', '.tar', '.tar.gz', '.tgz')
+
+
+def is_record_archive(path: str) -> bool:
+    """
+    check if a record path names an archive rather than a folder
+    :param path: path given on the command line
+    :return: True if the path ends with one of the supported archive suffixes
+    """
+    return path.lower().endswith(ARCHIVE_SUFFIXES)
+
+
+def find_record_root(names: list) -> str:
+    """
+    find the folder of the archive holding the record
+    :param names: the normalized member names of the archive
+    :return: the record root as a name prefix, empty if the record is at the root of the archive
+    """
+    context_names = [name for name in names if posixpath.basename(name) == 'context.json']
+    if not context_names:
+        return ''
+    root = posixpath.dirname(min(context_names, key=lambda name: name.count('/')))
+    return root + '/' if root else ''
+
+
+def strip_record_root(name: str, root: str):
+    """
+    get the name of an archive member relative to the record root
+    :param name: the normalized member name
+    :param root: the record root found by find_record_root()
+    :return: the name relative to the record root, or None if the member is outside of the record
+    """
+    if not name.startswith(root):
+        return None
+    return name[len(root):]
+
+
+class ZipRecordSource(RecordSource):
+    """
+    Zip archive backend, every member is read with random access.
+    """
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.zip_file = zipfile.ZipFile(path)
+        self.members = {}
+
+    def _scan(self):
+        infos = [(normalize_name(info.filename), info) for info in self.zip_file.infolist() if not info.is_dir()]
+        root = find_record_root([name for name, _ in infos])
+        for name, info in infos:
+            name = strip_record_root(name, root)
+            if name is None:
+                continue
+            self.members[name] = info
+            yield RecordEntry(name, info.file_size, 0)
+
+    def read(self, name: str) -> bytes:
+        # the members are only known once the archive is indexed
+        self.stat(name)
+        info = self.members.get(name)
+        if info is None:
+            return None
+        return self.zip_file.read(info)
+
+    def close(self):
+        self.zip_file.close()
+
+
+class TarRecordSource(RecordSource):
+    """
+    Tar archive backend. An uncompressed tar is read with random access, a compressed tar keeps the files outside of
+    the bulk folders in memory and streams the bulk folders once per walk.
+    """
+
+    BULK_FOLDERS = ('encrypted_ballots', 'spoiled_ballots')
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+        self.sequential = not path.lower().endswith('.tar')
+        self.tar_file = None if self.sequential else tarfile.open(path, 'r:')
+        self.lock = threading.Lock()
+        self.root = ''
+        self.members = {}
+        self.cached = {}
+
+    def _scan(self):
+        members, cached = [], {}
+        if self.sequential:
+            with tarfile.open(self.path, 'r|*') as tar:
+                for member in tar:
+                    if member.isfile():
+                        name = normalize_name(member.name)
+                        members.append((name, member))
+                        if not self.__is_bulk(name):
+                            cached[name] = tar.extractfile(member).read()
+        else:
+            members = [(normalize_name(member.name), member) for member in self.tar_file.getmembers()
+                       if member.isfile()]
+
+        self.root = find_record_root([name for name, _ in members])
+        for name, member in members:
+            relative_name = strip_record_root(name, self.root)
+            if relative_name is None:
+                continue
+            self.members[relative_name] = member
+            if name in cached:
+                self.cached[relative_name] = cached[name]
+            yield RecordEntry(relative_name, member.size, member.mtime)
+
+    def read(self, name: str) -> bytes:
+        # the members are only known once the archive is indexed
+        if self.stat(name) is None:
+            return None
+
+        if not self.sequential:
+            # the members share one file object
+            with self.lock:
+                return self.tar_file.extractfile(self.members[name]).read()
+
+        if name in self.cached:
+            return self.cached[name]
+        # a single bulk file of a compressed archive, only reached through a full scan
+        for _, content in self.__stream(lambda n: n == name):
+            return content
+        return None
+
+    def iter_folder(self, folder: str, selected):
+        if not self.sequential or not self.__is_bulk(folder + '/'):
+            yield from super().iter_folder(folder, selected)
+            return
+
+        # one pass over the compressed stream in archive order, since an archive written from a directory listing is
+        # rarely sorted, and buffering the files that come before their turn would hold most of the ballots
+        yield from self.__stream(lambda n: posixpath.dirname(n) == folder and selected(n))
+
+    def __stream(self, wanted):
+        """
+        walk the compressed archive from its start
+        :param wanted: a predicate on the file name relative to the record root
+        :return: a generator of (file name, content) tuples of the wanted files, in archive order
+        """
+        # the record root stripped from the member names is only found by indexing the archive
+        self.stat('')
+        with tarfile.open(self.path, 'r|*') as tar:
+            for member in tar:
+                if member.isfile():
+                    name = strip_record_root(normalize_name(member.name), self.root)
+                    if name is not None and wanted(name):
+                        yield name, tar.extractfile(member).read()
+
+    def __is_bulk(self, name: str) -> bool:
+        """
+        check if a file belongs to one of the ballot folders, which are not kept in memory
+        :param name: the normalized file name
+        :return: True if the file is inside a bulk folder
+        """
+        return any(part in self.BULK_FOLDERS for part in name.split('/')[:-1])
+
+    def close(self):
+        if self.tar_file is not None:
+            self.tar_file.close()
+
+
+def open_record_archive(path: str) -> RecordSource:
+    """
+    open an archive with the backend matching its suffix
+    :param path: path to a .zip, .tar, .tar.gz or .tgz file
+    :return: a ZipRecordSource or a TarRecordSource
+    """
+    if path.lower().endswith('.zip'):
+        return ZipRecordSource(path)
+    return TarRecordSource(path)
@@ -0,0 +1,294 @@
+import asyncio
+import threading
+from . import number
+from .generator import FilePathGenerator, ParameterGenerator, VoteLimitCounter
+from .baseline_verifier import BaselineVerifier
+from .key_generation_verifier import KeyGenerationVerifier
+from .encryption_verifier import AllBallotsVerifier, BallotEncryptionVerifier
+from .decryption_verifier import DecryptionVerifier
+from .result import Result, Reason, ResultSink
+
+"""
+This module is the asyncio interface of the verifier, for services that embed the verification in an event loop.
+
+The verification itself is the synchronous code of the verifiers, run in an executor so that the event loop never
+blocks on it: the default thread pool of the loop, or a process pool for the modular arithmetic to run in parallel.
+Every executor task only gets the path of the record and the item to verify; each thread or process loads the
+parameters of a record once, in a RecordContext, and reuses them for every later task. The results are Result
+objects, which are returned or streamed as the items complete, and nothing is printed.
+
+At most `concurrency` items of an AsyncVerifier are submitted to the executor at any time. Cancelling a call, or
+closing the stream of verify_record() before its end, cancels the items not started yet.
+
+Class:
+    RecordContext
+    AsyncVerifier
+
+Function:
+    get_record_context(str, bool)
+    verify_ballot(str, dict)
+    verify_record(str)
+"""
+
+BOX_TASKS = ('baseline', 'key_generation', 'tracking_chain', 'tally')
+
+# (record path, fail fast) - context, per process
+_CONTEXTS = {}
+_CONTEXTS_LOCK = threading.Lock()
+
+
+class RecordContext:
+    """
+    The parameters of a record loaded once per process, shared by the executor tasks verifying its items.
+    Note that number.set_group() is process-wide, so the records verified by one process must share their group.
+    """
+
+    def __init__(self, root: str, fail_fast=False):
+        """
+        :param root: the path to the record folder, archive or bundle
+        :param fail_fast: stop every check at its first failure
+        """
+        self.path_g = FilePathGenerator.open(root)
+        self.param_g = ParameterGenerator(self.path_g)
+        number.set_group(self.param_g.get_large_prime(), self.param_g.get_small_prime())
+        self.vlc = VoteLimitCounter(self.param_g)
+        self.fail_fast = fail_fast
+        self.sink = ResultSink()
+        self.decryption_verifier = None
+        self.lock = threading.Lock()
+
+    def get_decryption_verifier(self) -> DecryptionVerifier:
+        """
+        :return: the decryption verifier of the record, reading the tally on first use
+        """
+        with self.lock:
+            if self.decryption_verifier is None:
+                self.decryption_verifier = DecryptionVerifier(self.path_g, self.param_g, self.sink, self.fail_fast)
+            return self.decryption_verifier
+
+
+def get_record_context(root: str, fail_fast=False) -> RecordContext:
+    """
+    get the context of a record in this process, loading it on first use
+    :param root: the path to the record
+    :param fail_fast: stop every check at its first failure
+    :return: the context of the record
+    """
+    key = (root, fail_fast)
+    with _CONTEXTS_LOCK:
+        context = _CONTEXTS.get(key)
+        if context is None:
+            context = _CONTEXTS[key] = RecordContext(root, fail_fast)
+        return context
+
+
+def _list_items(root: str, fail_fast: bool) -> tuple:
+    """
+    :return: the ballot file names and the spoiled ballot names of a record
+    """
+    context = get_record_context(root, fail_fast)
+    ballot_files = context.path_g.list_files(context.path_g.get_encrypted_ballot_folder_path())
+    spoiled_names = sorted(context.get_decryption_verifier().spoiled_ballots.keys())
+    return ballot_files, spoiled_names
+
+
+def _verify_ballot(root: str, fail_fast: bool, ballot_dic: dict) -> Result:
+    """
+    :return: the Result of an encrypted ballot, box 3, 4 and its tracking hash
+    """
+    context = get_record_context(root, fail_fast)
+    return BallotEncryptionVerifier(ballot_dic, context.param_g, context.vlc, fail_fast).verify_ballot()
+
+
+def _verify_ballot_file(root: str, fail_fast: bool, ballot_file: str) -> tuple:
+    """
+    :return: the Result of a ballot file of the record and its (previous, current) tracking hashes
+    """
+    context = get_record_context(root, fail_fast)
+    ballot_dic = context.path_g.read_json(ballot_file)
+    if ballot_dic is None:
+        result = Result('ballot', context.path_g.get_name(ballot_file), box=3)
+        result.fail(Reason.MISSING_BALLOT, field='encrypted_ballots')
+        return result, None, None
+    bev = BallotEncryptionVerifier(ballot_dic, context.param_g, context.vlc, fail_fast)
+    prev_hash, curr_hash = bev.get_tracking_hash()
+    return bev.verify_ballot(), prev_hash, curr_hash
+
+
+def _verify_spoiled_ballot(root: str, fail_fast: bool, ballot_name: str) -> Result:
+    """
+    :return: the Result of a spoiled ballot of the tally, box 10
+    """
+    return get_record_context(root, fail_fast).get_decryption_verifier().verify_a_spoiled_ballot(ballot_name)
+
+
+def _verify_box(root: str, fail_fast: bool, box: str, tracking_hashes=None, num_ballots=None) -> Result:
+    """
+    run a record-wide check
+    :param box: one of BOX_TASKS
+    :param tracking_hashes: the current - previous tracking hashes of every ballot, for the tracking chain
+    :param num_ballots: the number of ballots of the record, for the tracking chain
+    :return: the box-level Result
+    """
+    context = get_record_context(root, fail_fast)
+    if box == 'baseline':
+        return BaselineVerifier(context.param_g, context.sink).verify_all_params()
+    if box == 'key_generation':
+        return KeyGenerationVerifier(context.param_g, context.path_g, context.sink, fail_fast).verify_all_guardians()
+    if box == 'tracking_chain':
+        result = Result('box', 'Box 5 tracking hash chain', box=5)
+        abv = AllBallotsVerifier(context.param_g, context.path_g, context.vlc, context.sink, fail_fast)
+        if not abv.verify_tracking_hashes(tracking_hashes, num_ballots):
+            result.fail(Reason.TRACKING_CHAIN, field='previous_tracking_hash')
+        return result
+    if box == 'tally':
+        return context.get_decryption_verifier().verify_cast_ballot_tallies()
+    raise ValueError("unknown box task {box}, expected one of {names}".format(box=box, names=', '.join(BOX_TASKS)))
+
+
+class AsyncVerifier:
+    """
+    This class verifies the items of one record from coroutines.
+
+    Method:
+        verify_ballot(dict)
+        verify_spoiled_ballot(str)
+        verify_box(str)
+        verify_record()
+    """
+
+    def __init__(self, root: str, executor=None, concurrency=8, fail_fast=False):
+        """
+        :param root: the path to the record folder, archive or bundle
+        :param executor: a concurrent.futures executor, the default executor of the loop if None
+        :param concurrency: the maximum number of items submitted to the executor at once
+        :param fail_fast: stop every check at its first failure, and verify_record() at the first invalid item
+        """
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        self.root = root
+        self.executor = executor
+        self.concurrency = concurrency
+        self.fail_fast = fail_fast
+        # created on first use, within the running loop
+        self.semaphore = None
+
+    async def __run(self, function, *args):
+        """
+        run a task in the executor once a slot of the concurrency limit is free
+        :param function: a module-level task function taking the record path and fail_fast first
+        :return: what the task returns
+        """
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(self.concurrency)
+        async with self.semaphore:
+            loop = asyncio.get_event_loop()
+            return await loop.run_in_executor(self.executor, function, self.root, self.fail_fast, *args)
+
+    async def verify_ballot(self, ballot_dic: dict) -> Result:
+        """
+        verify an encrypted ballot of the record, e.g. one submitted by a voter
+        :param ballot_dic: the encrypted ballot
+        :return: a ballot-level Result of box 3, 4 and of its tracking hash
+        """
+        return await self.__run(_verify_ballot, ballot_dic)
+
+    async def verify_spoiled_ballot(self, ballot_name: str) -> Result:
+        """
+        verify a spoiled ballot of the tally
+        :param ballot_name: the object id of the spoiled ballot
+        :return: a ballot-level Result of box 10
+        """
+        return await self.__run(_verify_spoiled_ballot, ballot_name)
+
+    async def verify_box(self, box: str, tracking_hashes=None, num_ballots=None) -> Result:
+        """
+        run a record-wide check
+        :param box: one of BOX_TASKS
+        :param tracking_hashes: the current - previous tracking hashes of every ballot, for the tracking chain
+        :param num_ballots: the number of ballots of the record, for the tracking chain, the number of hashes by default
+        :return: the box-level Result
+        """
+        return await self.__run(_verify_box, box, tracking_hashes, num_ballots)
+
+    async def __stream(self, calls):
+        """
+        run calls concurrently, yielding their results as they complete
+        :param calls: an iterable of (function, arguments) tuples, consumed as slots free up
+        :return: an async generator of the results
+        """
+        calls = iter(calls)
+        pending = set()
+        try:
+            while True:
+                for function, args in calls:
+                    pending.add(asyncio.ensure_future(self.__run(function, *args)))
+                    if len(pending) >= self.concurrency:
+                        break
+                if not pending:
+                    return
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+    async def verify_record(self):
+        """
+        verify the whole record, box 1 to box 10, streaming the results as the items complete: the box 1 and box 2
+        results and every ballot Result first, then the tracking chain, the tally and every spoiled ballot Result
+        :return: an async generator of Results, stopping after the first invalid item in fail-fast mode
+        """
+        ballot_files, spoiled_names = await self.__run(_list_items)
+
+        tracking_hashes = {}
+        calls = ([(_verify_box, ('baseline',)), (_verify_box, ('key_generation',))]
+                 + [(_verify_ballot_file, (ballot_file,)) for ballot_file in ballot_files])
+        stream = self.__stream(calls)
+        try:
+            async for item in stream:
+                if isinstance(item, tuple):
+                    item, prev_hash, curr_hash = item
+                    if curr_hash is not None:
+                        tracking_hashes[curr_hash] = prev_hash
+                yield item
+                if self.fail_fast and not item.ok:
+                    return
+        finally:
+            await stream.aclose()
+
+        calls = ([(_verify_box, ('tracking_chain', tracking_hashes, len(ballot_files))), (_verify_box, ('tally',))]
+                 + [(_verify_spoiled_ballot, (name,)) for name in spoiled_names])
+        stream = self.__stream(calls)
+        try:
+            async for item in stream:
+                yield item
+                if self.fail_fast and not item.ok:
+                    return
+        finally:
+            await stream.aclose()
+
+
+async def verify_ballot(root: str, ballot_dic: dict, executor=None) -> Result:
+    """
+    verify one encrypted ballot against the parameters of a record
+    :param root: the path to the record
+    :param ballot_dic: the encrypted ballot
+    :param executor: a concurrent.futures executor, the default executor of the loop if None
+    :return: a ballot-level Result
+    """
+    return await AsyncVerifier(root, executor).verify_ballot(ballot_dic)
+
+
+async def verify_record(root: str, executor=None, concurrency=8, fail_fast=False):
+    """
+    verify a whole record, streaming the Results as the items complete, see AsyncVerifier.verify_record()
+    :param root: the path to the record
+    :param executor: a concurrent.futures executor, the default executor of the loop if None
+    :param concurrency: the maximum number of items submitted to the executor at once
+    :param fail_fast: stop at the first invalid item
+    :return: an async generator of Results
+    """
+    async for result in AsyncVerifier(root, executor, concurrency, fail_fast).verify_record():
+        yield result
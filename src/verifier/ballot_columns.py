@@ -0,0 +1,221 @@
+import array
+from .generator import ParameterGenerator
+
+try:
+    import numpy
+except ImportError:
+    # the columns stay stdlib arrays and the checks run as plain loops over them
+    numpy = None
+
+"""
+This module holds the metadata of every ballot of a record in columns, filled as the ballot scan reads the files, and
+runs the structural checks of all the ballots at once on these columns.
+
+A ballot takes one row: its state as a small code, its timestamp, and for every contest of the manifest, in the order
+of the manifest, the number of its selections and of its placeholder selections, -1 when the ballot lacks the
+contest. The columns are compact typed arrays, a few dozen bytes per ballot, and with NumPy installed they are viewed
+as NumPy arrays without a copy, so the checks are a handful of vectorised comparisons, milliseconds for millions of
+ballots. Without NumPy the same checks run as loops over the arrays.
+
+The checks are:
+    the state of every ballot is CAST or SPOILED (box 3)
+    every contest is in the manifest (box 3)
+    every contest has as many selections as the manifest (box 3) and as many placeholders as votes allowed (box 4)
+    the timestamp of every ballot is not before the one of the ballot it is chained to (box 5)
+
+Class:
+    BallotColumns
+"""
+
+STATES = ('CAST', 'SPOILED')
+UNKNOWN_STATE = -1
+# the timestamp of a ballot without a valid one, left out of the ordering check
+NO_TIMESTAMP = -1
+ABSENT = -1
+
+
+class BallotColumns:
+    """
+    Columnar metadata of the ballots of a record, one row per ballot in the order they are added.
+
+    Method:
+        add_ballot(dict)
+        check()
+        summary()
+    """
+
+    def __init__(self, param_g: ParameterGenerator):
+        """
+        map the contests of the manifest to columns
+        :param param_g: the parameter generator of the record
+        """
+        contests = param_g.get_description().get('contests')
+        self.contest_ids = [contest.get('object_id') for contest in contests]
+        self.contest_columns = {contest_id: j for j, contest_id in enumerate(self.contest_ids)}
+        self.num_selections = [len(contest.get('ballot_selections', ())) for contest in contests]
+        self.votes_allowed = [int(contest.get('votes_allowed')) for contest in contests]
+        self.state_codes = {state: code for code, state in enumerate(STATES)}
+
+        self.ballot_ids = []
+        self.tracking_hashes = []
+        self.previous_hashes = []
+        self.states = array.array('b')
+        self.timestamps = array.array('q')
+        self.unknown_contests = array.array('i')
+        # row-major, one value per ballot and contest of the manifest
+        self.selections = array.array('i')
+        self.placeholders = array.array('i')
+
+    def __len__(self) -> int:
+        return len(self.ballot_ids)
+
+    def add_ballot(self, ballot_dic: dict):
+        """
+        add the row of a ballot
+        :param ballot_dic: the encrypted ballot
+        """
+        self.ballot_ids.append(ballot_dic.get('object_id'))
+        self.tracking_hashes.append(ballot_dic.get('tracking_hash'))
+        self.previous_hashes.append(ballot_dic.get('previous_tracking_hash'))
+        self.states.append(self.state_codes.get(ballot_dic.get('state'), UNKNOWN_STATE))
+        try:
+            self.timestamps.append(int(ballot_dic.get('timestamp')))
+        except (TypeError, ValueError, OverflowError):
+            self.timestamps.append(NO_TIMESTAMP)
+
+        selections = [ABSENT] * len(self.contest_ids)
+        placeholders = [ABSENT] * len(self.contest_ids)
+        unknown = 0
+        for contest in ballot_dic.get('contests', ()):
+            j = self.contest_columns.get(contest.get('object_id'))
+            if j is None:
+                unknown += 1
+                continue
+            num_placeholders = 0
+            num_selections = 0
+            for selection in contest.get('ballot_selections', ()):
+                if selection.get('is_placeholder_selection'):
+                    num_placeholders += 1
+                else:
+                    num_selections += 1
+            selections[j] = num_selections
+            placeholders[j] = num_placeholders
+        self.unknown_contests.append(unknown)
+        self.selections.extend(selections)
+        self.placeholders.extend(placeholders)
+
+    def __previous_rows(self) -> list:
+        """
+        :return: the row of the ballot every ballot is chained to, -1 for the first ballot and broken links
+        """
+        rows = {tracking_hash: row for row, tracking_hash in enumerate(self.tracking_hashes)}
+        return [rows.get(previous_hash, -1) for previous_hash in self.previous_hashes]
+
+    def check(self) -> list:
+        """
+        run the structural checks on every ballot
+        :return: a list of (row, check, contest id) tuples, one per failed check, check being 'state',
+                 'unknown_contest', 'selection_count', 'placeholder_count' or 'timestamp_order', and contest id None
+                 for the checks of the whole ballot, in row order
+        """
+        if not self.ballot_ids:
+            return []
+        if numpy is not None:
+            failures = self.__check_vectorised()
+        else:
+            failures = self.__check_loops()
+        failures.sort(key=lambda failure: failure[0])
+        return failures
+
+    def __views(self) -> tuple:
+        """
+        view the columns as NumPy arrays, without a copy
+        :return: the states, timestamps, unknown contests, selections and placeholders arrays, the last two being
+                 one row per ballot and one column per contest of the manifest
+        """
+        shape = (len(self.ballot_ids), len(self.contest_ids))
+        return (numpy.frombuffer(self.states, dtype=numpy.int8),
+                numpy.frombuffer(self.timestamps, dtype=numpy.int64),
+                numpy.frombuffer(self.unknown_contests, dtype=numpy.intc),
+                numpy.frombuffer(self.selections, dtype=numpy.intc).reshape(shape),
+                numpy.frombuffer(self.placeholders, dtype=numpy.intc).reshape(shape))
+
+    def __check_vectorised(self) -> list:
+        """
+        the checks on NumPy views of the columns
+        """
+        states, timestamps, unknown_contests, selections, placeholders = self.__views()
+        failures = [(int(row), 'state', None) for row in numpy.flatnonzero(states == UNKNOWN_STATE)]
+        failures += [(int(row), 'unknown_contest', None) for row in numpy.flatnonzero(unknown_contests)]
+
+        if self.contest_ids:
+            present = selections != ABSENT
+            for check, counts, expected in (('selection_count', selections, self.num_selections),
+                                            ('placeholder_count', placeholders, self.votes_allowed)):
+                rows, columns = numpy.nonzero(present & (counts != numpy.array(expected, dtype=numpy.intc)))
+                failures += [(int(row), check, self.contest_ids[j]) for row, j in zip(rows, columns)]
+
+        previous_rows = numpy.array(self.__previous_rows(), dtype=numpy.int64)
+        previous_timestamps = timestamps[numpy.maximum(previous_rows, 0)]
+        out_of_order = ((previous_rows >= 0) & (timestamps != NO_TIMESTAMP) & (previous_timestamps != NO_TIMESTAMP)
+                        & (timestamps < previous_timestamps))
+        failures += [(int(row), 'timestamp_order', None) for row in numpy.flatnonzero(out_of_order)]
+
+        return failures
+
+    def __check_loops(self) -> list:
+        """
+        the same checks as __check_vectorised(), one ballot at a time
+        """
+        num_contests = len(self.contest_ids)
+        failures = []
+        for row in range(len(self.ballot_ids)):
+            if self.states[row] == UNKNOWN_STATE:
+                failures.append((row, 'state', None))
+            if self.unknown_contests[row]:
+                failures.append((row, 'unknown_contest', None))
+
+        for check, counts, expected in (('selection_count', self.selections, self.num_selections),
+                                        ('placeholder_count', self.placeholders, self.votes_allowed)):
+            for i, count in enumerate(counts):
+                row, j = divmod(i, num_contests)
+                if self.selections[i] != ABSENT and count != expected[j]:
+                    failures.append((row, check, self.contest_ids[j]))
+
+        timestamps = self.timestamps
+        for row, previous_row in enumerate(self.__previous_rows()):
+            if (previous_row >= 0 and timestamps[row] != NO_TIMESTAMP and timestamps[previous_row] != NO_TIMESTAMP
+                    and timestamps[row] < timestamps[previous_row]):
+                failures.append((row, 'timestamp_order', None))
+
+        return failures
+
+    def summary(self) -> dict:
+        """
+        aggregate the columns for reporting
+        :return: a json-serializable dictionary of the number of ballots by state, the first and last timestamps, and
+                 the number of ballots holding every contest of the manifest
+        """
+        names = STATES + ('unknown',)
+        if numpy is not None and self.ballot_ids:
+            states, timestamps, _, selections, _ = self.__views()
+            # the unknown state code -1 is counted last
+            state_counts = [int(count) for count in numpy.bincount(states + 1, minlength=len(names))]
+            state_counts = state_counts[1:] + state_counts[:1]
+            timestamps = timestamps[timestamps != NO_TIMESTAMP]
+            first, last = (int(timestamps.min()), int(timestamps.max())) if timestamps.size else (None, None)
+            contest_counts = [int(count) for count in (selections != ABSENT).sum(axis=0)]
+        else:
+            state_counts = [0] * len(names)
+            for code in self.states:
+                state_counts[code] += 1
+            timestamps = [timestamp for timestamp in self.timestamps if timestamp != NO_TIMESTAMP]
+            first, last = (min(timestamps), max(timestamps)) if timestamps else (None, None)
+            contest_counts = [0] * len(self.contest_ids)
+            for i, count in enumerate(self.selections):
+                if count != ABSENT:
+                    contest_counts[i % len(self.contest_ids)] += 1
+
+        return {'ballots': len(self.ballot_ids), 'states': dict(zip(names, state_counts)),
+                'first_timestamp': first, 'last_timestamp': last,
+                'contests': dict(zip(self.contest_ids, contest_counts))}
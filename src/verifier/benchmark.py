@@ -0,0 +1,266 @@
+import os
+import sys
+import time
+import platform
+import tracemalloc
+from . import number
+from .generator import FilePathGenerator, ParameterGenerator, VoteLimitCounter
+from .baseline_verifier import BaselineVerifier
+from .key_generation_verifier import KeyGenerationVerifier
+from .encryption_verifier import AllBallotsVerifier
+from .decryption_verifier import DecryptionVerifier
+from .result import ResultSink
+from .synthetic import SyntheticRecordGenerator
+
+try:
+    import resource
+except ImportError:
+    # not available on Windows, the process peak memory is then left out
+    resource = None
+
+"""
+This module benchmarks every verification box on synthetic records of several sizes.
+
+Each phase, box 1, box 2, boxes 3 to 5, box 6 & 9 and box 10, is timed on its own, the best of a number of repeats
+being kept, and is run once more under tracemalloc to measure its peak memory without skewing the timings. The
+results are reported with the throughput of the phase, in ballots, selections or shares per second, and written as
+json, so that a run can be compared against a stored baseline with a regression threshold.
+
+Class:
+    BoxBenchmark
+
+Function:
+    compare_to_baseline(dict, dict, float)
+    write_report(dict)
+"""
+
+PHASES = ('box_1', 'box_2', 'box_3_4_5', 'box_6_9', 'box_10')
+
+
+class BoxBenchmark:
+    """
+    This class generates the benchmark records, runs every phase on them and collects the measures.
+
+    Method:
+        run()
+    """
+
+    def __init__(self, sizes=(10, 100, 1000), repeat=3, work_folder='benchmark-records', contests=((2, 1), (3, 2)),
+                 num_guardians=3, quorum=2, spoil_rate=0.1, small_params=True, seed=0, missing_guardians=0):
+        """
+        :param sizes: the numbers of ballots of the benchmark records
+        :param repeat: the number of timed runs of every phase, the fastest one is kept
+        :param work_folder: the folder holding the generated records, reused across runs with the same settings
+        :param contests: the manifest shape, see SyntheticRecordGenerator
+        :param num_guardians: number of guardians
+        :param quorum: quorum of guardians
+        :param spoil_rate: probability for each ballot to be spoiled
+        :param small_params: use the small test group instead of the standard group
+        :param seed: seed of the records
+        :param missing_guardians: number of guardians missing at decryption
+        """
+        self.sizes = sizes
+        self.repeat = max(1, repeat)
+        self.work_folder = work_folder
+        self.contests = tuple(contests)
+        self.num_guardians = num_guardians
+        self.quorum = quorum
+        self.spoil_rate = spoil_rate
+        self.small_params = small_params
+        self.seed = seed
+        self.missing_guardians = missing_guardians
+
+    def run(self) -> dict:
+        """
+        run every phase on a record of every size
+        :return: a json-serializable dictionary of the settings of the run and of the measures per size and phase
+        """
+        results = {'meta': {'python': platform.python_version(),
+                            'platform': platform.platform(),
+                            'params': 'small' if self.small_params else 'full',
+                            'backend': number.BACKEND.name,
+                            'contests': [list(contest) for contest in self.contests],
+                            'guardians': self.num_guardians,
+                            'quorum': self.quorum,
+                            'missing_guardians': self.missing_guardians,
+                            'spoil_rate': self.spoil_rate,
+                            'seed': self.seed,
+                            'repeat': self.repeat},
+                   'records': []}
+
+        for size in self.sizes:
+            results['records'].append(self.__run_record(size, self.__get_record(size)))
+        if resource is not None:
+            results['meta']['max_rss_kb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+        return results
+
+    def __get_record(self, size: int) -> str:
+        """
+        get the record of a given size, generating it unless a previous run left it in the work folder
+        :param size: the number of ballots
+        :return: the path to the record folder
+        """
+        shape = '-'.join('{s}x{l}'.format(s=s, l=l) for s, l in self.contests)
+        name = 'record-{n}-{g}of{k}-{shape}-{spoil}-{params}-{seed}'.format(
+            n=size, g=self.quorum, k=self.num_guardians, shape=shape, spoil=self.spoil_rate,
+            params='small' if self.small_params else 'full', seed=self.seed)
+        if self.missing_guardians:
+            name += '-{m}missing'.format(m=self.missing_guardians)
+        path = os.path.join(self.work_folder, name)
+        if not os.path.exists(os.path.join(path, 'tally.json')):
+            SyntheticRecordGenerator(self.contests, self.num_guardians, self.quorum, size, self.spoil_rate,
+                                     self.small_params, self.seed,
+                                     missing_guardians=self.missing_guardians).generate(path)
+        return path + '/'
+
+    def __run_record(self, size: int, path: str) -> dict:
+        """
+        measure every phase on one record
+        :param size: the number of ballots of the record
+        :param path: the path to the record folder
+        :return: a dictionary of the record counts and of the measures per phase
+        """
+        path_g = FilePathGenerator.open(path)
+        param_g = ParameterGenerator(path_g)
+        standard_group = (number.LARGE_PRIME, number.SMALL_PRIME)
+        number.set_group(param_g.get_large_prime(), param_g.get_small_prime())
+        try:
+            counts = self.__count_items(path_g)
+            phases = {}
+            for phase in PHASES:
+                seconds = min(self.__time_phase(phase, path) for _ in range(self.repeat))
+                peak_memory = self.__trace_phase(phase, path)
+                phases[phase] = {'seconds': round(seconds, 6),
+                                 'peak_memory_bytes': peak_memory,
+                                 'throughput': self.__get_throughput(phase, counts, seconds)}
+        finally:
+            number.set_group(*standard_group)
+
+        return {'ballots': size, 'counts': counts, 'phases': phases}
+
+    @staticmethod
+    def __count_items(path_g: FilePathGenerator) -> dict:
+        """
+        count the items every phase goes through
+        :param path_g: the file path generator of the record
+        :return: the number of ballots, selections including placeholders, tally shares and spoiled ballot shares
+        """
+        counts = {'ballots': 0, 'selections': 0, 'tally_shares': 0, 'spoiled_shares': 0}
+        for _, ballot in path_g.iter_json_files(path_g.get_encrypted_ballot_folder_path()):
+            counts['ballots'] += 1
+            counts['selections'] += sum(len(contest.get('ballot_selections', [])) for contest in ballot['contests'])
+
+        def count_shares(contests: dict) -> int:
+            return sum(len(selection.get('shares', [])) for contest in contests.values()
+                       for selection in contest.get('selections', {}).values())
+
+        tally = path_g.read_json(path_g.get_tally_file_path())
+        counts['tally_shares'] = count_shares(tally.get('contests', {}))
+        counts['spoiled_shares'] = sum(count_shares(ballot) for ballot in tally.get('spoiled_ballots', {}).values())
+        return counts
+
+    @staticmethod
+    def __get_throughput(phase: str, counts: dict, seconds: float) -> dict:
+        """
+        get the items per second of a phase
+        :param phase: the phase name
+        :param counts: the item counts of the record
+        :param seconds: the time of the phase
+        :return: a dictionary of the rates relevant to the phase
+        """
+        seconds = max(seconds, 1e-9)
+        if phase == 'box_3_4_5':
+            return {'ballots_per_second': round(counts['ballots'] / seconds, 2),
+                    'selections_per_second': round(counts['selections'] / seconds, 2)}
+        if phase == 'box_6_9':
+            return {'ballots_per_second': round(counts['ballots'] / seconds, 2),
+                    'shares_per_second': round(counts['tally_shares'] / seconds, 2)}
+        if phase == 'box_10':
+            return {'shares_per_second': round(counts['spoiled_shares'] / seconds, 2)}
+        return {}
+
+    @staticmethod
+    def __run_phase(phase: str, path: str) -> bool:
+        """
+        run one phase from scratch, reading the record again, with a sink that discards the results
+        :param phase: the phase name
+        :param path: the path to the record folder
+        :return: True if the phase passed
+        """
+        path_g = FilePathGenerator.open(path)
+        param_g = ParameterGenerator(path_g)
+        sink = ResultSink()
+        if phase == 'box_1':
+            return bool(BaselineVerifier(param_g, sink).verify_all_params())
+        if phase == 'box_2':
+            return bool(KeyGenerationVerifier(param_g, path_g, sink).verify_all_guardians())
+        if phase == 'box_3_4_5':
+            vlc = VoteLimitCounter(param_g)
+            return bool(AllBallotsVerifier(param_g, path_g, vlc, sink).verify_all_ballots())
+        if phase == 'box_6_9':
+            return bool(DecryptionVerifier(path_g, param_g, sink).verify_cast_ballot_tallies())
+        return bool(DecryptionVerifier(path_g, param_g, sink).verify_all_spoiled_ballots())
+
+    def __time_phase(self, phase: str, path: str) -> float:
+        """
+        :return: the wall time of one run of a phase, in seconds
+        """
+        start = time.perf_counter()
+        if not self.__run_phase(phase, path):
+            raise RuntimeError("{phase} failed on the benchmark record {path}".format(phase=phase, path=path))
+        return time.perf_counter() - start
+
+    def __trace_phase(self, phase: str, path: str) -> int:
+        """
+        :return: the peak memory allocated by Python during one run of a phase, in bytes
+        """
+        tracemalloc.start()
+        try:
+            self.__run_phase(phase, path)
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+
+def compare_to_baseline(results: dict, baseline: dict, threshold: float) -> list:
+    """
+    compare the phase times of a run to a baseline run
+    :param results: the results of BoxBenchmark.run()
+    :param baseline: the results of an earlier run
+    :param threshold: the relative slowdown tolerated, e.g. 0.1 for 10%
+    :return: the regressions, a list of dictionaries of record size, phase, baseline and current seconds and ratio
+    """
+    baseline_records = {record['ballots']: record for record in baseline.get('records', [])}
+    regressions = []
+    for record in results.get('records', []):
+        baseline_record = baseline_records.get(record['ballots'])
+        if baseline_record is None:
+            continue
+        for phase, measure in record['phases'].items():
+            baseline_measure = baseline_record['phases'].get(phase)
+            if baseline_measure is None or baseline_measure['seconds'] <= 0:
+                continue
+            ratio = measure['seconds'] / baseline_measure['seconds']
+            if ratio > 1 + threshold:
+                regressions.append({'ballots': record['ballots'], 'phase': phase,
+                                    'baseline_seconds': baseline_measure['seconds'],
+                                    'seconds': measure['seconds'], 'ratio': round(ratio, 3)})
+    return regressions
+
+
+def write_report(results: dict, stream=None):
+    """
+    write a human-readable table of the results
+    :param results: the results of BoxBenchmark.run()
+    :param stream: the output stream, stdout by default
+    """
+    stream = stream or sys.stdout
+    for record in results['records']:
+        stream.write('{n} ballots, {s} selections\n'.format(n=record['ballots'], s=record['counts']['selections']))
+        for phase, measure in record['phases'].items():
+            rates = ', '.join('{v} {k}'.format(k=k.replace('_', ' ').replace(' per ', '/'), v=v)
+                              for k, v in measure['throughput'].items())
+            stream.write('    {phase:<10} {sec:>10.4f} s {mem:>10.1f} KiB peak    {rates}\n'.format(
+                phase=phase, sec=measure['seconds'], mem=measure['peak_memory_bytes'] / 1024, rates=rates))
+    stream.flush()
@@ -0,0 +1,703 @@
+import os
+import argparse
+import json
+import sys
+from . import number
+from . import metrics
+from . import latency
+from . import number_decoding
+from .decryption_verifier import DecryptionVerifier
+from .generator import FilePathGenerator, ParameterGenerator, VoteLimitCounter
+from .record_source import write_packed_record
+from .precompute import PrecomputationStore, precompute_record_bases
+from .baseline_verifier import BaselineVerifier
+from .key_generation_verifier import KeyGenerationVerifier
+from .encryption_verifier import AllBallotsVerifier, BallotEncryptionVerifier
+from .result import ResultSink, ConsoleSink, SummarySink, JsonLinesSink, MultiSink
+from .sampling import BallotSampler
+
+"""
+Command line entry of the verifier, runs every box on an election record and reports the results through the chosen
+result sinks. The record is either a folder, a .zip, .tar, .tar.gz or .tgz archive of the folder, or a packed
+bundle written by the pack command.
+
+Usage:
+    python -m verifier.cli [--backend auto|python|gmpy2] [--number-encoding auto|decimal|hex|base64] <command> ...
+    python -m verifier.cli verify <record folder or archive> [--output console|summary] [--jsonl <file>] [--fail-fast]
+                                  [--metrics-json <file>] [--metrics-prom <file>]
+                                  [--profile [--profile-top N] [--profile-json <file>] [--profile-dump <file>]]
+                                  [--prefetch DEPTH] [--readers W] [--precompute <folder>] [--tracking-index <file>]
+                                  [--sample N | --confidence C] [--tolerance F] [--seed S]
+                                  [--fingerprint-budget BYTES] [--spill-folder <folder>]
+                                  [--quarantine <folder> | --no-schema]
+                                  [--shard i/N [--partial <file>]]
+    python -m verifier.cli verify-ballot <record folder or archive> <ballot file or -> [--snapshot <file>]
+                                         [--precompute <folder>] [--jsonl <file>]
+    python -m verifier.cli merge <record folder or archive> <partial file>... [--precompute <folder>]
+    python -m verifier.cli pack <record folder or archive> <bundle>.egrecord
+    python -m verifier.cli serve <record folder or archive> [--host 127.0.0.1] [--port 8080] [--precompute <folder>]
+                                 [--tracking-index <file>]
+    python -m verifier.cli index <record folder or archive> <index file> [--lookup KEY [--object-id]]
+    python -m verifier.cli generate <record folder> [--contests 2x1,3x2] [--guardians n] [--quorum k] [--ballots N]
+                                    [--spoil-rate R] [--missing-guardians M] [--full-params] [--seed S]
+                                    [--fault NAME]...
+    python -m verifier.cli benchmark [--sizes 10,100,1000] [--repeat R] [--json <file>] [--baseline <file>]
+                                     [--threshold F] [--work-folder <folder>] [--missing-guardians M] [--full-params]
+    python -m verifier.cli benchmark-number [--sizes test,1024,standard] [--primitive NAME]... [--min-time T]
+                                            [--json <file>]
+    python -m verifier.cli benchmark-startup [--runs N] [--budget SECONDS] [--work-folder <folder>] [--json <file>]
+
+The modules of the commands that need a server or an event loop, serve and the benchmarks, are imported by their
+command only, so that a verify-ballot process starts in a few tens of milliseconds.
+"""
+
+
+def build_sink(args: argparse.Namespace) -> ResultSink:
+    """
+    build the result sink requested on the command line
+    :param args: parsed command line arguments
+    :return: a result sink, combining the console/summary output with a json lines file if requested
+    """
+    if args.output == 'summary':
+        sink = SummarySink()
+    else:
+        sink = ConsoleSink()
+
+    if args.jsonl:
+        sink = MultiSink(sink, JsonLinesSink(args.jsonl, verbose=args.verbose))
+
+    return sink
+
+
+def build_sampler(args: argparse.Namespace):
+    """
+    build the ballot sampler requested on the command line
+    :param args: parsed command line arguments
+    :return: a BallotSampler, or None for a full verification
+    """
+    if args.sample is None and args.confidence is None:
+        return None
+
+    return BallotSampler(sample_size=args.sample, confidence=args.confidence, tolerance=args.tolerance,
+                         seed=args.seed)
+
+
+def timed(name: str, step):
+    """
+    run a step of the verification, timed when the instrumentation is on
+    :param name: the timer name, e.g. 'box_1'
+    :param step: a callable taking no argument
+    :return: what the step returns
+    """
+    if metrics.ACTIVE is None:
+        return step()
+    with metrics.ACTIVE.timer(name):
+        return step()
+
+
+def write_metrics(args: argparse.Namespace):
+    """
+    write the metrics of the run to the files requested on the command line. The Prometheus file is replaced
+    atomically, so that a node exporter textfile collector never reads it half written.
+    :param args: parsed command line arguments
+    """
+    if metrics.ACTIVE is None:
+        return
+    if args.metrics_json:
+        with open(args.metrics_json, 'w') as file:
+            json.dump(metrics.ACTIVE.to_dict(), file, indent=2)
+    if args.metrics_prom:
+        temp_path = args.metrics_prom + '.tmp'
+        with open(temp_path, 'w') as file:
+            file.write(metrics.ACTIVE.to_prometheus())
+        os.replace(temp_path, args.metrics_prom)
+
+
+def write_profile(args: argparse.Namespace):
+    """
+    report the latencies of the run on stderr and write them to the json file requested on the command line
+    :param args: parsed command line arguments
+    """
+    if latency.ACTIVE is None:
+        return
+    latency.ACTIVE.write_report()
+    if args.profile_json:
+        with open(args.profile_json, 'w') as file:
+            json.dump(latency.ACTIVE.to_dict(), file, indent=2)
+
+
+def load_precomputed(args: argparse.Namespace, param_g: ParameterGenerator):
+    """
+    serve the exponentiations of the fixed bases of the record from the tables of the store requested on the command
+    line, building the missing ones
+    :param args: parsed command line arguments
+    :param param_g: parameter generator of the record
+    """
+    if args.precompute:
+        precompute_record_bases(param_g, PrecomputationStore(args.precompute))
+
+
+def verify_decryption(path_g: FilePathGenerator, param_g: ParameterGenerator, sink: ResultSink,
+                      fail_fast: bool) -> bool:
+    """
+    run the decryption boxes, cast ballot tally (box 6 & 9) then spoiled ballots (box 10)
+    :param path_g: file path generator of the record
+    :param param_g: parameter generator of the record
+    :param sink: the result sink
+    :param fail_fast: whether to skip the spoiled ballots once the tally failed
+    :return: True if both boxes passed, False otherwise
+    """
+    dv = DecryptionVerifier(path_g, param_g, sink, fail_fast)
+    tally_res = timed('box_6_9', dv.verify_cast_ballot_tallies)
+    if not tally_res and fail_fast:
+        return False
+
+    return bool(timed('box_10', dv.verify_all_spoiled_ballots)) and bool(tally_res)
+
+
+def verify(args: argparse.Namespace) -> bool:
+    """
+    run the full verification, box 1 to box 10, on an election record.
+    With --fail-fast every check stops at its first failure and the run aborts after the first failed box.
+    :param args: parsed command line arguments
+    :return: True if every box passed, False otherwise
+    """
+    path_g = FilePathGenerator.open(args.root)
+    path_g.set_prefetch(args.prefetch, args.readers)
+    sink = build_sink(args)
+    fail_fast = args.fail_fast
+
+    # every document is validated before it is read for any check, the malformed ballot files being quarantined
+    quarantined = []
+    if not args.no_schema:
+        from .schema import RecordValidator
+        from .shard import Shard
+        shard = Shard.parse(args.shard) if args.shard is not None else None
+        in_shard = (lambda ballot_file: shard.contains(os.path.basename(ballot_file))) if shard is not None else None
+        validator = RecordValidator(path_g, sink, in_shard)
+        schema_result = timed('schema', validator.validate_record)
+        quarantined = list(validator.quarantined.values())
+        if args.quarantine:
+            validator.write_quarantine(args.quarantine)
+        if not schema_result.details.get('election_documents_valid') or (fail_fast and not schema_result):
+            sink.close()
+            write_metrics(args)
+            return False
+
+    param_g = ParameterGenerator(path_g)
+    # the module-level checks work in the group of the record, the standard one unless it is a test record
+    number.set_group(param_g.get_large_prime(), param_g.get_small_prime())
+    load_precomputed(args, param_g)
+    vlc = VoteLimitCounter(param_g)
+    sampler = build_sampler(args)
+
+    if args.shard is not None:
+        return verify_shard(args, path_g, param_g, vlc, sink, quarantined)
+
+    # the modules of the ballot scan are only imported by the commands running it, to keep the start of the others
+    # short, see benchmark-startup
+    from .tracking_index import TrackingIndex
+    from .fingerprint_index import FingerprintIndex, DEFAULT_MEMORY_BUDGET
+    from .ballot_columns import BallotColumns
+
+    # the ballots are indexed by tracking code as the run reads them
+    index = TrackingIndex(args.tracking_index) if args.tracking_index else None
+    # and fingerprinted to find the replayed ones
+    fingerprints = None
+    if args.fingerprint_budget != 0:
+        budget = DEFAULT_MEMORY_BUDGET if args.fingerprint_budget is None else args.fingerprint_budget
+        fingerprints = FingerprintIndex(budget, args.spill_folder)
+    # and their metadata kept in columns for the structural checks of all the ballots at once
+    columns = BallotColumns(param_g)
+
+    steps = (lambda: timed('box_1', BaselineVerifier(param_g, sink).verify_all_params),
+             lambda: timed('box_2', KeyGenerationVerifier(param_g, path_g, sink, fail_fast).verify_all_guardians),
+             lambda: timed('box_3_4_5',
+                           AllBallotsVerifier(param_g, path_g, vlc, sink, fail_fast, sampler, index,
+                                              fingerprints, columns).verify_all_ballots),
+             lambda: verify_decryption(path_g, param_g, sink, fail_fast))
+
+    error = bool(quarantined)
+    for step in steps:
+        if not step():
+            error = True
+            if fail_fast:
+                break
+
+    sink.close()
+    write_metrics(args)
+    if fingerprints is not None:
+        fingerprints.close()
+    if index is not None:
+        index.maybe_compact()
+        index.close()
+
+    return not error
+
+
+def verify_ballot(args: argparse.Namespace) -> bool:
+    """
+    verify a single encrypted ballot against a record, box 3, 4 and its tracking hash, on the fast path: with a
+    snapshot file the parameters, the vote limits and the box 1 verdict come from the snapshot of a previous run and
+    only the ballot is read, otherwise they are loaded from the record and the snapshot is written for the next run
+    :param args: parsed command line arguments
+    :return: True if box 1 and the ballot passed, False otherwise
+    """
+    from .schema import validate_document, parse_or_error
+    from .snapshot import RecordSnapshot
+    if args.ballot == '-':
+        ballot_dic = parse_or_error(sys.stdin.buffer.read())
+    else:
+        try:
+            with open(args.ballot, 'rb') as file:
+                ballot_dic = parse_or_error(file.read())
+        except FileNotFoundError:
+            raise SystemExit("ballot file {ballot} not found".format(ballot=args.ballot))
+
+    # a malformed ballot, or a file that is not json, is reported with the paths of its offending fields, without
+    # running any check on it
+    schema_result = validate_document('ballot', args.ballot, ballot_dic)
+
+    path_g = FilePathGenerator.open(args.root)
+    param_g = ParameterGenerator(path_g)
+    vlc = VoteLimitCounter(param_g)
+    snapshot = RecordSnapshot.load(args.snapshot, path_g, args.root) if args.snapshot else None
+    if snapshot is not None:
+        snapshot.restore(param_g, vlc)
+    # the module-level checks work in the group of the record, the standard one unless it is a test record
+    number.set_group(param_g.get_large_prime(), param_g.get_small_prime())
+    load_precomputed(args, param_g)
+    sink = build_sink(args)
+
+    if snapshot is not None:
+        baseline_valid = snapshot.baseline_valid
+    else:
+        baseline = BaselineVerifier(param_g, ResultSink()).verify_all_params()
+        baseline_valid = baseline.ok
+        if not baseline_valid:
+            sink.emit(baseline)
+        if args.snapshot:
+            snapshot = RecordSnapshot.take(path_g, args.root, param_g, vlc, baseline_valid)
+            if snapshot is not None:
+                snapshot.save(args.snapshot)
+
+    if schema_result.ok:
+        result = BallotEncryptionVerifier(ballot_dic, param_g, vlc, args.fail_fast).verify_ballot()
+    else:
+        result = schema_result
+    sink.emit(result)
+    ok = result.ok and baseline_valid
+    print('[{name}] verification {verdict}. '.format(name=result.item_id, verdict='success' if ok else 'failure'))
+    sink.close()
+    write_metrics(args)
+
+    return ok
+
+
+def verify_shard(args: argparse.Namespace, path_g: FilePathGenerator, param_g: ParameterGenerator,
+                 vlc: VoteLimitCounter, sink: ResultSink, quarantined=()) -> bool:
+    """
+    verify the ballots and spoiled ballots of one shard and write its partial result file
+    :param args: parsed command line arguments
+    :param path_g: file path generator of the record
+    :param param_g: parameter generator of the record
+    :param vlc: vote limit counter of the record
+    :param sink: the result sink
+    :param quarantined: the Results of the malformed ballot files of the shard, failed in the partial result
+    :return: True if every item of the shard passed, False otherwise
+    """
+    from .shard import Shard, ShardVerifier
+    shard = Shard.parse(args.shard)
+    partial_path = args.partial or 'partial-{i}-of-{n}.json'.format(i=shard.index, n=shard.count)
+
+    sv = ShardVerifier(param_g, path_g, vlc, shard, sink, args.fail_fast, quarantined)
+    partial = sv.verify_shard()
+    sv.write_partial(partial_path)
+    sink.close()
+    write_metrics(args)
+
+    return not partial.get('failures') and not partial.get('spoiled_failures')
+
+
+def merge(args: argparse.Namespace) -> bool:
+    """
+    merge the partial results of a sharded run and run the checks that need the whole record
+    :param args: parsed command line arguments
+    :return: True if the whole record passed, False otherwise
+    """
+    from .schema import RecordValidator
+    from .shard import ShardMerger
+    path_g = FilePathGenerator.open(args.root)
+    sink = build_sink(args)
+    # the shards validated their ballots, the election documents read by the global checks are validated here
+    if not RecordValidator(path_g, sink).validate_election_documents():
+        sink.close()
+        raise SystemExit("the election documents of {root} are missing or malformed".format(root=args.root))
+
+    param_g = ParameterGenerator(path_g)
+    # the module-level checks work in the group of the record, the standard one unless it is a test record
+    number.set_group(param_g.get_large_prime(), param_g.get_small_prime())
+    load_precomputed(args, param_g)
+
+    res = ShardMerger(param_g, path_g, args.partials, sink).merge()
+    sink.close()
+    write_metrics(args)
+
+    return res
+
+
+def pack(args: argparse.Namespace) -> bool:
+    """
+    pack a record into a single bundle, which is read without any directory walk or decompression
+    :param args: parsed command line arguments
+    :return: True once the bundle is written
+    """
+    if not args.output.endswith(FilePathGenerator.PACKED_RECORD_SUFFIX):
+        raise SystemExit("the bundle name must end with " + FilePathGenerator.PACKED_RECORD_SUFFIX)
+
+    path_g = FilePathGenerator.open(args.root)
+    write_packed_record(path_g.source, args.output)
+    path_g.source.close()
+
+    return True
+
+
+def serve_record(args: argparse.Namespace) -> bool:
+    """
+    load a record and serve ballot verification requests over HTTP until interrupted
+    :param args: parsed command line arguments
+    :return: True once the service stops
+    """
+    from .service import VerificationService, serve
+    service = VerificationService(args.root, args.precompute, args.tracking_index)
+    print('serving {root} on http://{host}:{port}'.format(root=args.root, host=args.host, port=args.port))
+    sys.stdout.flush()
+    serve(service, args.host, args.port)
+
+    return True
+
+
+def index(args: argparse.Namespace) -> bool:
+    """
+    bring the tracking index of a record up to date, reading only the ballots not indexed yet, and look up a ballot
+    :param args: parsed command line arguments
+    :return: True unless the ballot looked up is not in the index
+    """
+    from .tracking_index import TrackingIndex, TRACKING_HASH, OBJECT_ID
+    path_g = FilePathGenerator.open(args.root)
+    tracking_index = TrackingIndex(args.output)
+    num_added = tracking_index.update(path_g)
+    print('{n} ballots added to {index}'.format(n=num_added, index=args.output))
+
+    found = True
+    if args.lookup is not None:
+        name = tracking_index.lookup(args.lookup, OBJECT_ID if args.object_id else TRACKING_HASH)
+        print(json.dumps({'key': args.lookup, 'file': name}))
+        found = name is not None
+    tracking_index.close()
+
+    return found
+
+
+def parse_contests(text: str) -> tuple:
+    """
+    parse a manifest shape given as "selections x votes allowed" pairs, e.g. "2x1,3x2"
+    :param text: the manifest shape
+    :return: a tuple of (number of selections, votes allowed) pairs
+    """
+    try:
+        return tuple(tuple(int(n) for n in contest.split('x')) for contest in text.split(','))
+    except ValueError:
+        raise argparse.ArgumentTypeError("contests must be given as SxL pairs, e.g. 2x1,3x2")
+
+
+def generate(args: argparse.Namespace) -> bool:
+    """
+    write a synthetic election record and print the injected faults as json
+    :param args: parsed command line arguments
+    :return: True once the record is written
+    """
+    from .synthetic import SyntheticRecordGenerator
+    try:
+        generator = SyntheticRecordGenerator(args.contests, args.guardians, args.quorum, args.ballots,
+                                             args.spoil_rate, not args.full_params, args.seed, args.fault,
+                                             args.missing_guardians)
+    except ValueError as error:
+        raise SystemExit(str(error))
+    print(json.dumps(generator.generate(args.root)))
+
+    return True
+
+
+def benchmark(args: argparse.Namespace) -> bool:
+    """
+    run the benchmark suite, write its results and compare them to a baseline
+    :param args: parsed command line arguments
+    :return: True unless a phase got slower than the baseline by more than the threshold
+    """
+    from .benchmark import BoxBenchmark, compare_to_baseline, write_report
+    from .json_parser import read_json_file
+    bench = BoxBenchmark(args.sizes, args.repeat, args.work_folder, args.contests, args.guardians, args.quorum,
+                         args.spoil_rate, not args.full_params, args.seed, args.missing_guardians)
+    results = bench.run()
+    write_report(results)
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(results, file, indent=2)
+
+    if not args.baseline:
+        return True
+    regressions = compare_to_baseline(results, read_json_file(args.baseline), args.threshold)
+    for regression in regressions:
+        print('regression: {ballots} ballots {phase} {baseline_seconds} s -> {seconds} s (x{ratio})'
+              .format(**regression))
+    return not regressions
+
+
+def benchmark_number(args: argparse.Namespace) -> bool:
+    """
+    run the micro-benchmarks of the number.py primitives
+    :param args: parsed command line arguments
+    :return: True once the results are written
+    """
+    from .number_benchmark import GROUP_SIZES, CASES, run_number_benchmark, write_number_report
+    unknown = set(args.primitive or ()) - set(CASES)
+    if unknown:
+        raise SystemExit("unknown primitives: {names}, expected among {cases}"
+                         .format(names=', '.join(sorted(unknown)), cases=', '.join(sorted(CASES))))
+    results = run_number_benchmark(args.sizes or GROUP_SIZES, args.primitive or None, args.min_time)
+    write_number_report(results)
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(results, file, indent=2)
+
+    return True
+
+
+def benchmark_startup(args: argparse.Namespace) -> bool:
+    """
+    time the start of a single ballot verification in new processes
+    :param args: parsed command line arguments
+    :return: True if the warm start is within the budget
+    """
+    from .startup_benchmark import run_startup_benchmark, write_startup_report
+    results = run_startup_benchmark(args.work_folder, args.runs, args.budget)
+    write_startup_report(results)
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(results, file, indent=2)
+
+    return results['within_budget']
+
+
+def add_record_shape_arguments(parser: argparse.ArgumentParser):
+    """
+    add the arguments describing a synthetic record
+    :param parser: the parser of a sub-command
+    """
+    parser.add_argument('--contests', type=parse_contests, default=((2, 1), (3, 2)), metavar='SxL,...',
+                        help='number of selections and votes allowed of every contest, 2x1,3x2 by default')
+    parser.add_argument('--guardians', type=int, default=3, help='number of guardians, 3 by default')
+    parser.add_argument('--quorum', type=int, default=2, help='quorum of guardians, 2 by default')
+    parser.add_argument('--spoil-rate', type=float, default=0.1,
+                        help='probability of a ballot to be spoiled, 0.1 by default')
+    parser.add_argument('--missing-guardians', type=int, default=0, metavar='M',
+                        help='number of guardians missing at decryption, compensated by the others, 0 by default')
+    parser.add_argument('--full-params', action='store_true',
+                        help='use the standard 4096-bit group instead of the small test group')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the record, 0 by default')
+
+
+def add_output_arguments(parser: argparse.ArgumentParser):
+    """
+    add the arguments choosing the result sinks
+    :param parser: the parser of a sub-command
+    """
+    parser.add_argument('--output', choices=('console', 'summary'), default='console',
+                        help='console prints every failure, summary only prints one line per box')
+    parser.add_argument('--jsonl', metavar='FILE', help='also stream the results to a json lines file')
+    parser.add_argument('--verbose', action='store_true',
+                        help='write successful items to the json lines file as well')
+    parser.add_argument('--metrics-json', metavar='FILE',
+                        help='count and time the hot paths and write the metrics of the run to a json file')
+    parser.add_argument('--metrics-prom', metavar='FILE',
+                        help='count and time the hot paths and write the metrics in the Prometheus text format')
+    parser.add_argument('--precompute', metavar='FOLDER',
+                        help='use fixed-base tables of g, K and the guardian keys stored in this folder, built on the '
+                             'first run and shared by the later runs and processes')
+    parser.add_argument('--profile', action='store_true',
+                        help='time every ballot and spoiled ballot and report the latency percentiles and the '
+                             'slowest items')
+    parser.add_argument('--profile-top', type=int, default=10, metavar='N',
+                        help='number of slowest items reported, 10 by default')
+    parser.add_argument('--profile-json', metavar='FILE', help='also write the latency profile to a json file')
+    parser.add_argument('--profile-dump', metavar='FILE',
+                        help='run under cProfile and dump the stats to a file, to read with pstats or snakeviz')
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """
+    build the command line parser
+    :return: an argument parser with one sub-command per action
+    """
+    parser = argparse.ArgumentParser(prog='verifier', description='ElectionGuard election record verifier')
+    parser.add_argument('--backend', choices=['auto'] + list(number.BACKENDS), default='auto',
+                        help='big-integer backend of the modular arithmetic, auto picks gmpy2 when it is installed '
+                             'and falls back to pure Python')
+    parser.add_argument('--number-encoding', choices=number_decoding.ENCODINGS, default=number_decoding.AUTO,
+                        help='encoding of the numbers of the record, auto detects it on every number')
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    verify_parser = commands.add_parser('verify', help='verify an election record folder')
+    verify_parser.add_argument('root', help='path to the election record folder or archive')
+    add_output_arguments(verify_parser)
+    verify_parser.add_argument('--fail-fast', action='store_true',
+                               help='stop every check at its first failure and abort at the first invalid item')
+    sampling = verify_parser.add_mutually_exclusive_group()
+    sampling.add_argument('--sample', type=int, metavar='N',
+                          help='only run the full ballot checks on a random sample of N ballots')
+    sampling.add_argument('--confidence', type=float, metavar='C',
+                          help='sample enough ballots to detect --tolerance invalid ballots with confidence C')
+    verify_parser.add_argument('--tolerance', type=float, metavar='F',
+                               help='fraction of invalid ballots a sampled run should detect, 0.01 by default')
+    verify_parser.add_argument('--seed', type=int, help='seed of the ballot sample, to reproduce a sampled run')
+    verify_parser.add_argument('--prefetch', type=int, default=16, metavar='DEPTH',
+                               help='number of ballot files read and parsed ahead of the verification, 0 to disable')
+    verify_parser.add_argument('--readers', type=int, default=4, metavar='W',
+                               help='number of reader threads of the prefetch')
+    verify_parser.add_argument('--tracking-index', metavar='FILE',
+                               help='add the ballots read by the run to this tracking index, see the index command')
+    verify_parser.add_argument('--fingerprint-budget', type=int, metavar='BYTES',
+                               help='memory taken by the ballot fingerprints of the replay check before they are '
+                                    'spilled to sorted run files, 64 MiB by default, 0 to disable the check')
+    verify_parser.add_argument('--spill-folder', metavar='FOLDER',
+                               help='folder of the run files of the replay check, a temporary folder by default')
+    verify_parser.add_argument('--quarantine', metavar='FOLDER',
+                               help='copy the malformed ballot files to this folder, each with the list of its errors')
+    verify_parser.add_argument('--no-schema', action='store_true',
+                               help='skip the schema validation of the documents before the checks')
+    verify_parser.add_argument('--shard', metavar='i/N',
+                               help='only verify shard i of N of the ballots and spoiled ballots')
+    verify_parser.add_argument('--partial', metavar='FILE',
+                               help='partial result file of a sharded run, partial-<i>-of-<N>.json by default')
+    verify_parser.set_defaults(func=verify)
+
+    ballot_parser = commands.add_parser('verify-ballot', help='verify a single encrypted ballot against a record')
+    ballot_parser.add_argument('root', help='path to the election record folder or archive')
+    ballot_parser.add_argument('ballot', help='path to the encrypted ballot json file, - to read it from stdin')
+    ballot_parser.add_argument('--snapshot', metavar='FILE',
+                               help='read the parameters and the vote limits of the record from this snapshot, '
+                                    'written by the first run and rewritten whenever the record changes')
+    add_output_arguments(ballot_parser)
+    ballot_parser.add_argument('--fail-fast', action='store_true', help='stop the checks at the first failure')
+    ballot_parser.set_defaults(func=verify_ballot)
+
+    merge_parser = commands.add_parser('merge', help='merge the partial results of a sharded run')
+    merge_parser.add_argument('root', help='path to the election record folder or archive')
+    merge_parser.add_argument('partials', nargs='+', metavar='partial', help='partial result files, one per shard')
+    add_output_arguments(merge_parser)
+    merge_parser.set_defaults(func=merge)
+
+    pack_parser = commands.add_parser('pack', help='pack an election record into a single bundle file')
+    pack_parser.add_argument('root', help='path to the election record folder or archive')
+    pack_parser.add_argument('output', help='path of the bundle to write, ending with '
+                                            + FilePathGenerator.PACKED_RECORD_SUFFIX)
+    pack_parser.set_defaults(func=pack)
+
+    serve_parser = commands.add_parser('serve', help='serve ballot verification requests of a record over HTTP')
+    serve_parser.add_argument('root', help='path to the election record folder or archive')
+    serve_parser.add_argument('--host', default='127.0.0.1', help='address to listen on, localhost by default')
+    serve_parser.add_argument('--port', type=int, default=8080, help='port to listen on, 8080 by default')
+    serve_parser.add_argument('--precompute', metavar='FOLDER',
+                              help='use the fixed-base tables stored in this folder, built if missing')
+    serve_parser.add_argument('--tracking-index', metavar='FILE',
+                              help='look the ballots up in this tracking index, updated at start')
+    serve_parser.set_defaults(func=serve_record)
+
+    index_parser = commands.add_parser('index', help='index the ballots of a record by tracking code and object id')
+    index_parser.add_argument('root', help='path to the election record folder or archive')
+    index_parser.add_argument('output', metavar='index', help='path of the index file, updated if it exists')
+    index_parser.add_argument('--lookup', metavar='KEY', help='print the ballot file of this tracking code')
+    index_parser.add_argument('--object-id', action='store_true', help='look the ballot up by object id instead')
+    index_parser.set_defaults(func=index)
+
+    generate_parser = commands.add_parser('generate', help='write a synthetic election record')
+    generate_parser.add_argument('root', help='path to the record folder to write')
+    add_record_shape_arguments(generate_parser)
+    generate_parser.add_argument('--ballots', type=int, default=10, help='number of ballots, 10 by default')
+    generate_parser.add_argument('--fault', action='append', default=[], metavar='NAME',
+                                 help='inject a fault making one box fail, e.g. tracking_chain, can be repeated')
+    generate_parser.set_defaults(func=generate)
+
+    benchmark_parser = commands.add_parser('benchmark', help='benchmark every box on synthetic records')
+    add_record_shape_arguments(benchmark_parser)
+    benchmark_parser.add_argument('--sizes', type=lambda text: [int(n) for n in text.split(',')],
+                                  default=[10, 100, 1000], metavar='N,...',
+                                  help='numbers of ballots of the benchmark records, 10,100,1000 by default')
+    benchmark_parser.add_argument('--repeat', type=int, default=3,
+                                  help='number of timed runs of every phase, the fastest is kept, 3 by default')
+    benchmark_parser.add_argument('--work-folder', default='benchmark-records',
+                                  help='folder of the generated records, reused by later runs')
+    benchmark_parser.add_argument('--json', metavar='FILE', help='write the results to a json file')
+    benchmark_parser.add_argument('--baseline', metavar='FILE',
+                                  help='results of an earlier run, the command fails if a phase got slower')
+    benchmark_parser.add_argument('--threshold', type=float, default=0.1,
+                                  help='relative slowdown tolerated against the baseline, 0.1 by default')
+    benchmark_parser.set_defaults(func=benchmark)
+
+    number_parser = commands.add_parser('benchmark-number', help='micro-benchmark the number.py primitives')
+    number_parser.add_argument('--sizes', type=lambda text: text.split(','),
+                               metavar='SIZE,...', help='operand sizes among test, 1024 and standard, all by default')
+    number_parser.add_argument('--primitive', action='append', metavar='NAME',
+                               help='only measure this primitive, e.g. pow or decode, can be repeated')
+    number_parser.add_argument('--min-time', type=float, default=0.2,
+                               help='minimum duration of a timed run in seconds, 0.2 by default')
+    number_parser.add_argument('--json', metavar='FILE', help='write the results to a json file')
+    number_parser.set_defaults(func=benchmark_number)
+
+    startup_parser = commands.add_parser('benchmark-startup', help='time the start of a single ballot verification')
+    startup_parser.add_argument('--runs', type=int, default=10, help='number of runs of every variant, 10 by default')
+    startup_parser.add_argument('--budget', type=float, default=0.2, metavar='SECONDS',
+                                help='longest median warm start tolerated, the command fails beyond, 0.2 by default')
+    startup_parser.add_argument('--work-folder', default='benchmark-records',
+                                help='folder of the generated record and snapshot, reused by later runs')
+    startup_parser.add_argument('--json', metavar='FILE', help='write the results to a json file')
+    startup_parser.set_defaults(func=benchmark_startup)
+
+    return parser
+
+
+def main(argv=None) -> int:
+    """
+    parse the command line and run the requested command
+    :param argv: command line arguments, defaults to sys.argv
+    :return: process exit code, 0 on success and 1 on verification failure
+    """
+    args = build_parser().parse_args(argv)
+    try:
+        number.set_backend(args.backend)
+    except ImportError:
+        raise SystemExit("the {backend} backend is not installed".format(backend=args.backend))
+    number_decoding.set_encoding(args.number_encoding)
+    if getattr(args, 'metrics_json', None) or getattr(args, 'metrics_prom', None):
+        metrics.enable()
+    if getattr(args, 'profile', False) or getattr(args, 'profile_json', None):
+        latency.enable(args.profile_top)
+
+    if getattr(args, 'profile_dump', None):
+        import cProfile
+        profiler = cProfile.Profile()
+        try:
+            ok = profiler.runcall(args.func, args)
+        finally:
+            profiler.dump_stats(args.profile_dump)
+    else:
+        ok = args.func(args)
+
+    write_profile(args)
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
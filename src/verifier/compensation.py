@@ -0,0 +1,116 @@
+from . import number
+from .generator import ParameterGenerator
+
+"""
+This module holds what the checks of the compensated decryption shares reuse across the selections of a tally and
+of the spoiled ballots, spec boxes 7 and 8.
+
+When a guardian i is missing at decryption, every available guardian l computes a part M_i,l = A ^ P_i(l) from its
+backup of the secret polynomial of guardian i, and proves it against the evaluation g ^ P_i(l) of the commitments
+of guardian i, the product of the K_i,j ^ (l ^ j). The share of guardian i is then the recombination of the parts,
+M_i = prod of M_i,l ^ w_l, where the w_l are the Lagrange coefficients of the set of available guardians.
+
+Neither the evaluations nor the coefficients depend on the selection, while every selection of every contest and
+spoiled ballot needs them. GuardianCompensation computes each evaluation once per (missing guardian, available
+guardian) pair, as a single multi-exponentiation of the commitments, and the coefficients once per set of available
+guardians; every other selection gets them from its caches. The values are deterministic, so threads sharing an
+instance at most compute one twice.
+
+Class:
+    GuardianCompensation
+"""
+
+
+class GuardianCompensation:
+    """
+    The guardians of a record, their ids, public keys and commitments, with the caches of the compensation checks.
+    A guardian of index i has the sequence order i + 1, the point its polynomial is evaluated at for the others.
+
+    Method:
+        get_index(str, int)
+        get_public_key(int)
+        get_commitment_evaluation(int, int)
+        get_lagrange_coefficients(tuple)
+        recombine(dict)
+    """
+
+    def __init__(self, param_g: ParameterGenerator):
+        """
+        read the coefficient files of every guardian
+        :param param_g: the parameter generator of the record
+        """
+        self.large_prime = param_g.get_large_prime()
+        self.small_prime = param_g.get_small_prime()
+        self.quorum = param_g.get_quorum()
+        self.num_of_guardians = param_g.get_num_of_guardians()
+        self.public_keys = param_g.get_public_keys_of_all_guardians()
+        self.commitments = [param_g.get_coefficient_commitments(i) for i in range(self.num_of_guardians)]
+        self.indices = {param_g.get_guardian_id(i): i for i in range(self.num_of_guardians)}
+        # (missing guardian index, available guardian index) - g ^ P_i(l)
+        self.evaluations = {}
+        # sorted available guardian indices - guardian index - Lagrange coefficient
+        self.lagrange_coefficients = {}
+
+    def get_index(self, guardian_id: str, default=None):
+        """
+        :param guardian_id: the id of a guardian, the owner id of its coefficient file
+        :param default: the index returned for an unknown id, e.g. the position of a share in records without ids
+        :return: the index of the guardian
+        """
+        return self.indices.get(guardian_id, default)
+
+    def get_public_key(self, index: int) -> int:
+        """
+        :param index: guardian index
+        :return: the public key Ki of the guardian
+        """
+        return int(self.public_keys[index])
+
+    def get_commitment_evaluation(self, missing_index: int, available_index: int) -> int:
+        """
+        evaluate the commitments of a missing guardian at the sequence order l of an available guardian, memoized
+        :param missing_index: the index of the missing guardian i
+        :param available_index: the index of the available guardian l
+        :return: g ^ P_i(l) = prod of K_i,j ^ (l ^ j) mod p
+        """
+        key = (missing_index, available_index)
+        evaluation = self.evaluations.get(key)
+        if evaluation is None:
+            order = available_index + 1
+            commitments = self.commitments[missing_index]
+            exponents = [pow(order, j, self.small_prime) for j in range(len(commitments))]
+            evaluation = self.evaluations[key] = number.multi_pow_mod(commitments, exponents, self.large_prime)
+        return evaluation
+
+    def get_lagrange_coefficients(self, available_indices: tuple) -> dict:
+        """
+        get the Lagrange coefficients of a set of available guardians at 0, cached per set
+        :param available_indices: the sorted indices of the available guardians
+        :return: a dictionary of guardian index - w_l, with w_l * prod of (j - l) = prod of j mod q over the other
+                 available guardians j
+        """
+        coefficients = self.lagrange_coefficients.get(available_indices)
+        if coefficients is None:
+            q = self.small_prime
+            orders = [index + 1 for index in available_indices]
+            coefficients = {}
+            for index, order in zip(available_indices, orders):
+                numerator, denominator = 1, 1
+                for other in orders:
+                    if other != order:
+                        numerator = numerator * other % q
+                        denominator = denominator * (other - order) % q
+                coefficients[index] = numerator * number.inverse_mod(denominator, q) % q
+            self.lagrange_coefficients[available_indices] = coefficients
+        return coefficients
+
+    def recombine(self, parts: dict) -> int:
+        """
+        recombine the share of a missing guardian from the parts of the available guardians
+        :param parts: a dictionary of available guardian index - part M_i,l
+        :return: M_i = prod of M_i,l ^ w_l mod p
+        """
+        available_indices = tuple(sorted(parts))
+        coefficients = self.get_lagrange_coefficients(available_indices)
+        return number.multi_pow_mod([parts[index] for index in available_indices],
+                                    [coefficients[index] for index in available_indices], self.large_prime)
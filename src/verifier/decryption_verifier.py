@@ -1,7 +1,12 @@
+import time
 from .interfaces import IVerifier, IContestVerifier, ISelectionVerifier
 from .generator import ParameterGenerator, FilePathGenerator, SelectionInfoAggregator
+from .discrete_log import DiscreteLogTable
+from .compensation import GuardianCompensation
 from . import number
-from .json_parser import read_json_file
+from . import latency
+from .result import Result, Reason, ResultSink, ConsoleSink
+from .record_view import get_number
 
 """
 This module does the decryption work on cast ballot tallies and each spoiled ballots.
@@ -23,10 +28,16 @@ class DecryptionVerifier(IVerifier):
     This class is responsible for checking ballot decryption, its major work include,
     1. checking box 6, cast ballot tally decryption, where the verifier will check the total
     tallies of ballot selections match the actual selections.
-    2. checking box 9, confirm two equations for each (non-dummy) option in each contest in the ballot coding file.
+    2. checking box 9, confirm two equations for each (non-dummy) option in each contest in the ballot coding file,
+    and that the shares combine into the published count t, B / M = g ^ t. The counts are looked up in a table of
+    the powers of g shared by the tally and every spoiled ballot, a count being at most the number of ballots.
     3. checking box 10, spoiled ballot decryption, where spoiled ballots need to be checked individually.
+    4. checking boxes 7 and 8 for the shares of missing guardians, recombined from the compensated parts of the
+    available guardians. The commitment evaluations and Lagrange coefficients they need are computed once and shared
+    by the tally and every spoiled ballot.
     Note: user can check one single spoiled ballot or all the spoiled ballots in the folder by calling
-    verify_a_spoiled_ballot(str) and verify_all_spoiled_ballots(), respectively
+    verify_a_spoiled_ballot(str) and verify_all_spoiled_ballots(), respectively.
+    In fail-fast mode the checks stop at the first invalid contest or spoiled ballot.
 
     Methods:
         verify_cast_ballot_tallies()
@@ -34,14 +45,20 @@ class DecryptionVerifier(IVerifier):
         verify_all_spoiled_ballots()
     """
 
-    def __init__(self, path_g: FilePathGenerator, param_g: ParameterGenerator):
-        super().__init__(param_g)
+    def __init__(self, path_g: FilePathGenerator, param_g: ParameterGenerator, sink: ResultSink = None,
+                 fail_fast=False):
+        super().__init__(param_g, fail_fast)
         self.path_g = path_g
-        self.tally_dic = read_json_file(path_g.get_tally_file_path())
+        self.sink = sink if sink is not None else ConsoleSink()
+        self.tally_dic = path_g.read_json(path_g.get_tally_file_path())
         self.contests = self.tally_dic.get('contests')
         self.spoiled_ballots = self.tally_dic.get('spoiled_ballots')
+        self.discrete_logs = DiscreteLogTable(self.generator, self.large_prime)
+        self.guardians = GuardianCompensation(param_g)
+        # a selection of the tally counts at most every ballot, a selection of a spoiled ballot at most one vote
+        self.max_tally = param_g.get_num_of_ballots()
 
-    def verify_cast_ballot_tallies(self) -> bool:
+    def verify_cast_ballot_tallies(self, aggregator: SelectionInfoAggregator = None) -> Result:
         """
         check if the ballot tally satisfies the equations in box 6, including:
         confirming for each (non-dummy) option in each contest in the ballot coding file that the aggregate encryption,
@@ -53,32 +70,40 @@ class DecryptionVerifier(IVerifier):
                         ai and bi are both in Zrp,
                         challenge ci = H(Q-bar, (A,B), (ai, bi), Mi))
                         equations g ^ vi = ai * Ki ^ ci mod p and A ^ vi = bi * Mi ^ ci mod p
-        :return: true if all the above requirements are satisfied, false if any hasn't been satisfied
+        and confirming that B / M = g ^ t, with M the product of the Mi and t the published count (box 9)
+        :param aggregator: an aggregator already holding the products of all cast ballots, e.g. merged from the
+                           partial results of sharded runs; by default the ballot folder is scanned
+        :return: a box-level Result, truthy if all the above requirements are satisfied, falsy if any hasn't been
+                satisfied
         """
-        total_error, share_error = self.initialize_error(), self.initialize_error()
-
         tally_name = self.tally_dic.get('object_id')
         contest_names = list(self.contests.keys())
+        result = Result('box', 'Box 6 & 9 cast ballot tally', box=6)
 
         # confirm that the aggregate encryption are the accumulative product of all
         # corresponding encryption on all cast ballots
-        aggregator = SelectionInfoAggregator(self.path_g, self.param_g)
-        total_res = self.__match_total_across_ballots(aggregator, contest_names)
-        if not total_res:
-            total_error = self.set_error()
+        if aggregator is None:
+            aggregator = SelectionInfoAggregator(self.path_g, self.param_g)
+        self.__match_total_across_ballots(aggregator, contest_names, result)
 
         # confirm for each decrypting trustee Ti
-        share_res = self.__make_all_contest_verification(self.contests, contest_names, tally_name)
-        if not share_res:
-            share_error = self.set_error()
+        if result.ok or not self.fail_fast:
+            tally_result = self.__make_all_contest_verification(self.contests, contest_names, tally_name, 6,
+                                                                self.max_tally)
+            result.add(tally_result)
+            self.sink.emit(tally_result)
+
+        self.sink.emit(result)
 
-        return not (total_error and share_error)
+        return result
 
-    def __match_total_across_ballots(self, aggregator: SelectionInfoAggregator, contest_names: list) -> bool:
+    def __match_total_across_ballots(self, aggregator: SelectionInfoAggregator, contest_names: list,
+                                     result: Result) -> bool:
         """
         matching the given tallies with accumulative products calculated across all ballots
         :param aggregator: a SelectionInfoAggregator instance for accessing information of a selection
         :param contest_names: a list of unique contest names, listed as "object_id" under contests
+        :param result: the box result the mismatches are recorded on
         :return: true if all the tallies match, false if not
         """
         error = self.initialize_error()
@@ -100,45 +125,53 @@ class DecryptionVerifier(IVerifier):
                 tally_pad = total_pad_dic.get(contest_name, {}).get(selection_name)
                 accum_data = data_dic.get(selection_name)
                 tally_data = total_data_dic.get(contest_name, {}).get(selection_name)
+                field = '{contest}.{selection}'.format(contest=contest_name, selection=selection_name)
                 if not number.equals(accum_pad, tally_pad):
                     error = self.set_error()
+                    result.fail(Reason.TALLY_MISMATCH, field=field + '.pad')
                 if not number.equals(accum_data, tally_data):
                     error = self.set_error()
-        if error:
-            print("Tally error.")
+                    result.fail(Reason.TALLY_MISMATCH, field=field + '.data')
 
         return not error
 
-    def verify_a_spoiled_ballot(self, ballot_name: str) -> bool:
+    def verify_a_spoiled_ballot(self, ballot_name: str) -> Result:
         """
         verify a spoiled ballot's correctness by repeating the steps on cast_ballot_tallies, everything in box 6 & 9
         :param ballot_name: a unique name of a ballot, listed under "object_id" under a ballot
-        :return: true if all the requirements have been met, false if not
+        :return: a ballot-level Result, truthy if all the requirements have been met, falsy if not
         """
+        start = time.perf_counter() if latency.ACTIVE is not None else None
         spoiled_ballot = self.spoiled_ballots.get(ballot_name)
         contest_names = list(spoiled_ballot.keys())
-        return self.__make_all_contest_verification(spoiled_ballot, contest_names, ballot_name)
+        result = self.__make_all_contest_verification(spoiled_ballot, contest_names, ballot_name, 10, 1)
+        if start is not None:
+            latency.ACTIVE.record('spoiled_ballot', ballot_name, time.perf_counter() - start,
+                                  *latency.count_spoiled_ballot(spoiled_ballot))
+        return result
 
-    def verify_all_spoiled_ballots(self) -> bool:
+    def verify_all_spoiled_ballots(self) -> Result:
         """
         verify all the spoiled ballots in the spoiled_ballots folder by checking each one individually
-        :return true if all the spoiled ballots are verified as valid, false otherwise
+        :return: a box-level Result, truthy if all the spoiled ballots are verified as valid, falsy otherwise
         """
-        error = self.initialize_error()
+        result = Result('box', 'Box 10 spoiled ballots', box=10)
 
         spoiled_ballot_names = list(self.spoiled_ballots.keys())
         for spoiled_ballot_name in spoiled_ballot_names:
-            if not self.verify_a_spoiled_ballot(spoiled_ballot_name):
-                error = self.set_error()
+            ballot_result = self.verify_a_spoiled_ballot(spoiled_ballot_name)
+            result.add(ballot_result)
+            self.sink.emit(ballot_result)
 
-        if error:
-            print("Spoiled ballot decryption failure. ")
-        else:
-            print("Spoiled ballot decryption success. ")
+            if self.fail_fast and not ballot_result.ok:
+                break
 
-        return not error
+        self.sink.emit(result)
+
+        return result
 
-    def __make_all_contest_verification(self, contest_dic: dict, contest_names: list, field_name: str) -> bool:
+    def __make_all_contest_verification(self, contest_dic: dict, contest_names: list, field_name: str,
+                                        box: int, max_tally: int) -> Result:
         """
         helper function used in verify_cast_ballot_tallies() and verify_a_spoiled_ballot(str),
         verifying all contests in a ballot by calling the DecryptionContestVerifier
@@ -147,22 +180,20 @@ class DecryptionVerifier(IVerifier):
         :param contest_names: a list of all the contest names in this election
         :param field_name: 'object_id' under the cast ballot tallies or each individual spoiled ballot,
          used as an identifier to signal whether this is a check for the cast ballot tallies or spoiled ballots
-        :return: true if no error has been found in any contest verification in this cast ballot tallies or
-        spoiled ballot check, false otherwise
+        :param box: the specification box the checks belong to, 6 for the tally and 10 for spoiled ballots
+        :param max_tally: the largest count a selection can decrypt to
+        :return: a ballot-level Result, truthy if no error has been found in any contest verification in this cast
+        ballot tallies or spoiled ballot check, falsy otherwise
         """
-        error = self.initialize_error()
+        result = Result('ballot', field_name, box=box)
         for contest_name in contest_names:
             contest = contest_dic.get(contest_name)
-            tcv = DecryptionContestVerifier(contest, self.param_g)
-            if not tcv.verify_a_contest():
-                error = self.set_error()
+            tcv = DecryptionContestVerifier(contest, self.param_g, box, self.fail_fast, self.discrete_logs,
+                                            max_tally, self.guardians)
+            if not result.add(tcv.verify_a_contest()) and self.fail_fast:
+                break
 
-        if error:
-            print(field_name + ' [box 6 & 9] decryption verification failure. ')
-        else:
-            print(field_name + ' [box 6 & 9] decryption verification success. ')
-
-        return not error
+        return result
 
 
 class DecryptionContestVerifier(IContestVerifier):
@@ -178,31 +209,33 @@ class DecryptionContestVerifier(IContestVerifier):
         verify_a_contest()
     """
 
-    def __init__(self, contest_dic: dict, param_g: ParameterGenerator):
-        super().__init__(param_g)
+    def __init__(self, contest_dic: dict, param_g: ParameterGenerator, box=6, fail_fast=False,
+                 discrete_logs: DiscreteLogTable = None, max_tally=1, guardians: GuardianCompensation = None):
+        super().__init__(param_g, fail_fast)
+        self.box = box
+        self.discrete_logs = discrete_logs
+        self.max_tally = max_tally
+        self.guardians = guardians if guardians is not None else GuardianCompensation(param_g)
         self.contest_dic = contest_dic
-        self.public_keys = param_g.get_public_keys_of_all_guardians()
         self.selections = self.contest_dic.get('selections')
         self.selection_names = list(self.selections.keys())
         self.contest_id = self.contest_dic.get('object_id')
 
-    def verify_a_contest(self) -> bool:
+    def verify_a_contest(self) -> Result:
         """
         Verifies one contest inside the cast ballot tallies or a spoiled ballot at a time.
         It combines all the error checks for all the selections under this contest.
-        :return: true if all the selection checks are passed, false otherwise
+        :return: a contest-level Result, truthy if all the selection checks are passed, falsy otherwise
         """
-        error = self.initialize_error()
+        result = Result('contest', self.contest_id, box=self.box)
         for selection_name in self.selection_names:
             selection = self.selections.get(selection_name)
-            tsv = DecryptionSelectionVerifier(selection, self.param_g)
-            if not tsv.verify_a_selection():
-                error = self.set_error()
-
-        if error:
-            print(self.contest_id + ' tally decryption failure. ')
+            tsv = DecryptionSelectionVerifier(selection, self.param_g, self.box, self.fail_fast, self.discrete_logs,
+                                              self.max_tally, self.guardians)
+            if not result.add(tsv.verify_a_selection()) and self.fail_fast:
+                break
 
-        return not error
+        return result
 
 
 class DecryptionSelectionVerifier(ISelectionVerifier):
@@ -211,20 +244,25 @@ class DecryptionSelectionVerifier(ISelectionVerifier):
 
     Selection is the layer under contest and above guardian shares. Methods in this class provides public access to
     a selection's pad and data values for convenience and aggregates the guardian share check conducted by
-    ShareVerifier. Used in DecryptionContestVerifier.
+    ShareVerifier. Given a discrete log table, it also checks the plaintext the shares combine into.
+    Used in DecryptionContestVerifier.
 
     Method:
         get_pad()
         get_data()
         verify_a_selection()
     """
-    def __init__(self, selection_dic: dict, param_g: ParameterGenerator):
-        super().__init__(param_g)
+    def __init__(self, selection_dic: dict, param_g: ParameterGenerator, box=6, fail_fast=False,
+                 discrete_logs: DiscreteLogTable = None, max_tally=1, guardians: GuardianCompensation = None):
+        super().__init__(param_g, fail_fast)
+        self.box = box
+        self.discrete_logs = discrete_logs
+        self.max_tally = max_tally
+        self.guardians = guardians if guardians is not None else GuardianCompensation(param_g)
         self.selection_dic = selection_dic
         self.selection_id = selection_dic.get('object_id')
-        self.pad = int(self.selection_dic.get('message', {}).get('pad'))
-        self.data = int(self.selection_dic.get('message', {}).get('data'))
-        self.public_keys = param_g.get_public_keys_of_all_guardians()
+        self.pad = get_number(self.selection_dic.get('message', {}), 'pad')
+        self.data = get_number(self.selection_dic.get('message', {}), 'data')
 
     def get_pad(self) -> int:
         """
@@ -240,18 +278,45 @@ class DecryptionSelectionVerifier(ISelectionVerifier):
         """
         return self.data
 
-    def verify_a_selection(self) -> bool:
+    def verify_a_selection(self) -> Result:
         """
         verifies a selection at a time. It combines all the checks separated by guardian shares
-        :return: true if no error has found in any share verification of this selection, false otherwise
+        :return: a selection-level Result, truthy if no error has found in any share verification of this selection,
+                falsy otherwise
         """
         shares = self.selection_dic.get('shares')
-        sv = ShareVerifier(shares, self.param_g, self.pad, self.data)
-        res = sv.verify_all_shares()
-        if not res:
-            print(self.selection_id + " tally verification error. ")
+        result = Result('selection', self.selection_id, box=self.box)
+        sv = ShareVerifier(shares, self.param_g, self.pad, self.data, self.box, self.fail_fast, self.guardians)
+        if (sv.verify_all_shares(result) or not self.fail_fast) and self.discrete_logs is not None:
+            self.__check_plaintext(shares, result)
+
+        return result
+
+    def __check_plaintext(self, shares: list, result: Result) -> bool:
+        """
+        check that the partial decryptions combine into the published plaintext, B / M = g ^ t with M the product of
+        the Mi, and that t is the published count, found in the discrete log table
+        :param shares: the guardian shares of the selection
+        :param result: the selection result the failures are recorded on
+        :return: True if both checks passed, False otherwise
+        """
+        error = self.initialize_error()
+        # the tally plaintext is checked in box 9, a spoiled ballot in box 10
+        box = 9 if self.box == 6 else self.box
+        value = get_number(self.selection_dic, 'value')
+
+        product = 1
+        for share in shares:
+            product = number.mul_mod(product, get_number(share, 'share'), self.large_prime)
+        if not number.equals(number.mul_mod(value, product, self.large_prime), self.data):
+            error = self.set_error()
+            result.fail(Reason.PLAINTEXT, box=box, field='value')
+
+        if self.discrete_logs.log(value, self.max_tally) != int(self.selection_dic.get('tally')):
+            error = self.set_error()
+            result.fail(Reason.TALLY_COUNT, box=box, field='tally')
 
-        return res
+        return not error
 
 
 class ShareVerifier(IVerifier):
@@ -261,43 +326,95 @@ class ShareVerifier(IVerifier):
     The share level is the deepest level the data of cast ballot tallies and spoiled ballots can go, therefore, most of
     the computation needed for decryption happen here.
 
+    A share is matched to its guardian by its 'guardian_id', or by its position in records without ids. The share of
+    a missing guardian has no proof of its own but the 'recovered_parts' of the available guardians: every part is
+    checked in box 7 against the commitments of the missing guardian evaluated at the available guardian, and the
+    parts must recombine into the share, with at least a quorum of them, in box 8.
+
     Method:
         verify_all_shares()
     """
 
-    def __init__(self, shares: list, param_g: ParameterGenerator, selection_pad: int, selection_data: int):
+    def __init__(self, shares: list, param_g: ParameterGenerator, selection_pad: int, selection_data: int, box=6,
+                 fail_fast=False, guardians: GuardianCompensation = None):
         # calls IVerifier init
-        super().__init__(param_g)
+        super().__init__(param_g, fail_fast)
 
+        self.box = box
         self.shares = shares
         self.selection_pad = selection_pad
         self.selection_data = selection_data
-        self.public_keys = param_g.get_public_keys_of_all_guardians()
+        self.guardians = guardians if guardians is not None else GuardianCompensation(param_g)
 
-    def verify_all_shares(self) -> bool:
+    def verify_all_shares(self, selection_result: Result) -> bool:
         """
         verify all shares of a tally decryption
+        :param selection_result: the selection result every failed share is added to
         :return: True if no error occur in any share, False if some error
         """
         error = self.initialize_error()
-        for index, share in enumerate(self.shares):
-            curr_public_key = int(self.public_keys[index])
-            if not self.__verify_a_share(share, curr_public_key):
+        for position, share in enumerate(self.shares):
+            guardian_id = share.get('guardian_id')
+            index = position if guardian_id is None else self.guardians.get_index(guardian_id)
+            share_result = Result('share', position, box=self.box)
+            if index is None:
+                share_result.fail(Reason.UNKNOWN_GUARDIAN, field='guardian_id')
+            elif share.get('proof') is None and share.get('recovered_parts'):
+                self.__verify_a_compensated_share(share, index, share_result)
+            else:
+                self.__verify_a_share(share, self.guardians.get_public_key(index), share_result)
+            if not selection_result.add(share_result):
                 error = self.set_error()
-                print("Guardian {} decryption error. ".format(index))
+
+            if error and self.fail_fast:
+                break
 
         return not error
 
-    def __verify_a_share(self, share_dic: dict, public_key: int) -> bool:
-        """
-        verify one share at a time, check box 6 requirements,
+    def __verify_a_compensated_share(self, share_dic: dict, missing_index: int, result: Result) -> bool:
+        """
+        verify the share of a missing guardian i, check box 7 and 8 requirements,
+        (1) every part Mi,l has a valid proof for the public key g ^ Pi(l), the commitments of guardian i evaluated at
+        the available guardian l, which the recovery key given with the part must equal
+        (2) there are parts of at least a quorum of guardians, and they recombine into the share Mi
+        :param share_dic: a share with 'recovered_parts', a dictionary of available guardian id - part
+        :param missing_index: the index of the missing guardian
+        :param result: the share result the failures are recorded on, every failed part being added as a child
+        :return: True if no error found in the parts and their recombination, False if any error
+        """
+        parts = {}
+        for guardian_id, part_dic in share_dic.get('recovered_parts').items():
+            part_result = Result('share', guardian_id, box=7)
+            available_index = self.guardians.get_index(part_dic.get('guardian_id', guardian_id))
+            if available_index is None:
+                part_result.fail(Reason.UNKNOWN_GUARDIAN, field='guardian_id')
+            else:
+                evaluation = self.guardians.get_commitment_evaluation(missing_index, available_index)
+                recovery_key = part_dic.get('recovery_key')
+                if recovery_key is not None and not number.equals(get_number(part_dic, 'recovery_key'), evaluation):
+                    part_result.fail(Reason.RECOVERY_KEY, field='recovery_key')
+                self.__verify_a_share(part_dic, evaluation, part_result)
+                parts[available_index] = self.__get_partial_decryption(part_dic)
+            if not result.add(part_result) and self.fail_fast:
+                return False
+
+        if len(parts) < self.guardians.quorum:
+            return result.fail(Reason.QUORUM, box=8, field='recovered_parts')
+        if not number.equals(self.guardians.recombine(parts), self.__get_partial_decryption(share_dic)):
+            return result.fail(Reason.RECOMBINATION, box=8, field='share')
+
+        return result.ok
+
+    def __verify_a_share(self, share_dic: dict, public_key: int, result: Result) -> bool:
+        """
+        verify one share or compensated part at a time, check box 6 or box 7 requirements,
         (1) if the response vi is in the set Zq
         (2) if the given ai, bi are both in set Zrp
         :param share_dic: a specific share inside the shares list
+        :param public_key: the public key of the guardian who provided the share, Ki, or g ^ Pi(l) for a part
+        :param result: the share result the failures are recorded on
         :return: True if no error found in share partial decryption, False if any error
         """
-        error = self.initialize_error()
-
         # get values
         pad = self.__get_share_pad(share_dic)
         data = self.__get_share_data(share_dic)
@@ -305,26 +422,29 @@ class ShareVerifier(IVerifier):
         challenge = self.__get_share_challenge(share_dic)
         partial_decryption = self.__get_partial_decryption(share_dic)
 
-        # check if the response vi is in the set Zq
-        response_correctness = self.__check_response(response)
-
-        # check if the given ai, bi are both in set Zrp
-        pad_data_correctness = self.__check_data(data) and self.__check_pad(pad)
-
-        # check if challenge is correctly computed
-        challenge_correctness = self.__check_challenge(challenge, pad, data, partial_decryption)
-
-        # check equations
-        equ1_correctness = self.__check_equation1(response, pad, challenge, public_key)
-        equ2_correctness = self.__check_equation2(response, data, challenge, partial_decryption)
-
-        # error check
-        if not (response_correctness and pad_data_correctness and challenge_correctness
-                and equ1_correctness and equ2_correctness):
-            error = self.set_error()
-            print("partial decryption failure. ")
-
-        return not error
+        # the checks run from the cheapest to the most expensive: range checks, the challenge hash,
+        # the proof equations, and the Zrp subgroup tests last
+        self.run_checks(
+            # check if the response vi is in the set Zq
+            lambda: self.__check_response(response) or result.fail(Reason.NOT_IN_ZQ, field='proof.response'),
+            # check if the given ai, bi are within 0 < x < p
+            lambda: number.is_within_set_zstarp(data) or result.fail(Reason.NOT_IN_ZRP, field='proof.data'),
+            lambda: number.is_within_set_zstarp(pad) or result.fail(Reason.NOT_IN_ZRP, field='proof.pad'),
+            # check if challenge is correctly computed
+            lambda: (self.__check_challenge(challenge, pad, data, partial_decryption)
+                     or result.fail(Reason.CHALLENGE, field='proof.challenge')),
+            # check equations
+            lambda: (self.__check_equation1(pad, response, challenge, public_key)
+                     or result.fail(Reason.EQUATION, field='proof.pad')),
+            lambda: (self.__check_equation2(response, data, challenge, partial_decryption)
+                     or result.fail(Reason.EQUATION, field='proof.data')),
+            # check if the given ai, bi are both in set Zrp, values out of range have been reported already
+            lambda: (self.__check_data(data) or not number.is_within_set_zstarp(data)
+                     or result.fail(Reason.NOT_IN_ZRP, field='proof.data')),
+            lambda: (self.__check_pad(pad) or not number.is_within_set_zstarp(pad)
+                     or result.fail(Reason.NOT_IN_ZRP, field='proof.pad')))
+
+        return result.ok
 
     def __check_equation1(self,  pad: int, response: int,challenge: int, public_key: int) -> bool:
         """
@@ -338,14 +458,10 @@ class ShareVerifier(IVerifier):
         :param challenge: challenge of a share, ci
         :return True if the equation is satisfied, False if not
         """
-        left = pow(self.generator, response, self.large_prime)
-        right = number.mod_p(pad * pow(public_key, challenge, self.large_prime))
+        left = number.pow_mod(self.generator, response, self.large_prime)
+        right = number.mul_mod(pad, number.pow_mod(public_key, challenge, self.large_prime), self.large_prime)
 
-        res = number.equals(left, right)
-        if not res:
-            print("equation 1 error. ")
-
-        return res
+        return number.equals(left, right)
 
     def __check_equation2(self, response: int, data: int, challenge: int, partial_decrypt: int) -> bool:
         """
@@ -359,14 +475,10 @@ class ShareVerifier(IVerifier):
         :param partial_decrypt: partial decryption of a guardian, Mi
         :return True if the equation is satisfied, False if not
         """
-        left = pow(self.selection_pad, response, self.large_prime)
-        right = number.mod_p(data * pow(partial_decrypt, challenge, self.large_prime))
-
-        res = number.equals(left, right)
-        if not res:
-            print("equation 2 error. ")
+        left = number.pow_mod(self.selection_pad, response, self.large_prime)
+        right = number.mul_mod(data, number.pow_mod(partial_decrypt, challenge, self.large_prime), self.large_prime)
 
-        return res
+        return number.equals(left, right)
 
     @staticmethod
     def __check_response(response: int) -> bool:
@@ -375,11 +487,7 @@ class ShareVerifier(IVerifier):
         :param response: response value vi of a share
         :return: True if the response is in set Zq, False if not
         """
-        res = number.is_within_set_zq(response)
-        if not res:
-            print("response error. ")
-
-        return res
+        return number.is_within_set_zq(response)
 
     @staticmethod
     def __check_pad(pad: int) -> bool:
@@ -388,11 +496,7 @@ class ShareVerifier(IVerifier):
         :param pad: a pad value ai of a share
         :return: True if this value is in set Zrp, False if not
         """
-        res = number.is_within_set_zrp(pad)
-        if not res:
-            print("a/pad value error. ")
-
-        return res
+        return number.is_within_set_zrp(pad)
 
     @staticmethod
     def __check_data(data: int) -> bool:
@@ -401,11 +505,7 @@ class ShareVerifier(IVerifier):
         :param data: a data value bi of a share
         :return: True if this value is in set Zrp, False if not
         """
-        res = number.is_within_set_zrp(data)
-        if not res:
-            print("b/data value error. ")
-
-        return res
+        return number.is_within_set_zrp(data)
 
     def __check_challenge(self, challenge: int, pad: int, data: int, partial_decrypt: int) -> bool:
         """
@@ -419,12 +519,7 @@ class ShareVerifier(IVerifier):
         challenge_computed = number.hash_elems(self.extended_hash, self.selection_pad, self.selection_data,
                                                pad, data, partial_decrypt)
 
-        res = number.equals(challenge, challenge_computed)
-
-        if not res:
-            print("challenge value error. ")
-
-        return res
+        return number.equals(challenge, challenge_computed)
 
     @staticmethod
     def __get_share_pad(share_dic: dict) -> int:
@@ -433,7 +528,7 @@ class ShareVerifier(IVerifier):
         :param share_dic: the dictionary holding all the share info
         :return: alpha/pad of a share in integer
         """
-        return int(share_dic.get('proof', {}).get('pad'))
+        return get_number(share_dic.get('proof', {}), 'pad')
 
     @staticmethod
     def __get_share_data(share_dic: dict) -> int:
@@ -442,7 +537,7 @@ class ShareVerifier(IVerifier):
         :param share_dic: the dictionary holding all the share info
         :return: beta/data of a share in integer
         """
-        return int(share_dic.get('proof', {}).get('data'))
+        return get_number(share_dic.get('proof', {}), 'data')
 
     @staticmethod
     def __get_share_challenge(share_dic: dict) -> int:
@@ -451,7 +546,7 @@ class ShareVerifier(IVerifier):
         :param share_dic: the dictionary holding all the share info
         :return: the challenge value of a share in integer
         """
-        return int(share_dic.get('proof', {}).get('challenge'))
+        return get_number(share_dic.get('proof', {}), 'challenge')
 
     @staticmethod
     def __get_share_response(share_dic: dict) -> int:
@@ -460,7 +555,7 @@ class ShareVerifier(IVerifier):
         :param share_dic: the dictionary holding all the share info
         :return: the response value of a share in integer
         """
-        return int(share_dic.get('proof', {}).get('response'))
+        return get_number(share_dic.get('proof', {}), 'response')
 
     @staticmethod
     def __get_partial_decryption(share_dic: dict) -> int:
@@ -469,4 +564,4 @@ class ShareVerifier(IVerifier):
         :param share_dic: the dictionary holding all the share info
         :return: a partial decryption of a selection in integer
         """
-        return int(share_dic.get('share'))
+        return get_number(share_dic, 'share')
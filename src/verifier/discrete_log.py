@@ -0,0 +1,99 @@
+import math
+import threading
+from . import number
+from . import metrics
+
+"""
+This module solves the small discrete logarithms of the decrypted tallies: a selection decrypts to g ^ t mod p, and
+the verifier confirms that t is the published count.
+
+A DiscreteLogTable maps g ^ t to t for every t below its size. It is built incrementally, one multiplication per
+entry, and only as far as the largest count looked up, so a verifier shares one table across the contests of the
+tally and every spoiled ballot and pays for each power of g once. A count up to the bound of the lookup, the number
+of cast ballots, is then found with a single dictionary lookup. For a bound beyond the size the table may grow to,
+the lookup falls back to baby-step giant-step, the table serving as the baby steps: about sqrt(bound) entries and
+sqrt(bound) giant steps instead of bound multiplications.
+
+Class:
+    DiscreteLogTable
+"""
+
+# the largest number of entries a table grows to before the lookups switch to baby-step giant-step
+MAX_TABLE_SIZE = 1 << 20
+
+
+class DiscreteLogTable:
+    """
+    Table of the powers of a generator g modulo p, g ^ t - t, shared by the threads of a verifier.
+
+    Method:
+        log(int, int)
+    """
+
+    def __init__(self, generator: int, modulus: int, max_size=MAX_TABLE_SIZE):
+        """
+        :param generator: the generator g
+        :param modulus: the modulus p
+        :param max_size: the largest number of entries the table grows to
+        """
+        self.generator = generator
+        self.modulus = modulus
+        self.max_size = max_size
+        self.powers = {1: 0}
+        # the next power of g to enter the table, g ^ len(powers)
+        self.next_power = generator % modulus
+        self.lock = threading.Lock()
+
+    def __extend(self, size: int, value=None):
+        """
+        grow the table up to a number of entries, stopping as soon as a value enters it
+        :param size: the number of entries, g ^ 0 to g ^ (size - 1)
+        :param value: the power of g looked for, None to grow the table to its size
+        """
+        with self.lock:
+            powers, power, generator, modulus = self.powers, self.next_power, self.generator, self.modulus
+            for exponent in range(len(powers), size):
+                powers.setdefault(power, exponent)
+                added, power = power, power * generator % modulus
+                if added == value:
+                    break
+            self.next_power = power
+
+    def log(self, value: int, bound: int):
+        """
+        find the discrete logarithm of a value, at most a bound
+        :param value: a power of g
+        :param bound: the largest logarithm looked for, e.g. the number of cast ballots for a tally count
+        :return: t such that g ^ t = value mod p and 0 <= t <= bound, or None if there is none
+        """
+        if metrics.ACTIVE is not None:
+            metrics.ACTIVE.count('discrete_log')
+        value %= self.modulus
+        exponent = self.powers.get(value)
+        if exponent is not None:
+            return exponent if exponent <= bound else None
+
+        if bound < self.max_size:
+            if len(self.powers) <= bound:
+                self.__extend(bound + 1, value)
+                exponent = self.powers.get(value)
+            return exponent
+        return self.__baby_step_giant_step(value, bound)
+
+    def __baby_step_giant_step(self, value: int, bound: int):
+        """
+        find a discrete logarithm beyond the size of the table, the table holding the baby steps
+        :param value: a power of g, not in the table
+        :param bound: the largest logarithm looked for
+        :return: the logarithm, or None if it is above the bound
+        """
+        self.__extend(min(self.max_size, int(math.sqrt(bound)) + 1))
+        step = len(self.powers)
+        # multiplying by g ^ -step moves the value one giant step down, until it lands in the table
+        giant_step = number.inverse_mod(number.pow_mod(self.generator, step, self.modulus), self.modulus)
+        for giant in range(bound // step + 1):
+            exponent = self.powers.get(value)
+            if exponent is not None:
+                return giant * step + exponent if giant * step + exponent <= bound else None
+            value = value * giant_step % self.modulus
+        return None
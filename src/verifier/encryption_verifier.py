@@ -1,9 +1,12 @@
-import glob
-from typing import Tuple
+import time
 from . import number
-from .json_parser import read_json_file
+from . import latency
 from .generator import ParameterGenerator, FilePathGenerator, VoteLimitCounter
 from .interfaces import IBallotVerifier, IContestVerifier, ISelectionVerifier
+from .result import Result, Reason, ResultSink, ConsoleSink
+from .sampling import BallotSampler
+from .record_view import get_number
+from .number_decoding import decode_number
 
 
 """
@@ -18,105 +21,248 @@ Class:
     BallotEncryptionVerifier
     BallotContestVerifier
     BallotSelectionVerifier
+
+Function:
+    verify_tracking_chain(dict, int, int)
 """
 
 
 class AllBallotsVerifier(IBallotVerifier):
     """
     This class checks ballot encryption correctness on both spoiled and cast (box 3, 4), and verifies the correctness
-    of tracking hash chain (box 5).
+    of tracking hash chain (box 5). In fail-fast mode the run stops at the first invalid ballot.
+    Given a BallotSampler, only a random sample of ballots gets the full box 3 & 4 checks, the others only get the
+    structural checks, and every ballot still takes part in the tracking hash checks.
+    Given a TrackingIndex, the ballots read by the run that are not indexed yet are added to it.
+    Given a FingerprintIndex, the fingerprints of every ballot are added to it, and the ballots reusing the id, a
+    ciphertext or proof commitments of a ballot read before them are reported as replayed once the scan is over.
+    Given BallotColumns, the metadata of every ballot is added to them, and the structural checks, the placeholder
+    counts among them, run on all the ballots at once after the scan instead of contest by contest. In fail-fast mode
+    the placeholder counts and the contests unknown to the manifest are still checked ballot by ballot, so that the
+    scan stops at the first malformed ballot, the checks only the columns run, ballot states, selection counts and
+    timestamp order, failing the run after the scan.
 
     Method:
         verify_all_ballots()
         verify_tracking_hashes()
     """
 
-    def __init__(self, param_g: ParameterGenerator, path_g: FilePathGenerator, limit_counter: VoteLimitCounter):
-        super().__init__(param_g, limit_counter)
+    def __init__(self, param_g: ParameterGenerator, path_g: FilePathGenerator, limit_counter: VoteLimitCounter,
+                 sink: ResultSink = None, fail_fast=False, sampler: BallotSampler = None, index=None,
+                 fingerprints=None, columns=None):
+        super().__init__(param_g, limit_counter, fail_fast)
         self.path_g = path_g
         self.folder_path = path_g.get_encrypted_ballot_folder_path()
+        self.sink = sink if sink is not None else ConsoleSink()
+        self.sampler = sampler
+        self.index = index
+        self.fingerprints = fingerprints
+        self.columns = columns
 
-    def verify_all_ballots(self) -> bool:
+    def verify_all_ballots(self) -> Result:
         """
         runs through the folder that contains ballot files once, runs encryption verification on every ballot
-        :return: True there is no error, False otherwise
+        :return: a Result holding the box 3 & 4 and the box 5 results, truthy if there is no error, falsy otherwise
         """
-        error = self.initialize_error()
-        count = 0
+        ballots_result = Result('box', 'Box 3, 4 & 5 ballots', box=3)
+        chain_result = Result('box', 'Box 5 tracking hash chain', box=5)
         tracking_hashes = {}
 
-        for ballot_file in glob.glob(self.folder_path + '*.json'):
-            # verify all ballots, box 3 & 4
-            ballot_dic = read_json_file(ballot_file)
-            bev = BallotEncryptionVerifier(ballot_dic, self.param_g, self.limit_counter)
-
-            # verify correctness
-            contest_res = bev.verify_all_contests()
-            if not contest_res:
-                error = self.set_error()
-                count += 1
-
-            # verify tracking hash
+        aborted = False
+        num_sample_failures = 0
+        # the columns check the structure after the scan, too late to stop a fail-fast run at the malformed ballot
+        check_structure = self.columns is None or self.fail_fast
+
+        # the ballots come in an order stable across runs, so that a sample seed always selects the same ballots
+        ballot_files = self.path_g.list_files(self.folder_path)
+        sample = self.sampler.select(len(ballot_files)) if self.sampler is not None else None
+
+        for i, (ballot_file, ballot_dic) in enumerate(self.path_g.iter_json_files(self.folder_path)):
+            if ballot_dic is None:
+                # listed but gone by the time it is read
+                ballot_result = Result('ballot', self.path_g.get_name(ballot_file), box=3)
+                ballot_result.fail(Reason.MISSING_BALLOT, field='encrypted_ballots')
+                ballots_result.add(ballot_result)
+                self.sink.emit(ballot_result)
+                if self.fail_fast:
+                    aborted = True
+                    break
+                continue
+
+            # the latency of a ballot leaves out its reading and parsing, done ahead by the prefetch
+            start = time.perf_counter() if latency.ACTIVE is not None else None
+            bev = BallotEncryptionVerifier(ballot_dic, self.param_g, self.limit_counter, self.fail_fast)
+            ballot_result = Result('ballot', ballot_dic.get('object_id'), box=3)
+
+            # verify tracking hash, box 5, a single hash so it runs before the contests
             # store tracking hashes in a dict
             prev_hash, curr_hash = bev.get_tracking_hash()
             tracking_hashes[curr_hash] = prev_hash
-            # aggregate tracking hashes, box 5
-            tracking_res = bev.verify_tracking_hash()
-            if not tracking_res:
-                error = self.set_error()
-                count += 1
-
-        if error:
-            print("[Box 3 & 4] Ballot verification failure, {num} ballots didn't pass check. ".format(num=count))
-        else:
-            print("[Box 3 & 4] All ballot verification success. ".format(i=count))
-
-        if not self.verify_tracking_hashes(tracking_hashes):
-            error = self.set_error()
-
-        if error:
-            print("[Box 5] Tracking hashes verification failure. ")
-        else:
-            print("[Box 5] Tracking hashes verification success. ")
-
-        return not error
-
-    def verify_tracking_hashes(self, hashes_dic: dict) -> bool:
-        """
-        verifies the tracking hash chain correctness
-        NOTE: didn't check the first and closing hashes
-        :param hashes_dic: a dictionary of "previous tracking - current tracking " hash code pairs
-        :return: True if all the tracking hashes satisfy Bi, Hi = H(Hi-1, D, T, Bi)
-        """
-        error = self.initialize_error()
-        # get all previous and current hashes
-        prev_hashes = set(hashes_dic.values())
-        curr_hashes = set(hashes_dic.keys())
-
-        # find the set that only contains first and last hash
-        union_set = prev_hashes.union(curr_hashes)
-        intersection_set = prev_hashes.intersection(curr_hashes)
-        first_last_set = union_set - intersection_set
-
-        first_hash, last_hash = 0, 0
-
-        # find the first and last hash
-        for h in first_last_set:
-            if h in prev_hashes:
-                first_hash = h
-            elif h in curr_hashes:
-                last_hash = h
-
-        # verify the first hash H0 = H(Q-bar)
-        zero_hash = number.hash_elems(self.extended_hash)
-
-        if not number.equals(int(zero_hash), int(first_hash)):
-            error = self.set_error()
-
-        # verify the closing hash, H-bar = H(Hl, 'CLOSE')
-        closing_hash_computed = number.hash_elems(last_hash, 'CLOSE')
-
-        return not error
+            if self.index is not None and self.index.lookup(curr_hash) is None:
+                self.index.add_ballot(self.path_g.get_name(ballot_file), ballot_dic)
+            if not bev.verify_tracking_hash():
+                ballot_result.fail(Reason.TRACKING_HASH, box=5, field='tracking_hash')
+            if self.fingerprints is not None:
+                self.fingerprints.add_ballot(ballot_dic)
+            if self.columns is not None:
+                self.columns.add_ballot(ballot_dic)
+
+            # verify correctness, box 3 & 4, or only the structure for ballots outside of the sample
+            if ballot_result.ok or not self.fail_fast:
+                if sample is None or i in sample:
+                    # the confidence of the sample only counts the ballots failing the checks it runs, box 3 & 4
+                    num_failed_contests = len(ballot_result.children)
+                    bev.verify_all_contests(ballot_result, check_structure=check_structure)
+                    if len(ballot_result.children) > num_failed_contests:
+                        num_sample_failures += 1
+                elif check_structure:
+                    bev.verify_structure(ballot_result)
+
+            if start is not None:
+                latency.ACTIVE.record('ballot', ballot_result.item_id, time.perf_counter() - start,
+                                      *latency.count_ballot(ballot_dic))
+            ballots_result.add(ballot_result)
+            self.sink.emit(ballot_result)
+
+            if self.fail_fast and not ballot_result.ok:
+                aborted = True
+                break
+
+        if self.sampler is not None:
+            ballots_result.details = self.sampler.report(len(ballot_files), num_sample_failures)
+
+        self.sink.emit(ballots_result)
+
+        # an aborted run has only seen part of the chain, so the chain cannot be checked
+        if not aborted:
+            if not self.verify_tracking_hashes(tracking_hashes, ballots_result.checked):
+                chain_result.fail(Reason.TRACKING_CHAIN, field='previous_tracking_hash')
+            self.sink.emit(chain_result)
+
+        result = Result('group', 'Box 3, 4 & 5')
+        result.add(ballots_result)
+        result.add(chain_result)
+
+        # likewise, the columns and the duplicates are only complete once every ballot has been read
+        if self.columns is not None and not aborted:
+            structure_result = self.verify_ballot_structure()
+            self.sink.emit(structure_result)
+            result.add(structure_result)
+        if self.fingerprints is not None and not aborted:
+            replay_result = self.verify_no_replays(ballots_result.checked)
+            self.sink.emit(replay_result)
+            result.add(replay_result)
+
+        return result
+
+    def verify_ballot_structure(self) -> Result:
+        """
+        run the structural checks of every ballot on the columns: known state and contests, the number of selections
+        and of placeholders of every contest, and timestamps in the order of the tracking hash chain
+        :return: a box-level Result with one failed child per malformed ballot, and the summary of the columns in its
+                 details
+        """
+        # check - reason, box, field
+        checks = {'state': (Reason.BALLOT_STATE, 3, 'state'),
+                  'unknown_contest': (Reason.UNKNOWN_CONTEST, 3, 'contests'),
+                  'selection_count': (Reason.SELECTION_COUNT, 3, '{contest}.ballot_selections'),
+                  'placeholder_count': (Reason.PLACEHOLDER_COUNT, 4, '{contest}.ballot_selections'),
+                  'timestamp_order': (Reason.TIMESTAMP_ORDER, 5, 'timestamp')}
+        result = Result('box', 'Box 3, 4 & 5 ballot structure', box=3)
+
+        ballot_results = {}
+        for row, check, contest_id in self.columns.check():
+            ballot_result = ballot_results.get(row)
+            if ballot_result is None:
+                ballot_result = ballot_results[row] = Result('ballot', self.columns.ballot_ids[row], box=3)
+            reason, box, field = checks[check]
+            ballot_result.fail(reason, box=box, field=field.format(contest=contest_id))
+
+        for ballot_result in ballot_results.values():
+            result.add(ballot_result)
+            self.sink.emit(ballot_result)
+        result.checked = len(self.columns)
+        result.details = self.columns.summary()
+
+        return result
+
+    def verify_no_replays(self, num_of_ballots: int) -> Result:
+        """
+        report the ballots sharing a fingerprint with a ballot read before them
+        :param num_of_ballots: the number of ballots read by the scan
+        :return: a box-level Result with one failed child per replayed ballot, the ids of the ballots it copies being
+                 given in its details
+        """
+        from . import fingerprint_index
+        reasons = {fingerprint_index.BALLOT_ID: Reason.DUPLICATE_BALLOT_ID,
+                   fingerprint_index.CIPHERTEXT: Reason.DUPLICATE_CIPHERTEXT,
+                   fingerprint_index.COMMITMENT: Reason.DUPLICATE_COMMITMENT}
+        fields = {fingerprint_index.BALLOT_ID: 'object_id',
+                  fingerprint_index.CIPHERTEXT: '{location}.ciphertext',
+                  fingerprint_index.COMMITMENT: '{location}.proof'}
+        result = Result('box', 'Box 3 replayed ballots', box=3)
+
+        ballot_results = {}
+        for kind, ballot_id, location, kept_ballot_id, _ in self.fingerprints.duplicates():
+            ballot_result = ballot_results.get(ballot_id)
+            if ballot_result is None:
+                ballot_result = ballot_results[ballot_id] = Result('ballot', ballot_id, box=3)
+                ballot_result.details = {'duplicate_of': []}
+            ballot_result.fail(reasons[kind], field=fields[kind].format(location=location))
+            if kept_ballot_id not in ballot_result.details['duplicate_of']:
+                ballot_result.details['duplicate_of'].append(kept_ballot_id)
+
+        for ballot_result in ballot_results.values():
+            result.add(ballot_result)
+            self.sink.emit(ballot_result)
+        result.checked = num_of_ballots
+
+        return result
+
+    def verify_tracking_hashes(self, hashes_dic: dict, num_ballots: int = None) -> bool:
+        """
+        verifies the tracking hash chain correctness, see verify_tracking_chain()
+        :param hashes_dic: a dictionary of "current tracking hash - previous tracking hash" pairs
+        :param num_ballots: the number of ballots the chain should go through, the number of pairs by default
+        :return: True if the chain starts at H0 = H(Q-bar) and goes through every ballot, False otherwise
+        """
+        if num_ballots is None:
+            num_ballots = len(hashes_dic)
+        return verify_tracking_chain(hashes_dic, self.extended_hash, num_ballots)
+
+
+def verify_tracking_chain(hashes_dic: dict, extended_hash, num_ballots: int) -> bool:
+    """
+    walk the tracking hash chain from H0 = H(Q-bar) through every previous tracking hash - tracking hash link, box 5.
+    The hashes are compared as numbers, so the chain holds whatever notation the record writes them in.
+    NOTE: the record has no closing hash H-bar = H(Hl, 'CLOSE') to check the end of the chain against
+    :param hashes_dic: a dictionary of "current tracking hash - previous tracking hash" pairs of every ballot
+    :param extended_hash: the extended base hash Q-bar
+    :param num_ballots: the number of ballots the chain should go through, two ballots with the same tracking hash
+        making one pair
+    :return: True if the chain starts at H0 and goes through every ballot once, without forks, cycles or orphaned
+        ballots, False otherwise
+    """
+    next_hashes = {}
+    for curr_hash, prev_hash in hashes_dic.items():
+        try:
+            prev_hash, curr_hash = decode_number(prev_hash), decode_number(curr_hash)
+        except (TypeError, ValueError):
+            # a missing or malformed hash breaks the chain
+            return False
+        if prev_hash in next_hashes:
+            # a fork, two ballots following the same one
+            return False
+        next_hashes[prev_hash] = curr_hash
+
+    # a cycle would loop forever, so the walk stops past the number of ballots
+    visited = 0
+    curr_hash = next_hashes.get(int(number.hash_elems(extended_hash)))
+    while curr_hash is not None and visited <= num_ballots:
+        visited += 1
+        curr_hash = next_hashes.get(curr_hash)
+
+    return visited == num_ballots == len(hashes_dic)
 
 
 class BallotEncryptionVerifier(IBallotVerifier):
@@ -129,41 +275,66 @@ class BallotEncryptionVerifier(IBallotVerifier):
     3. the running hash are correctly computed (box 5)
 
     Method:
+        verify_ballot()
         verify_all_contests()
+        verify_structure()
         verify_tracking_hash()
     """
 
-    def __init__(self, ballot_dic: dict, param_g: ParameterGenerator, limit_counter: VoteLimitCounter):
-        super().__init__(param_g, limit_counter)
+    def __init__(self, ballot_dic: dict, param_g: ParameterGenerator, limit_counter: VoteLimitCounter,
+                 fail_fast=False):
+        super().__init__(param_g, limit_counter, fail_fast)
         self.ballot_dic = ballot_dic
 
-    def verify_all_contests(self) -> bool:
+    def verify_ballot(self) -> Result:
+        """
+        verify the tracking hash (box 5) then all the contests (box 3 & 4) of the ballot
+        :return: a ballot-level Result, truthy if the ballot is valid, falsy otherwise
+        """
+        result = Result('ballot', self.ballot_dic.get('object_id'), box=3)
+        if not self.verify_tracking_hash():
+            result.fail(Reason.TRACKING_HASH, box=5, field='tracking_hash')
+        if result.ok or not self.fail_fast:
+            self.verify_all_contests(result)
+
+        return result
+
+    def verify_all_contests(self, result: Result = None, check_structure=True) -> Result:
         """
         verify all the contests within a ballot and check if there are any encryption or limit error
-        :return: True if all contests checked out/no error, False if any error in any selection
+        :param result: the ballot-level Result to record the contests on, a new one is created if not given
+        :param check_structure: whether to check the number of placeholders, False when they are checked on the
+                                columns of all the ballots instead
+        :return: a ballot-level Result, truthy if all contests checked out/no error, falsy if any error in any
+                selection
         """
-        encrypt_error, limit_error = self.initialize_error(), self.initialize_error()
+        contests = self.ballot_dic.get('contests')
+        if result is None:
+            result = Result('ballot', self.ballot_dic.get('object_id'), box=3)
 
-        ballot_id = self.ballot_dic.get('object_id')
+        for contest in contests:
+            cv = BallotContestVerifier(contest, self.param_g, self.limit_counter, self.fail_fast)
+            if not result.add(cv.verify_a_contest(check_structure)) and self.fail_fast:
+                break
+
+        return result
+
+    def verify_structure(self, result: Result = None) -> Result:
+        """
+        run only the structural checks of all the contests within a ballot, see BallotContestVerifier.verify_structure()
+        :param result: the ballot-level Result to record the contests on, a new one is created if not given
+        :return: a ballot-level Result, truthy if all contests are well-formed, falsy otherwise
+        """
         contests = self.ballot_dic.get('contests')
+        if result is None:
+            result = Result('ballot', self.ballot_dic.get('object_id'), box=3)
 
         for contest in contests:
-            cv = BallotContestVerifier(contest, self.param_g, self.limit_counter)
-            encrypt_res, limit_res = cv.verify_a_contest()
-            if not encrypt_res:
-                encrypt_error = self.set_error()
-            if not limit_res:
-                limit_error = self.set_error()
-
-        if not encrypt_error and not limit_error:
-            print(ballot_id + ' [box 3 & 4] ballot correctness verification success.')
-        else:
-            if encrypt_error:
-                print(ballot_id + ' [box 3] ballot encryption correctness verification failure.')
-            if limit_error:
-                print(ballot_id + ' [box 4] ballot limit check failure. ')
-
-        return not (encrypt_error and limit_error)
+            cv = BallotContestVerifier(contest, self.param_g, self.limit_counter, self.fail_fast)
+            if not result.add(cv.verify_structure()) and self.fail_fast:
+                break
+
+        return result
 
     def verify_tracking_hash(self) -> bool:
         """
@@ -175,10 +346,10 @@ class BallotEncryptionVerifier(IBallotVerifier):
         timestamp = self.get_timestamp()
         curr_hash_computed = number.hash_elems(prev_hash, timestamp, crypto_hash)
 
-        res = number.equals(int(curr_hash), int(curr_hash_computed))
+        res = number.equals(decode_number(curr_hash), curr_hash_computed)
         return res
 
-    def get_tracking_hash(self) -> Tuple[str, str]:
+    def get_tracking_hash(self) -> tuple:
         """
         get a pair of previous tracking hash and current tracking hash values
         :return: (previous tracking hash, current tracking hash) as a tuple
@@ -201,28 +372,33 @@ class BallotContestVerifier(IContestVerifier):
 
     Method:
         verify_a_contest()
+        verify_structure()
     """
 
-    def __init__(self, contest_dic: dict, param_g: ParameterGenerator, limit_counter: VoteLimitCounter):
-        super().__init__(param_g)  # calls IVerifier init
+    def __init__(self, contest_dic: dict, param_g: ParameterGenerator, limit_counter: VoteLimitCounter,
+                 fail_fast=False):
+        super().__init__(param_g, fail_fast)  # calls IVerifier init
         self.limit_counter = limit_counter
         self.vote_limit_dic = limit_counter.get_contest_vote_limits()
 
         # contest info
         self.contest_dic = contest_dic
-        self.contest_alpha = int(contest_dic.get('proof', {}).get('pad'))
-        self.contest_beta = int(contest_dic.get('proof', {}).get('data'))
-        self.contest_response = int(contest_dic.get('proof', {}).get('response'))
-        self.contest_challenge = int(contest_dic.get('proof', {}).get('challenge'))
+        # the proof numbers are decoded when a check reads them, never by the structural checks
+        self.contest_proof = contest_dic.get('proof', {})
         self.contest_id = contest_dic.get('object_id')
 
-    def verify_a_contest(self) -> Tuple[bool, bool]:
+    def verify_a_contest(self, check_structure=True) -> Result:
         """
-        verify a contest within a ballot, ballot correctness
-        :return True if no error, False otherwise
+        verify a contest within a ballot, ballot correctness. The contest-level checks only need the products of the
+        selection encryptions, so they run first, cheapest first, and the selections, which cost the most modular
+        exponentiations, run last.
+        :param check_structure: whether to check the number of placeholders, see verify_structure()
+        :return: a contest-level Result, encryption errors are recorded under box 3 and selection limit errors
+                under box 4
         """
-        # initialize errors to false
-        encryption_error, limit_error = self.initialize_error(), self.initialize_error()
+        result = Result('contest', self.contest_id, box=4)
+        if not self.__check_known_contest(result):
+            return result
         # get variables
         selections_list = self.contest_dic.get('ballot_selections')
         vote_limit = int(self.vote_limit_dic.get(self.contest_id))
@@ -230,136 +406,154 @@ class BallotContestVerifier(IContestVerifier):
         placeholder_count = 0
         selection_alpha_product = 1
         selection_beta_product = 1
+        selection_verifiers = []
 
         for selection in selections_list:
-            # verify encryption correctness on every selection  - selection check
             # create selection verifiers
-            sv = BallotSelectionVerifier(selection, self.param_g)
+            sv = BallotSelectionVerifier(selection, self.param_g, self.fail_fast)
+            selection_verifiers.append(sv)
 
             # get alpha, beta products
-            selection_alpha_product = selection_alpha_product * int(sv.get_pad()) % int(self.param_g.get_large_prime())
-            selection_beta_product = selection_beta_product * int(sv.get_data()) % int(self.param_g.get_large_prime())
-
-            # check validity of a selection
-            is_correct = sv.verify_selection_validity()
-            if not is_correct:
-                encryption_error = self.set_error()
-
-            # check selection limit, whether each a and b are in zrp
-            is_within_limit = sv.verify_selection_limit()
-            if not is_within_limit:
-                limit_error = self.set_error()
+            selection_alpha_product = number.mul_mod(selection_alpha_product, sv.get_pad(), self.large_prime)
+            selection_beta_product = number.mul_mod(selection_beta_product, sv.get_data(), self.large_prime)
 
             # get placeholder counts
             if sv.is_placeholder_selection():
                 placeholder_count = self.__increment_num(placeholder_count)
 
-        # verify the placeholder numbers match the maximum votes allowed - contest check
-        placeholder_match = self.__match_vote_limit_by_contest(self.contest_id, placeholder_count)
-        if not placeholder_match:
-            limit_error = self.set_error()
-
         # calculate c = H(Q-bar, (A,B), (a,b))
         challenge_computed = number.hash_elems(self.extended_hash, selection_alpha_product, selection_beta_product,
-                                               self.contest_alpha, self.contest_beta)
+                                               get_number(self.contest_proof, 'pad'),
+                                               get_number(self.contest_proof, 'data'))
+
+        contest_ok = self.run_checks(
+            # check the contest response is in set Zq
+            lambda: self.__check_response(result),
+            # verify the placeholder numbers match the maximum votes allowed - contest check
+            lambda: (not check_structure
+                     or self.__match_vote_limit_by_contest(self.contest_id, placeholder_count, result)),
+            # check if given contest challenge matches the computation
+            lambda: self.__check_challenge(challenge_computed, result),
+            # check equations
+            lambda: self.__check_cp_proof_alpha(selection_alpha_product, result),
+            lambda: self.__check_cp_proof_beta(selection_beta_product, vote_limit, result))
+
+        if not contest_ok and self.fail_fast:
+            return result
+
+        for sv in selection_verifiers:
+            # verify encryption correctness on every selection  - selection check
+            selection_result = sv.verify_selection_validity()
 
-        # check if given contest challenge matches the computation
-        challenge_match = self.__check_challenge(challenge_computed)
-        if not challenge_match:
-            limit_error = self.set_error()
+            # check selection limit, whether each a and b are in zrp
+            if selection_result.ok or not self.fail_fast:
+                if not sv.verify_selection_limit():
+                    selection_result.fail(Reason.NOT_IN_ZRP, box=4, field='ciphertext')
 
-        # check equations
-        equ1_check = self.__check_cp_proof_alpha(selection_alpha_product)
-        equ2_check = self.__check_cp_proof_beta(selection_beta_product, vote_limit)
+            if not result.add(selection_result) and self.fail_fast:
+                break
 
-        if not equ1_check or not equ2_check:
-            limit_error = self.set_error()
+        return result
 
-        if encryption_error or limit_error:
-            output = self.contest_id + ' verification failure:'
-            if encryption_error:
-                output += ' encryption error. '
-            if limit_error:
-                output += ' selection limit error. '
-            print(output)
+    def verify_structure(self) -> Result:
+        """
+        run only the structural checks of a contest, which need no modular exponentiation: the number of placeholder
+        selections matches the votes allowed. Used on the ballots left out of a sampled run.
+        :return: a contest-level Result
+        """
+        result = Result('contest', self.contest_id, box=4)
+        if not self.__check_known_contest(result):
+            return result
+        selections_list = self.contest_dic.get('ballot_selections')
+        placeholder_count = sum(1 for selection in selections_list if selection.get('is_placeholder_selection'))
+        self.__match_vote_limit_by_contest(self.contest_id, placeholder_count, result)
 
-        return not encryption_error, not limit_error
+        return result
 
-    def __check_response(self) -> bool:
+    def __check_response(self, result: Result) -> bool:
         """
         check if the contest response value is within set zq
+        :param result: the contest result the failure is recorded on
         :return: True if it's within set zq, False otherwise
         """
-        res = number.is_within_set_zq(self.contest_response)
-        if not res:
-            print("Contest response error. ")
-        return res
+        if not number.is_within_set_zq(get_number(self.contest_proof, 'response')):
+            return result.fail(Reason.NOT_IN_ZQ, field='proof.response')
+        return True
 
-    def __check_challenge(self, challenge_computed) -> bool:
+    def __check_challenge(self, challenge_computed, result: Result) -> bool:
         """
         check if the given contest response equals to the one computed as c = H(Q-bar, (A,B), (a,b))
         :param challenge_computed: the computed challenge using hash
+        :param result: the contest result the failure is recorded on
         :return: True if the given and computed values are the same, False if not
         """
-        res = number.equals(challenge_computed, self.contest_challenge)
-
-        if not res:
-            print("Contest challenge error. ")
+        if not number.equals(challenge_computed, get_number(self.contest_proof, 'challenge')):
+            return result.fail(Reason.CHALLENGE, field='proof.challenge')
+        return True
 
-        return res
-
-    def __check_cp_proof_alpha(self, alpha_product: int) -> bool:
+    def __check_cp_proof_alpha(self, alpha_product: int, result: Result) -> bool:
         """
         check if equation g ^ v = a * A ^ c mod p is satisfied,
         This function checks the first part of aggregate encryption, A in (A, B), is used together with
         __check_cp_proof_beta() to form a pair-wise check on a complete encryption value pair (A,B)
         :param alpha_product: the accumulative product of all the alpha/pad values on all selections within a contest
+        :param result: the contest result the failure is recorded on
         :return: True if the equation is satisfied, False if not
         """
-        left = pow(self.generator, self.contest_response, self.large_prime)
-        right = number.mod_p(number.mod_p(self.contest_alpha) *
-                             pow(alpha_product, self.contest_challenge, self.large_prime))
+        challenge = get_number(self.contest_proof, 'challenge')
+        left = number.pow_mod(self.generator, get_number(self.contest_proof, 'response'), self.large_prime)
+        right = number.mul_mod(get_number(self.contest_proof, 'pad'),
+                               number.pow_mod(alpha_product, challenge, self.large_prime), self.large_prime)
 
-        res = number.equals(left, right)
-        if not res:
-            print("Contest selection limit check equation 1 error. ")
+        if not number.equals(left, right):
+            return result.fail(Reason.EQUATION, field='proof.pad')
+        return True
 
-        return res
-
-    def __check_cp_proof_beta(self, beta_product: int, votes_allowed: int) -> bool:
+    def __check_cp_proof_beta(self, beta_product: int, votes_allowed: int, result: Result) -> bool:
         """
         check if equation g ^ (L * c) * K ^ v = b * B ^ C mod p is satisfied
         This function checks the second part of aggregate encryption, B in (A, B), is used together with
          __check_cp_proof_alpha() to form a pair-wise check on a complete encryption value pair (A,B)
         :param beta_product: the accumalative product of pad/beta values of all the selections within a contest
         :param votes_allowed: the maximum votes allowed for this contest
+        :param result: the contest result the failure is recorded on
         :return: True if the equation is satisfied, False if not
         """
-        left = number.mod_p(pow(self.generator, number.mod_q(votes_allowed * self.contest_challenge), self.large_prime)
-                            * pow(self.public_key, self.contest_response, self.large_prime))
+        challenge = get_number(self.contest_proof, 'challenge')
+        response = get_number(self.contest_proof, 'response')
+        left = number.mul_mod(number.pow_mod(self.generator, number.mod_q(votes_allowed * challenge), self.large_prime),
+                              number.pow_mod(self.public_key, response, self.large_prime), self.large_prime)
 
-        right = number.mod_p(self.contest_beta * pow(beta_product, self.contest_challenge, self.large_prime))
+        right = number.mul_mod(get_number(self.contest_proof, 'data'),
+                               number.pow_mod(beta_product, challenge, self.large_prime), self.large_prime)
 
-        res = number.equals(left, right)
-        if not res:
-            print("contest selection limit check equation 2 error. ")
+        if not number.equals(left, right):
+            return result.fail(Reason.EQUATION, field='proof.data')
+        return True
 
-        return res
+    def __check_known_contest(self, result: Result) -> bool:
+        """
+        check that the contest is in the manifest, the other checks of a contest needing its vote limit
+        :param result: the contest result the failure is recorded on
+        :return: True if the manifest has the contest, False if not
+        """
+        if self.contest_id not in self.vote_limit_dic:
+            return result.fail(Reason.UNKNOWN_CONTEST, box=3, field='object_id')
+        return True
 
-    def __match_vote_limit_by_contest(self, contest_name: str, num_of_placeholders: int) -> bool:
+    def __match_vote_limit_by_contest(self, contest_name: str, num_of_placeholders: int, result: Result) -> bool:
         """
         match the placeholder numbers in each contest with the maximum votes allowed
         :param contest_name: name/id of the contest
         :param num_of_placeholders: number of placeholders appear in this contest
+        :param result: the contest result the failure is recorded on
         :return: True if vote limit and the placeholder numbers are equaled, False if not
         """
         vote_limit = int(self.vote_limit_dic.get(contest_name))
 
-        res = number.equals(vote_limit, num_of_placeholders)
-        if not res:
-            print("contest placeholder number error. ")
-
-        return res
+        if not number.equals(vote_limit, num_of_placeholders):
+            return result.fail(Reason.PLACEHOLDER_COUNT, field='ballot_selections')
+        return True
 
     @staticmethod
     def __increment_num(num: int) -> int:
@@ -387,29 +581,28 @@ class BallotSelectionVerifier(ISelectionVerifier):
 
     """
 
-    def __init__(self, selection_dic: dict, param_g: ParameterGenerator):
-        super().__init__(param_g)
+    def __init__(self, selection_dic: dict, param_g: ParameterGenerator, fail_fast=False):
+        super().__init__(param_g, fail_fast)
         # constants
         self.ZRP_PARAM_NAMES = {'pad', 'data'}
         self.ZQ_PARAM_NAMES = {'challenge', 'response'}
 
         self.selection_dic = selection_dic
-        self.pad = int(self.selection_dic.get('ciphertext', {}).get('pad'))
-        self.data = int(self.selection_dic.get('ciphertext', {}).get('data'))
+        self.ciphertext = selection_dic.get('ciphertext', {})
 
     def get_pad(self) -> int:
         """
         get alpha/pad of a selection
         :return: a selection's alpha/pad as integer
         """
-        return self.pad
+        return get_number(self.ciphertext, 'pad')
 
     def get_data(self) -> int:
         """
         get beta/pad of a selection
         :return: a selection's beta/data as integer
         """
-        return self.data
+        return get_number(self.ciphertext, 'data')
 
     def is_placeholder_selection(self) -> bool:
         """
@@ -419,95 +612,108 @@ class BallotSelectionVerifier(ISelectionVerifier):
         return bool(self.selection_dic.get('is_placeholder_selection'))
 
     # --------------------------------------- validity check ----------------------------------------------------
-    def verify_selection_validity(self) -> bool:
+    def verify_selection_validity(self) -> Result:
         """
-        verify the encryption validity of a selection within a contest
-        :return: True if no error occurs, False if some errors
+        verify the encryption validity of a selection within a contest. The checks run from the cheapest to the most
+        expensive: range checks, the challenge hash, the Chaum-Pedersen proofs, and finally the Zrp subgroup tests.
+        :return: a selection-level Result, truthy if no error occurs, falsy if some errors
         """
-        error = self.initialize_error()
-
         # get dictionaries
         proof_dic = self.selection_dic.get('proof')
         cipher_dic = self.selection_dic.get('ciphertext')
 
         # get values
         selection_id = self.selection_dic.get('object_id')
-        zero_pad = int(proof_dic.get('proof_zero_pad'))  # a0
-        one_pad = int(proof_dic.get('proof_one_pad'))  # a1
-        zero_data = int(proof_dic.get('proof_zero_data'))  # b0
-        one_data = int(proof_dic.get('proof_one_data'))  # b1
-        zero_challenge = int(proof_dic.get('proof_zero_challenge'))  # c0
-        one_challenge = int(proof_dic.get('proof_one_challenge'))  # c1
-        zero_response = int(proof_dic.get('proof_zero_response'))  # v0
-        one_response = int(proof_dic.get('proof_one_response'))  # v1
-
-        # point 1: check alpha, beta, a0, b0, a1, b1 are all in set Zrp
-        if not (self.__check_params_within_zrp(cipher_dic) and
-                self.__check_params_within_zrp(proof_dic)):
-            error = self.set_error()
-
-        # point 3: check if the given values, c0, c1, v0, v1 are each in the set zq
-        if not self.__check_params_within_zq(proof_dic):
-            error = self.set_error()
-
-        # point 2: conduct hash computation, c = H(Q-bar, (alpha, beta), (a0, b0), (a1, b1))
-        challenge = number.hash_elems(self.extended_hash, self.pad, self.data,
-                                      zero_pad, zero_data, one_pad, one_data)
-
-        # point 4:  c = c0 + c1 mod q is satisfied
-        if not self.__check_hash_comp(challenge, zero_challenge, one_challenge):
-            error = self.set_error()
-
-        # point 5: check 2 chaum-pedersen proofs, zero proof and one proof
-        if not (self.__check_cp_proof_zero_proof(self.pad, self.data, zero_pad, zero_data,
-                                                 zero_challenge, zero_response)
-                and self.__check_cp_proof_one_proof(self.pad, self.data, one_pad, one_data,
-                                                    one_challenge, one_response)):
-            error = self.set_error()
-
-        if error:
-            print(selection_id + ' validity verification failure.')
+        result = Result('selection', selection_id, box=3)
+        pad, data = self.get_pad(), self.get_data()
+        zero_pad = get_number(proof_dic, 'proof_zero_pad')  # a0
+        one_pad = get_number(proof_dic, 'proof_one_pad')  # a1
+        zero_data = get_number(proof_dic, 'proof_zero_data')  # b0
+        one_data = get_number(proof_dic, 'proof_one_data')  # b1
+        zero_challenge = get_number(proof_dic, 'proof_zero_challenge')  # c0
+        one_challenge = get_number(proof_dic, 'proof_one_challenge')  # c1
+        zero_response = get_number(proof_dic, 'proof_zero_response')  # v0
+        one_response = get_number(proof_dic, 'proof_one_response')  # v1
+
+        self.run_checks(
+            # point 3: check if the given values, c0, c1, v0, v1 are each in the set zq
+            lambda: self.__check_params_within_zq(proof_dic, result),
+            # point 1, range part: check alpha, beta, a0, b0, a1, b1 are all within 0 < x < p
+            lambda: self.__check_params_within_range(cipher_dic, result),
+            lambda: self.__check_params_within_range(proof_dic, result),
+            # point 2 & 4: conduct hash computation, c = H(Q-bar, (alpha, beta), (a0, b0), (a1, b1)),
+            # and check c = c0 + c1 mod q is satisfied
+            lambda: self.__check_hash_comp(number.hash_elems(self.extended_hash, pad, data,
+                                                             zero_pad, zero_data, one_pad, one_data),
+                                           zero_challenge, one_challenge, result),
+            # point 5: check 2 chaum-pedersen proofs, zero proof and one proof
+            lambda: self.__check_cp_proof_zero_proof(pad, data, zero_pad, zero_data, zero_challenge,
+                                                     zero_response, result),
+            lambda: self.__check_cp_proof_one_proof(pad, data, one_pad, one_data, one_challenge,
+                                                    one_response, result),
+            # point 1, subgroup part: check alpha, beta, a0, b0, a1, b1 are all in set Zrp
+            lambda: self.__check_params_within_zrp(cipher_dic, result),
+            lambda: self.__check_params_within_zrp(proof_dic, result))
+
+        return result
+
+    def __check_params_within_range(self, param_dic: dict, result: Result) -> bool:
+        """
+        check if the given values, alpha, beta, a0, b0, a1, b1 are all within 0 < x < p, the cheap part of the
+        Zrp membership test
+        :param param_dic: either ciphertext_dic or proof_dic generated in __verify_a_selection
+        :param result: the selection result the failures are recorded on
+        :return: True if all parameters in this given dict are within the range
+        """
+        error = self.initialize_error()
+        for k in param_dic.keys():
+            if any(name in k for name in self.ZRP_PARAM_NAMES):
+                if not number.is_within_set_zstarp(get_number(param_dic, k)):
+                    error = self.set_error()
+                    result.fail(Reason.NOT_IN_ZRP, field=k)
 
         return not error
 
-    def __check_params_within_zrp(self, param_dic: dict) -> bool:
+    def __check_params_within_zrp(self, param_dic: dict, result: Result) -> bool:
         """
         check if the given values, alpha, beta, a0, b0, a1, b1 are all in set Zrp
-        alpha, beta are from cipher dic and the others are from proof_dic
+        alpha, beta are from cipher dic and the others are from proof_dic. Values already reported out of range
+        by __check_params_within_range() are skipped.
         :param param_dic: either ciphertext_dic or proof_dic generated in __verify_a_selection
+        :param result: the selection result the failures are recorded on
         :return: True if all parameters in this given dict are within set zrp
         """
         error = self.initialize_error()
         # all the relevant parameters in one loop
-        for (k, v) in param_dic.items():
+        for k in param_dic.keys():
             # if it's a desired field, verify the number
             if any(name in k for name in self.ZRP_PARAM_NAMES):
-                res = number.is_within_set_zrp(v)
-                if not res:
+                v = get_number(param_dic, k)
+                if number.is_within_set_zstarp(v) and not number.is_within_set_zrp(v):
                     error = self.set_error()
-                    print('parameter error, {name} is not in set Zrp. '.format(name=k))
+                    result.fail(Reason.NOT_IN_ZRP, field=k)
 
         return not error
 
-    def __check_params_within_zq(self, param_dic: dict) -> bool:
+    def __check_params_within_zq(self, param_dic: dict, result: Result) -> bool:
         """
         check if the given values, c0, c1, v0, v1 are each in the set zq
         :param param_dic: the dictionary containing all the parameters needed to be checked against
+        :param result: the selection result the failures are recorded on
         :return: True if c0, c1, v0, v1 are each in the set zq, False if any of them is not in set Zq
         """
         error = self.initialize_error()
 
-        for (k, v) in param_dic.items():
+        for k in param_dic.keys():
             if any(name in k for name in self.ZQ_PARAM_NAMES):
-                res = number.is_within_set_zq(v)
-                if not res:
+                if not number.is_within_set_zq(get_number(param_dic, k)):
                     error = self.set_error()
-                    print('parameter error, {name} is not in set Zq. '.format(name=k))
+                    result.fail(Reason.NOT_IN_ZQ, field=k)
 
         return not error
 
     def __check_cp_proof_zero_proof(self, pad: int, data: int, zero_pad: int, zero_data: int, zero_chal: int,
-                                    zero_res: int) -> bool:
+                                    zero_res: int, result: Result) -> bool:
         """
         check if Chaum-Pedersen proof zero proof(given challenge c0, response v0) is satisfied.
 
@@ -522,23 +728,21 @@ class BallotSelectionVerifier(ISelectionVerifier):
         :param zero_data: zero_data of a selection
         :param zero_chal: zero_challenge of a selection
         :param zero_res: zero_response of a selection
+        :param result: the selection result the failure is recorded on
         :return: True if both equations of the zero proof are satisfied, False if either is not satisfied
         """
-        equ1_left = pow(self.generator, zero_res, self.large_prime)
-        equ1_right = number.mod_p(int(zero_pad) * pow(pad, zero_chal, self.large_prime))
-
-        equ2_left = pow(self.public_key, zero_res, self.large_prime)
-        equ2_right = number.mod_p(int(zero_data) * pow(data, zero_chal, self.large_prime))
-
-        res = number.equals(equ1_left, equ1_right) and number.equals(equ2_left, equ2_right)
+        equ1_left = number.pow_mod(self.generator, zero_res, self.large_prime)
+        equ1_right = number.mul_mod(zero_pad, number.pow_mod(pad, zero_chal, self.large_prime), self.large_prime)
 
-        if not res:
-            print("Chaum-pedersen proof zero proof failure. ")
+        equ2_left = number.pow_mod(self.public_key, zero_res, self.large_prime)
+        equ2_right = number.mul_mod(zero_data, number.pow_mod(data, zero_chal, self.large_prime), self.large_prime)
 
-        return res
+        if not (number.equals(equ1_left, equ1_right) and number.equals(equ2_left, equ2_right)):
+            return result.fail(Reason.ZERO_PROOF, field='proof')
+        return True
 
     def __check_cp_proof_one_proof(self, pad: int, data: int, one_pad: int, one_data: int, one_chal: int,
-                                   one_res: int) -> bool:
+                                   one_res: int, result: Result) -> bool:
         """
         check if Chaum-Pedersen proof one proof(given challenge c1, response v1) is satisfied.
 
@@ -553,40 +757,36 @@ class BallotSelectionVerifier(ISelectionVerifier):
         :param one_data: one_data of a selection
         :param one_chal: one_challenge of a selection
         :param one_res: one_response of a selection
+        :param result: the selection result the failure is recorded on
         :return: True if both equations of the one proof are satisfied, False if either is not satisfied
         """
-        equ1_left = pow(self.generator, one_res, self.large_prime)
-        equ1_right = number.mod_p(one_pad * pow(pad, one_chal, self.large_prime))
-
-        equ2_left = number.mod_p(pow(self.generator, one_chal, self.large_prime) *
-                                 pow(self.public_key, one_res, self.large_prime))
-        equ2_right = number.mod_p(one_data * pow(data, one_chal, self.large_prime))
+        equ1_left = number.pow_mod(self.generator, one_res, self.large_prime)
+        equ1_right = number.mul_mod(one_pad, number.pow_mod(pad, one_chal, self.large_prime), self.large_prime)
 
-        res = number.equals(equ1_left, equ1_right) and number.equals(equ2_left, equ2_right)
+        equ2_left = number.mul_mod(number.pow_mod(self.generator, one_chal, self.large_prime),
+                                   number.pow_mod(self.public_key, one_res, self.large_prime), self.large_prime)
+        equ2_right = number.mul_mod(one_data, number.pow_mod(data, one_chal, self.large_prime), self.large_prime)
 
-        if not res:
-            print("Chaum-pedersen proof one proof failure. ")
-
-        return res
+        if not (number.equals(equ1_left, equ1_right) and number.equals(equ2_left, equ2_right)):
+            return result.fail(Reason.ONE_PROOF, field='proof')
+        return True
 
     @staticmethod
-    def __check_hash_comp(chal: int, zero_chal: int, one_chal: int) -> bool:
+    def __check_hash_comp(chal: int, zero_chal: int, one_chal: int, result: Result) -> bool:
         """
         check if the hash computation is correct, equation c = c0 + c1 mod q is satisfied.
         :param chal: challenge of a selection
         :param zero_chal: zero_challenge of a selection
         :param one_chal: one_challenge of a selection
+        :param result: the selection result the failure is recorded on
         :return: True if the hash computation equation is satisfied, False if not
         """
         # calculated expected challenge value: c0 + c1 mod q
         expected = number.mod_q(int(zero_chal) + int(one_chal))
 
-        res = number.equals(number.mod_q(chal), expected)
-
-        if not res:
-            print("challenge value error.")
-
-        return res
+        if not number.equals(number.mod_q(chal), expected):
+            return result.fail(Reason.CHALLENGE, field='proof')
+        return True
 
     # --------------------------------------- limit check ----------------------------------------------------
     def verify_selection_limit(self) -> bool:
@@ -602,13 +802,7 @@ class BallotSelectionVerifier(ISelectionVerifier):
         :return: True if a and b both within set Zrp, False if either is not in set Zrp
         """
 
-        a_res = number.is_within_set_zrp(self.pad)
-        b_res = number.is_within_set_zrp(self.data)
-
-        if not a_res:
-            print('selection pad/a value error. ')
-
-        if not b_res:
-            print('selection data/b value error. ')
+        a_res = number.is_within_set_zrp(self.get_pad())
+        b_res = number.is_within_set_zrp(self.get_data())
 
         return a_res and b_res
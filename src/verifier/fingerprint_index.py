@@ -0,0 +1,238 @@
+import os
+import heapq
+import struct
+import hashlib
+import tempfile
+from . import number_decoding
+
+"""
+This module detects replayed ballots: ballots that reuse the object id, a selection ciphertext or the commitments of
+a proof of another ballot. A replayed ballot passes every check of its own, so the duplicates can only be found
+across all the ballots of the record.
+
+Every ballot read by the scan adds a 16-byte fingerprint per ballot id, selection ciphertext (alpha, beta),
+selection proof commitments (a0, b0, a1, b1) and contest proof commitment (a, b) to a FingerprintIndex. The index
+is a hash table in memory, so a duplicate within it is found as it is added. Once the table takes more memory than
+its budget, in bytes, it is sorted and written to a run file, and emptied. At the end of the scan, the runs and the
+last table are merged in a single sequential pass, the duplicates across runs being adjacent. Memory is bounded by
+the budget, and the disk traffic is one write and one read of every fingerprint past the budget.
+
+The numbers are fingerprinted from their text, without decoding them, so that the fingerprints cost about as much
+as reading the ballot and leave the decoding to the checks that need it, see record_view.py. The text is taken in
+a canonical form, without whitespace, 0x prefix or leading zeros, and in lower case unless the record is in base64,
+so that a replay cannot hide behind the notation of a decimal or hexadecimal number. A replay rewritten from decimal
+to hexadecimal is not found, a record being expected to write all its numbers in one notation.
+
+Every fingerprint carries the order it was added in, into the run files too, so the first ballot read is the one
+kept, and the later ones are reported as its duplicates. A duplicate met in memory is only the duplicate of the
+entry of the table when there is no run file; otherwise an earlier copy may have been spilled, so it joins the merge
+with its order, and the kept ballot is the earliest of all the copies, wherever they were.
+
+Class:
+    FingerprintIndex
+
+Function:
+    canonical_number(object)
+    fingerprint(str, iterable)
+    ballot_fingerprints(dict)
+"""
+
+BALLOT_ID = 'ballot_id'
+CIPHERTEXT = 'ciphertext'
+COMMITMENT = 'commitment'
+KINDS = (BALLOT_ID, CIPHERTEXT, COMMITMENT)
+
+# the memory taken by the table before it is spilled to a run file, in bytes
+DEFAULT_MEMORY_BUDGET = 64 << 20
+
+# the memory taken by a table entry besides the characters of its owner: the dict slot, the digest, the order, the
+# tuple and the string header, measured with tracemalloc at about 190 bytes
+ENTRY_OVERHEAD = 200
+
+
+def canonical_number(value) -> str:
+    """
+    :param value: a number as found in the record
+    :return: its text without whitespace, 0x prefix or leading zeros, in lower case unless the record is in base64
+    """
+    if type(value) is not str:
+        return str(value)
+    text = value.strip()
+    if number_decoding.ENCODING == number_decoding.BASE64:
+        return text
+    if text[:2] in ('0x', '0X'):
+        text = text[2:]
+    return text.lower().lstrip('0') or text[:1]
+
+
+def fingerprint(kind: str, values) -> bytes:
+    """
+    :param kind: one of KINDS
+    :param values: the numbers or ids fingerprinted, as found in the record
+    :return: the 16-byte digest of the kind and the values, numbers being taken in their canonical form
+    """
+    # sha256, accelerated by the processor on most machines, is faster than blake2b on the long number strings
+    digest = hashlib.sha256(kind.encode('utf-8'))
+    for value in values:
+        if kind != BALLOT_ID:
+            value = canonical_number(value)
+        digest.update(b'\0' + str(value).encode('utf-8'))
+    return digest.digest()[:16]
+
+
+def ballot_fingerprints(ballot_dic: dict):
+    """
+    list the fingerprints of a ballot
+    :param ballot_dic: the encrypted ballot
+    :return: a generator of (kind, location in the ballot, digest) tuples, the location being '' for the ballot id
+             and 'contest' or 'contest.selection' otherwise
+    """
+    yield BALLOT_ID, '', fingerprint(BALLOT_ID, (ballot_dic.get('object_id'),))
+    for contest in ballot_dic.get('contests', ()):
+        contest_id = contest.get('object_id')
+        proof = contest.get('proof', {})
+        yield COMMITMENT, contest_id, fingerprint(COMMITMENT, (proof.get('pad'), proof.get('data')))
+        for selection in contest.get('ballot_selections', ()):
+            location = '{contest}.{selection}'.format(contest=contest_id, selection=selection.get('object_id'))
+            ciphertext = selection.get('ciphertext', {})
+            yield CIPHERTEXT, location, fingerprint(CIPHERTEXT, (ciphertext.get('pad'), ciphertext.get('data')))
+            proof = selection.get('proof', {})
+            yield COMMITMENT, location, fingerprint(COMMITMENT, (proof.get('proof_zero_pad'),
+                                                                 proof.get('proof_zero_data'),
+                                                                 proof.get('proof_one_pad'),
+                                                                 proof.get('proof_one_data')))
+
+
+class FingerprintIndex:
+    """
+    Set of the fingerprints of the ballots of a record, in memory up to a budget and in sorted run files beyond it.
+
+    Method:
+        add(bytes, str, str, str)
+        add_ballot(dict)
+        duplicates()
+        close()
+    """
+
+    # digest, order of addition, length of the owner that follows
+    ENTRY = struct.Struct('>16sQH')
+
+    def __init__(self, memory_budget=DEFAULT_MEMORY_BUDGET, spill_folder=None):
+        """
+        :param memory_budget: the memory taken by the fingerprints held in memory before they are spilled to a run
+                              file, in bytes
+        :param spill_folder: the folder of the run files, a temporary folder by default, removed by close()
+        """
+        self.memory_budget = max(1, memory_budget)
+        self.spill_folder = spill_folder
+        self.own_folder = False
+        # digest - (order, owner), the owner being 'kind\0ballot id\0location'
+        self.table = {}
+        self.table_size = 0
+        self.order = 0
+        self.runs = []
+        # (digest, order, owner) of the duplicates found in memory, the kept one being resolved by duplicates()
+        self.found = []
+
+    def add(self, digest: bytes, kind: str, ballot_id: str, location: str):
+        """
+        add a fingerprint, spilling the table to a run file once it exceeds the budget
+        :param digest: the fingerprint
+        :param kind: one of KINDS
+        :param ballot_id: the id of the ballot it belongs to
+        :param location: its location in the ballot
+        """
+        owner = '{kind}\0{ballot}\0{location}'.format(kind=kind, ballot=ballot_id, location=location)
+        order = self.order
+        self.order += 1
+        if digest in self.table:
+            self.found.append((digest, order, owner))
+            return
+        self.table[digest] = (order, owner)
+        self.table_size += ENTRY_OVERHEAD + len(owner)
+        if self.table_size >= self.memory_budget:
+            self.__spill()
+
+    def add_ballot(self, ballot_dic: dict):
+        """
+        add every fingerprint of a ballot
+        :param ballot_dic: the encrypted ballot
+        """
+        ballot_id = ballot_dic.get('object_id')
+        for kind, location, digest in ballot_fingerprints(ballot_dic):
+            self.add(digest, kind, ballot_id, location)
+
+    def __spill(self):
+        """
+        write the table to a new run file, sorted by digest, and empty it
+        """
+        if self.spill_folder is None:
+            self.spill_folder = tempfile.mkdtemp(prefix='fingerprints-')
+            self.own_folder = True
+        os.makedirs(self.spill_folder, exist_ok=True)
+        path = os.path.join(self.spill_folder, 'run-{n}.bin'.format(n=len(self.runs)))
+        with open(path, 'wb') as file:
+            for digest, (order, owner) in sorted(self.table.items()):
+                owner = owner.encode('utf-8')
+                file.write(self.ENTRY.pack(digest, order, len(owner)) + owner)
+        self.runs.append(path)
+        self.table = {}
+        self.table_size = 0
+
+    def __read_run(self, path: str):
+        """
+        :param path: the path of a run file
+        :return: a generator of the (digest, order, owner) entries of the run, in digest order
+        """
+        size = self.ENTRY.size
+        with open(path, 'rb') as file:
+            while True:
+                entry = file.read(size)
+                if len(entry) < size:
+                    return
+                digest, order, length = self.ENTRY.unpack(entry)
+                yield digest, order, file.read(length).decode('utf-8')
+
+    def duplicates(self):
+        """
+        find every fingerprint added more than once, merging the run files and the table
+        :return: a generator of (kind, ballot id, location, kept ballot id, kept location) tuples, one per duplicate,
+                 the kept ballot being the first one added with the same fingerprint
+        """
+        if not self.runs:
+            # every copy is in memory, the entry of the table being the first one
+            for digest, _, owner in self.found:
+                yield self.__split(self.table[digest][1], owner)
+            return
+
+        # the copies of a fingerprint come out of the merge adjacent and in the order they were added
+        in_memory = ((digest, order, owner) for digest, (order, owner) in sorted(self.table.items()))
+        previous, kept = None, None
+        for digest, order, owner in heapq.merge(in_memory, sorted(self.found),
+                                                *[self.__read_run(path) for path in self.runs]):
+            if digest == previous:
+                yield self.__split(kept, owner)
+            else:
+                previous, kept = digest, owner
+
+    @staticmethod
+    def __split(kept: str, owner: str) -> tuple:
+        """
+        :return: the (kind, ballot id, location, kept ballot id, kept location) tuple of a duplicate
+        """
+        kind, ballot_id, location = owner.split('\0')
+        _, kept_ballot_id, kept_location = kept.split('\0')
+        return kind, ballot_id, location, kept_ballot_id, kept_location
+
+    def close(self):
+        """
+        remove the run files, and their folder if the index created it
+        """
+        for path in self.runs:
+            if os.path.exists(path):
+                os.remove(path)
+        self.runs = []
+        if self.own_folder:
+            os.rmdir(self.spill_folder)
+            self.own_folder = False
+            self.spill_folder = None
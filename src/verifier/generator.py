@@ -1,7 +1,11 @@
 import os
-import glob
-from .number import mod_p
-from .json_parser import read_json_file
+import time
+from . import metrics
+from .number import mul_mod
+from .prefetch import prefetch_map, prefetch_iter
+from .record_view import parse_document, get_number
+from .number_decoding import decode_number
+from .record_source import RecordSource, FolderRecordSource, PackedRecordSource, normalize_name
 
 
 class FilePathGenerator:
@@ -9,15 +13,28 @@ class FilePathGenerator:
     This class is responsible for navigating to different data files in the given dataset folder,
     the root folder path can be changed to where the whole dataset is stored and its inner structure should
     remain unchanged.
+
+    All the reads of the record go through read_json(), list_files() and iter_json_files(), which are served by a
+    record source: the folder itself by default, or an archive or a packed bundle, see open().
+    The source indexes the record once, so listing and counting files never walks the storage again.
     """
 
-    def __init__(self, root_folder_path="../data/"):
+    PACKED_RECORD_SUFFIX = '.egrecord'
+
+    def __init__(self, root_folder_path="../data/", source: RecordSource = None):
         """
         generate a file name generator with parameters from the json files
+        :param root_folder_path: path to the record folder, or '' when the record is read from another source
+        :param source: the record source, a FolderRecordSource of the root folder if None
         """
         self.DATA_FOLDER_PATH = root_folder_path
+        self.source = source if source is not None else FolderRecordSource(root_folder_path)
         self.FILE_TYPE_SUFFIX = '.json'
         self.FOLDER_SUFFIX = '/'
+        self.prefetch_depth = 0
+        self.prefetch_workers = 1
+        # names of the files left out of list_files() and iter_json_files(), see exclude_files()
+        self.excluded = set()
 
     def get_coefficients_folder_path(self) -> str:
         """
@@ -27,12 +44,33 @@ class FilePathGenerator:
         coeff_folder_path = '/coefficients'
         return self.DATA_FOLDER_PATH + coeff_folder_path + self.FOLDER_SUFFIX
 
+    @classmethod
+    def open(cls, path: str) -> 'FilePathGenerator':
+        """
+        open a record given as a folder, a .zip, .tar, .tar.gz or .tgz archive, or a packed bundle
+        :param path: path to the record
+        :return: a FilePathGenerator reading from the matching record source
+        """
+        if not os.path.isdir(path):
+            # the archive readers, and tarfile and zipfile with them, are only imported for a record that is a file
+            from .archive import is_record_archive, open_record_archive
+            if is_record_archive(path):
+                return cls('', open_record_archive(path))
+            if path.endswith(cls.PACKED_RECORD_SUFFIX):
+                return cls('', PackedRecordSource(path))
+        return cls(path if path.endswith('/') else path + '/')
+
     def get_guardian_coefficient_file_path(self, index: int) -> str:
         """
-        generate a coefficient file path given the guardian's index
+        generate a coefficient file path given the guardian's index, taken from the index of the record source when
+        a coefficient file ends with this index, so that the naming of the files does not matter
         :param index: index of a guardian, (0 - number of guardians)
         :return: a string of the coefficient
         """
+        name = self.source.get_guardian_file(index)
+        if name is not None:
+            return self.DATA_FOLDER_PATH + name
+
         coeff_file_path = 'coefficient_validation_' \
                           'set_hamilton-county-canvass-board-member-'
 
@@ -88,6 +126,98 @@ class FilePathGenerator:
         """
         return self.DATA_FOLDER_PATH + '/devices' + self.FILE_TYPE_SUFFIX
 
+    def get_name(self, file_path: str) -> str:
+        """
+        get the name of a file in the record source
+        :param file_path: a path given by one of the getters of this class
+        :return: the normalized name relative to the record root
+        """
+        if file_path.startswith(self.DATA_FOLDER_PATH):
+            file_path = file_path[len(self.DATA_FOLDER_PATH):]
+        return normalize_name(file_path)
+
+    def read_json(self, file_path: str, parse=None) -> dict:
+        """
+        read a json document of the record
+        :param file_path: a path given by one of the getters of this class
+        :param parse: the function parsing the content of the file, parse_json() if None
+        :return: a dictionary of the json file content, None if not found
+        """
+        content = self.source.read(self.get_name(file_path))
+        if content is None:
+            # reported by the caller, e.g. as a missing document or ballot through its result sink
+            return None
+        return (parse or self.parse_json)(content)
+
+    @staticmethod
+    def parse_json(content: bytes) -> dict:
+        """
+        parse a json document of the record, counted and timed when the instrumentation is on
+        :param content: the content of the file
+        :return: a dictionary of the json file content, a LazyDocument whose numbers are decoded on first access
+        """
+        if metrics.ACTIVE is None:
+            return parse_document(content)
+
+        start = time.perf_counter()
+        dic = parse_document(content)
+        metrics.ACTIVE.add_time('json_parse', time.perf_counter() - start)
+        metrics.ACTIVE.count('json_documents')
+        metrics.ACTIVE.count('json_bytes', len(content))
+        return dic
+
+    def list_files(self, folder_path: str, suffix='.json') -> list:
+        """
+        list the files directly inside a folder of the record, in a stable order
+        :param folder_path: a folder path given by one of the getters of this class
+        :param suffix: only list the files ending with this suffix, all files if empty
+        :return: a sorted list of file paths
+        """
+        return [self.DATA_FOLDER_PATH + name for name in self.source.list_folder(self.get_name(folder_path))
+                if name.endswith(suffix) and name not in self.excluded]
+
+    def iter_json_files(self, folder_path: str, selected=None, parse=None):
+        """
+        read every json file directly inside a folder of the record, in the order of list_files(), or in storage order
+        for a sequential source, stable across runs on the same record
+        :param folder_path: a folder path given by one of the getters of this class
+        :param selected: a predicate on the file path, only the files it accepts are read, all files if None
+        :param parse: the function parsing the content of every file, parse_json() if None
+        :return: a generator of (file path, dictionary of the json file content) tuples
+        """
+        parse = parse or self.parse_json
+        if not self.source.sequential:
+            file_paths = [file_path for file_path in self.list_files(folder_path)
+                          if selected is None or selected(file_path)]
+            yield from prefetch_map(lambda file_path: self.read_json(file_path, parse), file_paths,
+                                    self.prefetch_depth, self.prefetch_workers)
+            return
+
+        # a sequential source is read in storage order, so a single background thread reads and parses ahead
+        def accepted(name: str) -> bool:
+            return (name.endswith(self.FILE_TYPE_SUFFIX) and name not in self.excluded
+                    and (selected is None or selected(self.DATA_FOLDER_PATH + name)))
+
+        contents = self.source.iter_folder(self.get_name(folder_path), accepted)
+        documents = ((self.DATA_FOLDER_PATH + name, parse(content)) for name, content in contents)
+        yield from prefetch_iter(documents, self.prefetch_depth)
+
+    def exclude_files(self, file_paths):
+        """
+        leave files out of every later listing and scan of their folder, e.g. the quarantined malformed ballots
+        :param file_paths: paths given by list_files() or iter_json_files()
+        """
+        self.excluded.update(self.get_name(file_path) for file_path in file_paths)
+
+    def set_prefetch(self, depth: int, workers: int):
+        """
+        read and parse the files of iter_json_files() ahead of the consumer, in background threads
+        :param depth: the maximum number of files read ahead, 0 to read each file when it is consumed
+        :param workers: the number of reader threads
+        """
+        self.prefetch_depth = depth
+        self.prefetch_workers = workers
+
 
 class ParameterGenerator:
     """
@@ -95,6 +225,9 @@ class ParameterGenerator:
     with the help of the file path file generator to locate the files. Parameters in this
     case only include those that are higher than ballot-level. Those that are directly related
     to each specific ballot, contest, or selection will be taken care of by each level of verifiers.
+    The election-level documents, context, constants, description and guardian coefficients, are read once and kept,
+    every verifier asking for the same parameters many times, and so are the numbers parsed from the context and the
+    constants, the large prime alone having more than a thousand digits.
     """
     def __init__(self, path_g: FilePathGenerator):
         """
@@ -102,6 +235,22 @@ class ParameterGenerator:
         :param path_g: FilePathGenerator that helps to get the paths of files
         """
         self.path_g = path_g
+        self.documents = {}
+        # field name - number of the context and the constants
+        self.numbers = {}
+
+    def __read_document(self, file_path: str) -> dict:
+        """
+        read an election-level json document, from the record the first time only
+        :param file_path: a path given by one of the getters of the file path generator
+        :return: a dictionary of the json file content, None if not found
+        """
+        document = self.documents.get(file_path)
+        if document is None:
+            document = self.path_g.read_json(file_path)
+            if document is not None:
+                self.documents[file_path] = document
+        return document
 
     def get_context(self) -> dict:
         """
@@ -109,7 +258,7 @@ class ParameterGenerator:
         :return: a dictionary of context info
         """
         context_path = self.path_g.get_context_file_path()
-        return read_json_file(context_path)
+        return self.__read_document(context_path)
 
     def get_constants(self) -> dict:
         """
@@ -117,56 +266,68 @@ class ParameterGenerator:
         :return: a dictionary of constants info
         """
         constants_path = self.path_g.get_constants_file_path()
-        return read_json_file(constants_path)
+        return self.__read_document(constants_path)
+
+    def __get_number(self, document, field: str) -> int:
+        """
+        parse a number of an election-level document the first time only
+        :param document: the getter of the document, get_context or get_constants
+        :param field: the name of the number in the document
+        :return: the number as an integer
+        """
+        number = self.numbers.get(field)
+        if number is None:
+            number = self.numbers[field] = get_number(document(), field)
+        return number
 
     def get_generator(self) -> int:
         """
         get generator, set default name to be generator
         :return: generator 'g' in integer
         """
-        return int(self.get_constants().get('generator'))
+        return self.__get_number(self.get_constants, 'generator')
 
     def get_large_prime(self) -> int:
         """
         get large prime p
         :return: large prime 'p' in integer
         """
-        return int(self.get_constants().get('large_prime'))
+        return self.__get_number(self.get_constants, 'large_prime')
 
     def get_small_prime(self) -> int:
         """
         get small prime q
         :return: small prime 'q' in integer
         """
-        return int(self.get_constants().get('small_prime'))
+        return self.__get_number(self.get_constants, 'small_prime')
 
     def get_cofactor(self) -> int:
         """
         get cofactor r
         :return: cofactor 'r' in integer
         """
-        return int(self.get_constants().get('cofactor'))
+        return self.__get_number(self.get_constants, 'cofactor')
 
     def get_extended_hash(self) -> int:
         """
         get extended base hash Q-bar
         :return: extended base hash Q-bar in integer
         """
-        return int(self.get_context().get('crypto_extended_base_hash'))
+        return self.__get_number(self.get_context, 'crypto_extended_base_hash')
 
     def get_base_hash(self) -> int:
         """
         get extended base hash Q
         :return: base hash Q in integer
         """
-        return int(self.get_context().get('crypto_base_hash'))
+        return self.__get_number(self.get_context, 'crypto_base_hash')
 
     def get_elgamal_key(self) -> int:
         """
         get Elgamal key K
         :return: Elgamal key K in integer
         """
-        return int(self.get_context().get('elgamal_public_key'))
+        return self.__get_number(self.get_context, 'elgamal_public_key')
 
     def get_public_key_of_a_guardian(self, index: int) -> int:
         """
@@ -175,8 +336,27 @@ class ParameterGenerator:
         :return: public key Ki of guardian i in integer
         """
         file_path = self.path_g.get_guardian_coefficient_file_path(index)
-        coefficients = read_json_file(file_path)
-        return int(coefficients.get('coefficient_commitments')[0])
+        coefficients = self.__read_document(file_path)
+        return decode_number(coefficients.get('coefficient_commitments')[0])
+
+    def get_guardian_id(self, index: int) -> str:
+        """
+        get the id of a guardian, the owner of a coefficient file
+        :param index: guardian index
+        :return: the owner id of the coefficients of guardian i
+        """
+        file_path = self.path_g.get_guardian_coefficient_file_path(index)
+        return self.__read_document(file_path).get('owner_id')
+
+    def get_coefficient_commitments(self, index: int) -> list:
+        """
+        get the commitments Ki,j = g ^ ai,j of the polynomial coefficients of a guardian, Ki,0 being its public key
+        :param index: guardian index
+        :return: a list of the quorum commitments of guardian i in integer
+        """
+        file_path = self.path_g.get_guardian_coefficient_file_path(index)
+        commitments = self.__read_document(file_path).get('coefficient_commitments')
+        return [decode_number(commitment) for commitment in commitments]
 
     def get_public_keys_of_all_guardians(self) -> list:
         """
@@ -192,7 +372,7 @@ class ParameterGenerator:
         :return: a dictionary representation of the description.json
         """
         file_path = self.path_g.get_description_file_path()
-        return read_json_file(file_path)
+        return self.__read_document(file_path)
 
     def get_num_of_guardians(self) -> int:
         """
@@ -213,9 +393,7 @@ class ParameterGenerator:
         get number of guardians from the context.json
         :return: number of guardians n in integer
         """
-        context_file_path = self.path_g.get_context_file_path()
-        context = read_json_file(context_file_path)
-        return int(context.get('number_of_guardians'))
+        return int(self.get_context().get('number_of_guardians'))
 
     def __get_num_of_guardians_from_file(self) -> int:
         """
@@ -223,7 +401,7 @@ class ParameterGenerator:
         :return: number of guardians n in integer
         """
         coeff_folder_path = self.path_g.get_coefficients_folder_path()
-        coeff_files = next(os.walk(coeff_folder_path))[2]
+        coeff_files = self.path_g.list_files(coeff_folder_path, suffix='')
         return len(coeff_files)
 
     def get_quorum(self) -> int:
@@ -231,9 +409,7 @@ class ParameterGenerator:
         get the minimum number of presenting guardians in this election
         :return: the minimum number of presenting guardians in integer
         """
-        context_file_path = self.path_g.get_context_file_path()
-        context = read_json_file(context_file_path)
-        return int(context.get('quorum'))
+        return int(self.get_context().get('quorum'))
 
     def get_num_of_ballots(self) -> int:
         """
@@ -242,7 +418,7 @@ class ParameterGenerator:
         :return: number of ballots in integer
         """
         ballot_folder_path = self.path_g.get_encrypted_ballot_folder_path()
-        ballot_files = next(os.walk(ballot_folder_path))[2]
+        ballot_files = self.path_g.list_files(ballot_folder_path, suffix='')
         return len(ballot_files)
 
     def get_num_of_spoiled_ballots(self) -> int:
@@ -252,7 +428,7 @@ class ParameterGenerator:
         :return: number of spoiled ballots in integer
         """
         spoiled_ballot_folder_path = self.path_g.get_spoiled_ballot_folder_path()
-        spoiled_ballot_files = next(os.walk(spoiled_ballot_folder_path))[2]
+        spoiled_ballot_files = self.path_g.list_files(spoiled_ballot_folder_path, suffix='')
         return len(spoiled_ballot_files)
 
     def get_device_id(self) -> str:
@@ -261,8 +437,8 @@ class ParameterGenerator:
         :return: the device id as string
         """
         device_folder_path = self.path_g.get_device_folder_path()
-        for file in glob.glob(device_folder_path + '*json'):
-            dic = read_json_file(file)
+        for file in self.path_g.list_files(device_folder_path, suffix='json'):
+            dic = self.path_g.read_json(file)
             return dic.get('uuid')
 
     def get_location(self) -> str:
@@ -271,8 +447,8 @@ class ParameterGenerator:
         :return: location information as a string
         """
         device_folder_path = self.path_g.get_device_folder_path()
-        for file in glob.glob(device_folder_path + '*json'):
-            dic = read_json_file(file)
+        for file in self.path_g.list_files(device_folder_path, suffix='json'):
+            dic = self.path_g.read_json(file)
             return dic.get('location')
 
 
@@ -282,7 +458,8 @@ class VoteLimitCounter:
     dictionary of "contest name - maximum votes allowed" pairs. Used in the encryption verifier.
     """
     def __init__(self, param_g: ParameterGenerator):
-        self.description_dic = param_g.get_description()
+        # the description is only read once a vote limit is asked for
+        self.param_g = param_g
         self.contest_vote_limits = {}
 
     def get_contest_vote_limits(self) -> dict:
@@ -302,7 +479,7 @@ class VoteLimitCounter:
         fill in the num_max_vote dictionary, key- contest name, value- maximum votes allowed for this contest
         source: description
         """
-        contests = self.description_dic.get('contests')
+        contests = self.param_g.get_description().get('contests')
         for contest in contests:
             contest_name = contest.get('object_id')
             num_max_vote = contest.get('votes_allowed')
@@ -318,6 +495,7 @@ class SelectionInfoAggregator:
     def __init__(self, path_g: FilePathGenerator, param_g: ParameterGenerator):
         self.param_g = param_g
         self.path_g = path_g
+        self.large_prime = param_g.get_large_prime()
         self.order_names_dic = {}   # a dictionary to store the contest names and its sequence
         self.names_order_dic = {}
         self.contest_selection_names = {}  # a dictionary to store the contest names and its selection names
@@ -384,37 +562,80 @@ class SelectionInfoAggregator:
         # get to the folder
         ballot_folder_path = self.path_g.get_encrypted_ballot_folder_path()
 
-        # loop over every ballot file
-        for ballot_file in glob.glob(ballot_folder_path + '*json'):
-            ballot = read_json_file(ballot_file)
-            ballot_state = ballot.get('state')
-
-            # ignore spoiled ballots
-            if ballot_state == 'CAST':
-
-                # loop over every contest
-                contests = ballot.get('contests')
-                for contest in contests:
-                    contest_name = contest.get('object_id')
-                    selections = contest.get('ballot_selections')
-                    contest_idx = self.order_names_dic.get(contest_name)
-                    curr_pad_dic = self.dics_by_contest[contest_idx * 2]
-                    curr_data_dic = self.dics_by_contest[contest_idx * 2 + 1]
-
-                    # loop over every selection
-                    for selection in selections:
-                        selection_name = selection.get('object_id')
-                        is_placeholder_selection = selection.get('is_placeholder_selection')
-
-                        # ignore placeholders
-                        if not is_placeholder_selection:
-                            pad = selection.get('ciphertext', {}).get('pad')
-                            data = selection.get('ciphertext', {}).get('data')
-                            self.__get_accum_product(curr_pad_dic, selection_name, int(pad))
-                            self.__get_accum_product(curr_data_dic, selection_name, int(data))
+        # loop over every ballot file, a missing one being reported by the ballot checks
+        for _, ballot in self.path_g.iter_json_files(ballot_folder_path):
+            if ballot is not None:
+                self.add_ballot(ballot)
 
-    @staticmethod
-    def __get_accum_product(dic: dict, selection_name: str, num: int):
+    def add_ballot(self, ballot: dict):
+        """
+        multiply the selection alpha/pad and beta/data of one ballot into the accumulative products, spoiled ballots
+        are ignored. Used to build the products while the ballots are being read for another purpose, instead of
+        scanning the ballot folder again.
+        :param ballot: the dictionary of an encrypted ballot
+        :return: none
+        """
+        if len(self.dics_by_contest) == 0:
+            self.__create_inner_dic()
+
+        ballot_state = ballot.get('state')
+
+        # ignore spoiled ballots
+        if ballot_state == 'CAST':
+
+            # loop over every contest
+            contests = ballot.get('contests')
+            for contest in contests:
+                contest_name = contest.get('object_id')
+                selections = contest.get('ballot_selections')
+                contest_idx = self.order_names_dic.get(contest_name)
+                # a contest or a selection unknown to the manifest is reported by the ballot checks
+                if contest_idx is None:
+                    continue
+                curr_pad_dic = self.dics_by_contest[contest_idx * 2]
+                curr_data_dic = self.dics_by_contest[contest_idx * 2 + 1]
+
+                # loop over every selection
+                for selection in selections:
+                    selection_name = selection.get('object_id')
+                    is_placeholder_selection = selection.get('is_placeholder_selection')
+
+                    # ignore placeholders
+                    if not is_placeholder_selection and selection_name in curr_pad_dic:
+                        ciphertext = selection.get('ciphertext', {})
+                        self.__get_accum_product(curr_pad_dic, selection_name, get_number(ciphertext, 'pad'))
+                        self.__get_accum_product(curr_data_dic, selection_name, get_number(ciphertext, 'data'))
+
+    def get_products(self) -> dict:
+        """
+        get the accumulative products gathered so far, keyed by contest and selection name
+        :return: a dictionary of contest name - {selection name - [pad product, data product]}, products in strings,
+                 selections without any cast ballot are left out
+        """
+        products = {}
+        for contest_name, contest_idx in self.order_names_dic.items():
+            pad_dic = self.dics_by_contest[contest_idx * 2]
+            data_dic = self.dics_by_contest[contest_idx * 2 + 1]
+            products[contest_name] = {name: [pad, data_dic.get(name)] for name, pad in pad_dic.items() if pad != ''}
+        return products
+
+    def add_products(self, products: dict):
+        """
+        multiply partial products, as returned by get_products() on another part of the ballots, into the
+        accumulative products
+        :param products: a dictionary of contest name - {selection name - [pad product, data product]}
+        :return: none
+        """
+        if len(self.dics_by_contest) == 0:
+            self.__create_inner_dic()
+
+        for contest_name, selections in products.items():
+            contest_idx = self.order_names_dic.get(contest_name)
+            for selection_name, (pad, data) in selections.items():
+                self.__get_accum_product(self.dics_by_contest[contest_idx * 2], selection_name, int(pad))
+                self.__get_accum_product(self.dics_by_contest[contest_idx * 2 + 1], selection_name, int(data))
+
+    def __get_accum_product(self, dic: dict, selection_name: str, num: int):
         """
         get the accumulative product of alpha/pad and beta/data for all the selections
         :param dic: the dictionary alpha or beta values are being added into
@@ -426,7 +647,7 @@ class SelectionInfoAggregator:
             dic[selection_name] = str(num)
         else:
             temp = int(dic[selection_name])
-            product = mod_p(temp * num)
+            product = mul_mod(temp, num, self.large_prime)
             dic[selection_name] = str(product)
 
     def __fill_total_pad_data(self):
@@ -436,7 +657,7 @@ class SelectionInfoAggregator:
         :return: none
         """
         tally_path = self.path_g.get_tally_file_path()
-        tally = read_json_file(tally_path)
+        tally = self.path_g.read_json(tally_path)
         contests = tally.get('contests')
         contest_names = list(contests.keys())
         for contest_name in contest_names:
@@ -447,8 +668,9 @@ class SelectionInfoAggregator:
             selection_names = list(selections.keys())
             for selection_name in selection_names:
                 selection = selections.get(selection_name)
-                total_pad = selection.get('message', {}).get('pad')
-                total_data = selection.get('message', {}).get('data')
+                message = selection.get('message', {})
+                total_pad = get_number(message, 'pad')
+                total_data = get_number(message, 'data')
                 curr_dic_pad[selection_name] = total_pad
                 curr_dic_data[selection_name] = total_data
             self.total_pad_dic[contest_name] = curr_dic_pad
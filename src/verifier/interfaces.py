@@ -1,11 +1,12 @@
 from .generator import ParameterGenerator, VoteLimitCounter
+from .result import Result
 
 
 class IVerifier:
     """
     This represents an abstract class of a verifier, all concrete verifier extends from this class,
     defines all the parameters including generator, extended hash, elgamal public key, large prime p,
-    and small prime q
+    and small prime q. In fail-fast mode a verifier stops at the first failed check or item.
 
     Concrete classes:
         BaselineVerifier
@@ -20,9 +21,10 @@ class IVerifier:
         ShareVerifier
     """
 
-    def __init__(self, param_g: ParameterGenerator):
+    def __init__(self, param_g: ParameterGenerator, fail_fast=False):
 
         self.param_g = param_g
+        self.fail_fast = fail_fast
         self.generator = self.param_g.get_generator()
         self.extended_hash = self.param_g.get_extended_hash()
         self.public_key = self.param_g.get_elgamal_key()
@@ -45,6 +47,22 @@ class IVerifier:
         """
         return False
 
+    def run_checks(self, *checks) -> bool:
+        """
+        run a sequence of checks in the given order, callers list them from the cheapest to the most expensive.
+        In fail-fast mode the sequence stops at the first failing check.
+        :param checks: callables taking no argument and returning True if the check passed
+        :return: True if every check that ran passed, False otherwise
+        """
+        error = self.initialize_error()
+        for check in checks:
+            if not check():
+                error = self.set_error()
+                if self.fail_fast:
+                    break
+
+        return not error
+
 
 class IBallotVerifier(IVerifier):
     """
@@ -57,8 +75,8 @@ class IBallotVerifier(IVerifier):
         DecryptionVerifier
     """
 
-    def __init__(self, param_g: ParameterGenerator, limit_counter: VoteLimitCounter):
-        super().__init__(param_g)
+    def __init__(self, param_g: ParameterGenerator, limit_counter: VoteLimitCounter, fail_fast=False):
+        super().__init__(param_g, fail_fast)
         self.limit_counter = limit_counter
 
 
@@ -70,7 +88,7 @@ class IContestVerifier(IVerifier):
         BallotContestVerifier
         DecryptionContestVerifier
     """
-    def verify_a_contest(self) -> bool:
+    def verify_a_contest(self) -> Result:
         pass
 
 
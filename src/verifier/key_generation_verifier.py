@@ -1,83 +1,94 @@
-from .json_parser import read_json_file
-from .number import mod_p, equals, hash_elems
+from .number import mod_p, equals, hash_elems, pow_mod, mul_mod
 from .generator import ParameterGenerator, FilePathGenerator
 from .interfaces import IVerifier
+from .record_view import get_number
+from .result import Result, Reason, ResultSink, ConsoleSink
 
 
 class KeyGenerationVerifier(IVerifier):
     """
     This class checks the key generation information are given correctly for each guardian. (box 2)
+    In fail-fast mode the check stops at the first invalid guardian.
     """
 
-    def __init__(self, param_g: ParameterGenerator, path_g: FilePathGenerator):
-        super().__init__(param_g)
+    def __init__(self, param_g: ParameterGenerator, path_g: FilePathGenerator, sink: ResultSink = None,
+                 fail_fast=False):
+        super().__init__(param_g, fail_fast)
         self.path_g = path_g
+        self.sink = sink if sink is not None else ConsoleSink()
         self.num_of_guardians = param_g.get_num_of_guardians()
         self.quorum = param_g.get_quorum()
         self.base_hash = param_g.get_base_hash()
 
-    def verify_all_guardians(self) -> bool:
+    def verify_all_guardians(self) -> Result:
         """
         verify all guardians' key generation info by examining challenge values and equations
-        :return: True if no error were found in any guardian, False if some errors found in some or all guardians
+        :return: a box-level Result, truthy if no error were found in any guardian, falsy if some errors found in
+                some or all guardians
         """
-        error = self.initialize_error()
+        box_result = Result('box', 'Box 2 key generation', box=2)
 
         for i in range(self.num_of_guardians):
-            res = self.verify_one_guardian(i)
-            if not res:
-                error = self.set_error()
-                print("guardian {index} key generation verification failure. ".format(index=i))
+            guardian_result = self.verify_one_guardian(i)
+            box_result.add(guardian_result)
+            self.sink.emit(guardian_result)
 
-        if not error:
-            print("All guardians' key generation verification success. ")
+            if self.fail_fast and not guardian_result.ok:
+                break
 
-        return not error
+        self.sink.emit(box_result)
 
-    def verify_one_guardian(self, index: int) -> bool:
+        return box_result
+
+    def verify_one_guardian(self, index: int) -> Result:
         """
         verify one guardian's key generation
         :param index:  index of this guardian, (0 - number of guardians)
-        :return: True if the guardian's key information gets verified, False if not
+        :return: a guardian-level Result, truthy if the guardian's key information gets verified, falsy if not
         """
         coefficients_dic = self.__get_guardian_coeff_by_index(index)
-
-        error = self.initialize_error()
+        result = Result('guardian', index, box=2)
+        if coefficients_dic is None:
+            file_path = self.path_g.get_guardian_coefficient_file_path(index)
+            result.fail(Reason.MISSING_DOCUMENT, field=self.path_g.get_name(file_path))
+            return result
 
         # loop through every proof
         for i in range(self.quorum):
-            error = self.initialize_error()
             # get given values
             coeff_proofs_dic = coefficients_dic.get('coefficient_proofs')[i]
-            response = coeff_proofs_dic.get('response')      # u
-            commitment = coeff_proofs_dic.get('commitment')  # h
-            public_key = coeff_proofs_dic.get('public_key')  # k
-            challenge = coeff_proofs_dic.get('challenge')    # c
+            response = get_number(coeff_proofs_dic, 'response')      # u
+            commitment = get_number(coeff_proofs_dic, 'commitment')  # h
+            public_key = get_number(coeff_proofs_dic, 'public_key')  # k
+            challenge = get_number(coeff_proofs_dic, 'challenge')    # c
+            field = 'coefficient_proofs[{j}]'.format(j=i)
 
             # compute challenge
             challenge_computed = self.__compute_guardian_challenge_threshold_separated(public_key, commitment)
 
             # check if the computed challenge value matches the given
             if not equals(challenge, challenge_computed):
-                error = self.set_error()
-                print("guardian {i}, quorum {j}, challenge number error. ".format(i=index, j=i))
-            # check equation
-            if not self.__verify_individual_key_computation(response, commitment, public_key, challenge):
-                error = self.set_error()
-                print("guardian {i}, quorum {j}, equation error. ".format(i=index, j=i))
+                result.fail(Reason.CHALLENGE, field=field)
+            # check equation, skipped in fail-fast mode once the cheaper challenge check has failed
+            if result.ok or not self.fail_fast:
+                if not self.__verify_individual_key_computation(response, commitment, public_key, challenge):
+                    result.fail(Reason.EQUATION, field=field)
 
-        return not error
+            if self.fail_fast and not result.ok:
+                break
+
+        return result
 
     def __get_guardian_coeff_by_index(self, index: int) -> dict:
         """
         verify the key information of guardian at a index position
         :param index: index of this guardian, (0 - number of guardians)
-        :return: the corresponding key info stored in a dictionary
+        :return: the corresponding key info stored in a dictionary, None if the file is missing
         """
         if index >= self.num_of_guardians or index < 0:
             raise IndexError("index out of bound")
         coeff_file_path = self.path_g.get_guardian_coefficient_file_path(index)
-        return read_json_file(coeff_file_path)
+        return self.path_g.read_json(coeff_file_path)
 
     def __compute_guardian_challenge_threshold_separated(self, public_key: int, commitment: int) -> int:
         """
@@ -89,7 +100,8 @@ class KeyGenerationVerifier(IVerifier):
         """
         return mod_p(hash_elems(self.base_hash, public_key, commitment))
 
-    def __verify_individual_key_computation(self, response: str, commitment: str, public_key: str, challenge: str) -> bool:
+    def __verify_individual_key_computation(self, response: int, commitment: int, public_key: int,
+                                            challenge: int) -> bool:
         """
         check the equation generator ^ response mod p = (commitment * public key ^ challenge) mod p
         :param response: response given by a guardian, ui,j
@@ -98,12 +110,7 @@ class KeyGenerationVerifier(IVerifier):
         :param challenge: challenge of a guardian, ci,j
         :return: True if both sides of the equations are equal, False otherwise
         """
-        response = int(response)
-        commitment = int(commitment)
-        public_key = int(public_key)
-        challenge = int(challenge)
-
-        left = pow(self.generator, response, self.large_prime)
-        right = mod_p(commitment * pow(public_key, challenge, self.large_prime))
+        left = pow_mod(self.generator, response, self.large_prime)
+        right = mul_mod(commitment, pow_mod(public_key, challenge, self.large_prime), self.large_prime)
 
         return equals(left, right)
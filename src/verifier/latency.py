@@ -0,0 +1,252 @@
+import sys
+import math
+import heapq
+import threading
+
+"""
+This module records the verification latency of every ballot and spoiled ballot of a run, to find the items that take
+far longer than the others, e.g. ballots with many contests or long selection lists.
+
+Like the metrics, the profiling is off by default and the verifiers only time an item when a LatencyProfile is
+active. The latencies of each kind of item go into a histogram with logarithmic buckets, about 4% wide, which keeps
+a constant size whatever the number of items and gives the p50, p95 and p99 latencies within a bucket width; the
+slowest items are kept apart with their number of contests and selections.
+
+Class:
+    LatencyHistogram
+    LatencyProfile
+
+Function:
+    count_ballot(dict)
+    count_spoiled_ballot(dict)
+    enable(int)
+    disable()
+"""
+
+# buckets per doubling of the latency, and the lower bound of the first bucket in seconds
+BUCKETS_PER_OCTAVE = 16
+MIN_LATENCY = 1e-6
+
+PERCENTILES = (50, 95, 99)
+
+# the active profile, None while the profiling is off
+ACTIVE = None
+
+
+class LatencyHistogram:
+    """
+    Histogram of latencies with logarithmic buckets, stored sparsely as bucket index - count.
+    A percentile is the upper bound of its bucket, capped by the largest latency recorded.
+
+    Method:
+        add(float)
+        percentile(float)
+        merge(dict)
+        to_dict()
+    """
+
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    @staticmethod
+    def bucket_of(seconds: float) -> int:
+        """
+        :return: the index of the bucket holding a latency, 0 for anything below MIN_LATENCY
+        """
+        if seconds <= MIN_LATENCY:
+            return 0
+        return int(math.ceil(math.log2(seconds / MIN_LATENCY) * BUCKETS_PER_OCTAVE))
+
+    @staticmethod
+    def upper_bound(bucket: int) -> float:
+        """
+        :return: the largest latency of a bucket, in seconds
+        """
+        return MIN_LATENCY * 2 ** (bucket / BUCKETS_PER_OCTAVE)
+
+    def add(self, seconds: float):
+        """
+        record a latency
+        :param seconds: the latency in seconds
+        """
+        bucket = self.bucket_of(seconds)
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, percent: float) -> float:
+        """
+        get a percentile of the recorded latencies
+        :param percent: the percentile, within 0 and 100
+        :return: the latency in seconds, 0 if nothing was recorded
+        """
+        if self.count == 0:
+            return 0.0
+        rank = max(1, int(math.ceil(self.count * percent / 100)))
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return min(self.upper_bound(bucket), self.max)
+        return self.max
+
+    def merge(self, dic: dict):
+        """
+        add the latencies of another histogram, e.g. of a shard
+        :param dic: a dictionary as returned by to_dict()
+        """
+        for bucket, count in dic.get('buckets', {}).items():
+            bucket = int(bucket)
+            self.buckets[bucket] = self.buckets.get(bucket, 0) + count
+        self.count += dic.get('count', 0)
+        self.total += dic.get('seconds', 0.0)
+        self.max = max(self.max, dic.get('max', 0.0))
+
+    def to_dict(self) -> dict:
+        """
+        get a json-serializable representation of the histogram
+        :return: a dictionary of the count, total, mean, max and percentiles in seconds, and of the raw buckets
+        """
+        dic = {'count': self.count,
+               'seconds': round(self.total, 6),
+               'mean': round(self.total / self.count, 6) if self.count else 0.0,
+               'max': round(self.max, 6)}
+        for percent in PERCENTILES:
+            dic['p{p}'.format(p=percent)] = round(self.percentile(percent), 6)
+        dic['buckets'] = {str(bucket): count for bucket, count in sorted(self.buckets.items())}
+        return dic
+
+
+class LatencyProfile:
+    """
+    Latency histograms of a run, one per kind of item, 'ballot' or 'spoiled_ballot', and the slowest items of all
+    kinds. Updates are locked, so that items verified by several threads can be recorded.
+
+    Method:
+        record(str, str, float, int, int)
+        merge(dict)
+        to_dict()
+        write_report()
+    """
+
+    def __init__(self, num_slowest=10):
+        """
+        :param num_slowest: the number of slowest items kept
+        """
+        self.num_slowest = num_slowest
+        self.histograms = {}
+        # min-heap of (seconds, kind, item id, contests, selections), the fastest of the slowest items on top
+        self.slowest = []
+        self.lock = threading.Lock()
+
+    def record(self, kind: str, item_id: str, seconds: float, contests: int, selections: int):
+        """
+        record the verification latency of an item
+        :param kind: the kind of item, 'ballot' or 'spoiled_ballot'
+        :param item_id: the object id of the item
+        :param seconds: the latency in seconds
+        :param contests: the number of contests of the item
+        :param selections: the number of selections of the item, placeholders included
+        """
+        with self.lock:
+            histogram = self.histograms.get(kind)
+            if histogram is None:
+                histogram = self.histograms[kind] = LatencyHistogram()
+            histogram.add(seconds)
+            self.__keep_slowest((seconds, kind, str(item_id), contests, selections))
+
+    def __keep_slowest(self, item: tuple):
+        """
+        keep an item if it is among the slowest ones
+        :param item: a (seconds, kind, item id, contests, selections) tuple
+        """
+        if len(self.slowest) < self.num_slowest:
+            heapq.heappush(self.slowest, item)
+        elif self.num_slowest > 0 and item > self.slowest[0]:
+            heapq.heapreplace(self.slowest, item)
+
+    def merge(self, dic: dict):
+        """
+        add the latencies of a shard to this profile
+        :param dic: a dictionary as returned by to_dict()
+        """
+        with self.lock:
+            for kind, histogram in dic.get('histograms', {}).items():
+                self.histograms.setdefault(kind, LatencyHistogram()).merge(histogram)
+            for item in dic.get('slowest', []):
+                self.__keep_slowest((item['seconds'], item['kind'], item['object_id'], item['contests'],
+                                     item['selections']))
+
+    def to_dict(self) -> dict:
+        """
+        get a json-serializable representation of the profile
+        :return: a dictionary of the histograms per kind and of the slowest items, slowest first
+        """
+        with self.lock:
+            return {'histograms': {kind: histogram.to_dict() for kind, histogram in sorted(self.histograms.items())},
+                    'slowest': [{'kind': kind, 'object_id': item_id, 'seconds': round(seconds, 6),
+                                 'contests': contests, 'selections': selections}
+                                for seconds, kind, item_id, contests, selections in sorted(self.slowest,
+                                                                                           reverse=True)]}
+
+    def write_report(self, stream=None):
+        """
+        write a human-readable report of the latencies and of the slowest items
+        :param stream: the output stream, stderr by default so that it does not mix with the results
+        """
+        stream = stream or sys.stderr
+        dic = self.to_dict()
+        stream.write('latency per item (ms)\n')
+        stream.write('    {kind:<16} {n:>8} {mean:>10} {p50:>10} {p95:>10} {p99:>10} {max:>10}\n'.format(
+            kind='', n='count', mean='mean', p50='p50', p95='p95', p99='p99', max='max'))
+        for kind, h in dic['histograms'].items():
+            stream.write('    {kind:<16} {n:>8} {mean:>10.3f} {p50:>10.3f} {p95:>10.3f} {p99:>10.3f} {max:>10.3f}\n'
+                         .format(kind=kind, n=h['count'], mean=h['mean'] * 1000, p50=h['p50'] * 1000,
+                                 p95=h['p95'] * 1000, p99=h['p99'] * 1000, max=h['max'] * 1000))
+        if dic['slowest']:
+            stream.write('slowest items\n')
+        for item in dic['slowest']:
+            stream.write('    {ms:>10.3f} ms  {kind:<16} {object_id}  {contests} contests, {selections} selections\n'
+                         .format(ms=item['seconds'] * 1000, **item))
+        stream.flush()
+
+
+def count_ballot(ballot_dic: dict) -> tuple:
+    """
+    :param ballot_dic: an encrypted ballot
+    :return: the number of contests and of selections, placeholders included, of the ballot
+    """
+    contests = ballot_dic.get('contests') or []
+    return len(contests), sum(len(contest.get('ballot_selections') or []) for contest in contests)
+
+
+def count_spoiled_ballot(spoiled_ballot: dict) -> tuple:
+    """
+    :param spoiled_ballot: a spoiled ballot of the tally, contest name - contest
+    :return: the number of contests and of selections of the spoiled ballot
+    """
+    contests = spoiled_ballot or {}
+    return len(contests), sum(len(contest.get('selections') or {}) for contest in contests.values())
+
+
+def enable(num_slowest=10) -> LatencyProfile:
+    """
+    turn the profiling on, with a fresh profile
+    :param num_slowest: the number of slowest items kept
+    :return: the active profile
+    """
+    global ACTIVE
+    ACTIVE = LatencyProfile(num_slowest)
+    return ACTIVE
+
+
+def disable():
+    """
+    turn the profiling off
+    """
+    global ACTIVE
+    ACTIVE = None
@@ -0,0 +1,157 @@
+import time
+import threading
+from contextlib import contextmanager
+
+"""
+This module holds the instrumentation counters and timers of a verification run, to see where the time goes without
+attaching a profiler.
+
+The instrumentation is off by default: the hot paths only check whether a Metrics instance is active, so a normal run
+pays a single attribute test per instrumented call. Once enabled, the run counts the modular exponentiations and
+their time, the hashes, the Zrp membership tests, the json documents read with their bytes and parse time, the files
+opened and the wall time of every box. The metrics of worker processes or shards are merged into the metrics of the
+run, which are written at the end as json or in the Prometheus text format.
+
+Class:
+    Metrics
+
+Function:
+    enable()
+    disable()
+"""
+
+PROMETHEUS_PREFIX = 'electionguard_verifier'
+
+# help text of the known counters and timers, exported in the Prometheus file
+DESCRIPTIONS = {'modexp': 'modular exponentiations',
+                'fixed_base': 'modular exponentiations served by a precomputed table',
+                'multi_exp': 'products of modular exponentiations computed at once',
+                'hash': 'hash_elems calls',
+                'zrp_test': 'Zrp membership tests',
+                'discrete_log': 'tally count discrete log lookups',
+                'json_documents': 'json documents read',
+                'json_bytes': 'bytes of json read',
+                'json_parse': 'json parsing',
+                'files_opened': 'files opened on disk'}
+
+# the active metrics, None while the instrumentation is off
+ACTIVE = None
+
+
+class Metrics:
+    """
+    Counters and timers of one run. A timer keeps both the number of timed calls and their total time.
+    Updates are locked, the prefetch threads reading and parsing files concurrently with the verification.
+
+    Method:
+        count(str, int)
+        add_time(str, float)
+        timer(str)
+        merge(dict)
+        to_dict()
+        to_prometheus()
+    """
+
+    def __init__(self):
+        self.counters = {}
+        self.timers = {}
+        self.lock = threading.Lock()
+
+    def count(self, name: str, n=1):
+        """
+        increase a counter
+        :param name: the counter name
+        :param n: the increment
+        """
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def add_time(self, name: str, seconds: float):
+        """
+        add a timed call to a timer
+        :param name: the timer name
+        :param seconds: the duration of the call
+        """
+        with self.lock:
+            timer = self.timers.get(name)
+            if timer is None:
+                self.timers[name] = [1, seconds]
+            else:
+                timer[0] += 1
+                timer[1] += seconds
+
+    @contextmanager
+    def timer(self, name: str):
+        """
+        time the enclosed block
+        :param name: the timer name
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def merge(self, dic: dict):
+        """
+        add the metrics of a worker process or of a shard to these metrics
+        :param dic: a dictionary as returned by to_dict()
+        """
+        for name, value in dic.get('counters', {}).items():
+            self.count(name, value)
+        with self.lock:
+            for name, timer in dic.get('timers', {}).items():
+                current = self.timers.setdefault(name, [0, 0.0])
+                current[0] += timer['calls']
+                current[1] += timer['seconds']
+
+    def to_dict(self) -> dict:
+        """
+        get a json-serializable representation of the metrics
+        :return: a dictionary of counters and of timers with their calls and seconds
+        """
+        return {'counters': dict(sorted(self.counters.items())),
+                'timers': {name: {'calls': calls, 'seconds': round(seconds, 6)}
+                           for name, (calls, seconds) in sorted(self.timers.items())}}
+
+    def to_prometheus(self, prefix=PROMETHEUS_PREFIX) -> str:
+        """
+        get the metrics in the Prometheus text exposition format, e.g. for the textfile collector of node exporter
+        :param prefix: the prefix of every metric name
+        :return: the text of the metrics file
+        """
+        lines = []
+        for name, value in sorted(self.counters.items()):
+            metric = '{prefix}_{name}_total'.format(prefix=prefix, name=name)
+            lines += ['# HELP {m} Number of {d}.'.format(m=metric, d=DESCRIPTIONS.get(name, name)),
+                      '# TYPE {m} counter'.format(m=metric),
+                      '{m} {v}'.format(m=metric, v=value)]
+        for name, (calls, seconds) in sorted(self.timers.items()):
+            description = DESCRIPTIONS.get(name, name.replace('_', ' '))
+            metric = '{prefix}_{name}_seconds_total'.format(prefix=prefix, name=name)
+            lines += ['# HELP {m} Time spent in {d}.'.format(m=metric, d=description),
+                      '# TYPE {m} counter'.format(m=metric),
+                      '{m} {v}'.format(m=metric, v=repr(round(seconds, 6)))]
+            metric = '{prefix}_{name}_calls_total'.format(prefix=prefix, name=name)
+            lines += ['# HELP {m} Number of timed {d} calls.'.format(m=metric, d=description),
+                      '# TYPE {m} counter'.format(m=metric),
+                      '{m} {v}'.format(m=metric, v=calls)]
+        return '\n'.join(lines) + '\n'
+
+
+def enable() -> Metrics:
+    """
+    turn the instrumentation on, with fresh metrics
+    :return: the active metrics
+    """
+    global ACTIVE
+    ACTIVE = Metrics()
+    return ACTIVE
+
+
+def disable():
+    """
+    turn the instrumentation off
+    """
+    global ACTIVE
+    ACTIVE = None
@@ -1,24 +1,175 @@
+import time
 import random
 import hashlib
-from typing import Sequence
-
-LARGE_PRIME = (int(('''104438888141315250669175271071662438257996424904738378038423348328
-3953907971553643537729993126875883902173634017777416360502926082946377942955704498
-5420976148418252467735806893983863204397479111608977315510749039672438834271329188
-1374801626975452234350528589881677721176191239277291448552115552164104927344620757
-8961939840619466145806859275053476560973295158703823395710210329314709715239251736
-5523840808458360487786673189314183384224438910259118847234330847012077719019445932
-8662497991739135056466263272370300796422984915475619689061525228653308964318490270
-6926081744149289517418249153634178342075381874131646013444796894582106870531535803
-6662545796026324531037414525697939055519015418561732513850474148403927535855819099
-5015804625681054267836812127850996052095762473794291460031064660979266501285839738
-1435755902851312071248102599442308951327039250818892493767423329663783709190716162
-0235296692173009397831714158082331468230007669177892861540060422814237337064629052
-4377485454312723950024587358201266366643058386277816736954760301634424272959224454
-4608279405999759391099775667746401633668308698186721172238255007962658564443858927
-6348504157753488390520266757856948263869301753031434500465754608438799417919463132
-99322976993405829119''').replace('\n', '')))
-SMALL_PRIME = pow(2, 256) - 189
+from collections.abc import Sequence
+from . import metrics
+
+# the standard group of the specification, p stored as its big-endian bytes in hexadecimal, which are read in linear
+# time when the module is imported instead of parsing its 1,233 decimal digits
+STANDARD_LARGE_PRIME = int.from_bytes(bytes.fromhex('''
+FFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFF
+93C467E37DB0C7A4D1BE3F810152CB56A1CECC3AF65CC0190C03DF34709AFFBD
+8E4B59FA03A9F0EED0649CCB621057D11056AE9132135A08E43B4673D74BAFEA
+58DEB878CC86D733DBE7BF38154B36CF8A96D1567899AAAE0C09D4C8B6B7B86F
+D2A1EA1DE62FF8643EC7C271827977225E6AC2F0BD61C746961542A3CE3BEA5D
+B54FE70E63E6D09F8FC28658E80567A47CFDE60EE741E5D85A7BD46931CED822
+0365594964B839896FCAABCCC9B31959C083F22AD3EE591C32FAB2C7448F2A05
+7DB2DB49EE52E0182741E53865F004CC8E704B7C5C40BF304C4D8C4F13EDF604
+7C555302D2238D8CE11DF2424F1B66C2C5D238D0744DB679AF2890487031F9C0
+AEA1C4BB6FE9554EE528FDF1B05E5B256223B2F09215F3719F9C7CCC69DDF172
+D0D6234217FCC0037F18B93EF5389130B7A661E5C26E54214068BBCAFEA32A67
+818BD3075AD1F5C7E9CC3D1737FB28171BAF84DBB6612B7881C1A48E439CD03A
+92BF52225A2B38E6542E9F722BCE15A381B5753EA842763381CCAE83512B3051
+1B32E5E8D80362149AD030AABA5F3A5798BB22AA7EC1B6D0F17903F4E234EA60
+34AA85973F79A93FFB82A75C47C03D43D2F9CA02D03199BACEDDD45334DBC6B5
+FFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFF
+'''), byteorder='big')
+STANDARD_SMALL_PRIME = pow(2, 256) - 189
+
+LARGE_PRIME = STANDARD_LARGE_PRIME
+SMALL_PRIME = STANDARD_SMALL_PRIME
+
+
+def set_group(large_prime: int, small_prime: int):
+    """
+    set the group used by the module-level checks and by the hash, the standard group by default. A record published
+    with other parameters, e.g. the small test group of a synthetic record, is verified after setting its own group.
+    :param large_prime: the large prime p of the record
+    :param small_prime: the small prime q of the record
+    """
+    global LARGE_PRIME, SMALL_PRIME
+    LARGE_PRIME = int(large_prime)
+    SMALL_PRIME = int(small_prime)
+
+
+class PythonBackend:
+    """
+    Big-integer backend on the CPython int and the built-in pow, always available.
+    A backend serves the modular exponentiations, multiplications and inversions of the verifiers, its arguments and
+    results are plain ints whatever the library underneath.
+
+    Method:
+        native(int)
+        pow_mod(int, int, int)
+        mul_mod(int, int, int)
+        from_decimal(str)
+        inverse(int, int)
+    """
+    name = 'python'
+
+    def native(self, num: int):
+        """
+        :return: a number in the integer type of the library, for arithmetic loops run outside of the backend
+        """
+        return num
+
+    def pow_mod(self, base: int, exponent: int, modulus: int) -> int:
+        return pow(base, exponent, modulus)
+
+    def mul_mod(self, a: int, b: int, modulus: int) -> int:
+        return a * b % modulus
+
+    def from_decimal(self, text: str) -> int:
+        return int(text)
+
+    def inverse(self, num: int, modulus: int) -> int:
+        # extended Euclid, pow(num, -1, modulus) needs Python 3.8
+        old_r, r, old_s, s = num % modulus, modulus, 1, 0
+        while r:
+            quotient = old_r // r
+            old_r, r = r, old_r - quotient * r
+            old_s, s = s, old_s - quotient * s
+        if old_r != 1:
+            raise ValueError("{num} is not invertible modulo {modulus}".format(num=num, modulus=modulus))
+        return old_s % modulus
+
+
+class Gmpy2Backend(PythonBackend):
+    """
+    Big-integer backend on GMP through the optional gmpy2 package, several times faster than the built-in pow on
+    4096-bit operands. Raises ImportError when gmpy2 is not installed.
+    """
+    name = 'gmpy2'
+
+    def __init__(self):
+        import gmpy2
+        self.gmpy2 = gmpy2
+
+    def native(self, num: int):
+        return self.gmpy2.mpz(num)
+
+    def pow_mod(self, base: int, exponent: int, modulus: int) -> int:
+        return int(self.gmpy2.powmod(base, exponent, modulus))
+
+    def mul_mod(self, a: int, b: int, modulus: int) -> int:
+        return int(self.gmpy2.mpz(a) * b % modulus)
+
+    def from_decimal(self, text: str) -> int:
+        return int(self.gmpy2.mpz(text))
+
+    def inverse(self, num: int, modulus: int) -> int:
+        try:
+            return int(self.gmpy2.invert(num, modulus))
+        except ZeroDivisionError:
+            raise ValueError("{num} is not invertible modulo {modulus}".format(num=num, modulus=modulus))
+
+
+# backend name - class, the fastest first for the automatic choice
+BACKENDS = {'gmpy2': Gmpy2Backend, 'python': PythonBackend}
+
+BACKEND = PythonBackend()
+
+
+def available_backends() -> list:
+    """
+    :return: the names of the backends that can be used on this installation, the fastest first
+    """
+    names = []
+    for name, backend_class in BACKENDS.items():
+        try:
+            backend_class()
+        except ImportError:
+            continue
+        names.append(name)
+    return names
+
+
+def set_backend(name='auto') -> PythonBackend:
+    """
+    choose the big-integer backend of the module
+    :param name: a name of BACKENDS, or 'auto' for the fastest available one, falling back to pure Python
+    :return: the backend now in use
+    """
+    global BACKEND
+    if name == 'auto':
+        name = available_backends()[0]
+    if name not in BACKENDS:
+        raise ValueError("unknown big-integer backend {name}, expected auto or one of {names}"
+                         .format(name=name, names=', '.join(BACKENDS)))
+    BACKEND = BACKENDS[name]()
+    return BACKEND
+
+
+# the fastest backend installed is used unless another one is chosen
+set_backend()
+
+# base - precomputed fixed-base table, see precompute.py
+FIXED_BASES = {}
+
+
+def add_fixed_base(table):
+    """
+    serve the exponentiations of a base modulo the table modulus from a precomputed table
+    :param table: a FixedBaseTable
+    """
+    FIXED_BASES[table.base] = table
+
+
+def clear_fixed_bases():
+    """
+    stop using the precomputed tables
+    """
+    FIXED_BASES.clear()
 
 
 def is_prime(num: int, k=5) -> bool:
@@ -61,7 +212,7 @@ def __miller_test(d: int, num: int) -> bool:
     a = 2 + random.randint(1, num - 4)
 
     # Compute a^d % n
-    x = pow(a, d, num)
+    x = BACKEND.pow_mod(a, d, num)
 
     if x == 1 or x == num - 1:
         return True
@@ -153,9 +304,97 @@ def is_within_set_zrp(num) -> bool:
     :return: True if  0 < num < p and num ^ q mod p = 1 , False otherwise
     """
     num = int(num)
+    if metrics.ACTIVE is not None:
+        metrics.ACTIVE.count('zrp_test')
 
     return is_within_range(num, 0, LARGE_PRIME) and equals(
-        pow(num, SMALL_PRIME, LARGE_PRIME), 1)
+        pow_mod(num, SMALL_PRIME, LARGE_PRIME), 1)
+
+
+def pow_mod(base: int, exponent: int, modulus: int) -> int:
+    """
+    compute a modular exponentiation with the backend or a precomputed table, every one of the verifiers goes through
+    this function so that they can be counted and timed when the instrumentation is on
+    :param base: the base
+    :param exponent: the exponent
+    :param modulus: the modulus
+    :return: base ^ exponent mod modulus
+    """
+    if metrics.ACTIVE is None:
+        return __pow_mod(base, exponent, modulus)
+
+    start = time.perf_counter()
+    result = __pow_mod(base, exponent, modulus)
+    metrics.ACTIVE.add_time('modexp', time.perf_counter() - start)
+    return result
+
+
+def __pow_mod(base: int, exponent: int, modulus: int) -> int:
+    """
+    compute a modular exponentiation from the precomputed table of the base if there is one for this modulus and the
+    exponent is within its range, with the backend otherwise
+    """
+    table = FIXED_BASES.get(base) if FIXED_BASES else None
+    if table is not None and table.modulus == modulus and 0 <= exponent < table.limit:
+        if metrics.ACTIVE is not None:
+            metrics.ACTIVE.count('fixed_base')
+        return table.pow(exponent)
+    return BACKEND.pow_mod(base, exponent, modulus)
+
+
+def multi_pow_mod(bases: list, exponents: list, modulus: int) -> int:
+    """
+    compute a product of modular exponentiations at once, with Straus' method: the exponents are read 4 bits at a
+    time from the top, and the squarings are shared by all the bases instead of being repeated for every base
+    :param bases: the bases
+    :param exponents: the exponents, non-negative, one per base
+    :param modulus: the modulus
+    :return: the product of base ^ exponent mod modulus
+    """
+    if metrics.ACTIVE is not None:
+        metrics.ACTIVE.count('multi_exp')
+    modulus_n = BACKEND.native(modulus)
+    # base ^ digit for every base and every 4-bit digit
+    tables = []
+    for base in bases:
+        table = [BACKEND.native(1), BACKEND.native(base) % modulus_n]
+        for _ in range(14):
+            table.append(table[-1] * table[1] % modulus_n)
+        tables.append(table)
+
+    result = BACKEND.native(1)
+    # the bit length of the largest exponent rounded up to whole digits
+    shift = (max([exponent.bit_length() for exponent in exponents] + [1]) + 3) & ~3
+    while shift:
+        shift -= 4
+        for _ in range(4):
+            result = result * result % modulus_n
+        for table, exponent in zip(tables, exponents):
+            digit = (exponent >> shift) & 15
+            if digit:
+                result = result * table[digit] % modulus_n
+    return int(result)
+
+
+def mul_mod(a, b, modulus: int) -> int:
+    """
+    compute a modular product with the backend
+    :param a: a factor
+    :param b: the other factor
+    :param modulus: the modulus
+    :return: a * b mod modulus
+    """
+    return BACKEND.mul_mod(int(a), int(b), modulus)
+
+
+def inverse_mod(num, modulus: int) -> int:
+    """
+    compute a modular inverse with the backend
+    :param num: the number to invert
+    :param modulus: the modulus
+    :return: the inverse of num mod modulus, raises ValueError if num and modulus are not coprime
+    """
+    return BACKEND.inverse(int(num), modulus)
 
 
 def mod_p(dividend) -> int:
@@ -187,15 +426,11 @@ def multiply(*args, mod_num=1) -> int:
     :param mod_num: modulus, sets to 1 by default
     :return: the accumulative product of multiple numbers mod a given number
     """
-    product = 1
+    product = 1 % mod_num
     for arg in args:
-        if arg >= mod_num:
-            arg = arg % mod_num
-        if product >= mod_num:
-            product = product % mod_num
-        product *= arg
+        product = BACKEND.mul_mod(product, int(arg), mod_num)
 
-    return product % mod_num
+    return product
 
 
 def hash_elems(*a):
@@ -204,6 +439,9 @@ def hash_elems(*a):
     :param a: elements being fed into the hash function
     :return: a hash number of 256 bit
     """
+    if metrics.ACTIVE is not None:
+        metrics.ACTIVE.count('hash')
+
     h = hashlib.sha256()
     h.update("|".encode("utf-8"))
 
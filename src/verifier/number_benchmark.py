@@ -0,0 +1,298 @@
+import sys
+import timeit
+import random
+import hashlib
+import base64
+import functools
+from . import number
+from . import number_decoding
+from .synthetic import make_test_group, STANDARD_COFACTOR
+from .precompute import FixedBaseTable
+
+"""
+This module micro-benchmarks the arithmetic primitives of number.py, which make up the hot path of every box.
+
+Every primitive has one or more variants, the implementation in number.py coming first as the reference, and each
+variant is measured in ops/second on operands of several sizes: the 128-bit test group of the synthetic records,
+a 1024-bit group and the standard 4096-bit group. Alternative implementations are registered next to the reference
+with the register() decorator, so that an optimisation of number.py is measured side by side with what it replaces.
+The variants calling number.py are measured once per big-integer backend installed, pure Python first.
+
+Function:
+    register(str, str, bool)
+    get_group(str)
+    run_number_benchmark(list, list, float, int, list)
+    write_number_report(dict)
+"""
+
+GROUP_SIZES = ('test', '1024', 'standard')
+
+# primitive name - list of (variant name, factory, per backend), a factory takes the group and returns the callable
+# to time
+CASES = {}
+
+
+def register(primitive: str, variant: str, per_backend=False):
+    """
+    register a variant of a primitive, the first variant of a primitive being its reference
+    :param primitive: the primitive name, e.g. 'mod_p'
+    :param variant: the variant name
+    :param per_backend: measure the variant once per big-integer backend, for the variants going through number.py
+    :return: a decorator of a factory (p, q, g, rng) -> callable taking no argument
+    """
+    def decorator(factory):
+        CASES.setdefault(primitive, []).append((variant, factory, per_backend))
+        return factory
+    return decorator
+
+
+def get_group(size: str) -> tuple:
+    """
+    get the group of an operand size
+    :param size: 'test', '1024' or 'standard'
+    :return: a (p, q, g) tuple
+    """
+    if size == 'test':
+        p, q, _, g = make_test_group()
+    elif size == '1024':
+        p, q, _, g = make_test_group(256, 1024)
+    elif size == 'standard':
+        p, q = number.LARGE_PRIME, number.SMALL_PRIME
+        g = pow(2, STANDARD_COFACTOR, p)
+    else:
+        raise ValueError("unknown operand size " + size)
+    return p, q, g
+
+
+def random_elements(p: int, q: int, g: int, rng: random.Random, count: int) -> list:
+    """
+    :return: 'count' random elements of the order q subgroup of Z*p
+    """
+    return [pow(g, rng.randrange(1, q), p) for _ in range(count)]
+
+
+@register('pow', 'builtin pow(g, e, p)')
+def _pow_builtin(p, q, g, rng):
+    exponent = rng.randrange(1, q)
+    return lambda: pow(g, exponent, p)
+
+
+@register('pow', 'number.pow_mod', per_backend=True)
+def _pow_mod(p, q, g, rng):
+    exponent = rng.randrange(1, q)
+    return lambda: number.pow_mod(g, exponent, p)
+
+
+@register('pow', 'FixedBaseTable.pow, 8-bit windows', per_backend=True)
+def _pow_fixed_base(p, q, g, rng):
+    table = FixedBaseTable.build(g, p, q.bit_length())
+    exponent = rng.randrange(1, q)
+    return lambda: table.pow(exponent)
+
+
+@register('inverse', 'number.inverse_mod', per_backend=True)
+def _inverse_mod(p, q, g, rng):
+    element, = random_elements(p, q, g, rng, 1)
+    return lambda: number.inverse_mod(element, p)
+
+
+@register('inverse', 'pow(x, p - 2, p)')
+def _inverse_fermat(p, q, g, rng):
+    element, = random_elements(p, q, g, rng, 1)
+    return lambda: pow(element, p - 2, p)
+
+
+@register('mod_p', 'number.mod_p')
+def _mod_p(p, q, g, rng):
+    a, b = random_elements(p, q, g, rng, 2)
+    product = a * b
+    return lambda: number.mod_p(product)
+
+
+@register('mod_p', 'inline %')
+def _mod_p_inline(p, q, g, rng):
+    a, b = random_elements(p, q, g, rng, 2)
+    product = a * b
+    return lambda: product % p
+
+
+@register('is_within_set_zrp', 'number.is_within_set_zrp', per_backend=True)
+def _zrp(p, q, g, rng):
+    element, = random_elements(p, q, g, rng, 1)
+    return lambda: number.is_within_set_zrp(element)
+
+
+@register('is_within_set_zrp', 'inline pow(x, q, p) == 1')
+def _zrp_inline(p, q, g, rng):
+    element, = random_elements(p, q, g, rng, 1)
+    return lambda: 0 < element < p and pow(element, q, p) == 1
+
+
+@register('multiply', 'number.multiply, 16 factors', per_backend=True)
+def _multiply(p, q, g, rng):
+    factors = random_elements(p, q, g, rng, 16)
+    return lambda: number.multiply(*factors, mod_num=p)
+
+
+@register('multiply', 'reduce with % each step, 16 factors')
+def _multiply_reduce(p, q, g, rng):
+    factors = random_elements(p, q, g, rng, 16)
+    return lambda: functools.reduce(lambda x, y: x * y % p, factors, 1)
+
+
+@register('hash_elems', 'number.hash_elems, 6 elements')
+def _hash_elems(p, q, g, rng):
+    elements = random_elements(p, q, g, rng, 6)
+    return lambda: number.hash_elems(*elements)
+
+
+@register('hash_elems', 'inline sha256 of joined str, 6 elements')
+def _hash_elems_inline(p, q, g, rng):
+    elements = random_elements(p, q, g, rng, 6)
+
+    def hash_inline():
+        text = '|' + ''.join(str(x) + '|' for x in elements)
+        return int.from_bytes(hashlib.sha256(text.encode('utf-8')).digest(), byteorder='big') % (q - 1)
+    return hash_inline
+
+
+@register('decode', 'decode_number, decimal', per_backend=True)
+def _decode_decimal(p, q, g, rng):
+    text = str(random_elements(p, q, g, rng, 1)[0])
+    return lambda: number_decoding.decode_number(text)
+
+
+@register('decode', 'builtin int(s)')
+def _decode_builtin(p, q, g, rng):
+    text = str(random_elements(p, q, g, rng, 1)[0])
+    return lambda: int(text)
+
+
+@register('decode', 'decode_number, hex')
+def _decode_hex(p, q, g, rng):
+    text = format(random_elements(p, q, g, rng, 1)[0], 'X')
+    return lambda: number_decoding.decode_number(text)
+
+
+@register('decode', 'decode_number, base64')
+def _decode_base64(p, q, g, rng):
+    element, = random_elements(p, q, g, rng, 1)
+    text = base64.b64encode(element.to_bytes((p.bit_length() + 7) // 8, byteorder='big')).decode('ascii')
+    return lambda: number_decoding.decode_number(text)
+
+
+def without_digit_limit(conversion, value):
+    """
+    :return: conversion(value), past the limit on the digits of the int - str conversions of Python 3.11 and later
+    """
+    set_limit = getattr(sys, 'set_int_max_str_digits', None)
+    if set_limit is None:
+        return conversion(value)
+    limit = sys.get_int_max_str_digits()
+    set_limit(0)
+    try:
+        return conversion(value)
+    finally:
+        set_limit(limit)
+
+
+def long_decimal(p: int, q: int, g: int, rng: random.Random) -> str:
+    """
+    :return: the decimal string of a product of 16 random elements, 16 times as long as an element
+    """
+    return without_digit_limit(str, functools.reduce(lambda x, y: x * y, random_elements(p, q, g, rng, 16)))
+
+
+@register('decode_long', 'decode_decimal, 16 elements long', per_backend=True)
+def _decode_long(p, q, g, rng):
+    text = long_decimal(p, q, g, rng)
+    return lambda: number_decoding.decode_decimal(text)
+
+
+@register('decode_long', 'builtin int(s), 16 elements long')
+def _decode_long_builtin(p, q, g, rng):
+    text = long_decimal(p, q, g, rng)
+    return lambda: without_digit_limit(int, text)
+
+
+@register('is_prime', 'number.is_prime(p), 5 rounds', per_backend=True)
+def _is_prime(p, q, g, rng):
+    return lambda: number.is_prime(p)
+
+
+def measure(function, min_time: float) -> float:
+    """
+    measure the throughput of a callable, best of 3 runs of at least min_time seconds each
+    :param function: a callable taking no argument
+    :param min_time: the minimum duration of a run in seconds
+    :return: operations per second
+    """
+    timer = timeit.Timer(function)
+    loops = 1
+    while True:
+        elapsed = timer.timeit(loops)
+        if elapsed >= min_time:
+            break
+        loops = loops * 2 if elapsed <= 0 else max(loops * 2, int(loops * min_time / elapsed) + 1)
+    best = min([elapsed] + timer.repeat(repeat=2, number=loops))
+    return loops / best
+
+
+def run_number_benchmark(sizes=GROUP_SIZES, primitives=None, min_time=0.2, seed=0, backends=None) -> dict:
+    """
+    measure every variant of the primitives on operands of every size
+    :param sizes: the operand sizes, see get_group()
+    :param primitives: the primitive names to measure, all the registered ones if None
+    :param min_time: the minimum duration of a timed run in seconds
+    :param seed: seed of the random operands
+    :param backends: the big-integer backends of the variants going through number.py, all the available ones if None
+    :return: a json-serializable dictionary, size - primitive - list of variant measures
+    """
+    if backends is None:
+        backends = sorted(number.available_backends(), key=lambda name: name != 'python')
+    results = {}
+    standard_group = (number.LARGE_PRIME, number.SMALL_PRIME)
+    standard_backend = number.BACKEND.name
+    for size in sizes:
+        p, q, g = get_group(size)
+        # the primitives of number.py work in the group set at module level
+        number.set_group(p, q)
+        try:
+            results[size] = {}
+            for primitive, variants in CASES.items():
+                if primitives is not None and primitive not in primitives:
+                    continue
+                measures = []
+                for variant, factory, per_backend in variants:
+                    for backend in backends if per_backend else (None,):
+                        if backend is not None:
+                            number.set_backend(backend)
+                            variant_name = '{variant} [{backend}]'.format(variant=variant, backend=backend)
+                        else:
+                            variant_name = variant
+                        ops = measure(factory(p, q, g, random.Random(seed)), min_time)
+                        measures.append({'variant': variant_name, 'ops_per_second': round(ops, 1),
+                                         'relative': round(ops / measures[0]['ops_per_second'], 3) if measures
+                                         else 1.0})
+                results[size][primitive] = measures
+        finally:
+            number.set_group(*standard_group)
+            number.set_backend(standard_backend)
+    return results
+
+
+def write_number_report(results: dict, stream=None):
+    """
+    write a human-readable table of the results
+    :param results: the results of run_number_benchmark()
+    :param stream: the output stream, stdout by default
+    """
+    stream = stream or sys.stdout
+    for size, primitives in results.items():
+        stream.write('operands: {size}\n'.format(size=size))
+        for primitive, measures in primitives.items():
+            stream.write('    {primitive}\n'.format(primitive=primitive))
+            for m in measures:
+                stream.write('        {variant:<45} {ops:>14,.0f} ops/s   x{rel:.2f}\n'.format(
+                    variant=m['variant'], ops=m['ops_per_second'], rel=m['relative']))
+    stream.flush()
@@ -0,0 +1,172 @@
+import base64
+import binascii
+from . import number
+
+"""
+This module decodes the big numbers of a record, the step every loader goes through before the arithmetic of
+number.py. The records of this verifier write the numbers as decimal strings, while newer ElectionGuard record
+formats write them in hexadecimal, and binary formats as bytes or base64 text.
+
+Converting a decimal string to an integer is quadratic in CPython, about 10 microseconds for the 1,233 digits of a
+4096-bit number, paid for every pad, data and proof value of the record. The hexadecimal, base64 and binary forms
+convert in linear time, several times faster. A decimal string is converted by the big-integer backend, GMP being
+about twice as fast as the built-in int() at 4096 bits. A longer one is split in two at a power of ten and its
+halves are converted recursively and recombined with one multiplication, which is subquadratic with the Karatsuba
+multiplication of CPython. The split pays off only beyond a few thousand digits, so it is not used on the standard
+group. It also reads numbers past the 4,300-digit limit of int() in recent Python versions.
+
+The encoding of the record is detected on every number by default: the string is converted as decimal, and if it is
+not decimal as hexadecimal, with or without a 0x prefix, and otherwise as base64. Since int(), GMP and the base64
+decoder also take signs, underscores, whitespace or stray characters, each form is checked exactly: a decimal number
+is digits only, a hexadecimal number has no whitespace inside, and a base64 number is the canonical encoding of a
+non-empty number. An empty string is no number. The checks cost a fraction of a decimal conversion, so detecting
+costs nothing on a decimal record. A hexadecimal number without a letter is read as
+decimal, so a record written in hexadecimal should set its encoding with set_encoding(), or --number-encoding on the
+command line. For a 4096-bit number that case has a probability of about 10^-209, but it is real for small numbers.
+
+Function:
+    set_encoding(str)
+    decode_number(object)
+    is_decimal_text(str)
+    decode_decimal(str)
+    is_number_text(str)
+"""
+
+AUTO = 'auto'
+DECIMAL = 'decimal'
+HEX = 'hex'
+BASE64 = 'base64'
+ENCODINGS = (AUTO, DECIMAL, HEX, BASE64)
+
+ENCODING = AUTO
+
+# the number of digits up to which a decimal string is converted in one call, longer ones are split in two
+DECIMAL_CUTOFF = 2048
+
+# k - 10 ^ k, for the powers of two k the decimal strings are split at
+POWERS_OF_TEN = {}
+
+
+def set_encoding(encoding: str):
+    """
+    set the encoding of the number strings of the record
+    :param encoding: one of ENCODINGS, 'auto' to detect it on every number
+    """
+    global ENCODING
+    if encoding not in ENCODINGS:
+        raise ValueError("unknown number encoding {encoding}, expected one of {names}"
+                         .format(encoding=encoding, names=', '.join(ENCODINGS)))
+    ENCODING = encoding
+
+
+def decode_number(value) -> int:
+    """
+    decode a number of the record
+    :param value: an int, bytes or bytearray of a binary format, big-endian, or a string in the encoding of the record
+    :return: the number as an integer, a ValueError is raised if the string is not a number in that encoding
+    """
+    if type(value) is int:
+        return value
+    if isinstance(value, (bytes, bytearray)):
+        return int.from_bytes(value, byteorder='big')
+    if not isinstance(value, str):
+        # None or a float, reported by int() as in the rest of the verifier
+        return int(value)
+
+    if ENCODING != AUTO:
+        return DECODERS[ENCODING](value)
+    if is_decimal_text(value):
+        return __decode_decimal_text(value)
+    try:
+        return __decode_hex(value)
+    except ValueError:
+        pass
+    try:
+        return __decode_base64(value)
+    except ValueError:
+        raise ValueError("not a decimal, hexadecimal or base64 number: {text!r}".format(text=value[:40])) from None
+
+
+def is_decimal_text(text: str) -> bool:
+    """
+    check that a string only holds decimal digits, in a fraction of the time of its conversion
+    :param text: a string
+    :return: True if the string is a non-empty run of the digits 0 to 9
+    """
+    # str.isdigit() takes every unicode digit and is slower than the ascii check on bytes
+    return text.isascii() and text.encode('ascii').isdigit()
+
+
+def __decode_decimal_text(text: str) -> int:
+    """
+    :return: the decimal string as an integer
+    """
+    if not is_decimal_text(text):
+        raise ValueError("not a decimal number: {text!r}".format(text=text[:40]))
+    return number.BACKEND.from_decimal(text) if len(text) <= DECIMAL_CUTOFF else decode_decimal(text)
+
+
+def __decode_hex(text: str) -> int:
+    """
+    :return: the hexadecimal string, with or without a 0x prefix, as an integer
+    """
+    digits = text[2:] if text[:2] in ('0x', '0X') else text
+    if len(digits) % 2:
+        digits = '0' + digits
+    # fromhex() skips whitespace between the bytes, which shortens the result
+    raw = bytes.fromhex(digits)
+    if not raw or 2 * len(raw) != len(digits):
+        raise ValueError("not a hexadecimal number: {text!r}".format(text=text[:40]))
+    return int.from_bytes(raw, byteorder='big')
+
+
+def __decode_base64(text: str) -> int:
+    """
+    :return: the base64 string of a big-endian number as an integer
+    """
+    try:
+        raw = base64.b64decode(text, validate=True)
+    except ValueError:
+        # binascii.Error, or a non-ascii string
+        raw = b''
+    # decoding ignores the unused bits of the last character, only the canonical encoding is a number
+    if not raw or base64.b64encode(raw).decode('ascii') != text:
+        raise ValueError("not a base64 number: {text!r}".format(text=text[:40]))
+    return int.from_bytes(raw, byteorder='big')
+
+
+DECODERS = {DECIMAL: __decode_decimal_text, HEX: __decode_hex, BASE64: __decode_base64}
+
+
+def decode_decimal(text: str) -> int:
+    """
+    convert a decimal string by divide and conquer: the last k digits, k the largest power of two up to half the
+    length, and the digits before them are converted recursively, and recombined as high * 10 ^ k + low
+    :param text: a string of decimal digits
+    :return: the number as an integer
+    """
+    if len(text) <= DECIMAL_CUTOFF:
+        return number.BACKEND.from_decimal(text)
+    k = 1 << ((len(text) // 2).bit_length() - 1)
+    power = POWERS_OF_TEN.get(k)
+    if power is None:
+        power = POWERS_OF_TEN[k] = 10 ** k
+    return decode_decimal(text[:-k]) * power + decode_decimal(text[-k:])
+
+
+def is_number_text(text: str) -> bool:
+    """
+    check a number string without converting it from decimal, it is a number exactly when decode_number() accepts it
+    :param text: a string
+    :return: True if the string is a number in the encoding of the record, or in any of them when it is detected
+    """
+    if ENCODING in (AUTO, DECIMAL) and is_decimal_text(text):
+        return True
+    if ENCODING == DECIMAL:
+        return False
+    # the hexadecimal and base64 conversions are linear, about the cost of a check
+    try:
+        decode_number(text)
+    except ValueError:
+        return False
+    return True
@@ -0,0 +1,261 @@
+import os
+import mmap
+import struct
+import hashlib
+from . import number
+
+"""
+This module precomputes fixed-base exponentiation tables and keeps them on disk between runs.
+
+Most of the modular exponentiations of a record raise the same few bases, the generator g, the joint public key K and
+the public key Ki of every guardian, to exponents below q. A table of the powers base ^ (d * 2 ^ (w * i)) mod p, for
+every window i of w bits of the exponent and every digit d, turns such an exponentiation into one multiplication per
+window: 32 instead of about 300 for a 256-bit exponent with 8-bit windows.
+
+The tables only depend on p, q and the base, so they are the same for every run over the same election and for every
+worker process. A store serializes them to a folder, one file per (p, base), and maps the files back into memory:
+processes verifying the same record, e.g. the shards on one machine, share a single copy through the page cache
+instead of rebuilding and holding their own. Every file carries a sha256 checksum of its content, checked before
+the table is used; a table that does not match is rebuilt.
+
+Class:
+    FixedBaseTable
+    MappedEntries
+    PrecomputationStore
+
+Function:
+    precompute_record_bases(ParameterGenerator, PrecomputationStore)
+"""
+
+DEFAULT_WINDOW = 8
+
+
+class FixedBaseTable:
+    """
+    Fixed-base exponentiation table of one base modulo p, for exponents of up to exponent_bits bits.
+    Entry row * 2 ^ window + digit holds base ^ (digit * 2 ^ (window * row)) mod p.
+
+    Method:
+        build(int, int, int, int)
+        pow(int)
+    """
+
+    def __init__(self, base: int, modulus: int, window: int, exponent_bits: int, entries):
+        """
+        :param base: the fixed base
+        :param modulus: the modulus p
+        :param window: the number of exponent bits per row
+        :param exponent_bits: the largest exponent size served by the table
+        :param entries: the entries, a list of ints or any sequence of ints such as MappedEntries
+        """
+        self.base = base
+        self.modulus = modulus
+        self.window = window
+        self.exponent_bits = exponent_bits
+        self.rows = -(-exponent_bits // window)
+        self.limit = 1 << (self.rows * window)
+        self.entries = entries
+
+    @classmethod
+    def build(cls, base: int, modulus: int, exponent_bits: int, window=DEFAULT_WINDOW) -> 'FixedBaseTable':
+        """
+        compute the table of a base
+        :param base: the fixed base
+        :param modulus: the modulus p
+        :param exponent_bits: the largest exponent size served by the table, the bit length of q
+        :param window: the number of exponent bits per row
+        :return: a table held in memory
+        """
+        digits = 1 << window
+        entries = []
+        row_base = base % modulus
+        for _ in range(-(-exponent_bits // window)):
+            power = 1
+            for _ in range(digits):
+                entries.append(power)
+                power = power * row_base % modulus
+            # power is now row_base ^ (2 ^ window), the base of the next row
+            row_base = power
+        return cls(base, modulus, window, exponent_bits, entries)
+
+    def pow(self, exponent: int) -> int:
+        """
+        raise the base to an exponent within 0 and 2 ^ (rows * window)
+        :param exponent: the exponent
+        :return: base ^ exponent mod p
+        """
+        entries, window = self.entries, self.window
+        # the products run in the integer type of the big-integer backend, e.g. gmpy2.mpz
+        modulus = number.BACKEND.native(self.modulus)
+        mask = (1 << window) - 1
+        result = number.BACKEND.native(1)
+        offset = 0
+        while exponent:
+            digit = exponent & mask
+            if digit:
+                result = result * entries[offset + digit] % modulus
+            exponent >>= window
+            offset += mask + 1
+        return int(result % modulus)
+
+
+class MappedEntries:
+    """
+    Read-only view of the entries of a table file, every entry being decoded from the mapped file when it is read,
+    so that the table is never copied into the memory of the process.
+    """
+
+    def __init__(self, data, offset: int, entry_size: int, count: int):
+        self.data = data
+        self.offset = offset
+        self.entry_size = entry_size
+        self.count = count
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(self, index: int) -> int:
+        # past the entries a slice of the map reads as 0, so the end is signalled for iteration to stop
+        if not 0 <= index < self.count:
+            raise IndexError(index)
+        start = self.offset + index * self.entry_size
+        return int.from_bytes(self.data[start:start + self.entry_size], byteorder='big')
+
+
+class PrecomputationStore:
+    """
+    Folder of table files, one per (p, base, window). A file holds a header with the table layout and the sha256
+    checksum of the rest of the file, then p, the base and the entries, all as big-endian integers of the byte size
+    of p.
+
+    Method:
+        get(int, int, int)
+        load(int, int, int)
+        save(FixedBaseTable)
+        close()
+    """
+
+    MAGIC = b'EGTABLE1\n'
+    HEADER = struct.Struct('>III32s')
+    SUFFIX = '.egtable'
+
+    def __init__(self, folder: str, window=DEFAULT_WINDOW):
+        """
+        :param folder: the folder of the table files, created if missing
+        :param window: the number of exponent bits per row of the tables built by this store
+        """
+        self.folder = folder
+        self.window = window
+        self.maps = []
+        os.makedirs(folder, exist_ok=True)
+
+    def get_path(self, base: int, modulus: int, exponent_bits: int) -> str:
+        """
+        :return: the path of the table file of a base
+        """
+        key = hashlib.sha256('{p}|{b}|{w}|{e}'.format(p=modulus, b=base, w=self.window, e=exponent_bits)
+                             .encode('utf-8')).hexdigest()
+        return os.path.join(self.folder, key[:32] + self.SUFFIX)
+
+    def get(self, base: int, modulus: int, exponent_bits: int) -> FixedBaseTable:
+        """
+        get the table of a base, loading it from the store, or building and saving it if it is missing or invalid
+        :param base: the fixed base
+        :param modulus: the modulus p
+        :param exponent_bits: the largest exponent size served by the table, the bit length of q
+        :return: a table
+        """
+        table = self.load(base, modulus, exponent_bits)
+        if table is None:
+            self.save(FixedBaseTable.build(base, modulus, exponent_bits, self.window))
+            table = self.load(base, modulus, exponent_bits)
+        return table
+
+    def load(self, base: int, modulus: int, exponent_bits: int):
+        """
+        map the table file of a base into memory and validate it
+        :param base: the fixed base
+        :param modulus: the modulus p
+        :param exponent_bits: the largest exponent size served by the table
+        :return: a table reading its entries from the file, or None if the file is missing, truncated, does not
+                 match its checksum or belongs to another base
+        """
+        try:
+            file = open(self.get_path(base, modulus, exponent_bits), 'rb')
+        except FileNotFoundError:
+            return None
+        with file:
+            try:
+                data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # an empty file cannot be mapped
+                return None
+
+        start = len(self.MAGIC) + self.HEADER.size
+        if len(data) < start or data[:len(self.MAGIC)] != self.MAGIC:
+            data.close()
+            return None
+        window, table_bits, entry_size, checksum = self.HEADER.unpack(data[len(self.MAGIC):start])
+        table = FixedBaseTable(base, modulus, window, table_bits, None)
+        count = table.rows << window
+        valid = (window == self.window and table_bits == exponent_bits
+                 and len(data) == start + (count + 2) * entry_size
+                 and hashlib.sha256(data[start:]).digest() == checksum
+                 and int.from_bytes(data[start:start + entry_size], byteorder='big') == modulus
+                 and int.from_bytes(data[start + entry_size:start + 2 * entry_size], byteorder='big') == base)
+        if not valid:
+            data.close()
+            return None
+
+        self.maps.append(data)
+        table.entries = MappedEntries(data, start + 2 * entry_size, entry_size, count)
+        return table
+
+    def save(self, table: FixedBaseTable):
+        """
+        write the file of a table, replacing it atomically so that concurrent processes never map a partial file
+        :param table: a table
+        """
+        entry_size = (table.modulus.bit_length() + 7) // 8
+        digest = hashlib.sha256()
+        content = [table.modulus.to_bytes(entry_size, byteorder='big'),
+                   table.base.to_bytes(entry_size, byteorder='big')]
+        content.extend(entry.to_bytes(entry_size, byteorder='big') for entry in table.entries)
+        for chunk in content:
+            digest.update(chunk)
+
+        path = self.get_path(table.base, table.modulus, table.exponent_bits)
+        temp_path = '{path}.{pid}.tmp'.format(path=path, pid=os.getpid())
+        with open(temp_path, 'wb') as file:
+            file.write(self.MAGIC)
+            file.write(self.HEADER.pack(table.window, table.exponent_bits, entry_size, digest.digest()))
+            file.writelines(content)
+        os.replace(temp_path, path)
+
+    def close(self):
+        """
+        unmap the tables loaded by this store, which must not be used afterwards
+        """
+        for data in self.maps:
+            data.close()
+        self.maps = []
+
+
+def precompute_record_bases(param_g, store: PrecomputationStore) -> list:
+    """
+    load or build the tables of the fixed bases of a record, g, K and the public key of every guardian, and register
+    them with number.pow_mod()
+    :param param_g: the parameter generator of the record
+    :param store: the store of the tables
+    :return: the tables
+    """
+    modulus = param_g.get_large_prime()
+    exponent_bits = param_g.get_small_prime().bit_length()
+    bases = [param_g.get_generator(), param_g.get_elgamal_key()] + param_g.get_public_keys_of_all_guardians()
+
+    tables = []
+    for base in dict.fromkeys(int(base) for base in bases):
+        table = store.get(base, modulus, exponent_bits)
+        number.add_fixed_base(table)
+        tables.append(table)
+    return tables
@@ -0,0 +1,118 @@
+import collections
+import queue
+import threading
+
+"""
+This module overlaps the reading and parsing of record files with their verification. While the verifiers work on
+one ballot, background threads already read and parse the next ones, so that neither the CPU waits on the disk nor
+the disk waits on the CPU, which matters most on network-attached storage.
+
+Both pipelines are bounded: at most 'depth' items are read ahead of the consumer, so the memory held stays
+proportional to the depth and not to the size of the record. Items always come out in the order of the input, and
+closing the consumer early, e.g. on a fail-fast abort, stops the readers.
+
+Function:
+    prefetch_map(function, iterable, int, int)
+    prefetch_iter(iterable, int)
+"""
+
+
+def prefetch_map(function, items, depth: int, workers: int):
+    """
+    apply a function to every item in a pool of reader threads, keeping up to 'depth' results ready ahead of the
+    consumer
+    :param function: the loading function, e.g. reading and parsing a file given its path
+    :param items: an iterable of function inputs
+    :param depth: the number of items read ahead, 0 to call the function in the consumer thread
+    :param workers: the number of reader threads
+    :return: a generator of (item, function(item)) tuples in the order of the items
+    """
+    if depth <= 0:
+        for item in items:
+            yield item, function(item)
+        return
+
+    # imported on first use, the pool being idle in the runs reading a few files only
+    from concurrent.futures import ThreadPoolExecutor
+    items = iter(items)
+    pending = collections.deque()
+    executor = ThreadPoolExecutor(max_workers=max(1, workers))
+    try:
+        for item in items:
+            pending.append((item, executor.submit(function, item)))
+            if len(pending) >= depth:
+                break
+
+        while pending:
+            item, future = pending.popleft()
+            # back-pressure: a new read is only submitted once an older item has been handed to the consumer
+            for next_item in items:
+                pending.append((next_item, executor.submit(function, next_item)))
+                break
+            yield item, future.result()
+    finally:
+        for _, future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
+
+
+class _Failure:
+    """
+    Carries an exception raised by the producer thread of prefetch_iter to the consumer.
+    """
+
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+_END = object()
+
+
+def prefetch_iter(iterable, depth: int):
+    """
+    run an iterator in a background thread, keeping up to 'depth' values ready ahead of the consumer. Meant for
+    sources that can only be read sequentially, e.g. a compressed archive.
+    :param iterable: the iterable to run in the background
+    :param depth: the number of values read ahead, 0 to iterate in the consumer thread
+    :return: a generator of the values of the iterable, in order
+    """
+    if depth <= 0:
+        yield from iterable
+        return
+
+    values = queue.Queue(maxsize=depth)
+    stopped = threading.Event()
+
+    def put(value) -> bool:
+        # a full queue blocks the producer until the consumer catches up, or gives up once the consumer stopped
+        while not stopped.is_set():
+            try:
+                values.put(value, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for value in iterable:
+                if not put(value):
+                    return
+        except BaseException as error:
+            put(_Failure(error))
+            return
+        put(_END)
+
+    producer = threading.Thread(target=produce, name='verifier-prefetch', daemon=True)
+    producer.start()
+    try:
+        while True:
+            value = values.get()
+            if value is _END:
+                return
+            if isinstance(value, _Failure):
+                raise value.error
+            yield value
+    finally:
+        stopped.set()
+        producer.join()
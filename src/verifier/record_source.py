@@ -0,0 +1,264 @@
+import os
+import re
+import json
+import mmap
+import struct
+import posixpath
+from . import metrics
+
+"""
+This module abstracts where the files of an election record are stored. A record source scans its storage once,
+the first time it is needed, and keeps an in-memory index of the files of the record: their folder, size and
+modification time, and the coefficient file of each guardian by index. Every later listing or count is answered
+from the index, so no getter walks the storage again.
+
+File names are always relative to the record root and use '/' as separator, e.g. 'encrypted_ballots/ballot-1.json',
+whatever the backend. The backends are a folder on disk (this module), a zip or tar archive (archive.py) and a packed
+bundle, a single file holding every document of the record behind an index (this module).
+
+Class:
+    RecordEntry
+    RecordSource
+    FolderRecordSource
+    PackedRecordSource
+
+Function:
+    normalize_name(str)
+    write_packed_record(RecordSource, str)
+"""
+
+COEFFICIENTS_FOLDER = 'coefficients'
+GUARDIAN_INDEX_PATTERN = re.compile(r'(\d+)\.json$')
+
+
+def normalize_name(name: str) -> str:
+    """
+    normalize a file name of the record, so that paths built by string concatenation, which may contain duplicated
+    or leading separators, match the names of the index
+    :param name: a file name or a path relative to the record root
+    :return: the normalized name, without leading separator
+    """
+    name = posixpath.normpath(name.replace('\\', '/')).lstrip('/')
+    return '' if name == '.' else name
+
+
+class RecordEntry:
+    """
+    A file of the record in the index of a record source.
+
+    Attributes:
+        name: str
+            the normalized name relative to the record root
+        size: int
+            the size of the file in bytes
+        mtime: float
+            the modification time of the file, 0 if the backend does not keep it
+    """
+    __slots__ = ('name', 'size', 'mtime')
+
+    def __init__(self, name: str, size: int, mtime: float):
+        self.name = name
+        self.size = size
+        self.mtime = mtime
+
+
+class RecordSource:
+    """
+    Base class of the record backends. A backend implements _scan(), which lists the files of its storage once,
+    and read(), which returns the content of one file.
+
+    Method:
+        names()
+        list_folder(str)
+        stat(str)
+        get_guardian_file(int)
+        read(str)
+        iter_folder(str, function)
+        close()
+    """
+
+    # True if the files can only be read in storage order, e.g. a compressed tar, see iter_folder()
+    sequential = False
+
+    def __init__(self):
+        self.entries = None
+        self.folders = None
+        self.guardian_files = None
+
+    def _scan(self):
+        """
+        list the regular files of the storage, called once
+        :return: an iterable of RecordEntry, named relative to the record root
+        """
+        raise NotImplementedError
+
+    def __index(self):
+        """
+        build the in-memory index on first use
+        """
+        if self.entries is not None:
+            return
+
+        entries, folders, guardian_files = {}, {}, {}
+        for entry in self._scan():
+            entries[entry.name] = entry
+            folder = posixpath.dirname(entry.name)
+            folders.setdefault(folder, []).append(entry.name)
+            if folder == COEFFICIENTS_FOLDER:
+                match = GUARDIAN_INDEX_PATTERN.search(entry.name)
+                if match:
+                    guardian_files[int(match.group(1))] = entry.name
+        for names in folders.values():
+            names.sort()
+
+        self.entries, self.folders, self.guardian_files = entries, folders, guardian_files
+
+    def names(self) -> list:
+        """
+        :return: the names of all the files of the record
+        """
+        self.__index()
+        return list(self.entries)
+
+    def list_folder(self, folder: str) -> list:
+        """
+        list the files directly inside a folder of the record
+        :param folder: the normalized folder name, '' for the record root
+        :return: a sorted list of file names
+        """
+        self.__index()
+        return self.folders.get(folder, [])
+
+    def stat(self, name: str):
+        """
+        get the index entry of a file
+        :param name: the normalized file name
+        :return: a RecordEntry, or None if there is no such file
+        """
+        self.__index()
+        return self.entries.get(name)
+
+    def get_guardian_file(self, index: int):
+        """
+        get the coefficient file of a guardian, whatever the prefix of the file names
+        :param index: index of a guardian, (0 - number of guardians)
+        :return: the normalized file name, or None if no coefficient file ends with this index
+        """
+        self.__index()
+        return self.guardian_files.get(index)
+
+    def read(self, name: str) -> bytes:
+        """
+        read the content of a file of the record
+        :param name: the normalized file name
+        :return: the content of the file, or None if there is no such file
+        """
+        raise NotImplementedError
+
+    def iter_folder(self, folder: str, selected):
+        """
+        read the selected files directly inside a folder of the record, in the order of list_folder(), or in storage
+        order for a sequential source, stable across runs on the same record
+        :param folder: the normalized folder name
+        :param selected: a predicate on the file name
+        :return: a generator of (file name, content) tuples
+        """
+        for name in self.list_folder(folder):
+            if selected(name):
+                yield name, self.read(name)
+
+    def close(self):
+        """
+        release the storage of the record
+        """
+        pass
+
+
+class FolderRecordSource(RecordSource):
+    """
+    Record stored as a folder tree on disk, the usual layout of a published record.
+    """
+
+    def __init__(self, root_folder_path: str):
+        super().__init__()
+        self.root = root_folder_path
+
+    def _scan(self):
+        for folder, _, files in os.walk(self.root):
+            relative_folder = os.path.relpath(folder, self.root)
+            for file_name in files:
+                stat = os.stat(os.path.join(folder, file_name))
+                yield RecordEntry(normalize_name(posixpath.join(relative_folder, file_name)), stat.st_size,
+                                  stat.st_mtime)
+
+    def read(self, name: str) -> bytes:
+        if metrics.ACTIVE is not None:
+            metrics.ACTIVE.count('files_opened')
+        try:
+            with open(os.path.join(self.root, name), 'rb') as file:
+                return file.read()
+        except FileNotFoundError:
+            return None
+
+
+class PackedRecordSource(RecordSource):
+    """
+    Record stored as a packed bundle written by write_packed_record(): a header, a json index of the files and
+    their offsets, then the content of every file back to back. The bundle is memory-mapped, so any file is read
+    with a single slice and no system call, from any thread.
+    """
+
+    MAGIC = b'EGRECORD1\n'
+    HEADER = struct.Struct('>Q')
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.file = open(path, 'rb')
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.data[:len(self.MAGIC)] != self.MAGIC:
+            raise ValueError("{path} is not a packed election record".format(path=path))
+        start = len(self.MAGIC) + self.HEADER.size
+        index_size, = self.HEADER.unpack(self.data[len(self.MAGIC):start])
+        self.offsets = {}
+        self.raw_entries = []
+        for name, offset, size, mtime in json.loads(self.data[start:start + index_size].decode('utf-8')):
+            self.offsets[name] = (start + index_size + offset, size)
+            self.raw_entries.append(RecordEntry(name, size, mtime))
+
+    def _scan(self):
+        return self.raw_entries
+
+    def read(self, name: str) -> bytes:
+        location = self.offsets.get(name)
+        if location is None:
+            return None
+        offset, size = location
+        return self.data[offset:offset + size]
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+
+def write_packed_record(source: RecordSource, path: str):
+    """
+    pack every file of a record into a single bundle readable by PackedRecordSource
+    :param source: the record to pack, from any backend
+    :param path: path of the bundle to write
+    """
+    index, offset = [], 0
+    for name in sorted(source.names()):
+        entry = source.stat(name)
+        index.append([name, offset, entry.size, entry.mtime])
+        offset += entry.size
+    index_bytes = json.dumps(index).encode('utf-8')
+
+    with open(path, 'wb') as file:
+        file.write(PackedRecordSource.MAGIC)
+        file.write(PackedRecordSource.HEADER.pack(len(index_bytes)))
+        file.write(index_bytes)
+        for name, _, size, _ in index:
+            content = source.read(name)
+            if len(content) != size:
+                raise ValueError("{name} changed while packing the record".format(name=name))
+            file.write(content)
@@ -0,0 +1,67 @@
+import json
+from .number_decoding import decode_number
+
+"""
+This module decodes the numbers of the record lazily. The documents of a record write every big number as a decimal
+string, 1,233 digits for the standard 4096-bit group, and converting one to an integer costs about as much as
+parsing the rest of a selection. The verifiers used to convert every number of a selection or a share up front, and
+the range, Zq and Zrp checks converted them again, while a fail-fast or a sampled run never looks at most of them.
+
+The documents are parsed into LazyDocument objects instead of plain dictionaries: the raw strings are kept, and
+get_number() decodes a field on its first access, see number_decoding.py, and caches the integer on the document, so
+that every number is decoded at most once, and only if a check needs it. A LazyDocument is a dict, so the rest of the
+code reads it as before. A document must not be modified once its numbers have been read.
+
+Class:
+    LazyDocument
+
+Function:
+    parse_document(bytes)
+    get_number(dict, str)
+"""
+
+
+class LazyDocument(dict):
+    """
+    A json object of the record, with a cache of its decoded number fields.
+
+    Method:
+        get_number(str)
+    """
+    __slots__ = ('numbers',)
+
+    def get_number(self, key: str) -> int:
+        """
+        decode a number field on its first access, cached for the next ones
+        :param key: the field name
+        :return: the field as an integer
+        """
+        try:
+            return self.numbers[key]
+        except AttributeError:
+            self.numbers = {}
+        except KeyError:
+            pass
+        number = self.numbers[key] = decode_number(self.get(key))
+        return number
+
+
+def parse_document(content) -> LazyDocument:
+    """
+    parse a json document of the record into LazyDocument objects
+    :param content: the content of the file, as bytes or str
+    :return: the parsed document
+    """
+    return json.loads(content, object_pairs_hook=LazyDocument)
+
+
+def get_number(document: dict, key: str) -> int:
+    """
+    get a number field of a document, through the cache of a LazyDocument, decoded on every call otherwise
+    :param document: a LazyDocument, or a plain dictionary built by other code, e.g. the synthetic generator
+    :param key: the field name
+    :return: the field as an integer
+    """
+    if type(document) is LazyDocument:
+        return document.get_number(key)
+    return decode_number(document.get(key))
@@ -0,0 +1,377 @@
+import sys
+import json
+
+"""
+This module holds the structured outcome of a verification run. Instead of printing from inside the verification
+loops, every level of verifier (box, ballot, contest, selection, share) returns a Result describing which checks
+failed and why, and the top-level verifiers hand their results to a sink that decides what to output.
+
+A Result only keeps the children that failed, so both the memory held and the output written are proportional
+to the number of failures, not to the amount of work done.
+
+Class:
+    Reason
+    Failure
+    Result
+    ResultSink
+    SummarySink
+    ConsoleSink
+    JsonLinesSink
+    MultiSink
+"""
+
+
+class Reason:
+    """
+    Reason codes attached to every failure, stable strings that can be grepped or aggregated by downstream tools.
+    """
+    # schema validation of the documents, before any check
+    MALFORMED_JSON = 'malformed_json'
+    MISSING_DOCUMENT = 'missing_document'
+    MISSING_FIELD = 'missing_field'
+    INVALID_FIELD = 'invalid_field'
+
+    # box 1, baseline parameters
+    LARGE_PRIME = 'large_prime'
+    SMALL_PRIME = 'small_prime'
+    COFACTOR = 'cofactor'
+    COFACTOR_DIVISIBLE = 'cofactor_divisible_by_q'
+    GENERATOR_RANGE = 'generator_range'
+    GENERATOR_ORDER = 'generator_order'
+
+    # group membership checks
+    NOT_IN_ZRP = 'not_in_zrp'
+    NOT_IN_ZQ = 'not_in_zq'
+
+    # proof checks
+    CHALLENGE = 'challenge_mismatch'
+    EQUATION = 'equation'
+    ZERO_PROOF = 'zero_proof'
+    ONE_PROOF = 'one_proof'
+
+    # ballot structure
+    PLACEHOLDER_COUNT = 'placeholder_count'
+    SELECTION_COUNT = 'selection_count'
+    UNKNOWN_CONTEST = 'unknown_contest'
+    UNKNOWN_SELECTION = 'unknown_selection'
+    BALLOT_STATE = 'ballot_state'
+    TIMESTAMP_ORDER = 'timestamp_order'
+    TRACKING_HASH = 'tracking_hash'
+    TRACKING_CHAIN = 'tracking_chain'
+
+    # sharded runs
+    MISSING_SHARD = 'missing_shard'
+    MISSING_BALLOT = 'missing_ballot'
+    DUPLICATE_BALLOT = 'duplicate_ballot'
+
+    # replayed ballots
+    DUPLICATE_BALLOT_ID = 'duplicate_ballot_id'
+    DUPLICATE_CIPHERTEXT = 'duplicate_ciphertext'
+    DUPLICATE_COMMITMENT = 'duplicate_commitment'
+
+    # decryption
+    TALLY_MISMATCH = 'tally_mismatch'
+    PLAINTEXT = 'plaintext_mismatch'
+    TALLY_COUNT = 'tally_count'
+
+    # compensated decryption of missing guardians
+    UNKNOWN_GUARDIAN = 'unknown_guardian'
+    RECOVERY_KEY = 'recovery_key_mismatch'
+    QUORUM = 'quorum'
+    RECOMBINATION = 'recombination_mismatch'
+
+
+class Failure:
+    """
+    A single failed check inside a Result.
+
+    Attributes:
+        code: str
+            one of the Reason codes
+        box: int
+            the specification box the failed check belongs to
+        field: str
+            name of the offending field, or None if the check is not about a single field
+    """
+    __slots__ = ('code', 'box', 'field')
+
+    def __init__(self, code: str, box: int, field=None):
+        self.code = code
+        self.box = box
+        self.field = field
+
+    def to_dict(self) -> dict:
+        """
+        get a json-serializable representation of this failure
+        :return: a dictionary of code, box and field
+        """
+        dic = {'code': self.code, 'box': self.box}
+        if self.field is not None:
+            dic['field'] = self.field
+        return dic
+
+
+class Result:
+    """
+    The outcome of verifying one item at a given level, e.g. a ballot, a contest or a whole box.
+
+    Attributes:
+        level: str
+            'box', 'document', 'guardian', 'ballot', 'contest', 'selection' or 'share'
+        item_id: str
+            the identifier of the verified item, usually its 'object_id'
+        box: int
+            the default specification box of the failures recorded on this item
+        failures: list
+            Failure instances recorded directly on this item
+        children: list
+            Results of the sub-items that failed, successful sub-items are counted but not kept
+        checked: int
+            the number of sub-items verified under this item
+        details: dict
+            extra information about how the item was verified, e.g. the sample seed of a sampled run, or None
+    """
+    __slots__ = ('level', 'item_id', 'box', 'failures', 'children', 'checked', 'details')
+
+    def __init__(self, level: str, item_id, box=None):
+        self.level = level
+        self.item_id = item_id
+        self.box = box
+        self.failures = []
+        self.children = []
+        self.checked = 0
+        self.details = None
+
+    @property
+    def ok(self) -> bool:
+        """
+        :return: True if neither this item nor any of its sub-items failed
+        """
+        return not self.failures and not self.children
+
+    def __bool__(self) -> bool:
+        return self.ok
+
+    def fail(self, code: str, box=None, field=None) -> bool:
+        """
+        record a failed check on this item
+        :param code: a Reason code
+        :param box: the specification box of this check, defaults to the box of this result
+        :param field: the offending field name, if any
+        :return: False, so that a check can end with "return result.fail(...)"
+        """
+        self.failures.append(Failure(code, self.box if box is None else box, field))
+        return False
+
+    def add(self, child: 'Result') -> bool:
+        """
+        count a verified sub-item, keeping it only if it failed
+        :param child: the Result of a sub-item
+        :return: True if the sub-item passed, False otherwise
+        """
+        self.checked += 1
+        if child.ok:
+            return True
+        self.children.append(child)
+        return False
+
+    def failed_boxes(self) -> set:
+        """
+        get the specification boxes that have at least one failure anywhere under this item
+        :return: a set of box numbers
+        """
+        boxes = {failure.box for failure in self.failures}
+        for child in self.children:
+            boxes |= child.failed_boxes()
+        return boxes
+
+    def is_ok_for_box(self, box: int) -> bool:
+        """
+        check if this item passed every check belonging to a given box
+        :param box: the box number
+        :return: True if no failure under this item belongs to the box
+        """
+        return box not in self.failed_boxes()
+
+    def iter_failures(self, path=()):
+        """
+        walk every failure under this item
+        :param path: the ids of the enclosing items
+        :return: a generator of (path, Failure) tuples, path being a tuple of item ids from this item downwards
+        """
+        path = path + (self.item_id,)
+        for failure in self.failures:
+            yield path, failure
+        for child in self.children:
+            yield from child.iter_failures(path)
+
+    def to_dict(self) -> dict:
+        """
+        get a json-serializable representation of this result, including the failed sub-items
+        :return: a nested dictionary
+        """
+        dic = {'level': self.level, 'id': self.item_id, 'ok': self.ok, 'checked': self.checked}
+        if self.box is not None:
+            dic['box'] = self.box
+        if self.details:
+            dic['details'] = self.details
+        if self.failures:
+            dic['failures'] = [failure.to_dict() for failure in self.failures]
+        if self.children:
+            dic['children'] = [child.to_dict() for child in self.children]
+        return dic
+
+    @classmethod
+    def from_dict(cls, dic: dict) -> 'Result':
+        """
+        rebuild a result from its to_dict() representation, e.g. when merging partial results
+        :param dic: a dictionary as returned by to_dict()
+        :return: a Result
+        """
+        result = cls(dic.get('level'), dic.get('id'), dic.get('box'))
+        result.checked = dic.get('checked', 0)
+        result.details = dic.get('details')
+        result.failures = [Failure(f.get('code'), f.get('box'), f.get('field')) for f in dic.get('failures', [])]
+        result.children = [cls.from_dict(child) for child in dic.get('children', [])]
+        return result
+
+
+class ResultSink:
+    """
+    Base class of all the result sinks. The top-level verifiers emit one result per ballot, guardian or spoiled
+    ballot, and one result per box once the box is finished; a sink decides what gets written.
+
+    Method:
+        emit(Result)
+        close()
+    """
+
+    def emit(self, result: Result):
+        """
+        receive a result from a verifier
+        :param result: the result of a top-level item or of a whole box
+        """
+        pass
+
+    def close(self):
+        """
+        flush whatever the sink has buffered, called once at the end of a run
+        """
+        pass
+
+
+class SummarySink(ResultSink):
+    """
+    Quiet sink, counts items and failures and only writes one line per box when the run is closed.
+    """
+
+    def __init__(self, stream=None):
+        self.stream = stream
+        self.box_results = []
+        self.num_items = 0
+        self.num_failed_items = 0
+
+    def emit(self, result: Result):
+        if result.level == 'box':
+            self.box_results.append(result)
+        else:
+            self.num_items += 1
+            if not result.ok:
+                self.num_failed_items += 1
+
+    def close(self):
+        stream = self.stream or sys.stdout
+        for result in self.box_results:
+            status = 'success' if result.ok else 'failure, {n} failed'.format(n=len(result.children) or
+                                                                             len(result.failures))
+            stream.write('{name}: {checked} checked, {status}\n'.format(name=result.item_id, checked=result.checked,
+                                                                      status=status))
+            if result.details:
+                stream.write('    {details}\n'.format(details=json.dumps(result.details)))
+        stream.flush()
+
+
+class ConsoleSink(ResultSink):
+    """
+    Human-readable sink, prints every failure with the path of the item it belongs to, and one status line per box.
+    """
+
+    def __init__(self, stream=None):
+        self.stream = stream
+
+    def emit(self, result: Result):
+        stream = self.stream or sys.stdout
+        if result.level != 'box':
+            self.__write_failures(stream, result)
+            return
+
+        # failed sub-items of a box have already been written when they were emitted
+        for failure in result.failures:
+            self.__write_failure(stream, (result.item_id,), failure)
+        if result.ok:
+            stream.write('[{name}] verification success. \n'.format(name=result.item_id))
+        elif not result.children:
+            stream.write('[{name}] verification failure. \n'.format(name=result.item_id))
+        else:
+            stream.write('[{name}] verification failure, {n} of {checked} failed. \n'
+                         .format(name=result.item_id, n=len(result.children), checked=result.checked))
+        if result.details:
+            stream.write('    ' + ', '.join('{k}: {v}'.format(k=k, v=v) for k, v in result.details.items()) + '\n')
+
+    def __write_failures(self, stream, result: Result):
+        """
+        write every failure under an item, one line each
+        :param stream: the output stream
+        :param result: the result of an item
+        """
+        for path, failure in result.iter_failures():
+            self.__write_failure(stream, path, failure)
+
+    @staticmethod
+    def __write_failure(stream, path: tuple, failure: Failure):
+        """
+        write one failure as "ballot / contest / selection [box n] code (field)"
+        :param stream: the output stream
+        :param path: the ids of the items enclosing the failure
+        :param failure: the failure
+        """
+        line = '{path} [box {box}] {code}'.format(path=' / '.join(str(p) for p in path), box=failure.box,
+                                                  code=failure.code)
+        if failure.field is not None:
+            line += ' ({field})'.format(field=failure.field)
+        stream.write(line + '\n')
+
+
+class JsonLinesSink(ResultSink):
+    """
+    Streaming sink, writes one json object per line for every failed item and every box result.
+    Successful items are only written when verbose is set.
+    """
+
+    def __init__(self, file_path: str, verbose=False):
+        self.file = open(file_path, 'w')
+        self.verbose = verbose
+
+    def emit(self, result: Result):
+        if result.level == 'box' or self.verbose or not result.ok:
+            self.file.write(json.dumps(result.to_dict()) + '\n')
+
+    def close(self):
+        self.file.close()
+
+
+class MultiSink(ResultSink):
+    """
+    Forwards every result to several sinks, e.g. a console sink and a json lines file at the same time.
+    """
+
+    def __init__(self, *sinks: ResultSink):
+        self.sinks = sinks
+
+    def emit(self, result: Result):
+        for sink in self.sinks:
+            sink.emit(result)
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
@@ -0,0 +1,149 @@
+import math
+import random
+
+"""
+This module supports the sampling mode of the ballot verification (box 3 & 4). Instead of running the full
+cryptographic checks on every ballot, a seeded random sample of ballots is verified and the result is reported
+together with the confidence it gives on the whole record. The cheap structural checks and the tracking hash chain
+still cover every ballot.
+
+Class:
+    BallotSampler
+"""
+
+
+class BallotSampler:
+    """
+    This class picks a reproducible random sample of ballots and computes the confidence bound a clean sample gives.
+
+    The sample size is either given directly, or derived from a confidence target: the smallest sample such that, if
+    a fraction 'tolerance' of the ballots were invalid, at least one of them would be drawn with probability
+    'confidence'. Bounds are computed from the hypergeometric distribution, i.e. sampling without replacement.
+
+    Method:
+        get_sample_size(int)
+        select(int)
+        report(int, int)
+    """
+
+    DEFAULT_CONFIDENCE = 0.95
+    DEFAULT_TOLERANCE = 0.01
+
+    def __init__(self, sample_size=None, confidence=None, tolerance=None, seed=None):
+        """
+        :param sample_size: fixed number of ballots to verify, takes precedence over the confidence target
+        :param confidence: confidence target between 0 and 1, defaults to 0.95
+        :param tolerance: fraction of invalid ballots that should be detected with the confidence target,
+                          defaults to 0.01
+        :param seed: seed of the random sample, a random seed is drawn and reported if not given
+        """
+        if sample_size is not None and sample_size < 0:
+            raise ValueError("sample size must not be negative")
+        if confidence is not None and not 0 < confidence < 1:
+            raise ValueError("confidence must be between 0 and 1")
+        if tolerance is not None and not 0 < tolerance < 1:
+            raise ValueError("tolerance must be between 0 and 1")
+
+        self.sample_size = sample_size
+        self.confidence = confidence if confidence is not None else self.DEFAULT_CONFIDENCE
+        self.tolerance = tolerance if tolerance is not None else self.DEFAULT_TOLERANCE
+        self.seed = seed if seed is not None else random.SystemRandom().randrange(2 ** 32)
+
+    def get_sample_size(self, num_ballots: int) -> int:
+        """
+        get the number of ballots to verify out of a given population
+        :param num_ballots: total number of ballots in the record
+        :return: the sample size, never larger than the population
+        """
+        if self.sample_size is not None:
+            return min(self.sample_size, num_ballots)
+
+        num_invalid = self.__get_num_invalid(num_ballots)
+        low, high = 0, num_ballots
+        # the miss probability decreases with the sample size, find the smallest size meeting the target
+        while low < high:
+            mid = (low + high) // 2
+            if self.__miss_probability(num_ballots, mid, num_invalid) <= 1 - self.confidence:
+                high = mid
+            else:
+                low = mid + 1
+
+        return low
+
+    def select(self, num_ballots: int) -> set:
+        """
+        pick the indices of the ballots to verify, the same seed and population always give the same sample
+        :param num_ballots: total number of ballots in the record, the ballots being indexed in a stable order
+        :return: a set of ballot indices
+        """
+        size = self.get_sample_size(num_ballots)
+        return set(random.Random(self.seed).sample(range(num_ballots), size))
+
+    def report(self, num_ballots: int, num_failed: int) -> dict:
+        """
+        describe a sampled run so that it can be reproduced and interpreted
+        :param num_ballots: total number of ballots in the record
+        :param num_failed: number of sampled ballots that failed verification
+        :return: a dictionary of the seed, sample size, achieved confidence and the upper bound on invalid ballots
+        """
+        size = self.get_sample_size(num_ballots)
+        num_invalid = self.__get_num_invalid(num_ballots)
+        report = {'sample_seed': self.seed,
+                  'sample_size': size,
+                  'population': num_ballots,
+                  'tolerance': self.tolerance,
+                  'confidence_target': self.confidence,
+                  'sample_failures': num_failed}
+
+        if num_failed == 0:
+            # confidence that fewer than tolerance * N ballots are invalid
+            report['achieved_confidence'] = round(1 - self.__miss_probability(num_ballots, size, num_invalid), 6)
+            # with the target confidence, no more than this many ballots are invalid
+            report['max_invalid_ballots'] = self.__get_max_invalid(num_ballots, size)
+
+        return report
+
+    def __get_num_invalid(self, num_ballots: int) -> int:
+        """
+        the number of invalid ballots the tolerance stands for, at least one
+        :param num_ballots: total number of ballots
+        :return: ceil(tolerance * num_ballots)
+        """
+        return max(1, math.ceil(self.tolerance * num_ballots))
+
+    def __get_max_invalid(self, num_ballots: int, size: int) -> int:
+        """
+        get the largest number of invalid ballots still compatible with a clean sample at the target confidence
+        :param num_ballots: total number of ballots
+        :param size: sample size
+        :return: an upper bound on the number of invalid ballots
+        """
+        low, high = 0, num_ballots
+        # smallest number of invalid ballots that a clean sample rules out, found by binary search
+        while low < high:
+            mid = (low + high) // 2
+            if self.__miss_probability(num_ballots, size, mid) <= 1 - self.confidence:
+                high = mid
+            else:
+                low = mid + 1
+
+        return max(0, low - 1)
+
+    @staticmethod
+    def __miss_probability(num_ballots: int, size: int, num_invalid: int) -> float:
+        """
+        the probability that a sample without replacement contains none of the invalid ballots,
+        C(N - b, n) / C(N, n)
+        :param num_ballots: total number of ballots, N
+        :param size: sample size, n
+        :param num_invalid: number of invalid ballots, b
+        :return: the probability in [0, 1]
+        """
+        if num_invalid <= 0:
+            return 1.0
+        if size > num_ballots - num_invalid:
+            return 0.0
+
+        log_p = (math.lgamma(num_ballots - num_invalid + 1) - math.lgamma(num_ballots - num_invalid - size + 1)
+                 - math.lgamma(num_ballots + 1) + math.lgamma(num_ballots - size + 1))
+        return math.exp(log_p)
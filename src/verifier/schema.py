@@ -0,0 +1,481 @@
+import os
+import json
+from .generator import FilePathGenerator
+from .result import Result, Reason, ResultSink, ConsoleSink
+from .number_decoding import is_number_text
+
+"""
+This module validates the shape of every document of a record before the cryptographic checks, so that a malformed
+file is reported with the path of its offending field instead of failing deep inside a verifier with a TypeError,
+after the work done on the files before it.
+
+The documents are described declaratively: a dictionary for an object and its required fields, Optional for a field
+that may be missing, ListOf and MapOf for lists and objects keyed by ids, OneOf for alternatives, and the leaf types
+NUMBER (a non-negative integer written as a json number or as a string in the encoding of the record, see
+number_decoding.py),
+INTEGER, STRING, BOOLEAN and SCALAR. Each description is compiled once into nested closures, which only check types
+and never convert a number, so a ballot is validated in about the time it takes to parse it, no modular arithmetic
+involved. A valid document allocates nothing, the paths being built only for the fields that fail.
+
+A ballot of the right shape may still name a contest or a selection the election does not have, which the verifiers
+would only find out by looking it up in the description. Given the manifest of the description, the contest ids of a
+ballot and the ids of its selections, placeholders aside, are checked against it as part of the schema.
+
+RecordValidator runs the first pass: the election-level documents, which every box needs, then every ballot file,
+read ahead by the prefetch threads and validated one by one. A ballot file that is not valid json or does not match
+its schema is quarantined: it is excluded from the record source, so that no later stage reads it, and optionally
+copied to a quarantine folder with the list of its errors.
+
+Class:
+    Optional
+    ListOf
+    MapOf
+    OneOf
+    MalformedJson
+    RecordValidator
+
+Function:
+    compile_schema(object)
+    get_validator(str)
+    read_manifest(dict)
+    check_manifest(dict, dict)
+    validate_document(str, str, object, dict)
+    parse_or_error(bytes)
+"""
+
+NUMBER = 'number'
+INTEGER = 'integer'
+STRING = 'string'
+BOOLEAN = 'boolean'
+SCALAR = 'scalar'
+
+# the errors kept per document, a garbage file would otherwise report every one of its fields
+MAX_ERRORS = 20
+
+MISSING = 'missing'
+
+
+class Optional:
+    """
+    A field that may be missing or null.
+    """
+
+    def __init__(self, spec):
+        self.spec = spec
+
+
+class ListOf:
+    """
+    A list whose items all match a spec, with at least a minimum number of items.
+    """
+
+    def __init__(self, spec, min_size=0):
+        self.spec = spec
+        self.min_size = min_size
+
+
+class MapOf:
+    """
+    An object keyed by ids, whose values all match a spec, with at least a minimum number of entries.
+    """
+
+    def __init__(self, spec, min_size=0):
+        self.spec = spec
+        self.min_size = min_size
+
+
+class OneOf:
+    """
+    A value matching at least one of several specs, the errors of the closest one being reported otherwise.
+    """
+
+    def __init__(self, *specs):
+        self.specs = specs
+
+
+def __is_number(value) -> bool:
+    if type(value) is int:
+        return value >= 0
+    return type(value) is str and is_number_text(value)
+
+
+LEAVES = {
+    NUMBER: (__is_number, 'expected a non-negative integer'),
+    INTEGER: (lambda value: type(value) is int, 'expected an integer'),
+    STRING: (lambda value: type(value) is str, 'expected a string'),
+    BOOLEAN: (lambda value: type(value) is bool, 'expected a boolean'),
+    SCALAR: (lambda value: type(value) in (str, int), 'expected a string or an integer'),
+}
+
+
+def compile_schema(spec):
+    """
+    compile a declarative description into a validator
+    :param spec: a leaf type, a dictionary of field name - spec, or an Optional, ListOf, MapOf or OneOf
+    :return: a function of a value returning None if the value is valid, or a list of (path, message) tuples, the
+             path being a tuple of the field names and list indices down to the offending value
+    """
+    if isinstance(spec, str):
+        is_valid, message = LEAVES[spec]
+        error = [((), message)]
+        return lambda value: None if is_valid(value) else error
+
+    if isinstance(spec, dict):
+        fields = [(key, compile_schema(field.spec if isinstance(field, Optional) else field),
+                   isinstance(field, Optional)) for key, field in spec.items()]
+
+        def check_object(value):
+            if not isinstance(value, dict):
+                return [((), 'expected an object')]
+            errors = None
+            for key, check, optional in fields:
+                field = value.get(key)
+                if field is None:
+                    if not optional:
+                        errors = errors or []
+                        errors.append(((key,), MISSING))
+                    continue
+                found = check(field)
+                if found:
+                    errors = errors or []
+                    errors.extend(((key,) + path, message) for path, message in found)
+                    if len(errors) >= MAX_ERRORS:
+                        break
+            return errors
+        return check_object
+
+    if isinstance(spec, (ListOf, MapOf)):
+        check_item = compile_schema(spec.spec)
+        is_list = isinstance(spec, ListOf)
+        min_size = spec.min_size
+
+        def check_collection(value):
+            if not isinstance(value, list if is_list else dict):
+                return [((), 'expected a list' if is_list else 'expected an object')]
+            if len(value) < min_size:
+                return [((), 'expected at least {n} items'.format(n=min_size))]
+            errors = None
+            for key, item in (enumerate(value) if is_list else value.items()):
+                found = check_item(item)
+                if found:
+                    errors = errors or []
+                    errors.extend(((key,) + path, message) for path, message in found)
+                    if len(errors) >= MAX_ERRORS:
+                        break
+            return errors
+        return check_collection
+
+    if isinstance(spec, OneOf):
+        checks = [compile_schema(alternative) for alternative in spec.specs]
+
+        def check_alternatives(value):
+            closest = None
+            for check in checks:
+                found = check(value)
+                if not found:
+                    return None
+                if closest is None or len(found) < len(closest):
+                    closest = found
+            return closest
+        return check_alternatives
+
+    raise TypeError("unknown schema spec {spec!r}".format(spec=spec))
+
+
+CHAUM_PEDERSEN_PROOF = {'pad': NUMBER, 'data': NUMBER, 'challenge': NUMBER, 'response': NUMBER}
+CIPHERTEXT = {'pad': NUMBER, 'data': NUMBER}
+
+BALLOT = {
+    'object_id': STRING,
+    'state': STRING,
+    'tracking_hash': NUMBER,
+    'previous_tracking_hash': NUMBER,
+    'crypto_hash': NUMBER,
+    'timestamp': SCALAR,
+    'contests': ListOf({
+        'object_id': STRING,
+        'proof': CHAUM_PEDERSEN_PROOF,
+        'ballot_selections': ListOf({
+            'object_id': STRING,
+            'is_placeholder_selection': Optional(BOOLEAN),
+            'ciphertext': CIPHERTEXT,
+            'proof': {'proof_zero_pad': NUMBER, 'proof_zero_data': NUMBER,
+                      'proof_one_pad': NUMBER, 'proof_one_data': NUMBER,
+                      'proof_zero_challenge': NUMBER, 'proof_one_challenge': NUMBER,
+                      'proof_zero_response': NUMBER, 'proof_one_response': NUMBER},
+        }),
+    }),
+}
+
+SHARE = OneOf(
+    {'guardian_id': Optional(STRING), 'share': NUMBER, 'proof': CHAUM_PEDERSEN_PROOF},
+    # the share of a missing guardian, recombined from the parts of the available guardians
+    {'guardian_id': Optional(STRING), 'share': NUMBER, 'recovered_parts': MapOf({
+        'guardian_id': Optional(STRING),
+        'share': NUMBER,
+        'recovery_key': Optional(NUMBER),
+        'proof': CHAUM_PEDERSEN_PROOF,
+    }, min_size=1)})
+
+TALLY_CONTEST = {
+    'object_id': STRING,
+    'selections': MapOf({
+        'object_id': STRING,
+        'tally': INTEGER,
+        'value': NUMBER,
+        'message': CIPHERTEXT,
+        'shares': ListOf(SHARE, min_size=1),
+    }),
+}
+
+TALLY = {
+    'object_id': Optional(STRING),
+    'contests': MapOf(TALLY_CONTEST),
+    'spoiled_ballots': MapOf(MapOf(TALLY_CONTEST)),
+}
+
+COEFFICIENTS = {
+    'owner_id': Optional(STRING),
+    'coefficient_commitments': ListOf(NUMBER, min_size=1),
+    'coefficient_proofs': ListOf({'public_key': NUMBER, 'commitment': NUMBER, 'challenge': NUMBER,
+                                  'response': NUMBER}, min_size=1),
+}
+
+CONSTANTS = {'large_prime': NUMBER, 'small_prime': NUMBER, 'cofactor': NUMBER, 'generator': NUMBER}
+
+CONTEXT = {
+    'crypto_base_hash': NUMBER,
+    'crypto_extended_base_hash': NUMBER,
+    'elgamal_public_key': NUMBER,
+    'number_of_guardians': INTEGER,
+    'quorum': INTEGER,
+}
+
+DESCRIPTION = {
+    'contests': ListOf({
+        'object_id': STRING,
+        'sequence_order': INTEGER,
+        'votes_allowed': INTEGER,
+        'ballot_selections': ListOf({'object_id': STRING}),
+    }),
+}
+
+# document kind - (spec, box of its checks)
+SCHEMAS = {
+    'constants': (CONSTANTS, 1),
+    'context': (CONTEXT, 1),
+    'description': (DESCRIPTION, 3),
+    'coefficients': (COEFFICIENTS, 2),
+    'ballot': (BALLOT, 3),
+    'tally': (TALLY, 6),
+}
+
+# document kind - compiled validator, filled on first use so that importing the module costs nothing
+VALIDATORS = {}
+
+
+def get_validator(kind: str):
+    """
+    :param kind: a document kind of SCHEMAS
+    :return: the compiled validator of the kind, see compile_schema()
+    """
+    validator = VALIDATORS.get(kind)
+    if validator is None:
+        validator = VALIDATORS[kind] = compile_schema(SCHEMAS[kind][0])
+    return validator
+
+
+def format_path(path: tuple) -> str:
+    """
+    :param path: a tuple of field names and list indices
+    :return: the path written as 'contests[0].ballot_selections[2].ciphertext.pad'
+    """
+    text = ''
+    for part in path:
+        text += '[{i}]'.format(i=part) if isinstance(part, int) else ('.' if text else '') + str(part)
+    return text or '.'
+
+
+def read_manifest(description: dict) -> dict:
+    """
+    :param description: a description document matching its schema
+    :return: the manifest of the election, a dictionary of contest id - set of the ids of its selections
+    """
+    return {contest.get('object_id'): {selection.get('object_id') for selection in contest.get('ballot_selections')}
+            for contest in description.get('contests')}
+
+
+def check_manifest(ballot: dict, manifest: dict):
+    """
+    check that the contests and selections of a ballot are those of the election
+    :param ballot: a ballot document matching its schema
+    :param manifest: the manifest of the election, see read_manifest()
+    :return: None if every id is known, or a list of (path, reason) tuples, the path being that of the unknown id
+    """
+    errors = None
+    for i, contest in enumerate(ballot.get('contests')):
+        selection_ids = manifest.get(contest.get('object_id'))
+        if selection_ids is None:
+            errors = errors or []
+            errors.append((('contests', i, 'object_id'), Reason.UNKNOWN_CONTEST))
+            continue
+        for j, selection in enumerate(contest.get('ballot_selections')):
+            # the placeholders only exist on the ballots
+            if not selection.get('is_placeholder_selection') and selection.get('object_id') not in selection_ids:
+                errors = errors or []
+                errors.append((('contests', i, 'ballot_selections', j, 'object_id'), Reason.UNKNOWN_SELECTION))
+    return errors
+
+
+class MalformedJson:
+    """
+    The outcome of parsing a file that is not valid json.
+    """
+
+    def __init__(self, error: ValueError):
+        self.error = error
+
+
+def parse_or_error(content: bytes):
+    """
+    parse a json document without raising
+    :param content: the content of the file
+    :return: the parsed document, or a MalformedJson holding the parse error
+    """
+    try:
+        return FilePathGenerator.parse_json(content)
+    except ValueError as error:
+        return MalformedJson(error)
+
+
+def validate_document(kind: str, name: str, document, manifest: dict = None) -> Result:
+    """
+    validate one document against the schema of its kind
+    :param kind: a document kind of SCHEMAS
+    :param name: the name of the file, the id of the result
+    :param document: the parsed document, None for a missing file, or a MalformedJson
+    :param manifest: the manifest of the election, the contests and selections of a ballot are checked against it,
+                     see read_manifest(), not checked if None
+    :return: a document-level Result with one failure per offending field
+    """
+    result = Result('document', name, box=SCHEMAS[kind][1])
+    if document is None:
+        result.fail(Reason.MISSING_DOCUMENT)
+    elif isinstance(document, MalformedJson):
+        result.fail(Reason.MALFORMED_JSON, field=str(document.error))
+    else:
+        for path, message in get_validator(kind)(document) or ():
+            result.fail(Reason.MISSING_FIELD if message == MISSING else Reason.INVALID_FIELD, field=format_path(path))
+        if result.ok and kind == 'ballot' and manifest is not None:
+            for path, reason in check_manifest(document, manifest) or ():
+                result.fail(reason, field=format_path(path))
+    return result
+
+
+class RecordValidator:
+    """
+    This class runs the schema pass over a record, reporting every malformed document and quarantining the malformed
+    ballot files, and the ballots whose contests or selections are not in the description.
+
+    Method:
+        validate_record()
+        validate_election_documents(Result)
+        write_quarantine(str)
+    """
+
+    def __init__(self, path_g: FilePathGenerator, sink: ResultSink = None, selected=None):
+        """
+        :param path_g: the file path generator of the record
+        :param sink: the result sink
+        :param selected: a predicate on the ballot file paths, only the ballots it accepts are validated, e.g. the
+                         ballots of a shard, all of them if None
+        """
+        self.path_g = path_g
+        self.sink = sink if sink is not None else ConsoleSink()
+        self.selected = selected
+        # ballot file path - its errors, as (path, message) tuples
+        self.quarantined = {}
+        # the manifest of a valid description, see read_manifest()
+        self.manifest = None
+
+    def validate_record(self) -> Result:
+        """
+        validate the election-level documents, then every ballot file, quarantining the malformed ones
+        :return: a box-level Result with one failed child per malformed document, whose details tell whether the
+                 election-level documents are valid, without which no box can run
+        """
+        result = self.validate_election_documents()
+        election_valid = result.ok
+
+        path_g = self.path_g
+        folder_path = path_g.get_encrypted_ballot_folder_path()
+        for file_path, document in path_g.iter_json_files(folder_path, self.selected, parse_or_error):
+            document_result = validate_document('ballot', path_g.get_name(file_path), document, self.manifest)
+            if not document_result.ok:
+                self.quarantined[file_path] = document_result
+            self.__add(result, document_result)
+
+        path_g.exclude_files(self.quarantined)
+        result.details = {'election_documents_valid': election_valid, 'quarantined_ballots': len(self.quarantined)}
+        self.sink.emit(result)
+
+        return result
+
+    def validate_election_documents(self, result: Result = None) -> Result:
+        """
+        validate the election-level documents, the constants, context, description, tally and guardian coefficients
+        :param result: the box-level Result the documents are counted on, a new one if None
+        :return: the box-level Result, with one failed child per missing or malformed document, not emitted
+        """
+        if result is None:
+            result = Result('box', 'Schema validation')
+        path_g = self.path_g
+        documents = [('constants', path_g.get_constants_file_path()),
+                     ('context', path_g.get_context_file_path()),
+                     ('description', path_g.get_description_file_path()),
+                     ('tally', path_g.get_tally_file_path())]
+        num_of_guardians = 0
+        for kind, file_path in documents:
+            document = self.__read(file_path)
+            document_result = validate_document(kind, path_g.get_name(file_path), document)
+            # the number of guardians is only known from a valid context, the manifest from a valid description
+            if kind == 'context' and document_result.ok:
+                num_of_guardians = document.get('number_of_guardians')
+            elif kind == 'description' and document_result.ok:
+                self.manifest = read_manifest(document)
+            self.__add(result, document_result)
+
+        for index in range(num_of_guardians):
+            file_path = path_g.get_guardian_coefficient_file_path(index)
+            self.__add(result, validate_document('coefficients', path_g.get_name(file_path),
+                                                      self.__read(file_path)))
+
+        return result
+
+    def __read(self, file_path: str):
+        """
+        :return: the parsed document, None if the file is missing, or a MalformedJson
+        """
+        content = self.path_g.source.read(self.path_g.get_name(file_path))
+        return None if content is None else parse_or_error(content)
+
+    def __add(self, result: Result, document_result: Result):
+        """
+        count a validated document, emitting it if it is malformed
+        """
+        if not result.add(document_result):
+            self.sink.emit(document_result)
+
+    def write_quarantine(self, folder_path: str):
+        """
+        copy the quarantined ballot files to a folder, each with a '.errors.json' file listing its errors
+        :param folder_path: the quarantine folder, created if needed
+        """
+        os.makedirs(folder_path, exist_ok=True)
+        for file_path, document_result in self.quarantined.items():
+            name = os.path.basename(self.path_g.get_name(file_path))
+            content = self.path_g.source.read(self.path_g.get_name(file_path))
+            with open(os.path.join(folder_path, name), 'wb') as file:
+                file.write(content)
+            with open(os.path.join(folder_path, name + '.errors.json'), 'w') as file:
+                json.dump(document_result.to_dict(), file, indent=2)
@@ -0,0 +1,243 @@
+import json
+import time
+import threading
+import traceback
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote
+from .async_verifier import RecordContext
+from .baseline_verifier import BaselineVerifier
+from .encryption_verifier import BallotEncryptionVerifier
+from .latency import LatencyProfile, count_ballot
+from .precompute import PrecomputationStore, precompute_record_bases
+from .schema import validate_document, read_manifest, parse_or_error
+from .tracking_index import TrackingIndex
+
+"""
+This module is a local HTTP service answering voters' "verify my ballot" requests, e.g. from a kiosk or a web front
+end, with the election loaded once.
+
+At start the service loads the parameters and the manifest of the record, checks the baseline parameters (box 1) and
+loads the precomputed fixed-base tables if a store is given. A request then only runs the checks of one ballot: its
+tracking hash and contests (boxes 3, 4 and 5). A ballot posted to the service is first validated against the ballot
+schema and the manifest, a malformed one being answered with the paths of its offending fields. The ballots of the record can be looked up by tracking code, through
+a persistent TrackingIndex brought up to date at start, or else an in-memory index built on the first lookup. The
+latency of every request goes into the histograms of a LatencyProfile, served on /latency.
+
+Endpoints:
+    GET  /health                       the record and the baseline verdict
+    POST /verify-ballot                verify the encrypted ballot in the request body
+    GET  /tracking-code/<code>         verify the ballot of the record with this tracking code
+    GET  /latency                      latency histograms and slowest requests
+
+Class:
+    VerificationService
+    VerificationRequestHandler
+    VerificationServer
+
+Function:
+    serve(VerificationService, str, int)
+"""
+
+# the largest request body accepted, an encrypted ballot being a few hundred KiB at most
+MAX_BODY_SIZE = 16 * 1024 * 1024
+
+
+class VerificationService:
+    """
+    The warm state of the service: the record context, the baseline verdict, the tracking code index and the
+    latency profile. Every method can be called from several request threads at once.
+
+    Method:
+        verify_ballot(dict)
+        verify_tracking_code(str)
+        health()
+        latency()
+    """
+
+    def __init__(self, root: str, precompute=None, index_path=None, num_slowest=10):
+        """
+        :param root: the path to the record folder, archive or bundle
+        :param precompute: the folder of a precomputation store, None to run without fixed-base tables
+        :param index_path: the path of a persistent tracking index, None to index the ballots in memory
+        :param num_slowest: the number of slowest requests reported on /latency
+        """
+        self.root = root
+        self.context = RecordContext(root)
+        # read the manifest once, the vote limits of every contest and the ids the posted ballots are validated against
+        self.context.vlc.get_contest_vote_limits()
+        self.manifest = read_manifest(self.context.param_g.get_description())
+        self.baseline_ok = BaselineVerifier(self.context.param_g, self.context.sink).verify_all_params().ok
+        if precompute:
+            precompute_record_bases(self.context.param_g, PrecomputationStore(precompute))
+        self.profile = LatencyProfile(num_slowest)
+        self.tracking_index = None
+        self.index_lock = threading.Lock()
+        if index_path:
+            self.tracking_index = TrackingIndex(index_path)
+            self.tracking_index.update(self.context.path_g)
+
+    def verify_ballot(self, ballot_dic: dict, kind='verify_ballot') -> dict:
+        """
+        verify an encrypted ballot, box 3, 4 and its tracking hash
+        :param ballot_dic: the encrypted ballot
+        :param kind: the request kind the latency is recorded under
+        :return: the response, a json-serializable dictionary of the verdict and of the result
+        """
+        start = time.perf_counter()
+        bev = BallotEncryptionVerifier(ballot_dic, self.context.param_g, self.context.vlc)
+        result = bev.verify_ballot()
+        seconds = time.perf_counter() - start
+        self.profile.record(kind, ballot_dic.get('object_id'), seconds, *count_ballot(ballot_dic))
+
+        return {'object_id': ballot_dic.get('object_id'),
+                'tracking_hash': ballot_dic.get('tracking_hash'),
+                'valid': result.ok and self.baseline_ok,
+                'baseline_valid': self.baseline_ok,
+                'result': result.to_dict(),
+                'seconds': round(seconds, 6)}
+
+    def verify_tracking_code(self, tracking_code: str):
+        """
+        find the ballot of the record with a tracking code and verify it
+        :param tracking_code: the tracking hash of the ballot
+        :return: the response, as verify_ballot(), or None if no ballot of the record has this tracking code, or if
+                 its file is gone since it was indexed
+        """
+        path_g = self.context.path_g
+        if isinstance(self.tracking_index, TrackingIndex):
+            name = self.tracking_index.lookup(tracking_code)
+            ballot_file = path_g.DATA_FOLDER_PATH + name if name is not None else None
+        else:
+            ballot_file = self.__get_memory_index().get(tracking_code)
+        ballot_dic = path_g.read_json(ballot_file) if ballot_file is not None else None
+        if ballot_dic is None:
+            return None
+        return self.verify_ballot(ballot_dic, kind='tracking_code')
+
+    def __get_memory_index(self) -> dict:
+        """
+        :return: the tracking hash - ballot file index of the record, built on first use
+        """
+        with self.index_lock:
+            if self.tracking_index is None:
+                path_g = self.context.path_g
+                self.tracking_index = {str(ballot_dic.get('tracking_hash')): ballot_file for ballot_file, ballot_dic
+                                       in path_g.iter_json_files(path_g.get_encrypted_ballot_folder_path())}
+            return self.tracking_index
+
+    def health(self) -> dict:
+        """
+        :return: the record served and the baseline verdict
+        """
+        return {'status': 'ok', 'record': self.root, 'baseline_valid': self.baseline_ok}
+
+    def latency(self) -> dict:
+        """
+        :return: the latency histograms of the requests and the slowest requests
+        """
+        return self.profile.to_dict()
+
+
+class VerificationRequestHandler(BaseHTTPRequestHandler):
+    """
+    Routes the requests to the service of the server, every response being json.
+    """
+    server_version = 'ElectionGuardVerifier'
+    protocol_version = 'HTTP/1.1'
+    # the headers and the body are written separately, which Nagle's algorithm would delay on a kept-alive connection
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        service = self.server.service
+        if self.path == '/health':
+            return self.__respond(200, service.health())
+        if self.path == '/latency':
+            return self.__respond(200, service.latency())
+        if self.path.startswith('/tracking-code/'):
+            tracking_code = unquote(self.path[len('/tracking-code/'):])
+            try:
+                response = service.verify_tracking_code(tracking_code)
+            except Exception:
+                # e.g. a ballot file of the record that is not json, answered rather than dropping the connection
+                traceback.print_exc()
+                return self.__respond(500, {'error': 'the ballot with this tracking code could not be verified'})
+            if response is None:
+                return self.__respond(404, {'error': 'no ballot with this tracking code'})
+            return self.__respond(200, response)
+        return self.__respond(404, {'error': 'unknown endpoint'})
+
+    def do_POST(self):
+        if self.path != '/verify-ballot':
+            return self.__respond(404, {'error': 'unknown endpoint'})
+        # the body of a request with an unusable length is left unread, so the connection cannot be kept alive
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            self.close_connection = True
+            return self.__respond(400, {'error': 'invalid Content-Length'})
+        if length > MAX_BODY_SIZE:
+            self.close_connection = True
+            return self.__respond(413, {'error': 'request body too large'})
+        service = self.server.service
+        ballot_dic = parse_or_error(self.rfile.read(length))
+        # a malformed ballot is answered with its offending fields, so that the checks only see well-formed ballots
+        schema_result = validate_document('ballot', 'request body', ballot_dic, service.manifest)
+        if not schema_result.ok:
+            return self.__respond(400, {'error': 'the request body is not a well-formed encrypted ballot',
+                                        'failures': [failure.to_dict() for failure in schema_result.failures]})
+
+        try:
+            response = service.verify_ballot(ballot_dic)
+        except Exception:
+            # a well-formed ballot failing the checks is a bug of the verifier, not of the client
+            traceback.print_exc()
+            return self.__respond(500, {'error': 'the ballot could not be verified'})
+        return self.__respond(200, response)
+
+    def __respond(self, status: int, dic: dict):
+        """
+        send a json response
+        :param status: the HTTP status code
+        :param dic: the json-serializable body
+        """
+        body = json.dumps(dic).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # the request latencies are on /latency, so the access log is left out
+        pass
+
+
+class VerificationServer(ThreadingHTTPServer):
+    """
+    HTTP server handling every connection in its own thread, giving the handlers access to the service.
+    """
+    daemon_threads = True
+    # the default backlog of 5 drops the connections of a burst of clients, which then retry a second later
+    request_queue_size = 128
+
+    def __init__(self, address: tuple, service: VerificationService):
+        super().__init__(address, VerificationRequestHandler)
+        self.service = service
+
+
+def serve(service: VerificationService, host='127.0.0.1', port=8080):
+    """
+    serve the requests until interrupted, one thread per connection
+    :param service: the loaded service
+    :param host: the address to listen on, localhost by default
+    :param port: the port to listen on
+    """
+    server = VerificationServer((host, port), service)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,298 @@
+import os
+import json
+import time
+import hashlib
+from . import metrics
+from . import latency
+from .json_parser import read_json_file
+from .generator import ParameterGenerator, FilePathGenerator, VoteLimitCounter, SelectionInfoAggregator
+from .interfaces import IBallotVerifier
+from .encryption_verifier import BallotEncryptionVerifier, verify_tracking_chain
+from .decryption_verifier import DecryptionVerifier
+from .baseline_verifier import BaselineVerifier
+from .key_generation_verifier import KeyGenerationVerifier
+from .result import Result, Reason, ResultSink, ConsoleSink
+
+"""
+This module splits the verification of one election record across several processes or machines.
+
+Each shard verifies a deterministic subset of the ballot files and of the spoiled ballots, and writes a partial result
+file holding the per-ballot verdicts, its partial products of the cast ballot encryptions (box 6) and its fragment of
+the tracking hash chain (box 5). Merging the N partial results runs the checks that need the whole record: the
+tally against the products of all cast ballots, the completeness of the tracking hash chain, and the global boxes
+1, 2, 6 and 9, which are cheap compared to the ballots.
+
+Class:
+    Shard
+    ShardVerifier
+    ShardMerger
+"""
+
+
+class Shard:
+    """
+    This class represents shard i of N. Items are assigned to shards by a hash of their name, so every node computes
+    the same assignment without coordination and regardless of the order the files are listed in.
+    """
+
+    def __init__(self, index: int, count: int):
+        if count < 1 or not 0 <= index < count:
+            raise ValueError("shard index must be within 0 and the number of shards")
+        self.index = index
+        self.count = count
+
+    @classmethod
+    def parse(cls, text: str) -> 'Shard':
+        """
+        parse a shard given as "i/N"
+        :param text: the shard description, e.g. "0/4"
+        :return: a Shard
+        """
+        try:
+            index, count = text.split('/')
+            return cls(int(index), int(count))
+        except ValueError:
+            raise ValueError("shard must be given as i/N with 0 <= i < N, got {text}".format(text=text))
+
+    def contains(self, name: str) -> bool:
+        """
+        check if an item belongs to this shard
+        :param name: the item name, a ballot file name or a spoiled ballot id
+        :return: True if the item is assigned to this shard
+        """
+        digest = hashlib.sha256(name.encode('utf-8')).digest()
+        return int.from_bytes(digest[:8], byteorder='big') % self.count == self.index
+
+    def __str__(self) -> str:
+        return '{i}/{n}'.format(i=self.index, n=self.count)
+
+
+class ShardVerifier(IBallotVerifier):
+    """
+    This class verifies the ballots (box 3, 4 and the tracking hash of each ballot, box 5) and the spoiled ballots
+    (box 10) assigned to one shard, and collects what the merge step needs.
+
+    Method:
+        verify_shard()
+        write_partial(str)
+    """
+
+    def __init__(self, param_g: ParameterGenerator, path_g: FilePathGenerator, limit_counter: VoteLimitCounter,
+                 shard: Shard, sink: ResultSink = None, fail_fast=False, quarantined=()):
+        """
+        :param quarantined: the Results of the malformed ballot files of this shard, left out of the record source by
+                            the schema pass, reported as failed ballots of the partial result
+        """
+        super().__init__(param_g, limit_counter, fail_fast)
+        self.path_g = path_g
+        self.shard = shard
+        self.quarantined = quarantined
+        self.sink = sink if sink is not None else ConsoleSink()
+        self.partial = None
+
+    def verify_shard(self) -> dict:
+        """
+        verify the ballots and spoiled ballots of this shard
+        :return: the partial result, a json-serializable dictionary
+        """
+        ballots_result = Result('box', 'Box 3, 4 & 5 ballots (shard {s})'.format(s=self.shard), box=3)
+        aggregator = SelectionInfoAggregator(self.path_g, self.param_g)
+        verdicts, failures, spoiled_failures, tracking_hashes = {}, [], [], {}
+        for document_result in self.quarantined:
+            failures.append(document_result.to_dict())
+            ballots_result.add(document_result)
+
+        ballot_folder_path = self.path_g.get_encrypted_ballot_folder_path()
+        in_shard = lambda ballot_file: self.shard.contains(os.path.basename(ballot_file))
+        for ballot_file, ballot_dic in self.path_g.iter_json_files(ballot_folder_path, in_shard):
+            if ballot_dic is None:
+                # listed but gone by the time it is read
+                ballot_result = Result('ballot', self.path_g.get_name(ballot_file), box=3)
+                ballot_result.fail(Reason.MISSING_BALLOT, field='encrypted_ballots')
+                failures.append(ballot_result.to_dict())
+                ballots_result.add(ballot_result)
+                self.sink.emit(ballot_result)
+                if self.fail_fast:
+                    break
+                continue
+
+            start = time.perf_counter() if latency.ACTIVE is not None else None
+            bev = BallotEncryptionVerifier(ballot_dic, self.param_g, self.limit_counter, self.fail_fast)
+
+            # tracking hash fragment of the chain, box 5
+            # a ballot without a tracking hash is left out, breaking the chain at the merge
+            prev_hash, curr_hash = bev.get_tracking_hash()
+            if curr_hash is not None:
+                tracking_hashes[str(curr_hash)] = prev_hash
+
+            # tracking hash and ballot correctness, box 3, 4 & 5
+            ballot_result = bev.verify_ballot()
+
+            if start is not None:
+                latency.ACTIVE.record('ballot', ballot_result.item_id, time.perf_counter() - start,
+                                      *latency.count_ballot(ballot_dic))
+
+            # partial products of the cast ballots, box 6
+            aggregator.add_ballot(ballot_dic)
+
+            verdicts[ballot_result.item_id] = ballot_result.ok
+            if not ballot_result.ok:
+                failures.append(ballot_result.to_dict())
+            ballots_result.add(ballot_result)
+            self.sink.emit(ballot_result)
+
+            if self.fail_fast and not ballot_result.ok:
+                break
+
+        self.sink.emit(ballots_result)
+
+        # spoiled ballots, box 10
+        spoiled_result = Result('box', 'Box 10 spoiled ballots (shard {s})'.format(s=self.shard), box=10)
+        spoiled_verdicts = {}
+        dv = DecryptionVerifier(self.path_g, self.param_g, self.sink, self.fail_fast)
+        for ballot_name in sorted(dv.spoiled_ballots.keys()):
+            if not self.shard.contains(ballot_name):
+                continue
+            ballot_result = dv.verify_a_spoiled_ballot(ballot_name)
+            spoiled_verdicts[ballot_name] = ballot_result.ok
+            if not ballot_result.ok:
+                spoiled_failures.append(ballot_result.to_dict())
+            spoiled_result.add(ballot_result)
+            self.sink.emit(ballot_result)
+
+        self.sink.emit(spoiled_result)
+
+        self.partial = {'shard': self.shard.index,
+                        'num_shards': self.shard.count,
+                        'ballots': verdicts,
+                        'spoiled_ballots': spoiled_verdicts,
+                        'failures': failures,
+                        'spoiled_failures': spoiled_failures,
+                        'tally_products': aggregator.get_products(),
+                        'tracking_hashes': tracking_hashes}
+        if metrics.ACTIVE is not None:
+            self.partial['metrics'] = metrics.ACTIVE.to_dict()
+        if latency.ACTIVE is not None:
+            self.partial['latency'] = latency.ACTIVE.to_dict()
+
+        return self.partial
+
+    def write_partial(self, file_path: str):
+        """
+        write the partial result of this shard to a json file, verifying the shard first if not done yet
+        :param file_path: path of the partial result file
+        """
+        if self.partial is None:
+            self.verify_shard()
+        with open(file_path, 'w') as file:
+            json.dump(self.partial, file)
+
+
+class ShardMerger:
+    """
+    This class combines the partial results of all the shards of a record and runs the checks that need the whole
+    record.
+
+    Method:
+        merge()
+    """
+
+    def __init__(self, param_g: ParameterGenerator, path_g: FilePathGenerator, partial_paths: list,
+                 sink: ResultSink = None):
+        self.param_g = param_g
+        self.path_g = path_g
+        self.sink = sink if sink is not None else ConsoleSink()
+        self.partials = [read_json_file(path) for path in partial_paths]
+        if metrics.ACTIVE is not None:
+            # the work of every shard is part of the run
+            for partial in self.partials:
+                metrics.ACTIVE.merge(partial.get('metrics', {}))
+        if latency.ACTIVE is not None:
+            for partial in self.partials:
+                latency.ACTIVE.merge(partial.get('latency', {}))
+
+    def merge(self) -> bool:
+        """
+        merge the partial results and run the global checks: box 1 and 2, the ballot verdicts of every shard,
+        the completeness of the tracking hash chain, the cast ballot tally against the merged products (box 6 & 9),
+        and the coverage of the spoiled ballots (box 10)
+        :return: True if the whole record passed, False otherwise
+        """
+        error = False
+        if not BaselineVerifier(self.param_g, self.sink).verify_all_params():
+            error = True
+        if not KeyGenerationVerifier(self.param_g, self.path_g, self.sink).verify_all_guardians():
+            error = True
+
+        # ballots, box 3 & 4, from the verdicts of every shard
+        ballots_result = Result('box', 'Box 3, 4 & 5 ballots', box=3)
+        self.__check_shards(ballots_result)
+        ballot_ids = set()
+        for partial in self.partials:
+            for ballot_id, ok in partial.get('ballots', {}).items():
+                if ballot_id in ballot_ids:
+                    ballots_result.fail(Reason.DUPLICATE_BALLOT, field=ballot_id)
+                ballot_ids.add(ballot_id)
+                ballots_result.checked += 1
+        for dic in self.__get_failures('failures'):
+            ballot_result = Result.from_dict(dic)
+            ballots_result.children.append(ballot_result)
+            self.sink.emit(ballot_result)
+        if len(ballot_ids) != self.param_g.get_num_of_ballots():
+            ballots_result.fail(Reason.MISSING_BALLOT, field='encrypted_ballots')
+        self.sink.emit(ballots_result)
+
+        # tracking hash chain, box 5
+        chain_result = Result('box', 'Box 5 tracking hash chain', box=5)
+        tracking_hashes = {}
+        for partial in self.partials:
+            tracking_hashes.update(partial.get('tracking_hashes', {}))
+        if not verify_tracking_chain(tracking_hashes, self.param_g.get_extended_hash(), len(ballot_ids)):
+            chain_result.fail(Reason.TRACKING_CHAIN, field='previous_tracking_hash')
+        self.sink.emit(chain_result)
+
+        # cast ballot tally, box 6 & 9, against the merged products
+        aggregator = SelectionInfoAggregator(self.path_g, self.param_g)
+        for partial in self.partials:
+            aggregator.add_products(partial.get('tally_products', {}))
+        dv = DecryptionVerifier(self.path_g, self.param_g, self.sink)
+        tally_result = dv.verify_cast_ballot_tallies(aggregator)
+
+        # spoiled ballots, box 10, from the verdicts of every shard
+        spoiled_result = Result('box', 'Box 10 spoiled ballots', box=10)
+        spoiled_ids = set()
+        for partial in self.partials:
+            spoiled_ids.update(partial.get('spoiled_ballots', {}).keys())
+            spoiled_result.checked += len(partial.get('spoiled_ballots', {}))
+        for dic in self.__get_failures('spoiled_failures'):
+            ballot_result = Result.from_dict(dic)
+            spoiled_result.children.append(ballot_result)
+            self.sink.emit(ballot_result)
+        for ballot_name in set(dv.spoiled_ballots.keys()) - spoiled_ids:
+            spoiled_result.fail(Reason.MISSING_BALLOT, field=ballot_name)
+        self.sink.emit(spoiled_result)
+
+        return not error and bool(ballots_result) and bool(chain_result) and bool(tally_result) \
+            and bool(spoiled_result)
+
+    def __check_shards(self, result: Result) -> bool:
+        """
+        check that the partial results come from the same split and cover every shard exactly once
+        :param result: the box result the failures are recorded on
+        :return: True if every shard is present once, False otherwise
+        """
+        counts = {partial.get('num_shards') for partial in self.partials}
+        indices = sorted(partial.get('shard') for partial in self.partials)
+        if len(counts) != 1 or indices != list(range(counts.pop())):
+            return result.fail(Reason.MISSING_SHARD, field='shard')
+        return True
+
+    def __get_failures(self, key: str):
+        """
+        walk the failed items of every partial result
+        :param key: 'failures' for the ballots or 'spoiled_failures' for the spoiled ballots
+        :return: a generator of result dictionaries
+        """
+        for partial in self.partials:
+            for dic in partial.get(key, []):
+                yield dic
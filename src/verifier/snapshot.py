@@ -0,0 +1,141 @@
+import os
+import json
+from .generator import FilePathGenerator, ParameterGenerator, VoteLimitCounter
+
+"""
+This module keeps a snapshot of what the checks of a single ballot need from a record, so that verifying one ballot
+from the command line, e.g. a voter checking their ballot at a kiosk, does not pay for loading the record again.
+
+A snapshot holds the parameters of the group and of the context, the vote limit of every contest of the manifest and
+the verdict of box 1. It is taken by the first run over a record and written as a small json file, the numbers in
+hexadecimal which is parsed in linear time. A later run restores it into its ParameterGenerator and VoteLimitCounter
+and reads no election-level document at all, only the ballot. The snapshot records the size and modification time of
+the documents it was taken from, of the archive or bundle for a record that is a file, and is ignored as soon as one
+of them changed.
+
+Class:
+    RecordSnapshot
+
+Function:
+    record_fingerprint(FilePathGenerator, str)
+"""
+
+SNAPSHOT_VERSION = 1
+
+# the fields of the context and of the constants read by the ballot checks
+NUMBER_FIELDS = ('large_prime', 'small_prime', 'generator', 'cofactor', 'crypto_base_hash',
+                 'crypto_extended_base_hash', 'elgamal_public_key')
+
+
+def record_fingerprint(path_g: FilePathGenerator, root: str):
+    """
+    identify the state of the election-level documents of a record without reading them
+    :param path_g: the file path generator of the record
+    :param root: the path to the record folder, archive or bundle
+    :return: a list of (path, size, modification time) lists, or None if one of the files is missing
+    """
+    if path_g.DATA_FOLDER_PATH:
+        paths = [path_g.get_context_file_path(), path_g.get_constants_file_path(),
+                 path_g.get_description_file_path()]
+    else:
+        paths = [root]
+
+    fingerprint = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        fingerprint.append([os.path.abspath(path), stat.st_size, stat.st_mtime_ns])
+    return fingerprint
+
+
+class RecordSnapshot:
+    """
+    The parameters, the vote limits and the box 1 verdict of a record, as of the fingerprint of its documents.
+
+    Method:
+        take(FilePathGenerator, str, ParameterGenerator, VoteLimitCounter, bool)
+        load(str, FilePathGenerator, str)
+        save(str)
+        restore(ParameterGenerator, VoteLimitCounter)
+    """
+
+    def __init__(self, fingerprint: list, numbers: dict, vote_limits: dict, baseline_valid: bool):
+        """
+        :param fingerprint: the fingerprint of the record, see record_fingerprint()
+        :param numbers: field name - number of the context and the constants, see NUMBER_FIELDS
+        :param vote_limits: contest name - maximum votes allowed
+        :param baseline_valid: the verdict of box 1
+        """
+        self.fingerprint = fingerprint
+        self.numbers = numbers
+        self.vote_limits = vote_limits
+        self.baseline_valid = baseline_valid
+
+    @classmethod
+    def take(cls, path_g: FilePathGenerator, root: str, param_g: ParameterGenerator, vlc: VoteLimitCounter,
+             baseline_valid: bool):
+        """
+        take the snapshot of a loaded record
+        :param path_g: the file path generator of the record
+        :param root: the path to the record folder, archive or bundle
+        :param param_g: the parameter generator of the record
+        :param vlc: the vote limit counter of the record
+        :param baseline_valid: the verdict of box 1
+        :return: a snapshot, or None if a document of the record is missing
+        """
+        fingerprint = record_fingerprint(path_g, root)
+        if fingerprint is None:
+            return None
+        numbers = {'large_prime': param_g.get_large_prime(),
+                   'small_prime': param_g.get_small_prime(),
+                   'generator': param_g.get_generator(),
+                   'cofactor': param_g.get_cofactor(),
+                   'crypto_base_hash': param_g.get_base_hash(),
+                   'crypto_extended_base_hash': param_g.get_extended_hash(),
+                   'elgamal_public_key': param_g.get_elgamal_key()}
+        return cls(fingerprint, numbers, dict(vlc.get_contest_vote_limits()), baseline_valid)
+
+    @classmethod
+    def load(cls, path: str, path_g: FilePathGenerator, root: str):
+        """
+        read the snapshot file of a record
+        :param path: the path of the snapshot file
+        :param path_g: the file path generator of the record
+        :param root: the path to the record folder, archive or bundle
+        :return: the snapshot, or None if the file is missing, unreadable, or was taken from other documents
+        """
+        try:
+            with open(path, 'r') as file:
+                dic = json.load(file)
+            if dic.get('version') != SNAPSHOT_VERSION or dic.get('fingerprint') != record_fingerprint(path_g, root):
+                return None
+            numbers = {field: int(dic['numbers'][field], 16) for field in NUMBER_FIELDS}
+            return cls(dic['fingerprint'], numbers, dic['vote_limits'], dic['baseline_valid'])
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def save(self, path: str):
+        """
+        write the snapshot file, replacing it atomically so that a concurrent run never reads a partial file
+        :param path: the path of the snapshot file
+        """
+        dic = {'version': SNAPSHOT_VERSION,
+               'fingerprint': self.fingerprint,
+               'numbers': {field: format(self.numbers[field], 'x') for field in NUMBER_FIELDS},
+               'vote_limits': self.vote_limits,
+               'baseline_valid': self.baseline_valid}
+        temp_path = '{path}.{pid}.tmp'.format(path=path, pid=os.getpid())
+        with open(temp_path, 'w') as file:
+            json.dump(dic, file)
+        os.replace(temp_path, path)
+
+    def restore(self, param_g: ParameterGenerator, vlc: VoteLimitCounter):
+        """
+        fill a parameter generator and a vote limit counter, so that neither reads the record
+        :param param_g: the parameter generator of the record
+        :param vlc: the vote limit counter of the record
+        """
+        param_g.numbers.update(self.numbers)
+        vlc.contest_vote_limits.update(self.vote_limits)
@@ -0,0 +1,97 @@
+import os
+import sys
+import time
+import subprocess
+from .synthetic import SyntheticRecordGenerator
+
+"""
+This module benchmarks the cold start of the verification of a single ballot: a new process running the
+verify-ballot command, from its start to the verdict, the way a voter's check from the command line runs.
+
+The record is a small test group record, so that the checks of the ballot take a few milliseconds and the measure is
+dominated by the start of the process: the interpreter, the imports, and loading the record. Three variants are
+timed, each in a new process every run, the median being kept: the bare interpreter as the floor, a cold run that
+reads the election-level documents, and a warm run from the snapshot of a previous run. The benchmark fails when the
+warm run exceeds its budget, so that a slow import or an extra read on the fast path is caught.
+
+Function:
+    run_startup_benchmark(str, int, float)
+    write_startup_report(dict)
+"""
+
+DEFAULT_BUDGET = 0.2
+
+VARIANTS = ('interpreter', 'cold', 'warm')
+
+
+def get_record(work_folder: str) -> str:
+    """
+    get the benchmark record, generating it unless a previous run left it in the work folder
+    :param work_folder: the folder of the generated records
+    :return: the path to the record folder
+    """
+    path = os.path.join(work_folder, 'startup-record')
+    if not os.path.exists(os.path.join(path, 'tally.json')):
+        SyntheticRecordGenerator(num_ballots=1, spoil_rate=0).generate(path)
+    return path
+
+
+def time_process(arguments: list) -> float:
+    """
+    run a new python process
+    :param arguments: the arguments of the interpreter
+    :return: the wall time from the start of the process to its end in seconds
+    """
+    # the package is importable from the child whatever its working folder
+    env = dict(os.environ)
+    package_parent = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, (package_parent, env.get('PYTHONPATH'))))
+    start = time.perf_counter()
+    subprocess.run([sys.executable] + arguments, stdout=subprocess.DEVNULL, env=env, check=True)
+    return time.perf_counter() - start
+
+
+def run_startup_benchmark(work_folder='benchmark-records', runs=10, budget=DEFAULT_BUDGET) -> dict:
+    """
+    time every variant of the start of a single ballot verification
+    :param work_folder: the folder of the generated record and of the snapshot
+    :param runs: the number of runs of every variant
+    :param budget: the longest median time of the warm run tolerated, in seconds
+    :return: a json-serializable dictionary of the median, fastest and slowest time of every variant, and whether
+             the warm run is within the budget
+    """
+    root = get_record(work_folder)
+    ballot_file = os.path.join(root, 'encrypted_ballots', os.listdir(os.path.join(root, 'encrypted_ballots'))[0])
+    snapshot_path = os.path.join(work_folder, 'startup-record.snapshot')
+    command = ['-m', 'verifier.cli', 'verify-ballot', root, ballot_file]
+    arguments = {'interpreter': ['-c', 'pass'],
+                 'cold': command,
+                 'warm': command + ['--snapshot', snapshot_path]}
+
+    # the first warm run writes the snapshot
+    time_process(arguments['warm'])
+    variants = {}
+    for variant in VARIANTS:
+        times = sorted(time_process(arguments[variant]) for _ in range(max(1, runs)))
+        variants[variant] = {'median_seconds': round(times[len(times) // 2], 6),
+                             'min_seconds': round(times[0], 6),
+                             'max_seconds': round(times[-1], 6)}
+
+    return {'runs': runs, 'budget_seconds': budget, 'variants': variants,
+            'within_budget': variants['warm']['median_seconds'] <= budget}
+
+
+def write_startup_report(results: dict, stream=None):
+    """
+    write a human-readable table of the results
+    :param results: the results of run_startup_benchmark()
+    :param stream: the output stream, stdout by default
+    """
+    stream = stream or sys.stdout
+    for variant, measure in results['variants'].items():
+        stream.write('{variant:<12} {median:>8.1f} ms median {low:>8.1f} ms min {high:>8.1f} ms max\n'.format(
+            variant=variant, median=measure['median_seconds'] * 1000, low=measure['min_seconds'] * 1000,
+            high=measure['max_seconds'] * 1000))
+    stream.write('warm start {verdict} the {budget:.0f} ms budget\n'.format(
+        verdict='within' if results['within_budget'] else 'over', budget=results['budget_seconds'] * 1000))
+    stream.flush()
@@ -0,0 +1,496 @@
+import os
+import json
+import random
+from . import number
+
+"""
+This module generates synthetic election records, so that the verifier can be benchmarked and tested at any scale.
+
+A record is built from a chosen manifest shape, contests with a number of selections and votes allowed, a number of
+guardians and a quorum, a number of ballots and a spoil rate. Every part of it is computed, not mocked: the guardian
+coefficient commitments and their Schnorr proofs, the ElGamal encryption of every selection and placeholder with its
+disjunctive Chaum-Pedersen proof, the constant Chaum-Pedersen proof of every contest, the tracking hash chain, and
+the tally and spoiled ballot decryptions with a Chaum-Pedersen proof for every guardian share. Guardians can be
+missing at decryption, their shares then being recombined from the compensated parts of the available guardians,
+each computed from the polynomial of the missing guardian and proven. The files are written in the layout
+FilePathGenerator expects.
+
+Records use either the standard 4096-bit group, or a small test group, a 64-bit q in a 128-bit p, which is orders
+of magnitude faster to generate and to verify. A small group record is verified in its own group, see
+number.set_group(). Faults can be injected on purpose, each one making exactly one box fail.
+
+Class:
+    SyntheticRecordGenerator
+
+Function:
+    make_test_group(int, int)
+"""
+
+STANDARD_COFACTOR = (number.LARGE_PRIME - 1) // number.SMALL_PRIME
+
+
+def make_test_group(q_bits=64, p_bits=128) -> tuple:
+    """
+    find a small group with the same structure as the standard one, p = q * r + 1 with p and q prime and q not
+    dividing r, deterministic for given sizes
+    :param q_bits: size of the small prime q in bits
+    :param p_bits: size of the large prime p in bits
+    :return: a (p, q, r, g) tuple, g being a generator of the order q subgroup
+    """
+    q = (1 << (q_bits - 1)) + 1
+    while not number.is_prime(q, 20):
+        q += 2
+
+    r = 1 << (p_bits - q_bits)
+    while r % q == 0 or not number.is_prime(q * r + 1, 20):
+        r += 2
+    p = q * r + 1
+
+    base = 2
+    while pow(base, r, p) == 1:
+        base += 1
+
+    return p, q, r, pow(base, r, p)
+
+
+class SyntheticRecordGenerator:
+    """
+    This class writes a complete and valid election record, except for the faults asked for.
+
+    Faults, by name, with the box they make fail:
+        guardian_proof: the response of a coefficient proof of guardian 0, box 2
+        selection_proof: the zero proof response of a selection of one ballot, box 3
+        contest_proof: the constant proof response of a contest of one ballot, box 4
+        tracking_hash: the tracking hash of one ballot, the chain staying consistent, box 5
+        tracking_chain: the previous tracking hash of one ballot, its own hash staying consistent, box 5
+        tally: the aggregate encryption of a tally selection, box 6
+        tally_share: a guardian share of a tally selection, box 6
+        tally_count: the published count of a tally selection, its decryption staying consistent, box 9
+        spoiled_share: a guardian share of a spoiled ballot selection, box 10
+        compensated_share: the proof response of a compensated part of a missing guardian's tally share, box 7
+        recombined_share: the tally share of a missing guardian, recombined from valid compensated parts, box 8
+
+    Method:
+        generate(str)
+    """
+
+    FAULTS = {'guardian_proof': 2, 'selection_proof': 3, 'contest_proof': 4, 'tracking_hash': 5,
+              'tracking_chain': 5, 'tally': 6, 'tally_share': 6, 'tally_count': 9, 'spoiled_share': 10,
+              'compensated_share': 7, 'recombined_share': 8}
+    COEFFICIENT_FILE_NAME = 'coefficient_validation_set_hamilton-county-canvass-board-member-{i}.json'
+
+    def __init__(self, contests=((2, 1), (3, 2)), num_guardians=3, quorum=2, num_ballots=10, spoil_rate=0.1,
+                 small_params=True, seed=0, faults=(), missing_guardians=0):
+        """
+        :param contests: the manifest shape, a (number of selections, votes allowed) pair per contest
+        :param num_guardians: number of guardians n
+        :param quorum: number of guardians k needed to decrypt, the degree of the guardian polynomials plus one
+        :param num_ballots: number of ballots, cast and spoiled
+        :param spoil_rate: probability for each ballot to be spoiled
+        :param small_params: use the small test group instead of the standard group
+        :param seed: seed of every random choice, the same arguments always give the same record
+        :param faults: names of the faults to inject, see the class description
+        :param missing_guardians: number of guardians missing at decryption, the last ones, whose shares are
+                                  compensated by the others
+        """
+        for selections, votes_allowed in contests:
+            if not 0 < votes_allowed <= selections:
+                raise ValueError("votes allowed must be between 1 and the number of selections")
+        if not 0 < quorum <= num_guardians:
+            raise ValueError("quorum must be between 1 and the number of guardians")
+        if not 0 <= missing_guardians <= num_guardians - quorum:
+            raise ValueError("missing guardians must leave at least a quorum of guardians")
+        for fault in ('compensated_share', 'recombined_share'):
+            if fault in faults and not missing_guardians:
+                raise ValueError("the {fault} fault needs at least one missing guardian".format(fault=fault))
+        if not 0 <= spoil_rate <= 1:
+            raise ValueError("spoil rate must be between 0 and 1")
+        unknown = set(faults) - set(self.FAULTS)
+        if unknown:
+            raise ValueError("unknown faults: {names}, expected among {faults}"
+                             .format(names=', '.join(sorted(unknown)), faults=', '.join(sorted(self.FAULTS))))
+
+        self.contests = tuple((int(s), int(l)) for s, l in contests)
+        self.num_guardians = num_guardians
+        self.quorum = quorum
+        self.num_ballots = num_ballots
+        self.spoil_rate = spoil_rate
+        self.small_params = small_params
+        self.missing_guardians = missing_guardians
+        self.faults = set(faults)
+        self.rng = random.Random(seed)
+
+        if small_params:
+            self.p, self.q, self.r, self.g = make_test_group()
+        else:
+            self.p, self.q, self.r = number.LARGE_PRIME, number.SMALL_PRIME, STANDARD_COFACTOR
+            self.g = pow(2, self.r, self.p)
+
+        self.base_hash = self.extended_hash = self.public_key = None
+        self.polynomials = []
+        self.secrets = []
+        self.public_keys = []
+        self.lagrange_coefficients = []
+        self.injected = []
+
+    def generate(self, root_folder_path: str) -> list:
+        """
+        write the record, the folder is created if needed
+        :param root_folder_path: path to the record folder
+        :return: the injected faults, a list of dictionaries of fault name, box and item
+        """
+        os.makedirs(os.path.join(root_folder_path, 'coefficients'), exist_ok=True)
+        os.makedirs(os.path.join(root_folder_path, 'encrypted_ballots'), exist_ok=True)
+
+        # the hash of the record reduces modulo its own q
+        standard_group = (number.LARGE_PRIME, number.SMALL_PRIME)
+        number.set_group(self.p, self.q)
+        try:
+            self.__write_guardians(root_folder_path)
+            self.__write_parameters(root_folder_path)
+            totals, spoiled = self.__write_ballots(root_folder_path)
+            self.__write_tally(root_folder_path, totals, spoiled)
+        finally:
+            number.set_group(*standard_group)
+
+        return self.injected
+
+    def __nonce(self) -> int:
+        """
+        :return: a random element of Zq, not 0
+        """
+        return self.rng.randrange(1, self.q)
+
+    def __inverse(self, x: int) -> int:
+        """
+        :param x: an element of Z*p
+        :return: its inverse modulo p
+        """
+        return pow(x, self.p - 2, self.p)
+
+    def __inject(self, fault: str, item) -> bool:
+        """
+        check if a fault was asked for and record it as injected
+        :param fault: the fault name
+        :param item: the item the fault is injected in
+        :return: True if the fault has to be injected here
+        """
+        if fault not in self.faults:
+            return False
+        self.faults.discard(fault)
+        self.injected.append({'fault': fault, 'box': self.FAULTS[fault], 'item': item})
+        return True
+
+    @staticmethod
+    def __write_json(path: str, dic: dict):
+        """
+        write a json document of the record
+        :param path: the file path
+        :param dic: the document
+        """
+        with open(path, 'w') as file:
+            json.dump(dic, file)
+
+    def __write_guardians(self, root: str):
+        """
+        generate the guardian polynomials and write the coefficient files with their commitments and proofs, box 2
+        """
+        p, q, g = self.p, self.q, self.g
+        self.base_hash = self.__nonce()
+        self.extended_hash = number.hash_elems(self.base_hash, 'extended')
+
+        for i in range(self.num_guardians):
+            coefficients = [self.__nonce() for _ in range(self.quorum)]
+            commitments = [pow(g, a, p) for a in coefficients]
+            proofs = []
+            for a, commitment in zip(coefficients, commitments):
+                w = self.__nonce()
+                h = pow(g, w, p)
+                c = number.hash_elems(self.base_hash, commitment, h)
+                u = (w + c * a) % q
+                if i == 0 and self.__inject('guardian_proof', 'guardian-0'):
+                    u = (u + 1) % q
+                proofs.append({'public_key': str(commitment), 'commitment': str(h), 'challenge': str(c),
+                               'response': str(u)})
+            self.polynomials.append(coefficients)
+            self.secrets.append(coefficients[0])
+            self.public_keys.append(commitments[0])
+            self.__write_json(os.path.join(root, 'coefficients', self.COEFFICIENT_FILE_NAME.format(i=i)),
+                              {'owner_id': 'guardian-{i}'.format(i=i),
+                               'coefficient_commitments': [str(k) for k in commitments],
+                               'coefficient_proofs': proofs})
+
+        self.public_key = 1
+        for key in self.public_keys:
+            self.public_key = self.public_key * key % p
+
+        # the coefficients w_l recombining the compensated parts of the available guardians, of sequence order l
+        orders = range(1, self.num_guardians - self.missing_guardians + 1)
+        for order in orders:
+            numerator, denominator = 1, 1
+            for other in orders:
+                if other != order:
+                    numerator, denominator = numerator * other % q, denominator * (other - order) % q
+            self.lagrange_coefficients.append(numerator * pow(denominator, q - 2, q) % q)
+
+    def __write_parameters(self, root: str):
+        """
+        write the constants, context and description files
+        """
+        self.__write_json(os.path.join(root, 'constants.json'),
+                          {'large_prime': str(self.p), 'small_prime': str(self.q), 'cofactor': str(self.r),
+                           'generator': str(self.g)})
+        self.__write_json(os.path.join(root, 'context.json'),
+                          {'crypto_base_hash': str(self.base_hash),
+                           'crypto_extended_base_hash': str(self.extended_hash),
+                           'elgamal_public_key': str(self.public_key),
+                           'number_of_guardians': self.num_guardians,
+                           'quorum': self.quorum})
+        contests = []
+        for ci, (num_selections, votes_allowed) in enumerate(self.contests):
+            contests.append({'object_id': 'contest-{c}'.format(c=ci),
+                             'sequence_order': ci,
+                             'votes_allowed': votes_allowed,
+                             'ballot_selections': [{'object_id': 'contest-{c}-selection-{s}'.format(c=ci, s=si),
+                                                    'sequence_order': si} for si in range(num_selections)]})
+        self.__write_json(os.path.join(root, 'description.json'), {'contests': contests})
+
+    def __encrypt_selection(self, vote: int, object_id: str, is_placeholder: bool) -> tuple:
+        """
+        encrypt a vote and prove it is 0 or 1 with a disjunctive Chaum-Pedersen proof, the branch not taken
+        being simulated
+        :param vote: 0 or 1
+        :param object_id: the selection id
+        :param is_placeholder: whether the selection is a placeholder
+        :return: the selection dictionary, the pad, the data and the nonce of the encryption
+        """
+        p, q, g, key = self.p, self.q, self.g, self.public_key
+        nonce = self.__nonce()
+        pad = pow(g, nonce, p)
+        data = pow(g, vote, p) * pow(key, nonce, p) % p
+
+        if vote == 0:
+            u0 = self.__nonce()
+            a0, b0 = pow(g, u0, p), pow(key, u0, p)
+            c1, v1 = self.__nonce(), self.__nonce()
+            a1 = pow(g, v1, p) * self.__inverse(pow(pad, c1, p)) % p
+            b1 = pow(g, c1, p) * pow(key, v1, p) * self.__inverse(pow(data, c1, p)) % p
+            c = number.hash_elems(self.extended_hash, pad, data, a0, b0, a1, b1)
+            c0 = (c - c1) % q
+            v0 = (u0 + c0 * nonce) % q
+        else:
+            c0, v0 = self.__nonce(), self.__nonce()
+            a0 = pow(g, v0, p) * self.__inverse(pow(pad, c0, p)) % p
+            b0 = pow(key, v0, p) * self.__inverse(pow(data, c0, p)) % p
+            u1 = self.__nonce()
+            a1, b1 = pow(g, u1, p), pow(key, u1, p)
+            c = number.hash_elems(self.extended_hash, pad, data, a0, b0, a1, b1)
+            c1 = (c - c0) % q
+            v1 = (u1 + c1 * nonce) % q
+
+        selection = {'object_id': object_id,
+                     'is_placeholder_selection': is_placeholder,
+                     'ciphertext': {'pad': str(pad), 'data': str(data)},
+                     'proof': {'proof_zero_pad': str(a0), 'proof_zero_data': str(b0),
+                               'proof_one_pad': str(a1), 'proof_one_data': str(b1),
+                               'proof_zero_challenge': str(c0), 'proof_one_challenge': str(c1),
+                               'proof_zero_response': str(v0), 'proof_one_response': str(v1)}}
+        return selection, pad, data, nonce
+
+    def __encrypt_contest(self, ci: int, ballot_id: str, plaintexts: dict, faulty: bool) -> dict:
+        """
+        encrypt the selections of a contest, fill in the placeholders up to the votes allowed and prove the number
+        of votes with a constant Chaum-Pedersen proof
+        :param ci: the contest index
+        :param ballot_id: the ballot id, to report injected faults
+        :param plaintexts: filled with (contest id, selection id) - (pad, data, vote) of the real selections
+        :param faulty: whether the ballot is the one carrying the injected ballot faults
+        :return: the contest dictionary
+        """
+        p, q, g, key = self.p, self.q, self.g, self.public_key
+        num_selections, votes_allowed = self.contests[ci]
+        contest_id = 'contest-{c}'.format(c=ci)
+        votes = [0] * num_selections
+        for si in self.rng.sample(range(num_selections), self.rng.randint(0, votes_allowed)):
+            votes[si] = 1
+        num_placeholder_votes = votes_allowed - sum(votes)
+
+        selections = []
+        pad_product, data_product, nonce_sum = 1, 1, 0
+        for si, vote in enumerate(votes):
+            selection_id = '{c}-selection-{s}'.format(c=contest_id, s=si)
+            selection, pad, data, nonce = self.__encrypt_selection(vote, selection_id, False)
+            if faulty and ci == 0 and si == 0 and self.__inject('selection_proof', ballot_id + '/' + selection_id):
+                proof = selection['proof']
+                proof['proof_zero_response'] = str((int(proof['proof_zero_response']) + 1) % q)
+            selections.append(selection)
+            plaintexts[(contest_id, selection_id)] = (pad, data, vote)
+            pad_product, data_product, nonce_sum = pad_product * pad % p, data_product * data % p, nonce_sum + nonce
+        for pi in range(votes_allowed):
+            placeholder_id = '{c}-placeholder-{i}'.format(c=contest_id, i=pi)
+            selection, pad, data, nonce = self.__encrypt_selection(1 if pi < num_placeholder_votes else 0,
+                                                                   placeholder_id, True)
+            selections.append(selection)
+            pad_product, data_product, nonce_sum = pad_product * pad % p, data_product * data % p, nonce_sum + nonce
+
+        u = self.__nonce()
+        a, b = pow(g, u, p), pow(key, u, p)
+        c = number.hash_elems(self.extended_hash, pad_product, data_product, a, b)
+        v = (u + c * nonce_sum) % q
+        if faulty and ci == 0 and self.__inject('contest_proof', ballot_id + '/' + contest_id):
+            v = (v + 1) % q
+
+        return {'object_id': contest_id, 'ballot_selections': selections,
+                'proof': {'pad': str(a), 'data': str(b), 'challenge': str(c), 'response': str(v)}}
+
+    def __write_ballots(self, root: str) -> tuple:
+        """
+        write the encrypted ballots, chained by their tracking hashes, boxes 3, 4 and 5
+        :return: the aggregate (pad, data, total) of every selection of the cast ballots, and the (pad, data, vote)
+                 of every selection of every spoiled ballot
+        """
+        p = self.p
+        states = ['SPOILED' if self.rng.random() < self.spoil_rate else 'CAST' for _ in range(self.num_ballots)]
+        fault_ballot = self.rng.randrange(self.num_ballots) if self.num_ballots else None
+        totals, spoiled = {}, {}
+        previous_hash = number.hash_elems(self.extended_hash)
+
+        for bi, state in enumerate(states):
+            ballot_id = 'ballot-{b}'.format(b=bi)
+            faulty = bi == fault_ballot
+            plaintexts = {}
+            contests = [self.__encrypt_contest(ci, ballot_id, plaintexts, faulty) for ci in range(len(self.contests))]
+
+            timestamp = 1600000000 + bi
+            crypto_hash = number.hash_elems(ballot_id, [c['proof']['challenge'] for c in contests])
+            if faulty and self.__inject('tracking_chain', ballot_id):
+                previous_hash = self.__nonce()
+            tracking_hash = number.hash_elems(previous_hash, timestamp, crypto_hash)
+            if faulty and self.__inject('tracking_hash', ballot_id):
+                tracking_hash = self.__nonce()
+
+            self.__write_json(os.path.join(root, 'encrypted_ballots', ballot_id + '.json'),
+                              {'object_id': ballot_id, 'state': state, 'contests': contests,
+                               'crypto_hash': str(crypto_hash), 'previous_tracking_hash': str(previous_hash),
+                               'tracking_hash': str(tracking_hash), 'timestamp': timestamp})
+            previous_hash = tracking_hash
+
+            if state == 'CAST':
+                for key, (pad, data, vote) in plaintexts.items():
+                    total_pad, total_data, total = totals.get(key, (1, 1, 0))
+                    totals[key] = (total_pad * pad % p, total_data * data % p, total + vote)
+            else:
+                spoiled[ballot_id] = plaintexts
+
+        return totals, spoiled
+
+    def __prove_share(self, pad: int, data: int, secret: int, share: int) -> dict:
+        """
+        prove a share M = A ^ s with a Chaum-Pedersen proof
+        :param pad: the pad A of the encryption
+        :param data: the data B of the encryption
+        :param secret: the secret s
+        :param share: the share M
+        :return: the proof dictionary
+        """
+        p, q, g = self.p, self.q, self.g
+        u = self.__nonce()
+        a, b = pow(g, u, p), pow(pad, u, p)
+        c = number.hash_elems(self.extended_hash, pad, data, a, b, share)
+        v = (u + c * secret) % q
+        return {'pad': str(a), 'data': str(b), 'challenge': str(c), 'response': str(v)}
+
+    def __compensate_share(self, selection_id: str, pad: int, data: int, missing: int, fault=None) -> dict:
+        """
+        recover the share of a missing guardian i from the parts Mi,l = A ^ Pi(l) of the available guardians l,
+        boxes 7 and 8
+        :param selection_id: the selection id
+        :param pad: the pad A of the encryption
+        :param data: the data B of the encryption
+        :param missing: the index of the missing guardian
+        :param fault: the name of the share fault to inject on this selection, if any
+        :return: the share dictionary, with its recovered parts instead of a proof
+        """
+        p, q, g = self.p, self.q, self.g
+        missing_id = 'guardian-{i}'.format(i=missing)
+        parts, share = {}, 1
+        for index, coefficient in enumerate(self.lagrange_coefficients):
+            order = index + 1
+            value = sum(a * pow(order, j, q) for j, a in enumerate(self.polynomials[missing])) % q
+            part = pow(pad, value, p)
+            share = share * pow(part, coefficient, p) % p
+            proof = self.__prove_share(pad, data, value, part)
+            if index == 0 and fault == 'compensated_share':
+                proof['response'] = str((int(proof['response']) + 1) % q)
+            if index == 0 and fault == 'recombined_share':
+                share = share * g % p
+            guardian_id = 'guardian-{i}'.format(i=index)
+            parts[guardian_id] = {'object_id': selection_id, 'guardian_id': guardian_id,
+                                  'missing_guardian_id': missing_id, 'share': str(part),
+                                  'recovery_key': str(pow(g, value, p)), 'proof': proof}
+
+        return {'guardian_id': missing_id, 'share': str(share), 'proof': None, 'recovered_parts': parts}
+
+    def __decrypt_selection(self, selection_id: str, pad: int, data: int, total: int, fault=None) -> dict:
+        """
+        decrypt an aggregate encryption with the share of every guardian and prove each share, boxes 6 and 10, the
+        shares of the missing guardians being compensated
+        :param selection_id: the selection id
+        :param pad: the pad A of the encryption
+        :param data: the data B of the encryption
+        :param total: the plaintext t, B / M = g ^ t
+        :param fault: the name of the share fault to inject on this selection, if any
+        :return: the selection dictionary
+        """
+        p, g = self.p, self.g
+        shares, product = [], 1
+        for i, secret in enumerate(self.secrets):
+            share = pow(pad, secret, p)
+            product = product * share % p
+            if i >= len(self.lagrange_coefficients):
+                first_missing = i == len(self.lagrange_coefficients)
+                shares.append(self.__compensate_share(selection_id, pad, data, i, fault if first_missing else None))
+                continue
+            proof = self.__prove_share(pad, data, secret, share)
+            if i == 0 and fault in ('tally_share', 'spoiled_share'):
+                share = share * g % p
+            shares.append({'guardian_id': 'guardian-{i}'.format(i=i), 'share': str(share), 'proof': proof})
+
+        return {'object_id': selection_id, 'tally': total, 'value': str(data * self.__inverse(product) % p),
+                'message': {'pad': str(pad), 'data': str(data)}, 'shares': shares}
+
+    def __decrypt_contests(self, plaintexts: dict, item: str, share_faults: tuple) -> dict:
+        """
+        decrypt every selection of a tally or of a spoiled ballot
+        :param plaintexts: (contest id, selection id) - (pad, data, plaintext)
+        :param item: the tally or spoiled ballot id, to report injected faults
+        :param share_faults: the names of the share faults that may be injected here, one per selection
+        :return: the contests dictionary
+        """
+        contests = {}
+        for (contest_id, selection_id), (pad, data, total) in sorted(plaintexts.items()):
+            fault = next((f for f in share_faults if self.__inject(f, item + '/' + selection_id)), None)
+            selection = self.__decrypt_selection(selection_id, pad, data, total, fault)
+            contest = contests.setdefault(contest_id, {'object_id': contest_id, 'selections': {}})
+            contest['selections'][selection_id] = selection
+        return contests
+
+    def __write_tally(self, root: str, totals: dict, spoiled: dict):
+        """
+        write the tally of the cast ballots and the decryption of every spoiled ballot
+        """
+        if 'spoiled_share' in self.faults and not spoiled:
+            raise ValueError("the spoiled_share fault needs at least one spoiled ballot")
+
+        contests = self.__decrypt_contests(totals, 'tally', ('tally_share', 'compensated_share', 'recombined_share'))
+        if contests and self.__inject('tally', 'tally'):
+            selection = next(iter(next(iter(contests.values()))['selections'].values()))
+            selection['message']['pad'] = str(int(selection['message']['pad']) * self.g % self.p)
+        if contests and self.__inject('tally_count', 'tally'):
+            selection = next(iter(next(iter(contests.values()))['selections'].values()))
+            selection['tally'] += 1
+
+        spoiled_ballots = {ballot_id: self.__decrypt_contests(plaintexts, ballot_id, ('spoiled_share',))
+                           for ballot_id, plaintexts in sorted(spoiled.items())}
+        self.__write_json(os.path.join(root, 'tally.json'),
+                          {'object_id': 'tally', 'contests': contests, 'spoiled_ballots': spoiled_ballots})
@@ -0,0 +1,285 @@
+import os
+import json
+import mmap
+import struct
+import hashlib
+import threading
+
+"""
+This module keeps a persistent index of the encrypted ballots of a record by tracking code and by object id, so that
+a voter's ballot is found without reading every file of the encrypted_ballots folder.
+
+The index is a sorted file, memory-mapped: a table of fixed-size entries, each holding a 16-byte digest of the key,
+the kind of key and the location of the key and of the ballot file name in a string heap that follows the table.
+A lookup is a binary search on the digests, touching a handful of pages, then one read of the heap. The file name is
+relative to the record root, so it locates the ballot in any backend, a packed bundle resolving it to its offset with
+its own index.
+
+Ballots added to the record after the index was written are appended to a log next to the index file, one json line
+per ballot, and looked up in memory; once the log grows beyond a fraction of the index, both are merged into a new
+sorted file. Ballots are never removed from a published record, so neither are entries.
+
+Class:
+    TrackingIndex
+"""
+
+TRACKING_HASH = 'tracking_hash'
+OBJECT_ID = 'object_id'
+KINDS = (TRACKING_HASH, OBJECT_ID)
+
+# the log is merged into the sorted file once it holds more than this many ballots and this fraction of the index
+COMPACT_MIN_ENTRIES = 1024
+COMPACT_RATIO = 0.1
+
+
+def key_digest(kind: str, key: str) -> bytes:
+    """
+    :param kind: TRACKING_HASH or OBJECT_ID
+    :param key: the tracking code or the object id
+    :return: the 16-byte digest the entries are sorted by
+    """
+    return hashlib.sha256('{kind}:{key}'.format(kind=kind, key=key).encode('utf-8')).digest()[:16]
+
+
+class TrackingIndex:
+    """
+    Index of the ballot files of a record by tracking hash and object id, a sorted memory-mapped file and a log of
+    the ballots added since it was written.
+
+    Method:
+        lookup(str, str)
+        names()
+        add(str, str, str)
+        add_ballot(str, dict)
+        update(FilePathGenerator)
+        maybe_compact()
+        compact()
+        close()
+    """
+
+    MAGIC = b'EGINDEX1\n'
+    HEADER = struct.Struct('>Q')
+    # key digest, index of the kind of key in KINDS, offset of the heap item, length of the heap item
+    ENTRY = struct.Struct('>16sBQI')
+
+    def __init__(self, path: str):
+        """
+        open the index, empty if the file does not exist yet
+        :param path: the path of the index file, the log being the same path ending with '.log'
+        """
+        self.path = path
+        self.log_path = path + '.log'
+        self.log = None
+        self.lock = threading.Lock()
+        self.file = None
+        self.data = None
+        self.count = 0
+        self.heap_start = 0
+        self.__map()
+
+        # kind - key - file name, the ballots of the log
+        self.added = {TRACKING_HASH: {}, OBJECT_ID: {}}
+        self.num_logged = 0
+        if os.path.exists(self.log_path):
+            with open(self.log_path, 'r') as log:
+                for line in log:
+                    # a line cut short by a crash while appending is ignored
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    self.__add_in_memory(entry['name'], entry[TRACKING_HASH], entry[OBJECT_ID])
+
+    def __map(self):
+        """
+        map the sorted file, if any
+        """
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            return
+        self.file = open(self.path, 'rb')
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.data[:len(self.MAGIC)] != self.MAGIC:
+            self.close()
+            raise ValueError("{path} is not a tracking index".format(path=self.path))
+        start = len(self.MAGIC)
+        self.count, = self.HEADER.unpack(self.data[start:start + self.HEADER.size])
+        self.heap_start = start + self.HEADER.size + self.count * self.ENTRY.size
+
+    def __entry(self, i: int) -> tuple:
+        """
+        :return: the (digest, kind index, heap offset, heap length) of the i-th entry of the sorted file
+        """
+        offset = len(self.MAGIC) + self.HEADER.size + i * self.ENTRY.size
+        return self.ENTRY.unpack(self.data[offset:offset + self.ENTRY.size])
+
+    def __heap_item(self, offset: int, length: int) -> tuple:
+        """
+        :return: the (key, file name) of a heap item
+        """
+        start = self.heap_start + offset
+        key, name = self.data[start:start + length].decode('utf-8').split('\0', 1)
+        return key, name
+
+    def lookup(self, key: str, kind=TRACKING_HASH):
+        """
+        find the ballot file of a tracking code or of an object id
+        :param key: the tracking code or the object id
+        :param kind: TRACKING_HASH or OBJECT_ID
+        :return: the file name relative to the record root, or None if no indexed ballot has this key
+        """
+        key = str(key)
+        name = self.added[kind].get(key)
+        if name is not None or self.data is None:
+            return name
+
+        digest = key_digest(kind, key)
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self.__entry(middle)[0] < digest:
+                low = middle + 1
+            else:
+                high = middle
+        # entries sharing a digest are adjacent, the key itself tells them apart
+        kind_index = KINDS.index(kind)
+        while low < self.count:
+            entry_digest, entry_kind, offset, length = self.__entry(low)
+            if entry_digest != digest:
+                break
+            entry_key, name = self.__heap_item(offset, length)
+            if entry_kind == kind_index and entry_key == key:
+                return name
+            low += 1
+        return None
+
+    def names(self) -> set:
+        """
+        :return: the file names of all the indexed ballots
+        """
+        names = set(self.added[TRACKING_HASH].values())
+        for _, name in self.__iter_sorted(TRACKING_HASH):
+            names.add(name)
+        return names
+
+    def __iter_sorted(self, kind: str):
+        """
+        :return: a generator of the (key, file name) of one kind in the sorted file
+        """
+        if self.data is None:
+            return
+        kind_index = KINDS.index(kind)
+        for i in range(self.count):
+            _, entry_kind, offset, length = self.__entry(i)
+            if entry_kind == kind_index:
+                yield self.__heap_item(offset, length)
+
+    def __add_in_memory(self, name: str, tracking_hash: str, object_id: str):
+        self.added[TRACKING_HASH][str(tracking_hash)] = name
+        self.added[OBJECT_ID][str(object_id)] = name
+        self.num_logged += 1
+
+    def add(self, name: str, tracking_hash: str, object_id: str):
+        """
+        index a ballot, appending it to the log
+        :param name: the ballot file name relative to the record root
+        :param tracking_hash: the tracking hash of the ballot
+        :param object_id: the object id of the ballot
+        """
+        line = json.dumps({'name': name, TRACKING_HASH: str(tracking_hash), OBJECT_ID: str(object_id)})
+        with self.lock:
+            if self.log is None:
+                self.log = open(self.log_path, 'a')
+            self.log.write(line + '\n')
+            self.log.flush()
+            self.__add_in_memory(name, tracking_hash, object_id)
+
+    def add_ballot(self, name: str, ballot_dic: dict):
+        """
+        index a ballot as read from the record
+        :param name: the ballot file name relative to the record root
+        :param ballot_dic: the encrypted ballot
+        """
+        self.add(name, ballot_dic.get('tracking_hash'), ballot_dic.get('object_id'))
+
+    def update(self, path_g) -> int:
+        """
+        index the ballot files of a record that are not indexed yet, reading only those, and compact the index if
+        the log got large
+        :param path_g: the file path generator of the record
+        :return: the number of ballots added
+        """
+        indexed = self.names()
+        folder_path = path_g.get_encrypted_ballot_folder_path()
+        new_ballot = lambda ballot_file: path_g.get_name(ballot_file) not in indexed
+        num_added = 0
+        for ballot_file, ballot_dic in path_g.iter_json_files(folder_path, new_ballot):
+            self.add_ballot(path_g.get_name(ballot_file), ballot_dic)
+            num_added += 1
+
+        self.maybe_compact()
+        return num_added
+
+    def maybe_compact(self) -> bool:
+        """
+        compact the index if the log got large, see COMPACT_MIN_ENTRIES and COMPACT_RATIO, or if there is no sorted
+        file yet, a new index being written sorted right away
+        :return: True if the index was compacted
+        """
+        # the sorted file holds two entries per ballot
+        if self.num_logged and (self.data is None
+                                or self.num_logged > max(COMPACT_MIN_ENTRIES, COMPACT_RATIO * self.count / 2)):
+            self.compact()
+            return True
+        return False
+
+    def compact(self):
+        """
+        merge the log into a new sorted file, replaced atomically, and empty the log
+        """
+        with self.lock:
+            items = {}
+            for kind in KINDS:
+                for key, name in self.__iter_sorted(kind):
+                    items[(kind, key)] = name
+                for key, name in self.added[kind].items():
+                    items[(kind, key)] = name
+
+            entries, heap, heap_size = [], [], 0
+            for (kind, key), name in items.items():
+                item = '{key}\0{name}'.format(key=key, name=name).encode('utf-8')
+                entries.append((key_digest(kind, key), KINDS.index(kind), heap_size, len(item)))
+                heap.append(item)
+                heap_size += len(item)
+            entries.sort()
+
+            temp_path = '{path}.{pid}.tmp'.format(path=self.path, pid=os.getpid())
+            with open(temp_path, 'wb') as file:
+                file.write(self.MAGIC)
+                file.write(self.HEADER.pack(len(entries)))
+                file.writelines(self.ENTRY.pack(*entry) for entry in entries)
+                file.writelines(heap)
+            self.__unmap()
+            os.replace(temp_path, self.path)
+            if self.log is not None:
+                self.log.close()
+                self.log = None
+            if os.path.exists(self.log_path):
+                os.remove(self.log_path)
+            self.added = {TRACKING_HASH: {}, OBJECT_ID: {}}
+            self.num_logged = 0
+            self.__map()
+
+    def __unmap(self):
+        if self.data is not None:
+            self.data.close()
+            self.file.close()
+        self.data, self.file, self.count = None, None, 0
+
+    def close(self):
+        """
+        unmap the sorted file and close the log
+        """
+        self.__unmap()
+        if self.log is not None:
+            self.log.close()
+            self.log = None
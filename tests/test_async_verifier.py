@@ -0,0 +1,85 @@
+import json
+import os
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from verifier import number
+from verifier import async_verifier
+from verifier.async_verifier import AsyncVerifier
+from verifier.synthetic import SyntheticRecordGenerator
+
+"""
+The asyncio interface streams a Result for every item of a record, gives the verdict of the synchronous run on
+faulty records, stops at the first invalid item in fail-fast mode, and verifies a single ballot on its own.
+"""
+
+NUM_BALLOTS = 10
+
+
+@pytest.fixture(autouse=True)
+def standard_group():
+    # a record context sets the group of its record for the whole process
+    group = (number.LARGE_PRIME, number.SMALL_PRIME)
+    yield
+    number.set_group(*group)
+
+
+def generate(folder, faults=()) -> tuple:
+    root = str(folder / 'record')
+    injected = SyntheticRecordGenerator(num_ballots=NUM_BALLOTS, spoil_rate=0.2, seed=1, faults=faults).generate(root)
+    return root, injected
+
+
+def collect(stream) -> list:
+    async def run():
+        return [result async for result in stream]
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize('workers', [None, 2])
+def test_valid_record(tmp_path, workers):
+    root, _ = generate(tmp_path)
+    executor = workers and ThreadPoolExecutor(workers)
+    results = collect(async_verifier.verify_record(root, executor, concurrency=3))
+    if executor:
+        executor.shutdown()
+    assert all(result.ok for result in results)
+    with open(os.path.join(root, 'tally.json')) as file:
+        num_spoiled = len(json.load(file)['spoiled_ballots'])
+    assert num_spoiled
+    # box 1, 2, 5 and the tally, then a Result per ballot file and per spoiled ballot of the tally
+    assert len(results) == 4 + NUM_BALLOTS + num_spoiled
+    assert len([result for result in results if result.level == 'ballot']) == NUM_BALLOTS + num_spoiled
+
+
+@pytest.mark.parametrize('fault', ['guardian_proof', 'selection_proof', 'tracking_chain', 'tally'])
+def test_faulty_record(tmp_path, fault):
+    root, injected = generate(tmp_path, [fault])
+    results = collect(async_verifier.verify_record(root))
+    failed_boxes = set().union(*(result.failed_boxes() for result in results))
+    assert {item['box'] for item in injected} <= failed_boxes
+
+
+def test_fail_fast_stops_at_the_first_invalid_item(tmp_path):
+    root, _ = generate(tmp_path, ['selection_proof'])
+    results = collect(AsyncVerifier(root, concurrency=1, fail_fast=True).verify_record())
+    assert not results[-1].ok and all(result.ok for result in results[:-1])
+    assert len(results) < len(collect(AsyncVerifier(root).verify_record()))
+
+
+def test_verify_ballot(tmp_path):
+    root, _ = generate(tmp_path)
+    folder = os.path.join(root, 'encrypted_ballots')
+    with open(os.path.join(folder, sorted(os.listdir(folder))[0])) as file:
+        ballot_dic = json.load(file)
+    assert asyncio.run(async_verifier.verify_ballot(root, ballot_dic)).ok
+
+    selection = ballot_dic['contests'][0]['ballot_selections'][0]
+    selection['proof']['proof_zero_response'] = str(int(selection['proof']['proof_zero_response']) + 1)
+    result = asyncio.run(async_verifier.verify_ballot(root, ballot_dic))
+    assert not result.ok and 3 in result.failed_boxes()
+
+
+def test_concurrency_must_be_positive(tmp_path):
+    with pytest.raises(ValueError):
+        AsyncVerifier(str(tmp_path), concurrency=0)
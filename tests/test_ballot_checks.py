@@ -0,0 +1,59 @@
+import os
+import json
+from verifier import cli
+from verifier.result import Result, Reason
+from verifier.synthetic import SyntheticRecordGenerator
+
+"""
+The ballot scan reports a malformed ballot instead of crashing when the schema pass is skipped, stops at it in
+fail-fast mode, and only counts the failures of the sampled checks in the confidence of a sampled run.
+"""
+
+
+def make_record(tmp_path, contest_id=None, **kwargs) -> str:
+    root = str(tmp_path / 'record')
+    SyntheticRecordGenerator(num_ballots=10, seed=1, **kwargs).generate(root)
+    if contest_id is not None:
+        folder = os.path.join(root, 'encrypted_ballots')
+        file_path = os.path.join(folder, sorted(os.listdir(folder))[0])
+        with open(file_path) as file:
+            ballot = json.load(file)
+        ballot['contests'][0]['object_id'] = contest_id
+        with open(file_path, 'w') as file:
+            json.dump(ballot, file)
+    return root
+
+
+def run(tmp_path, root: str, *options) -> tuple:
+    jsonl = str(tmp_path / 'results.jsonl')
+    code = cli.main(['verify', root, '--output', 'summary', '--jsonl', jsonl] + list(options))
+    with open(jsonl) as file:
+        return code, [Result.from_dict(json.loads(line)) for line in file]
+
+
+def test_unknown_contest_without_schema(tmp_path):
+    code, results = run(tmp_path, make_record(tmp_path, 'bogus'), '--no-schema')
+    assert code == 1
+    codes = {failure.code for result in results for _, failure in result.iter_failures()}
+    assert Reason.UNKNOWN_CONTEST in codes
+
+
+def test_fail_fast_stops_at_malformed_ballot(tmp_path):
+    code, results = run(tmp_path, make_record(tmp_path, 'bogus'), '--no-schema', '--fail-fast')
+    assert code == 1
+    ballots = [result for result in results if result.item_id == 'Box 3, 4 & 5 ballots']
+    assert len(ballots) == 1 and ballots[0].checked == 1
+
+
+def test_sample_failures_leave_out_tracking_hashes(tmp_path):
+    root = make_record(tmp_path, faults=['tracking_hash'])
+    code, results = run(tmp_path, root, '--sample', '10', '--seed', '1')
+    assert code == 1
+    ballots = [result for result in results if result.item_id == 'Box 3, 4 & 5 ballots'][0]
+    assert 5 in ballots.failed_boxes()
+    assert ballots.details['sample_failures'] == 0
+
+    code, results = run(tmp_path, make_record(tmp_path / 'other', faults=['selection_proof']), '--sample', '10',
+                        '--seed', '1')
+    ballots = [result for result in results if result.item_id == 'Box 3, 4 & 5 ballots'][0]
+    assert ballots.details['sample_failures'] == 1
@@ -0,0 +1,51 @@
+import json
+import os
+import pytest
+from verifier.compensation import GuardianCompensation
+from verifier.generator import FilePathGenerator, ParameterGenerator
+from verifier.synthetic import SyntheticRecordGenerator
+
+"""
+The share of a missing guardian is the recombination of the parts of the available guardians with the Lagrange
+coefficients of their set, which must interpolate the polynomials at 0.
+"""
+
+
+@pytest.fixture(scope='module')
+def record(tmp_path_factory):
+    root = str(tmp_path_factory.mktemp('compensation') / 'record')
+    SyntheticRecordGenerator(num_ballots=4, num_guardians=3, quorum=2, missing_guardians=1, seed=1).generate(root)
+    return root
+
+
+@pytest.fixture(scope='module')
+def guardians(record):
+    return GuardianCompensation(ParameterGenerator(FilePathGenerator.open(record)))
+
+
+def test_lagrange_coefficients(guardians):
+    q = guardians.small_prime
+    # guardians 0 and 1 evaluate at 1 and 2: w_1 = 2 / (2 - 1) and w_2 = 1 / (1 - 2)
+    coefficients = guardians.get_lagrange_coefficients((0, 1))
+    assert coefficients == {0: 2, 1: q - 1}
+    assert guardians.get_lagrange_coefficients((0, 1)) is coefficients
+
+    # any polynomial of degree quorum - 1 is interpolated at 0 by every set of quorum guardians
+    polynomial = [123456789, 987654321]
+    for available in ((0, 1), (0, 2), (1, 2)):
+        coefficients = guardians.get_lagrange_coefficients(available)
+        values = {index: sum(a * (index + 1) ** j for j, a in enumerate(polynomial)) % q for index in available}
+        assert sum(coefficients[index] * values[index] for index in available) % q == polynomial[0]
+
+
+def test_recombine_missing_guardian(record, guardians):
+    with open(os.path.join(record, 'tally.json')) as file:
+        tally = json.load(file)
+    for contest in tally['contests'].values():
+        for selection in contest['selections'].values():
+            missing = [share for share in selection['shares'] if share.get('recovered_parts')]
+            assert [share['guardian_id'] for share in missing] == ['guardian-2']
+            parts = {guardians.get_index(guardian_id): int(part['share'])
+                     for guardian_id, part in missing[0]['recovered_parts'].items()}
+            assert sorted(parts) == [0, 1]
+            assert guardians.recombine(parts) == int(missing[0]['share'])
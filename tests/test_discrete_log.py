@@ -0,0 +1,38 @@
+import pytest
+from verifier.discrete_log import DiscreteLogTable
+from verifier.synthetic import make_test_group
+
+"""
+The discrete log table finds every count up to its bound and none beyond it, from the table or by baby-step
+giant-step once the bound is past the size the table may grow to.
+"""
+
+P, Q, R, G = make_test_group()
+
+
+@pytest.mark.parametrize('max_size', [1 << 20, 16])
+def test_known_logs(max_size):
+    table = DiscreteLogTable(G, P, max_size)
+    for t in (0, 1, 7, 100, 999):
+        assert table.log(pow(G, t, P), 1000) == t
+    assert len(table.powers) <= max(max_size, 1)
+
+
+@pytest.mark.parametrize('max_size', [1 << 20, 16])
+def test_value_at_the_bound(max_size):
+    table = DiscreteLogTable(G, P, max_size)
+    assert table.log(pow(G, 500, P), 500) == 500
+    assert table.log(pow(G, 501, P), 500) is None
+    # a log already in the table is still bounded
+    assert table.log(pow(G, 500, P), 499) is None
+
+
+def test_none_beyond_max_size():
+    table = DiscreteLogTable(G, P, max_size=16)
+    # found by baby-step giant-step, the table never growing past its size
+    assert table.log(pow(G, 300, P), 1000) == 300
+    assert table.log(pow(G, 5000, P), 1000) is None
+    assert table.log(pow(G, 5000, P), 200) is None
+    assert len(table.powers) == 16
+    # not a power of g below any bound looked for
+    assert table.log(P - 1, 1000) is None
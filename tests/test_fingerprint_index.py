@@ -0,0 +1,56 @@
+from verifier.fingerprint_index import FingerprintIndex, canonical_number, fingerprint, CIPHERTEXT
+from verifier.record_view import parse_document
+
+"""
+The replay check fingerprints the numbers from their text: the notation must not hide a replay, the numbers must
+not be decoded, and a spilled index must find the same duplicates as one held in memory.
+"""
+
+
+def make_ballot(ballot_id: str, pad: str) -> bytes:
+    return ('{{"object_id": "{ballot}", "contests": [{{"object_id": "c", "proof": {{"pad": "1", "data": "2"}}, '
+            '"ballot_selections": [{{"object_id": "s", "ciphertext": {{"pad": "{pad}", "data": "7"}}, '
+            '"proof": {{}}}}]}}]}}').format(ballot=ballot_id, pad=pad).encode('utf-8')
+
+
+def test_canonical_notation():
+    assert canonical_number('0x00ABc') == canonical_number('abc') == canonical_number(' 0Xabc ') == 'abc'
+    assert canonical_number('000') == '0'
+    assert fingerprint(CIPHERTEXT, ('0012', '7')) == fingerprint(CIPHERTEXT, ('12', '7'))
+    assert fingerprint(CIPHERTEXT, ('12', '7')) != fingerprint(CIPHERTEXT, ('127', ''))
+
+
+def test_numbers_stay_undecoded():
+    ballot = parse_document(make_ballot('b0', '123'))
+    FingerprintIndex().add_ballot(ballot)
+    ciphertext = ballot['contests'][0]['ballot_selections'][0]['ciphertext']
+    assert not hasattr(ciphertext, 'numbers')
+
+
+def test_spilled_duplicates(tmp_path):
+    ballots = [make_ballot('b{i}'.format(i=i), str(1000 + i)) for i in range(50)]
+    ballots.append(make_ballot('b50', '001013'))
+    found = {}
+    for budget in (1 << 20, 1000):
+        index = FingerprintIndex(budget, str(tmp_path / str(budget)))
+        for ballot in ballots:
+            index.add_ballot(parse_document(ballot))
+        found[budget] = sorted(duplicate for duplicate in index.duplicates() if duplicate[0] == CIPHERTEXT)
+        assert (budget == 1000) == bool(index.runs)
+        index.close()
+    assert found[1 << 20] == found[1000] == [('ciphertext', 'b50', 'c.s', 'b13', 'c.s')]
+
+
+def test_first_copy_kept_across_a_spill(tmp_path):
+    digest = fingerprint(CIPHERTEXT, ('5', '7'))
+    # room for a single entry, the first copy is spilled with the second entry
+    index = FingerprintIndex(400, str(tmp_path))
+    index.add(digest, CIPHERTEXT, 'b0', 'c.s')
+    index.add(fingerprint(CIPHERTEXT, ('6', '7')), CIPHERTEXT, 'b1', 'c.s')
+    assert len(index.runs) == 1
+    # the later copies meet in memory, after the first one left it
+    index.add(digest, CIPHERTEXT, 'b2', 'c.s')
+    index.add(digest, CIPHERTEXT, 'b3', 'c.s')
+    assert sorted(index.duplicates()) == [('ciphertext', 'b2', 'c.s', 'b0', 'c.s'),
+                                          ('ciphertext', 'b3', 'c.s', 'b0', 'c.s')]
+    index.close()
@@ -0,0 +1,63 @@
+import random
+import pytest
+from verifier import number
+from verifier.number import PythonBackend, Gmpy2Backend
+
+"""
+Every big-integer backend computes the same numbers as the built-in pow on the standard group, and the products of
+exponentiations computed at once give the product of the single ones, whichever backend runs them.
+"""
+
+P = number.STANDARD_LARGE_PRIME
+Q = number.STANDARD_SMALL_PRIME
+
+
+@pytest.fixture(params=['python', 'gmpy2'])
+def backend(request):
+    if request.param == 'gmpy2':
+        pytest.importorskip('gmpy2')
+    previous = number.BACKEND
+    backend = number.set_backend(request.param)
+    yield backend
+    number.BACKEND = previous
+
+
+def operands(count: int) -> list:
+    rng = random.Random(1)
+    return [(rng.randrange(2, P), rng.randrange(Q)) for _ in range(count)] + [(1, 0), (P - 1, Q - 1), (2, 1)]
+
+
+def test_backend_matches_python(backend):
+    python = PythonBackend()
+    for base, exponent in operands(8):
+        assert backend.pow_mod(base, exponent, P) == python.pow_mod(base, exponent, P) == pow(base, exponent, P)
+        assert backend.mul_mod(base, exponent, P) == python.mul_mod(base, exponent, P) == base * exponent % P
+        inverse = backend.inverse(base, P)
+        assert inverse == python.inverse(base, P) and inverse * base % P == 1
+        assert backend.from_decimal(str(base)) == base
+        assert type(backend.pow_mod(base, exponent, P)) is int
+    with pytest.raises(ValueError):
+        backend.inverse(Q * 3, Q)
+
+
+def test_multi_pow_mod_matches_pow(backend):
+    pairs = operands(5)
+    bases = [base for base, _ in pairs]
+    exponents = [exponent for _, exponent in pairs]
+    expected = 1
+    for base, exponent in pairs:
+        expected = expected * pow(base, exponent, P) % P
+    assert number.multi_pow_mod(bases, exponents, P) == expected
+    assert number.multi_pow_mod(bases[:1], [0], P) == 1
+    assert number.multi_pow_mod([], [], P) == 1
+
+
+def test_gmpy2_is_chosen_when_installed():
+    gmpy2 = pytest.importorskip('gmpy2')
+    assert number.available_backends() == ['gmpy2', 'python']
+    assert isinstance(Gmpy2Backend().native(3), type(gmpy2.mpz(3)))
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        number.set_backend('gmp')
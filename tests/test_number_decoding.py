@@ -0,0 +1,94 @@
+import base64
+import pytest
+from verifier import number_decoding
+from verifier.number_decoding import decode_number, decode_decimal, is_number_text
+
+"""
+The decoding layer is where a malformed number would be silently read as another one, so every string is checked
+against both decode_number() and is_number_text(), which the schema pass relies on to reject what the checks cannot
+decode.
+"""
+
+NUMBER = 0xC0FFEE << 4000 | 0x1234567
+GARBAGE = ['', '0x', '0X', '12 34!', 'zz==', ' 12', '12 ', '12\n', '1 2', '1_2', '+12', '-12', '0x0x1', 'ab cd',
+           '0xab cd', '１２', 'AQ', 'AQ=']
+
+
+@pytest.fixture(autouse=True)
+def auto_encoding():
+    yield
+    number_decoding.set_encoding(number_decoding.AUTO)
+
+
+@pytest.mark.parametrize('text', GARBAGE)
+def test_garbage_is_rejected(text):
+    with pytest.raises(ValueError):
+        decode_number(text)
+    assert not is_number_text(text)
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('123', 123),
+    ('0', 0),
+    ('ff', 255),
+    ('0xFF', 255),
+    ('0Xabc', 0xabc),
+    ('AQ==', 1),
+    ('zw==', 207),
+    (str(NUMBER), NUMBER),
+    ('{n:x}'.format(n=NUMBER), NUMBER),
+    ('0x{n:X}'.format(n=NUMBER), NUMBER),
+    (base64.b64encode(NUMBER.to_bytes(512, 'big')).decode('ascii'), NUMBER),
+])
+def test_auto_detection(text, expected):
+    assert decode_number(text) == expected
+    assert is_number_text(text)
+
+
+@pytest.mark.parametrize('encoding, text, expected', [
+    (number_decoding.DECIMAL, '123', 123),
+    (number_decoding.HEX, '123', 0x123),
+    (number_decoding.HEX, '0x123', 0x123),
+    (number_decoding.BASE64, 'AQ==', 1),
+])
+def test_forced_encoding(encoding, text, expected):
+    number_decoding.set_encoding(encoding)
+    assert decode_number(text) == expected
+    assert is_number_text(text)
+
+
+@pytest.mark.parametrize('encoding, text', [
+    (number_decoding.DECIMAL, 'ff'),
+    (number_decoding.DECIMAL, 'AQ=='),
+    (number_decoding.HEX, 'AQ=='),
+    (number_decoding.HEX, '0x'),
+    (number_decoding.BASE64, '123'),
+    (number_decoding.BASE64, 'zz=='),
+])
+def test_forced_encoding_rejects_others(encoding, text):
+    number_decoding.set_encoding(encoding)
+    with pytest.raises(ValueError):
+        decode_number(text)
+    assert not is_number_text(text)
+
+
+def test_non_strings():
+    assert decode_number(42) == 42
+    assert decode_number(b'\x01\x00') == 256
+    with pytest.raises(TypeError):
+        decode_number(None)
+
+
+def test_unknown_encoding():
+    with pytest.raises(ValueError):
+        number_decoding.set_encoding('octal')
+
+
+def test_long_decimal_split():
+    # past the cutoff, and past the 4,300-digit limit of int() in recent Python versions
+    digits = '9876543210' * 500
+    expected = 0
+    for digit in digits:
+        expected = expected * 10 + int(digit)
+    assert decode_decimal(digits) == expected
+    assert decode_number(digits) == expected
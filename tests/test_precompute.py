@@ -0,0 +1,100 @@
+import os
+import random
+import pytest
+from verifier import cli
+from verifier import number
+from verifier.precompute import FixedBaseTable, MappedEntries, PrecomputationStore
+from verifier.synthetic import SyntheticRecordGenerator
+
+"""
+A fixed-base table, held in memory or mapped from its file, raises its base as the built-in pow does with every
+backend, a stored table that was tampered with is rebuilt, and a record gets the same verdict with or without the
+tables.
+"""
+
+P = number.STANDARD_LARGE_PRIME
+Q = number.STANDARD_SMALL_PRIME
+G = 3
+
+
+@pytest.fixture(params=['python', 'gmpy2'])
+def backend(request):
+    if request.param == 'gmpy2':
+        pytest.importorskip('gmpy2')
+    previous = number.BACKEND
+    yield number.set_backend(request.param)
+    number.BACKEND = previous
+
+
+@pytest.fixture(autouse=True)
+def no_fixed_bases():
+    yield
+    number.clear_fixed_bases()
+
+
+def exponents() -> list:
+    rng = random.Random(1)
+    return [0, 1, 255, 256, Q - 1] + [rng.randrange(Q) for _ in range(8)]
+
+
+@pytest.mark.parametrize('window', [4, 8])
+def test_table_matches_pow(backend, window):
+    table = FixedBaseTable.build(G, P, Q.bit_length(), window)
+    assert len(table.entries) == table.rows << window and table.limit >= Q
+    for exponent in exponents():
+        assert table.pow(exponent) == number.PythonBackend().pow_mod(G, exponent, P)
+
+    number.add_fixed_base(table)
+    for exponent in exponents():
+        assert number.pow_mod(G, exponent, P) == pow(G, exponent, P)
+    # another modulus or an exponent beyond the table goes to the backend
+    assert number.pow_mod(G, 5, Q) == pow(G, 5, Q)
+    assert number.pow_mod(G, table.limit + 1, P) == pow(G, table.limit + 1, P)
+
+
+def test_store_round_trip(tmp_path, backend):
+    store = PrecomputationStore(str(tmp_path / 'tables'), window=4)
+    assert store.load(G, P, Q.bit_length()) is None
+    built = FixedBaseTable.build(G, P, Q.bit_length(), 4)
+
+    table = store.get(G, P, Q.bit_length())
+    assert isinstance(table.entries, MappedEntries)
+    assert list(table.entries) == built.entries
+    for exponent in exponents():
+        assert table.pow(exponent) == pow(G, exponent, P)
+    store.close()
+
+    # a table of another window is not served by this store
+    assert PrecomputationStore(store.folder, window=8).load(G, P, Q.bit_length()) is None
+
+
+def test_tampered_table_is_rebuilt(tmp_path):
+    store = PrecomputationStore(str(tmp_path / 'tables'), window=4)
+    path = store.get_path(G, P, Q.bit_length())
+    store.save(FixedBaseTable.build(G, P, Q.bit_length(), 4))
+    with open(path, 'r+b') as file:
+        file.seek(-1, os.SEEK_END)
+        last = file.read(1)
+        file.seek(-1, os.SEEK_END)
+        file.write(bytes([last[0] ^ 1]))
+    assert store.load(G, P, Q.bit_length()) is None
+
+    table = store.get(G, P, Q.bit_length())
+    assert table.pow(Q - 1) == pow(G, Q - 1, P)
+    store.close()
+
+    with open(path, 'wb'):
+        pass
+    assert store.load(G, P, Q.bit_length()) is None
+
+
+@pytest.mark.parametrize('faults, code', [((), 0), (('selection_proof',), 1), (('guardian_proof',), 1)])
+def test_verdict_does_not_depend_on_tables(tmp_path, backend, faults, code):
+    root = str(tmp_path / 'record')
+    SyntheticRecordGenerator(num_ballots=10, seed=1, faults=faults).generate(root)
+    tables = str(tmp_path / 'tables')
+    assert cli.main(['verify', root, '--output', 'summary']) == code
+    assert cli.main(['verify', root, '--output', 'summary', '--precompute', tables]) == code
+    assert os.listdir(tables)
+    # the second run maps the stored tables
+    assert cli.main(['verify', root, '--output', 'summary', '--precompute', tables]) == code
@@ -0,0 +1,91 @@
+import time
+import random
+import threading
+import pytest
+from verifier import cli
+from verifier.prefetch import prefetch_map, prefetch_iter
+from verifier.synthetic import SyntheticRecordGenerator
+
+"""
+The prefetch pipelines hand the items out in input order, read at most their depth ahead of the consumer, pass the
+errors of the readers on, and stop the readers when the consumer stops early.
+"""
+
+
+class Reader:
+    """
+    A loading function recording how many items it was called on, slow at random.
+    """
+
+    def __init__(self, fail_at=None):
+        self.calls = 0
+        self.lock = threading.Lock()
+        self.fail_at = fail_at
+        self.rng = random.Random(1)
+
+    def __call__(self, item):
+        with self.lock:
+            self.calls += 1
+            delay = self.rng.random() / 1000
+        time.sleep(delay)
+        if item == self.fail_at:
+            raise ValueError(item)
+        return item * 2
+
+    def iterate(self, items):
+        for item in items:
+            yield self(item)
+
+
+@pytest.mark.parametrize('depth, workers', [(0, 1), (1, 1), (4, 1), (4, 3), (16, 8)])
+def test_map_order_and_depth(depth, workers):
+    reader = Reader()
+    for consumed, (item, value) in enumerate(prefetch_map(reader, range(50), depth, workers), 1):
+        assert value == item * 2 and item == consumed - 1
+        assert reader.calls <= consumed + depth
+    assert reader.calls == 50
+
+
+@pytest.mark.parametrize('depth', [0, 1, 4])
+def test_iter_order_and_depth(depth):
+    reader = Reader()
+    for consumed, value in enumerate(prefetch_iter(reader.iterate(range(50)), depth), 1):
+        assert value == (consumed - 1) * 2
+        # the queue holds depth values and the producer one more waiting for room
+        assert reader.calls <= consumed + depth + 1
+    assert reader.calls == 50
+
+
+def test_errors_reach_the_consumer():
+    values = prefetch_map(Reader(fail_at=3), range(10), 4, 2)
+    assert [next(values)[1] for _ in range(3)] == [0, 2, 4]
+    with pytest.raises(ValueError):
+        next(values)
+
+    values = prefetch_iter(Reader(fail_at=3).iterate(range(10)), 4)
+    assert [next(values) for _ in range(3)] == [0, 2, 4]
+    with pytest.raises(ValueError):
+        next(values)
+
+
+def test_early_close_stops_the_readers():
+    reader = Reader()
+    values = prefetch_map(reader, range(1000), 4, 2)
+    next(values)
+    values.close()
+    assert reader.calls <= 6
+
+    reader = Reader()
+    num_threads = threading.active_count()
+    values = prefetch_iter(reader.iterate(range(1000)), 4)
+    next(values)
+    values.close()
+    assert threading.active_count() == num_threads
+    assert reader.calls <= 7
+
+
+def test_verdict_does_not_depend_on_prefetch(tmp_path):
+    root = str(tmp_path / 'record')
+    SyntheticRecordGenerator(num_ballots=20, seed=1, faults=['selection_proof']).generate(root)
+    for options in (['--prefetch', '0'], ['--prefetch', '1', '--readers', '1'], ['--prefetch', '8', '--readers', '4']):
+        assert cli.main(['verify', root, '--output', 'summary'] + options) == 1
@@ -0,0 +1,114 @@
+import os
+import tarfile
+import zipfile
+import pytest
+from verifier import cli
+from verifier import number
+from verifier.encryption_verifier import AllBallotsVerifier
+from verifier.generator import FilePathGenerator, ParameterGenerator, VoteLimitCounter
+from verifier.key_generation_verifier import KeyGenerationVerifier
+from verifier.result import Result, Reason, ResultSink
+from verifier.synthetic import SyntheticRecordGenerator
+
+"""
+A record gives the same files and the same verdict whatever it is read from: a folder, a zip, tar or compressed tar
+archive, the record being at the root of the archive or in a folder of it, or a packed bundle. A file gone from the
+record is reported through the sink of the run.
+"""
+
+
+def write_archive(root: str, path: str, prefix: str):
+    # the members are written in reverse order, a compressed tar being streamed in archive order, not sorted
+    names = sorted((os.path.relpath(os.path.join(folder, name), root) for folder, _, names in os.walk(root)
+                    for name in names), reverse=True)
+    if path.endswith('.zip'):
+        with zipfile.ZipFile(path, 'w') as archive:
+            for name in names:
+                archive.write(os.path.join(root, name), prefix + name)
+    else:
+        with tarfile.open(path, 'w:gz' if path.endswith('gz') else 'w') as archive:
+            for name in names:
+                archive.add(os.path.join(root, name), prefix + name)
+
+
+def read_ballots(path: str) -> dict:
+    path_g = FilePathGenerator.open(path)
+    folder = path_g.get_encrypted_ballot_folder_path()
+    ballots = {path_g.get_name(ballot_file): ballot_dic.get('object_id')
+               for ballot_file, ballot_dic in path_g.iter_json_files(folder)}
+    assert sorted(path_g.get_name(name) for name in path_g.list_files(folder)) == sorted(ballots)
+    path_g.source.close()
+    return ballots
+
+
+@pytest.fixture(scope='module')
+def records(tmp_path_factory):
+    folder = tmp_path_factory.mktemp('sources')
+    roots = {}
+    for name, faults in (('valid', ()), ('faulty', ('selection_proof',))):
+        roots[name] = str(folder / name)
+        SyntheticRecordGenerator(num_ballots=10, spoil_rate=0.2, seed=1, faults=faults).generate(roots[name])
+    return folder, roots
+
+
+@pytest.mark.parametrize('suffix', ['.zip', '.tar', '.tar.gz', '.tgz'])
+@pytest.mark.parametrize('prefix', ['', 'record/'])
+def test_archive_matches_folder(records, suffix, prefix):
+    folder, roots = records
+    for name, root in roots.items():
+        path = str(folder / (name + prefix.strip('/') + suffix))
+        if not os.path.exists(path):
+            write_archive(root, path, prefix)
+        assert read_ballots(path) == read_ballots(root)
+        assert cli.main(['verify', path, '--output', 'summary']) == (0 if name == 'valid' else 1)
+
+
+def test_packed_record_matches_folder(records):
+    folder, roots = records
+    for name, root in roots.items():
+        path = str(folder / (name + '.egrecord'))
+        assert cli.main(['pack', root, path]) == 0
+        assert read_ballots(path) == read_ballots(root)
+        assert cli.main(['verify', path, '--output', 'summary']) == (0 if name == 'valid' else 1)
+
+
+class CollectingSink(ResultSink):
+    def __init__(self):
+        self.results = []
+
+    def emit(self, result: Result):
+        self.results.append(result)
+
+    def failures(self) -> set:
+        return {(path[-1], failure.code) for result in self.results for path, failure in result.iter_failures()}
+
+
+def open_record(root: str) -> tuple:
+    path_g = FilePathGenerator.open(root)
+    # the files are indexed before they go missing, as in a record changing under a run
+    path_g.source.names()
+    param_g = ParameterGenerator(path_g)
+    number.set_group(param_g.get_large_prime(), param_g.get_small_prime())
+    return path_g, param_g
+
+
+def test_missing_files_are_reported_through_the_sink(tmp_path, capsys):
+    root = str(tmp_path / 'record')
+    SyntheticRecordGenerator(num_ballots=10, seed=1).generate(root)
+    standard_group = (number.LARGE_PRIME, number.SMALL_PRIME)
+    try:
+        path_g, param_g = open_record(root)
+        ballot_file = path_g.list_files(path_g.get_encrypted_ballot_folder_path())[3]
+        os.remove(os.path.join(root, path_g.get_name(ballot_file)))
+        os.remove(os.path.join(root, path_g.get_name(path_g.get_guardian_coefficient_file_path(1))))
+
+        sink = CollectingSink()
+        assert not AllBallotsVerifier(param_g, path_g, VoteLimitCounter(param_g), sink).verify_all_ballots()
+        assert (path_g.get_name(ballot_file), Reason.MISSING_BALLOT) in sink.failures()
+
+        sink = CollectingSink()
+        assert not KeyGenerationVerifier(param_g, path_g, sink).verify_all_guardians()
+        assert (1, Reason.MISSING_DOCUMENT) in sink.failures()
+    finally:
+        number.set_group(*standard_group)
+    assert capsys.readouterr().out == ''
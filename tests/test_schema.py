@@ -0,0 +1,76 @@
+import os
+import json
+from verifier import cli
+from verifier.result import Result, Reason
+from verifier.schema import validate_document, read_manifest
+from verifier.synthetic import SyntheticRecordGenerator
+
+"""
+A ballot naming a contest or a selection the manifest does not have must be quarantined by the schema pass, so that
+no verifier ever looks it up in the description.
+"""
+
+
+def tamper_first_ballot(root: str, tamper) -> str:
+    folder = os.path.join(root, 'encrypted_ballots')
+    name = sorted(os.listdir(folder))[0]
+    with open(os.path.join(folder, name)) as file:
+        ballot = json.load(file)
+    tamper(ballot)
+    with open(os.path.join(folder, name), 'w') as file:
+        json.dump(ballot, file)
+    return 'encrypted_ballots/' + name
+
+
+def read_failures(jsonl: str) -> set:
+    failures = set()
+    with open(jsonl) as file:
+        for line in file:
+            result = Result.from_dict(json.loads(line))
+            failures |= {(path[-1], failure.code, failure.field) for path, failure in result.iter_failures()}
+    return failures
+
+
+def test_unknown_contest_is_quarantined(tmp_path):
+    root = str(tmp_path / 'record')
+    SyntheticRecordGenerator(num_ballots=10, seed=1).generate(root)
+    name = tamper_first_ballot(root, lambda ballot: ballot['contests'][0].update(object_id='bogus'))
+
+    jsonl = str(tmp_path / 'results.jsonl')
+    assert cli.main(['verify', root, '--output', 'summary', '--jsonl', jsonl]) == 1
+    assert (name, Reason.UNKNOWN_CONTEST, 'contests[0].object_id') in read_failures(jsonl)
+
+    # the shards quarantine the ballot likewise, before it reaches the tally products
+    partial = str(tmp_path / 'partial.json')
+    assert cli.main(['verify', root, '--output', 'summary', '--shard', '0/1', '--partial', partial]) == 1
+
+
+def test_unknown_selection_is_quarantined(tmp_path):
+    root = str(tmp_path / 'record')
+    SyntheticRecordGenerator(num_ballots=10, seed=1).generate(root)
+
+    def tamper(ballot):
+        ballot['contests'][1]['ballot_selections'][0]['object_id'] = 'bogus'
+    name = tamper_first_ballot(root, tamper)
+
+    jsonl = str(tmp_path / 'results.jsonl')
+    assert cli.main(['verify', root, '--output', 'summary', '--jsonl', jsonl]) == 1
+    assert (name, Reason.UNKNOWN_SELECTION, 'contests[1].ballot_selections[0].object_id') in read_failures(jsonl)
+
+
+def test_placeholders_are_not_in_the_manifest():
+    manifest = read_manifest({'contests': [{'object_id': 'c', 'ballot_selections': [{'object_id': 's'}]}]})
+    selection = {'object_id': 's', 'ciphertext': {'pad': 1, 'data': 2},
+                 'proof': dict.fromkeys(['proof_zero_pad', 'proof_zero_data', 'proof_one_pad', 'proof_one_data',
+                                         'proof_zero_challenge', 'proof_one_challenge', 'proof_zero_response',
+                                         'proof_one_response'], 1)}
+    placeholder = dict(selection, object_id='c-placeholder-0', is_placeholder_selection=True)
+    ballot = {'object_id': 'b', 'state': 'CAST', 'tracking_hash': 1, 'previous_tracking_hash': 2, 'crypto_hash': 3,
+              'timestamp': 4, 'contests': [{'object_id': 'c', 'proof': {'pad': 1, 'data': 2, 'challenge': 3,
+                                                                        'response': 4},
+                                            'ballot_selections': [selection, placeholder]}]}
+    assert validate_document('ballot', 'b', ballot, manifest).ok
+    # without a manifest only the shape is checked
+    assert validate_document('ballot', 'b', dict(ballot, contests=[dict(ballot['contests'][0], object_id='x')])).ok
+    assert not validate_document('ballot', 'b', dict(ballot, contests=[dict(ballot['contests'][0], object_id='x')]),
+                                 manifest).ok
@@ -0,0 +1,80 @@
+import os
+import json
+import threading
+import http.client
+import pytest
+from verifier import number
+from verifier.result import Reason
+from verifier.service import VerificationService, VerificationServer
+from verifier.synthetic import SyntheticRecordGenerator
+
+"""
+The service answers every request with json: a posted ballot is validated against the schema and the manifest
+before any check, and a failure of the checks themselves is a server error, not a client one.
+"""
+
+
+@pytest.fixture(scope='module')
+def server(tmp_path_factory):
+    root = str(tmp_path_factory.mktemp('service') / 'record')
+    SyntheticRecordGenerator(num_ballots=4, seed=1).generate(root)
+    standard_group = (number.LARGE_PRIME, number.SMALL_PRIME)
+    server = VerificationServer(('127.0.0.1', 0), VerificationService(root))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    folder = os.path.join(root, 'encrypted_ballots')
+    with open(os.path.join(folder, sorted(os.listdir(folder))[0]), 'rb') as file:
+        server.ballot = file.read()
+    yield server
+    server.shutdown()
+    server.server_close()
+    number.set_group(*standard_group)
+
+
+def post(server, body: bytes, headers=None) -> tuple:
+    connection = http.client.HTTPConnection('127.0.0.1', server.server_address[1], timeout=10)
+    connection.request('POST', '/verify-ballot', body=body, headers=headers or {})
+    response = connection.getresponse()
+    status, dic = response.status, json.loads(response.read())
+    connection.close()
+    return status, dic
+
+
+def tampered(server, tamper) -> bytes:
+    ballot = json.loads(server.ballot)
+    tamper(ballot)
+    return json.dumps(ballot).encode('utf-8')
+
+
+def test_valid_ballot(server):
+    status, dic = post(server, server.ballot)
+    assert status == 200 and dic['valid']
+
+
+@pytest.mark.parametrize('tamper, code, field', [
+    (lambda ballot: ballot['contests'][0].update(object_id='bogus'), Reason.UNKNOWN_CONTEST, 'contests[0].object_id'),
+    (lambda ballot: ballot['contests'][0]['proof'].update(pad='0x'), Reason.INVALID_FIELD, 'contests[0].proof.pad'),
+    (lambda ballot: ballot.pop('contests'), Reason.MISSING_FIELD, 'contests'),
+])
+def test_malformed_ballot(server, tamper, code, field):
+    status, dic = post(server, tampered(server, tamper))
+    assert status == 400
+    assert {'code': code, 'box': 3, 'field': field} in dic['failures']
+
+
+def test_not_json(server):
+    status, dic = post(server, b'{"object_id": ')
+    assert status == 400 and dic['failures'][0]['code'] == Reason.MALFORMED_JSON
+
+
+def test_invalid_length(server):
+    status, dic = post(server, b'', {'Content-Length': '-1'})
+    assert status == 400 and dic['error'] == 'invalid Content-Length'
+
+
+def test_verifier_error_is_a_server_error(server, monkeypatch):
+    def fail(ballot_dic):
+        raise KeyError('bug')
+    monkeypatch.setattr(server.service, 'verify_ballot', fail)
+    status, dic = post(server, server.ballot)
+    assert status == 500 and 'error' in dic
@@ -0,0 +1,71 @@
+import os
+import json
+import pytest
+from verifier import cli
+from verifier.result import Result, Reason
+from verifier.shard import Shard
+from verifier.synthetic import SyntheticRecordGenerator
+
+"""
+A record verified in shards and merged gets the verdict of an unsharded run, and the merge fails unless it is given
+every shard of one split exactly once.
+"""
+
+
+@pytest.fixture(scope='module')
+def record(tmp_path_factory):
+    folder = tmp_path_factory.mktemp('shard')
+    root = str(folder / 'record')
+    SyntheticRecordGenerator(num_ballots=20, spoil_rate=0.2, seed=1).generate(root)
+    partials = []
+    for shard in ('0/2', '1/2', '0/1'):
+        partial = str(folder / 'partial-{name}.json'.format(name=shard.replace('/', '-of-')))
+        assert cli.main(['verify', root, '--output', 'summary', '--shard', shard, '--partial', partial]) == 0
+        partials.append(partial)
+    return root, partials
+
+
+def merge(tmp_path, root: str, partials: list) -> tuple:
+    jsonl = str(tmp_path / 'results.jsonl')
+    code = cli.main(['merge', root] + partials + ['--output', 'summary', '--jsonl', jsonl])
+    with open(jsonl) as file:
+        codes = {failure.code for line in file for _, failure in Result.from_dict(json.loads(line)).iter_failures()}
+    return code, codes
+
+
+def test_shards_partition_the_ballots(record):
+    root, _ = record
+    names = os.listdir(os.path.join(root, 'encrypted_ballots'))
+    shards = [Shard(i, 3) for i in range(3)]
+    assert all(sum(shard.contains(name) for shard in shards) == 1 for name in names)
+
+
+def test_merge_every_shard(tmp_path, record):
+    root, (first, second, _) = record
+    assert merge(tmp_path, root, [first, second]) == (0, set())
+    # a single shard of one is the whole record
+    assert merge(tmp_path, root, [record[1][2]]) == (0, set())
+
+
+@pytest.mark.parametrize('parts, reasons', [
+    ((0,), {Reason.MISSING_SHARD, Reason.MISSING_BALLOT}),
+    ((0, 0), {Reason.MISSING_SHARD, Reason.DUPLICATE_BALLOT}),
+    ((0, 2), {Reason.MISSING_SHARD, Reason.DUPLICATE_BALLOT}),
+])
+def test_merge_incomplete_split(tmp_path, record, parts, reasons):
+    root, partials = record
+    code, codes = merge(tmp_path, root, [partials[i] for i in parts])
+    assert code == 1
+    assert reasons <= codes
+
+
+@pytest.mark.parametrize('fault', ['selection_proof', 'tracking_chain', 'tally'])
+def test_sharded_verdict_matches(tmp_path, fault):
+    root = str(tmp_path / 'record')
+    SyntheticRecordGenerator(num_ballots=20, seed=1, faults=[fault]).generate(root)
+    assert cli.main(['verify', root, '--output', 'summary']) == 1
+
+    partials = [str(tmp_path / 'partial-{i}.json'.format(i=i)) for i in range(2)]
+    for i, partial in enumerate(partials):
+        cli.main(['verify', root, '--output', 'summary', '--shard', '{i}/2'.format(i=i), '--partial', partial])
+    assert cli.main(['merge', root] + partials + ['--output', 'summary']) == 1
@@ -0,0 +1,35 @@
+import json
+import pytest
+from verifier import cli
+from verifier.result import Result
+from verifier.synthetic import SyntheticRecordGenerator
+
+"""
+Every fault of the synthetic generator must make the full verification fail on the box it is documented for, so
+that a check losing its teeth shows up here rather than in a benchmark that happens to pass.
+"""
+
+
+@pytest.mark.parametrize('fault, box', sorted(SyntheticRecordGenerator.FAULTS.items()))
+def test_fault_fails_its_box(tmp_path, fault, box):
+    root = str(tmp_path / 'record')
+    missing_guardians = 1 if fault in ('compensated_share', 'recombined_share') else 0
+    injected = SyntheticRecordGenerator(num_ballots=20, faults=[fault], missing_guardians=missing_guardians,
+                                        seed=1).generate(root)
+    assert [item['box'] for item in injected] == [box]
+
+    jsonl = str(tmp_path / 'results.jsonl')
+    assert cli.main(['verify', root, '--output', 'summary', '--jsonl', jsonl]) == 1
+
+    failed_boxes = set()
+    with open(jsonl) as file:
+        for line in file:
+            failed_boxes |= Result.from_dict(json.loads(line)).failed_boxes()
+    assert box in failed_boxes
+
+
+def test_valid_record_passes(tmp_path):
+    root = str(tmp_path / 'record')
+    SyntheticRecordGenerator(num_ballots=20, missing_guardians=1, seed=1).generate(root)
+
+    assert cli.main(['verify', root, '--output', 'summary']) == 0
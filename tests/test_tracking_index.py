@@ -0,0 +1,69 @@
+import os
+from verifier import tracking_index
+from verifier.generator import FilePathGenerator
+from verifier.synthetic import SyntheticRecordGenerator
+from verifier.tracking_index import TrackingIndex, OBJECT_ID
+
+"""
+The tracking index finds a ballot through its sorted file and through the log of the ballots added since, both
+surviving a reopen, and only merges the log into the sorted file once the log is large.
+"""
+
+
+def add_ballots(index: TrackingIndex, start: int, stop: int):
+    for i in range(start, stop):
+        index.add('encrypted_ballots/ballot-{i}.json'.format(i=i), str(1000 + i), 'ballot-{i}'.format(i=i))
+
+
+def test_log_compaction_and_reopen(tmp_path, monkeypatch):
+    path = str(tmp_path / 'ballots.idx')
+    index = TrackingIndex(path)
+    add_ballots(index, 0, 100)
+    # a new index is written sorted right away
+    assert index.maybe_compact()
+    assert index.count == 200 and index.num_logged == 0 and not os.path.exists(path + '.log')
+    index.close()
+
+    index = TrackingIndex(path)
+    add_ballots(index, 100, 120)
+    # a small log is kept as is
+    assert not index.maybe_compact()
+    size = os.path.getsize(path)
+    index.close()
+
+    index = TrackingIndex(path)
+    assert index.num_logged == 20 and os.path.getsize(path) == size
+    for i in (0, 99, 100, 119):
+        name = 'encrypted_ballots/ballot-{i}.json'.format(i=i)
+        assert index.lookup(str(1000 + i)) == name
+        assert index.lookup('ballot-{i}'.format(i=i), OBJECT_ID) == name
+    assert index.lookup('999') is None
+    assert len(index.names()) == 120
+
+    # a log large against the index is merged into it
+    monkeypatch.setattr(tracking_index, 'COMPACT_MIN_ENTRIES', 5)
+    assert index.maybe_compact()
+    index.close()
+
+    index = TrackingIndex(path)
+    assert index.num_logged == 0 and index.count == 240
+    assert index.lookup('1105') == 'encrypted_ballots/ballot-105.json'
+    index.close()
+
+
+def test_update_from_record(tmp_path):
+    root = str(tmp_path / 'record')
+    SyntheticRecordGenerator(num_ballots=10, seed=1).generate(root)
+    path_g = FilePathGenerator.open(root)
+    path = str(tmp_path / 'ballots.idx')
+
+    index = TrackingIndex(path)
+    assert index.update(path_g) == 10
+    index.close()
+
+    index = TrackingIndex(path)
+    assert index.update(path_g) == 0
+    folder = path_g.get_encrypted_ballot_folder_path()
+    for ballot_file, ballot_dic in path_g.iter_json_files(folder):
+        assert index.lookup(str(ballot_dic.get('tracking_hash'))) == path_g.get_name(ballot_file)
+    index.close()